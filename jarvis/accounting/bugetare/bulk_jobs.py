@@ -0,0 +1,167 @@
+"""
+Background Bulk Processing Jobs
+
+Runs process_bulk_invoices() on a local background worker so uploads return
+immediately with a job id. Job state lives in the bulk_jobs table, so any
+Gunicorn worker can answer status polls and downloads for a job running in
+another worker, and finished jobs survive worker restarts (--max-requests).
+
+Columns per job:
+    status  - progress snapshot, updated after every file
+    report  - final report from process_bulk_invoices() (pickled)
+    excel   - Excel export, generated on first download
+
+A job runs in the worker that accepted the upload. If that worker exits
+mid-job the job cannot resume; once its status has not changed for
+BULK_JOB_STALE_AFTER seconds it is reported as failed. A job still queued
+when its worker exits stays queued until it expires (BULK_JOB_TTL).
+
+Usage:
+    job_id = submit_bulk_job([(pdf_bytes, 'inv.pdf'), ...], user_id=current_user.id)
+    get_bulk_job(job_id)          # {'status': 'running', 'processed': 12, 'partial': {...}}
+    get_bulk_job_report(job_id)   # full report once status == 'completed'
+    get_bulk_job_excel(job_id)    # XLSX bytes (generated once)
+"""
+
+import os
+import uuid
+import pickle
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from database import (
+    save_bulk_job_status, save_bulk_job_result, get_bulk_job_row, delete_expired_bulk_jobs,
+)
+from .bulk_processor import process_bulk_invoices, summarize_bulk_invoices, generate_excel_report
+
+logger = logging.getLogger('jarvis.bugetare.bulk_jobs')
+
+# How long job status and results stay downloadable (seconds)
+BULK_JOB_TTL = int(os.environ.get('BULK_JOB_TTL', 3600))
+# Jobs run concurrently per process; each job already uses a process pool
+BULK_JOB_CONCURRENCY = int(os.environ.get('BULK_JOB_CONCURRENCY', 1))
+# A running job whose status has not changed this long lost its worker (seconds)
+BULK_JOB_STALE_AFTER = int(os.environ.get('BULK_JOB_STALE_AFTER', 900))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Get the per-process job executor (re-created after fork)."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=BULK_JOB_CONCURRENCY, thread_name_prefix='bulk-job')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _save_status(status: dict):
+    save_bulk_job_status(status['job_id'], status['user_id'], status, BULK_JOB_TTL)
+
+
+def _partial_summary(invoices: list[dict]) -> dict:
+    summary = summarize_bulk_invoices(invoices)
+    return {key: summary[key] for key in ('total', 'count', 'currency', 'by_month', 'by_supplier')}
+
+
+def _run_job(job_id: str, files: list[tuple[bytes, str]], status: dict):
+    parsed = []
+
+    def on_file(index, filename, result, error):
+        entry = status['files'][index]
+        if error is not None:
+            entry.update(status='failed', error=error)
+        elif result:
+            entry['status'] = 'done'
+            parsed.append(result)
+        else:
+            # No extractable text - same as the synchronous endpoint, skipped
+            entry['status'] = 'skipped'
+        status['processed'] += 1
+        status['partial'] = _partial_summary(parsed)
+        _save_status(status)
+
+    status['status'] = 'running'
+    status['started_at'] = datetime.now().isoformat()
+    _save_status(status)
+
+    try:
+        report = process_bulk_invoices(files, on_file=on_file)
+    except Exception as e:
+        logger.exception(f'Bulk job {job_id} failed')
+        status.update(status='failed', error=str(e), finished_at=datetime.now().isoformat())
+        _save_status(status)
+        return
+
+    save_bulk_job_result(job_id, report=pickle.dumps(report, protocol=pickle.HIGHEST_PROTOCOL))
+    status.update(
+        status='completed',
+        finished_at=datetime.now().isoformat(),
+        partial=_partial_summary(report['invoices']),
+    )
+    _save_status(status)
+    logger.info(f"Bulk job {job_id} completed: {report['count']} invoices, {len(report['errors'])} errors")
+
+
+def submit_bulk_job(files: list[tuple[bytes, str]], user_id: int = None) -> str:
+    """Queue files for background processing. Returns the job id."""
+    try:
+        delete_expired_bulk_jobs()
+    except Exception as e:
+        logger.warning(f'Could not delete expired bulk jobs: {e}')
+
+    job_id = uuid.uuid4().hex
+    status = {
+        'job_id': job_id,
+        'user_id': user_id,
+        'status': 'queued',
+        'created_at': datetime.now().isoformat(),
+        'started_at': None,
+        'finished_at': None,
+        'error': None,
+        'total_files': len(files),
+        'processed': 0,
+        'files': [{'filename': filename, 'status': 'pending', 'error': None} for _, filename in files],
+        'partial': _partial_summary([]),
+    }
+    _save_status(status)
+    _get_executor().submit(_run_job, job_id, files, status)
+    return job_id
+
+
+def get_bulk_job(job_id: str) -> Optional[dict]:
+    """Get a job's progress snapshot, or None if unknown/expired."""
+    row = get_bulk_job_row(job_id)
+    if row is None:
+        return None
+    status = row['status']
+    if status['status'] == 'running' and row['idle_seconds'] > BULK_JOB_STALE_AFTER:
+        # The worker running it exited (restart, --max-requests recycle, crash)
+        status.update(status='failed', error='Job interrupted: the worker running it stopped')
+    return status
+
+
+def get_bulk_job_report(job_id: str) -> Optional[dict]:
+    """Get the final report of a completed job, or None."""
+    row = get_bulk_job_row(job_id, with_report=True)
+    if row is None or row['report'] is None:
+        return None
+    return pickle.loads(row['report'])
+
+
+def get_bulk_job_excel(job_id: str) -> Optional[bytes]:
+    """Get the Excel report of a completed job, generating and storing it on first use."""
+    row = get_bulk_job_row(job_id, with_report=True, with_excel=True)
+    if row is None or row['report'] is None:
+        return None
+    if row['excel'] is not None:
+        return row['excel']
+    excel_bytes = generate_excel_report(pickle.loads(row['report']))
+    save_bulk_job_result(job_id, excel=excel_bytes)
+    return excel_bytes
@@ -9,6 +9,8 @@ from typing import Optional
 import json
 import tempfile
 
+from parsing.parse_cache import get_parse_cache, path_digest, template_cache_key
+
 
 def normalize_vat_number(vat: str) -> str:
     """
@@ -74,7 +76,13 @@ def encode_image_to_base64(image_path: str) -> tuple[str, str]:
 
 
 def pdf_to_images(pdf_path: str) -> list[tuple[str, str]]:
-    """Convert PDF pages to base64 encoded images."""
+    """Convert PDF pages to base64 encoded images (cached by file content)."""
+    cache = get_parse_cache()
+    digest = path_digest(pdf_path)
+    cached = cache.get_images(digest)
+    if cached is not None:
+        return cached
+
     images = convert_from_path(pdf_path, dpi=150)
     result = []
 
@@ -85,6 +93,7 @@ def pdf_to_images(pdf_path: str) -> list[tuple[str, str]]:
         image_data = base64.standard_b64encode(buffer.read()).decode('utf-8')
         result.append((image_data, 'image/png'))
 
+    cache.set_images(digest, result)
     return result
 
 
@@ -107,6 +116,13 @@ def parse_invoice(file_path: str, api_key: Optional[str] = None) -> dict:
     if not api_key:
         raise ValueError("ANTHROPIC_API_KEY not set. Please set the environment variable or pass api_key parameter.")
 
+    # Same file parsed before - don't pay for the AI call again
+    cache = get_parse_cache()
+    digest = path_digest(file_path)
+    cached = cache.get_result(digest, 'ai')
+    if cached is not None:
+        return cached
+
     client = anthropic.Anthropic(api_key=api_key)
 
     # Prepare image(s) based on file type
@@ -205,6 +221,7 @@ Other important notes:
         if result.get('invoice_date'):
             result['invoice_date'] = parse_romanian_date(result['invoice_date'])
 
+        cache.set_result(digest, 'ai', result)
         return result
     except json.JSONDecodeError as e:
         return {
@@ -252,6 +269,13 @@ def extract_missing_fields_with_ai(file_path: str, missing_fields: list, api_key
     if not api_key:
         return {}
 
+    cache = get_parse_cache()
+    digest = path_digest(file_path)
+    cache_key = 'ai-fields:' + ','.join(sorted(missing_fields))
+    cached = cache.get_result(digest, cache_key)
+    if cached is not None:
+        return cached
+
     client = anthropic.Anthropic(api_key=api_key)
 
     # Prepare image(s) based on file type
@@ -339,6 +363,7 @@ IMPORTANT:
         if result.get('invoice_date'):
             result['invoice_date'] = parse_romanian_date(result['invoice_date'])
 
+        cache.set_result(digest, cache_key, result)
         return result
     except json.JSONDecodeError:
         return {}
@@ -581,20 +606,8 @@ def parse_with_template(file_path: str, template: dict) -> dict:
     Falls back to default patterns if no custom regex is provided.
     Patterns are dynamically loaded from all templates in the database.
     """
-    import PyPDF2
-
     # Try to extract text from PDF for regex matching
-    ext = os.path.splitext(file_path)[1].lower()
-    text = ''
-
-    if ext == '.pdf':
-        try:
-            with open(file_path, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                for page in reader.pages:
-                    text += page.extract_text() or ''
-        except Exception:
-            pass
+    text = extract_text_from_file(file_path)
 
     # Apply template with extracted text (for format-based templates)
     result = apply_template(template, text)
@@ -737,27 +750,41 @@ def parse_invoice_with_template_from_bytes(file_bytes: bytes, filename: str, tem
         tmp.write(file_bytes)
         tmp_path = tmp.name
 
+    cache = get_parse_cache()
+    digest = path_digest(tmp_path)
+    cache_key = template_cache_key('template', template)
     try:
-        return parse_with_template(tmp_path, template)
+        cached = cache.get_result(digest, cache_key)
+        if cached is not None:
+            return cached
+        result = parse_with_template(tmp_path, template)
+        cache.set_result(digest, cache_key, result)
+        return result
     finally:
         os.unlink(tmp_path)
 
 
 def extract_text_from_file(file_path: str) -> str:
-    """Extract text from PDF or return empty string for images."""
+    """Extract text from PDF (cached by file content) or return empty string for images."""
     import PyPDF2
 
     ext = os.path.splitext(file_path)[1].lower()
     text = ''
 
     if ext == '.pdf':
+        cache = get_parse_cache()
+        digest = path_digest(file_path)
+        cached = cache.get_text(digest)
+        if cached is not None:
+            return cached
         try:
             with open(file_path, 'rb') as f:
                 reader = PyPDF2.PdfReader(f)
                 for page in reader.pages:
                     text += page.extract_text() or ''
         except Exception:
-            pass
+            return text
+        cache.set_text(digest, text)
 
     return text
 
@@ -1117,6 +1144,14 @@ def auto_detect_and_parse(file_bytes: bytes, filename: str, templates: list[dict
         matched_template = find_matching_template(text, templates)
 
         if matched_template:
+            # Final result for this file + template version, including any AI gap-filling
+            cache = get_parse_cache()
+            digest = path_digest(tmp_path)
+            cache_key = template_cache_key('auto', matched_template)
+            cached = cache.get_result(digest, cache_key)
+            if cached is not None:
+                return cached
+
             # Use template-based parsing
             result = parse_with_template(tmp_path, matched_template)
             result['auto_detected_template'] = matched_template.get('name')
@@ -1133,6 +1168,7 @@ def auto_detect_and_parse(file_bytes: bytes, filename: str, templates: list[dict
             if not result.get('customer_vat'):
                 missing_fields.append('customer_vat')
 
+            ai_failed = False
             if missing_fields:
                 # Use AI to extract only the missing fields
                 try:
@@ -1144,7 +1180,10 @@ def auto_detect_and_parse(file_bytes: bytes, filename: str, templates: list[dict
                 except Exception as e:
                     # AI fallback failed, continue with template results
                     print(f"AI fallback failed for missing fields: {e}")
+                    ai_failed = True
 
+            if not ai_failed:
+                cache.set_result(digest, cache_key, result)
             return result
         else:
             # Fall back to AI parsing
@@ -340,93 +340,171 @@ def seed_vendor_mappings():
 
 # ============== BANK STATEMENT TRANSACTIONS ==============
 
+TRANSACTION_INSERT_COLUMNS = (
+    'statement_id', 'statement_file', 'company_name', 'company_cui', 'account_number',
+    'transaction_date', 'value_date', 'description', 'vendor_name',
+    'matched_supplier', 'amount', 'currency', 'original_amount',
+    'original_currency', 'exchange_rate', 'auth_code', 'card_number',
+    'transaction_type', 'status',
+)
+# Two transactions with the same key are duplicates (NULL equals NULL)
+TRANSACTION_DEDUP_KEY = ('company_cui', 'account_number', 'transaction_date', 'amount', 'currency', 'description')
+# Rows per multi-row VALUES statement when staging
+INGEST_PAGE_SIZE = 1000
+
+
+def _transaction_insert_values(txn: dict, statement_id: int = None) -> tuple:
+    """Values for TRANSACTION_INSERT_COLUMNS, with the same defaults as the insert."""
+    return (
+        statement_id,
+        txn.get('statement_file'),
+        txn.get('company_name'),
+        txn.get('company_cui'),
+        txn.get('account_number'),
+        txn.get('transaction_date'),
+        txn.get('value_date'),
+        txn.get('description'),
+        txn.get('vendor_name'),
+        txn.get('matched_supplier'),
+        txn.get('amount'),
+        txn.get('currency', 'RON'),
+        txn.get('original_amount'),
+        txn.get('original_currency'),
+        txn.get('exchange_rate'),
+        txn.get('auth_code'),
+        txn.get('card_number'),
+        txn.get('transaction_type'),
+        txn.get('status', 'pending'),
+    )
+
+
+def _ingest_transactions(cursor, transactions: list[dict], statement_id: int = None) -> list[int]:
+    """
+    Set-based insert with dedup. Must run inside a transaction.
+
+    Stages all rows in a temp table (multi-row VALUES), then inserts the rows
+    whose dedup key is neither already in bank_statement_transactions nor
+    repeated earlier in the batch, in one INSERT ... SELECT. ON CONFLICT covers
+    rows inserted concurrently by another upload.
+
+    Rows with a date and amount (all parsed statement rows) are matched with
+    equality on those columns so Postgres can hash/index the anti-join; rows
+    missing either go through a second, NULL-safe statement.
+
+    Returns:
+        New transaction ids in input order.
+    """
+    from psycopg2.extras import execute_values
+
+    columns = ', '.join(TRANSACTION_INSERT_COLUMNS)
+    key = ', '.join(TRANSACTION_DEDUP_KEY)
+
+    cursor.execute(f'''
+        CREATE TEMP TABLE txn_stage ON COMMIT DROP AS
+        SELECT 0 AS ord, {columns} FROM bank_statement_transactions WITH NO DATA
+    ''')
+    execute_values(
+        cursor,
+        f'INSERT INTO txn_stage (ord, {columns}) VALUES %s',
+        [(i,) + _transaction_insert_values(txn, statement_id) for i, txn in enumerate(transactions)],
+        page_size=INGEST_PAGE_SIZE
+    )
+
+    null_safe = ' AND '.join(f't.{col} IS NOT DISTINCT FROM s.{col}' for col in TRANSACTION_DEDUP_KEY)
+    variants = (
+        ('s.transaction_date IS NOT NULL AND s.amount IS NOT NULL',
+         f't.transaction_date = s.transaction_date AND t.amount = s.amount AND {null_safe}'),
+        ('s.transaction_date IS NULL OR s.amount IS NULL', null_safe),
+    )
+
+    new_ids = []
+    for stage_filter, duplicate_match in variants:
+        # SERIAL ids are assigned in ORDER BY ord, so sorting ids restores input order
+        cursor.execute(f'''
+            INSERT INTO bank_statement_transactions ({columns})
+            SELECT {columns} FROM (
+                SELECT DISTINCT ON ({key}) *
+                FROM txn_stage s
+                WHERE {stage_filter}
+                ORDER BY {key}, ord
+            ) s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM bank_statement_transactions t
+                WHERE {duplicate_match}
+            )
+            ORDER BY ord
+            ON CONFLICT DO NOTHING
+            RETURNING id
+        ''')
+        new_ids.extend(row['id'] for row in cursor.fetchall())
+
+    return sorted(new_ids)
+
+
+def _ingest_transactions_per_row(cursor, transactions: list[dict], statement_id: int = None) -> list[int]:
+    """
+    Previous row-at-a-time insert: one duplicate probe, SAVEPOINT and INSERT per
+    transaction. Kept as the baseline for scripts/benchmark_statement_ingest.py.
+    """
+    import psycopg2.errors
+
+    new_ids = []
+    placeholders = ', '.join(['%s'] * len(TRANSACTION_INSERT_COLUMNS))
+    for txn in transactions:
+        # Check for duplicate using IS NOT DISTINCT FROM for NULL-safe comparison
+        cursor.execute('''
+            SELECT id FROM bank_statement_transactions
+            WHERE company_cui IS NOT DISTINCT FROM %s
+              AND account_number IS NOT DISTINCT FROM %s
+              AND transaction_date IS NOT DISTINCT FROM %s
+              AND amount IS NOT DISTINCT FROM %s
+              AND currency IS NOT DISTINCT FROM %s
+              AND description IS NOT DISTINCT FROM %s
+            LIMIT 1
+        ''', tuple(txn.get(col, 'RON' if col == 'currency' else None) for col in TRANSACTION_DEDUP_KEY))
+        if cursor.fetchone():
+            continue
+
+        try:
+            cursor.execute('SAVEPOINT txn_insert')
+            cursor.execute(f'''
+                INSERT INTO bank_statement_transactions ({', '.join(TRANSACTION_INSERT_COLUMNS)})
+                VALUES ({placeholders})
+                RETURNING id
+            ''', _transaction_insert_values(txn, statement_id))
+            new_ids.append(cursor.fetchone()['id'])
+            cursor.execute('RELEASE SAVEPOINT txn_insert')
+        except psycopg2.errors.UniqueViolation:
+            cursor.execute('ROLLBACK TO SAVEPOINT txn_insert')
+    return new_ids
+
+
 def save_transactions_with_dedup(
     transactions: list[dict],
     statement_id: int = None
 ) -> dict:
     """
     Save transactions with duplicate detection.
-    Uses both application-level check AND database unique constraint.
+
+    A transaction is a duplicate if its (company_cui, account_number,
+    transaction_date, amount, currency, description) matches an existing row
+    or an earlier row in the same batch. The whole batch is staged and inserted
+    set-based (see _ingest_transactions), so an upload costs a handful of
+    round-trips regardless of row count.
+
     Returns dict with new_ids, duplicate_count, and new_count.
     """
-    import psycopg2.errors
+    if not transactions:
+        return {'new_ids': [], 'new_count': 0, 'duplicate_count': 0}
 
     conn = get_db()
     try:
-        # Disable autocommit to enable transaction with SAVEPOINTs
+        # Temp staging table lives for this transaction only
         conn.autocommit = False
         cursor = get_cursor(conn)
 
-        new_ids = []
-        duplicate_count = 0
-
-        for txn in transactions:
-            # Check for duplicate using IS NOT DISTINCT FROM for NULL-safe comparison
-            # Include account_number and currency to distinguish transactions across accounts/currencies
-            cursor.execute('''
-                SELECT id FROM bank_statement_transactions
-                WHERE company_cui IS NOT DISTINCT FROM %s
-                  AND account_number IS NOT DISTINCT FROM %s
-                  AND transaction_date IS NOT DISTINCT FROM %s
-                  AND amount IS NOT DISTINCT FROM %s
-                  AND currency IS NOT DISTINCT FROM %s
-                  AND description IS NOT DISTINCT FROM %s
-                LIMIT 1
-            ''', (
-                txn.get('company_cui'),
-                txn.get('account_number'),
-                txn.get('transaction_date'),
-                txn.get('amount'),
-                txn.get('currency', 'RON'),
-                txn.get('description')
-            ))
-
-            if cursor.fetchone():
-                duplicate_count += 1
-                continue
-
-            # Insert new transaction with constraint violation handling
-            # Use savepoint to allow partial rollback without losing other inserts
-            try:
-                cursor.execute('SAVEPOINT txn_insert')
-                cursor.execute('''
-                    INSERT INTO bank_statement_transactions (
-                        statement_id, statement_file, company_name, company_cui, account_number,
-                        transaction_date, value_date, description, vendor_name,
-                        matched_supplier, amount, currency, original_amount,
-                        original_currency, exchange_rate, auth_code, card_number,
-                        transaction_type, status
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                ''', (
-                    statement_id,
-                    txn.get('statement_file'),
-                    txn.get('company_name'),
-                    txn.get('company_cui'),
-                    txn.get('account_number'),
-                    txn.get('transaction_date'),
-                    txn.get('value_date'),
-                    txn.get('description'),
-                    txn.get('vendor_name'),
-                    txn.get('matched_supplier'),
-                    txn.get('amount'),
-                    txn.get('currency', 'RON'),
-                    txn.get('original_amount'),
-                    txn.get('original_currency'),
-                    txn.get('exchange_rate'),
-                    txn.get('auth_code'),
-                    txn.get('card_number'),
-                    txn.get('transaction_type'),
-                    txn.get('status', 'pending')
-                ))
-                new_ids.append(cursor.fetchone()['id'])
-                cursor.execute('RELEASE SAVEPOINT txn_insert')
-            except psycopg2.errors.UniqueViolation:
-                # Constraint caught a duplicate - rollback only this insert, not the whole batch
-                cursor.execute('ROLLBACK TO SAVEPOINT txn_insert')
-                duplicate_count += 1
-                logger.debug(f'Duplicate caught by constraint: {txn.get("description")[:50]}...')
-                continue
+        new_ids = _ingest_transactions(cursor, transactions, statement_id)
+        duplicate_count = len(transactions) - len(new_ids)
 
         conn.commit()
         logger.info(f'Saved {len(new_ids)} new transactions, {duplicate_count} duplicates skipped')
@@ -648,24 +726,22 @@ def bulk_update_status(transaction_ids: list[int], status: str) -> int:
     try:
         cursor = get_cursor(conn)
 
-        placeholders = ','.join(['%s'] * len(transaction_ids))
-
         if status == 'ignored':
             # Clear invoice suggestions when ignoring transactions
-            cursor.execute(f'''
+            cursor.execute('''
                 UPDATE bank_statement_transactions
                 SET status = %s,
                     suggested_invoice_id = NULL,
                     match_confidence = NULL,
                     match_method = NULL
-                WHERE id IN ({placeholders})
-            ''', (status, *transaction_ids))
+                WHERE id = ANY(%s)
+            ''', (status, list(transaction_ids)))
         else:
-            cursor.execute(f'''
+            cursor.execute('''
                 UPDATE bank_statement_transactions
                 SET status = %s
-                WHERE id IN ({placeholders})
-            ''', (status, *transaction_ids))
+                WHERE id = ANY(%s)
+            ''', (status, list(transaction_ids)))
 
         conn.commit()
         return cursor.rowcount
@@ -810,7 +886,7 @@ def check_duplicate_transaction(company_cui: str, transaction_date: str,
 def get_candidate_invoices(supplier: str = None, amount: float = None,
                            amount_tolerance: float = 0.1, currency: str = 'RON',
                            date_from: str = None, date_to: str = None,
-                           limit: int = 50) -> list[dict]:
+                           limit: Optional[int] = 50) -> list[dict]:
     """
     Get candidate invoices for matching against a transaction.
 
@@ -821,7 +897,7 @@ def get_candidate_invoices(supplier: str = None, amount: float = None,
         currency: Transaction currency
         date_from: Start date for invoice date range
         date_to: End date for invoice date range
-        limit: Max number of candidates
+        limit: Max number of candidates (None = all matching invoices)
 
     Returns:
         List of invoice dicts with id, supplier, invoice_number, invoice_value, etc.
@@ -864,7 +940,10 @@ def get_candidate_invoices(supplier: str = None, amount: float = None,
             params.append(date_to)
 
         where_clause = ' AND '.join(conditions) if conditions else 'TRUE'
-        params.append(limit)
+        limit_clause = ''
+        if limit is not None:
+            limit_clause = 'LIMIT %s'
+            params.append(limit)
 
         cursor.execute(f'''
             SELECT id, supplier, invoice_number, invoice_date, invoice_value,
@@ -873,7 +952,7 @@ def get_candidate_invoices(supplier: str = None, amount: float = None,
             FROM invoices
             WHERE {where_clause}
             ORDER BY invoice_date DESC
-            LIMIT %s
+            {limit_clause}
         ''', tuple(params))
 
         invoices = []
@@ -995,10 +1074,41 @@ def update_transaction_match(transaction_id: int, invoice_id: int = None,
         release_db(conn)
 
 
+def _update_matches_from_values(cursor, set_clause: str, rows: list[tuple]) -> set[int]:
+    """
+    Apply (transaction_id, invoice_id, confidence, method) rows in one
+    UPDATE ... FROM (VALUES ...) statement. Returns the ids that were updated.
+    """
+    if not rows:
+        return set()
+
+    from psycopg2.extras import execute_values
+
+    updated = execute_values(
+        cursor,
+        f'''
+            UPDATE bank_statement_transactions AS t
+            SET {set_clause}
+            FROM (VALUES %s) AS v(id, invoice_id, confidence, method)
+            WHERE t.id = v.id
+            RETURNING t.id
+        ''',
+        rows,
+        template='(%s::integer, %s::integer, %s::real, %s::text)',
+        page_size=len(rows),
+        fetch=True
+    )
+    return {row['id'] for row in updated}
+
+
 def bulk_update_transaction_matches(results: list[dict]) -> dict:
     """
     Bulk update transactions with match results.
 
+    Auto-accepted results are linked with one UPDATE ... FROM (VALUES ...)
+    statement and suggestions are stored with a second one, so the cost is two
+    round-trips regardless of batch size.
+
     Args:
         results: List of match results from invoice_matcher.auto_match_transactions()
             Each dict should have: transaction_id, invoice_id, suggested_invoice_id,
@@ -1007,49 +1117,43 @@ def bulk_update_transaction_matches(results: list[dict]) -> dict:
     Returns:
         Summary dict with counts of updated transactions.
     """
+    linked = []
+    suggested = []
+    for result in results:
+        txn_id = result.get('transaction_id')
+        if not txn_id:
+            continue
+
+        if result.get('auto_accepted') and result.get('invoice_id'):
+            # Auto-link confirmed match
+            linked.append((txn_id, result['invoice_id'], result.get('confidence'), result.get('method')))
+        elif result.get('suggested_invoice_id'):
+            # Store suggestion for review
+            suggested.append((txn_id, result['suggested_invoice_id'], result.get('confidence'), result.get('method')))
+
+    if not linked and not suggested:
+        return {'linked_count': 0, 'suggested_count': 0}
+
     conn = get_db()
     try:
         cursor = get_cursor(conn)
 
-        linked_count = 0
-        suggested_count = 0
-
-        for result in results:
-            txn_id = result.get('transaction_id')
-            if not txn_id:
-                continue
-
-            if result.get('auto_accepted') and result.get('invoice_id'):
-                # Auto-link confirmed match
-                cursor.execute('''
-                    UPDATE bank_statement_transactions
-                    SET invoice_id = %s, match_confidence = %s, match_method = %s, status = 'resolved'
-                    WHERE id = %s
-                ''', (
-                    result['invoice_id'],
-                    result.get('confidence'),
-                    result.get('method'),
-                    txn_id
-                ))
-                if cursor.rowcount > 0:
-                    linked_count += 1
-
-            elif result.get('suggested_invoice_id'):
-                # Store suggestion for review
-                cursor.execute('''
-                    UPDATE bank_statement_transactions
-                    SET suggested_invoice_id = %s, match_confidence = %s, match_method = %s
-                    WHERE id = %s
-                ''', (
-                    result['suggested_invoice_id'],
-                    result.get('confidence'),
-                    result.get('method'),
-                    txn_id
-                ))
-                if cursor.rowcount > 0:
-                    suggested_count += 1
+        # A row may only be joined once per UPDATE; the last result for a transaction wins
+        linked_ids = _update_matches_from_values(
+            cursor,
+            "invoice_id = v.invoice_id, match_confidence = v.confidence, match_method = v.method, status = 'resolved'",
+            list({row[0]: row for row in linked}.values())
+        )
+        suggested_ids = _update_matches_from_values(
+            cursor,
+            'suggested_invoice_id = v.invoice_id, match_confidence = v.confidence, match_method = v.method',
+            list({row[0]: row for row in suggested}.values())
+        )
 
         conn.commit()
+
+        linked_count = sum(1 for row in linked if row[0] in linked_ids)
+        suggested_count = sum(1 for row in suggested if row[0] in suggested_ids)
         logger.info(f'Bulk match update: {linked_count} linked, {suggested_count} suggested')
         return {
             'linked_count': linked_count,
@@ -1073,25 +1177,14 @@ def accept_suggested_match(transaction_id: int) -> bool:
     try:
         cursor = get_cursor(conn)
 
-        # Get the current suggested invoice
-        cursor.execute('''
-            SELECT suggested_invoice_id, match_confidence, match_method
-            FROM bank_statement_transactions
-            WHERE id = %s AND suggested_invoice_id IS NOT NULL
-        ''', (transaction_id,))
-
-        row = cursor.fetchone()
-        if not row:
-            return False
-
-        # Move suggested to confirmed
+        # Move suggested to confirmed; no row updated means there was no suggestion
         cursor.execute('''
             UPDATE bank_statement_transactions
             SET invoice_id = suggested_invoice_id,
                 suggested_invoice_id = NULL,
                 match_method = COALESCE(match_method, 'manual') || '_accepted',
                 status = 'resolved'
-            WHERE id = %s
+            WHERE id = %s AND suggested_invoice_id IS NOT NULL
         ''', (transaction_id,))
 
         conn.commit()
@@ -1128,6 +1221,84 @@ def reject_suggested_match(transaction_id: int) -> bool:
         release_db(conn)
 
 
+# ============== AI MATCH DECISION CACHE ==============
+
+def get_ai_match_decision(cache_key: str) -> Optional[dict]:
+    """
+    Get a cached AI match decision and count the hit.
+
+    Entries are removed by trigger when any of their candidate invoices
+    changes (migration 5), so a returned decision is still current.
+
+    Returns:
+        Dict with invoice_id, confidence, reasoning, alternatives, or None.
+    """
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+
+        cursor.execute('''
+            UPDATE statement_ai_match_cache
+            SET hit_count = hit_count + 1, last_hit_at = CURRENT_TIMESTAMP
+            WHERE cache_key = %s
+            RETURNING invoice_id, confidence, reasoning, alternatives
+        ''', (cache_key,))
+        row = cursor.fetchone()
+
+        conn.commit()
+        return dict(row) if row else None
+    finally:
+        release_db(conn)
+
+
+def save_ai_match_decision(cache_key: str, candidate_invoice_ids: list[int], decision: dict):
+    """Store an AI match decision for the given candidate invoices."""
+    import json
+
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+
+        cursor.execute('''
+            INSERT INTO statement_ai_match_cache (
+                cache_key, invoice_id, confidence, reasoning, alternatives, candidate_invoice_ids
+            ) VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (cache_key) DO UPDATE SET
+                invoice_id = EXCLUDED.invoice_id,
+                confidence = EXCLUDED.confidence,
+                reasoning = EXCLUDED.reasoning,
+                alternatives = EXCLUDED.alternatives,
+                candidate_invoice_ids = EXCLUDED.candidate_invoice_ids,
+                created_at = CURRENT_TIMESTAMP
+        ''', (
+            cache_key,
+            decision.get('invoice_id'),
+            decision.get('confidence'),
+            decision.get('reasoning'),
+            json.dumps(decision.get('alternatives') or []),
+            candidate_invoice_ids
+        ))
+
+        conn.commit()
+    finally:
+        release_db(conn)
+
+
+def get_ai_match_cache_summary() -> dict:
+    """Entry count and lifetime hits of the AI match decision cache."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+
+        cursor.execute('''
+            SELECT COUNT(*) AS entries, COALESCE(SUM(hit_count), 0) AS total_hits
+            FROM statement_ai_match_cache
+        ''')
+        return dict(cursor.fetchone())
+    finally:
+        release_db(conn)
+
+
 # ============== TRANSACTION MERGING ==============
 
 def merge_transactions(transaction_ids: list[int]) -> dict:
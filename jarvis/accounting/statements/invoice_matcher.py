@@ -7,11 +7,16 @@ Matches transactions to invoices using a 3-layer approach:
 3. AI fallback (Claude semantic analysis)
 """
 import json
+import hashlib
 import logging
 import os
-from datetime import datetime, timedelta
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, date
 from difflib import SequenceMatcher
 
+from .database import get_ai_match_decision, save_ai_match_decision
+
 logger = logging.getLogger('jarvis.statements.invoice_matcher')
 
 # Matching thresholds
@@ -31,6 +36,13 @@ SCORE_DATE_WITHIN_60_DAYS = 2
 SCORE_SUPPLIER_EXACT = 5
 SCORE_SUPPLIER_SIMILAR = 2
 
+# Candidates sent to Claude per transaction
+AI_MAX_CANDIDATES = 5
+
+# Widest amount band that still scores (see calculate_amount_score)
+MAX_AMOUNT_DIFF_PERCENT = 5
+SUPPLIER_SIMILARITY_THRESHOLD = 0.8
+
 
 def normalize_amount(amount: float) -> float:
     """Normalize amount to positive value for comparison."""
@@ -139,50 +151,151 @@ def calculate_supplier_score(txn_supplier: str, inv_supplier: str) -> int:
     # Calculate similarity ratio
     similarity = SequenceMatcher(None, txn_lower, inv_lower).ratio()
 
-    if similarity >= 0.8:
+    if similarity >= SUPPLIER_SIMILARITY_THRESHOLD:
         return SCORE_SUPPLIER_SIMILAR
 
     return 0
 
 
-def find_invoice_candidates(transaction: dict, invoices: list) -> list[dict]:
+def _to_date(value):
+    """Parse an invoice/transaction date the same way calculate_date_score() does."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.fromisoformat(value).date() if 'T' in value else datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _invoice_amount(invoice: dict, txn_currency: str) -> float:
+    """Invoice amount comparable to a transaction in txn_currency."""
+    if txn_currency == 'RON':
+        inv_amount = invoice.get('value_ron') or invoice.get('invoice_value', 0)
+    elif txn_currency == 'EUR':
+        inv_amount = invoice.get('value_eur') or invoice.get('invoice_value', 0)
+    else:
+        inv_amount = invoice.get('invoice_value', 0)
+    return normalize_amount(inv_amount)
+
+
+class InvoiceMatchIndex:
+    """
+    In-memory lookup structure over a set of invoices for candidate search.
+
+    Candidates are invoices that match the transaction on amount or supplier:
+    - amount within MAX_AMOUNT_DIFF_PERCENT (sorted amounts per currency view, bisected)
+    - exact or similar supplier name (similarity computed once per distinct name)
+
+    The MAX_DATE_DIFFERENCE_DAYS window only adds to the score of those. An
+    invoice that is merely dated in the window (any amount, other supplier)
+    is not a candidate: it scored at most 5 points, yet on a busy ledger it
+    filled the AI prompt and the no-match suggestion with unrelated invoices.
+    So scoring a transaction touches a handful of invoices instead of the
+    whole 60-day window.
+
+    Build once per batch and pass it wherever a list of invoices is accepted:
+        index = InvoiceMatchIndex(invoices)
+        auto_match_transactions(transactions, index)
+    """
+
+    def __init__(self, invoices: list):
+        self.invoices = list(invoices)
+        self._amounts = {}  # currency view -> (sorted amounts, invoice positions)
+
+        self._parsed_dates = {
+            i: inv_date for i, inv in enumerate(self.invoices)
+            if (inv_date := _to_date(inv.get('invoice_date')))
+        }
+
+        self._by_supplier = {}
+        for i, invoice in enumerate(self.invoices):
+            name = (invoice.get('supplier') or '').lower().strip()
+            if name:
+                self._by_supplier.setdefault(name, []).append(i)
+        self._supplier_scores = {}  # normalized txn supplier -> {invoice supplier: score}
+
+    def __len__(self):
+        return len(self.invoices)
+
+    @staticmethod
+    def _currency_view(txn_currency: str) -> str:
+        return txn_currency if txn_currency in ('RON', 'EUR') else ''
+
+    def _amount_bucket(self, txn_currency: str) -> tuple[list, list]:
+        view = self._currency_view(txn_currency)
+        if view not in self._amounts:
+            pairs = sorted((_invoice_amount(inv, view), i) for i, inv in enumerate(self.invoices))
+            self._amounts[view] = ([a for a, _ in pairs], [i for _, i in pairs])
+        return self._amounts[view]
+
+    def supplier_scores(self, txn_supplier: str) -> dict:
+        """Supplier score for every indexed supplier name that scores > 0."""
+        if not txn_supplier:
+            return {}
+        txn_lower = txn_supplier.lower().strip()
+        if txn_lower not in self._supplier_scores:
+            self._supplier_scores[txn_lower] = {
+                name: score for name in self._by_supplier
+                if (score := calculate_supplier_score(txn_lower, name)) > 0
+            }
+        return self._supplier_scores[txn_lower]
+
+    def invoice_date(self, position: int):
+        return self._parsed_dates.get(position)
+
+    def candidate_positions(self, transaction: dict) -> list[int]:
+        """Positions of invoices matching the transaction on amount or supplier, in input order."""
+        positions = set()
+
+        txn_amount = normalize_amount(transaction.get('amount', 0))
+        amounts, amount_positions = self._amount_bucket(transaction.get('currency', 'RON'))
+        # inv within 5% of itself: txn / 1.05 <= inv <= txn / 0.95 (small slack for float rounding)
+        low = txn_amount / (1 + MAX_AMOUNT_DIFF_PERCENT / 100) * (1 - 1e-9)
+        high = txn_amount / (1 - MAX_AMOUNT_DIFF_PERCENT / 100) * (1 + 1e-9)
+        positions.update(amount_positions[bisect_left(amounts, low):bisect_right(amounts, high)])
+
+        for name in self.supplier_scores(transaction.get('matched_supplier')):
+            positions.update(self._by_supplier[name])
+
+        return sorted(positions)
+
+
+def find_invoice_candidates(transaction: dict, invoices) -> list[dict]:
     """
     Find potential invoice matches for a transaction.
 
     Args:
         transaction: Dict with amount, transaction_date, matched_supplier, currency
-        invoices: List of invoice dicts with invoice_value, invoice_date, supplier, etc.
+        invoices: List of invoice dicts with invoice_value, invoice_date, supplier, etc.,
+            or an InvoiceMatchIndex built over them (reuse it across transactions)
 
     Returns:
         List of candidates sorted by score:
         [{'invoice': {...}, 'score': 0.95, 'reasons': ['exact_amount', 'same_supplier']}]
     """
+    index = invoices if isinstance(invoices, InvoiceMatchIndex) else InvoiceMatchIndex(invoices)
+
     candidates = []
     txn_amount = normalize_amount(transaction.get('amount', 0))
-    txn_date = transaction.get('transaction_date')
-    txn_supplier = transaction.get('matched_supplier')
+    txn_date = _to_date(transaction.get('transaction_date'))
     txn_currency = transaction.get('currency', 'RON')
+    supplier_scores = index.supplier_scores(transaction.get('matched_supplier'))
 
-    for invoice in invoices:
-        # Skip already matched invoices (check by payment_status or other criteria)
-        # For now, consider all invoices as candidates
+    for position in index.candidate_positions(transaction):
+        invoice = index.invoices[position]
 
         # Get invoice amount in same currency or use value_ron for comparison
-        if txn_currency == 'RON':
-            inv_amount = invoice.get('value_ron') or invoice.get('invoice_value', 0)
-        elif txn_currency == 'EUR':
-            inv_amount = invoice.get('value_eur') or invoice.get('invoice_value', 0)
-        else:
-            inv_amount = invoice.get('invoice_value', 0)
-
-        inv_amount = normalize_amount(inv_amount)
-        inv_date = invoice.get('invoice_date')
-        inv_supplier = invoice.get('supplier')
+        inv_amount = _invoice_amount(invoice, txn_currency)
+        inv_supplier = (invoice.get('supplier') or '').lower().strip()
 
         # Calculate scores
         amount_score = calculate_amount_score(txn_amount, inv_amount)
-        date_score = calculate_date_score(txn_date, inv_date)
-        supplier_score = calculate_supplier_score(txn_supplier, inv_supplier)
+        date_score = calculate_date_score(txn_date, index.invoice_date(position))
+        supplier_score = supplier_scores.get(inv_supplier, 0)
 
         total_score = amount_score + date_score + supplier_score
 
@@ -223,7 +336,7 @@ def find_invoice_candidates(transaction: dict, invoices: list) -> list[dict]:
                 'supplier_score': supplier_score
             })
 
-    # Sort by score descending
+    # Sort by score descending (stable, so ties keep invoice order)
     candidates.sort(key=lambda x: x['score'], reverse=True)
 
     return candidates
@@ -272,6 +385,76 @@ def score_candidates(transaction: dict, invoices: list, limit: int = 3) -> list[
     return candidates[:limit]
 
 
+_ai_cache_stats = {'hits': 0, 'misses': 0}
+_ai_cache_stats_lock = threading.Lock()
+
+
+def ai_match_cache_key(transaction: dict, candidates: list) -> str:
+    """
+    Cache key for an AI match decision.
+
+    Hash of the normalized transaction fields in the prompt plus the candidate
+    invoices (id, amounts, currency, number, supplier, date), sorted by id so
+    the same set in a different order maps to the same decision.
+    """
+    txn_fields = {
+        'date': str(transaction.get('transaction_date') or '')[:10],
+        'amount': round(normalize_amount(transaction.get('amount', 0)), 2),
+        'currency': transaction.get('currency') or 'RON',
+        'description': ' '.join((transaction.get('description') or '').split()).lower(),
+        'vendor': (transaction.get('vendor_name') or '').strip().lower(),
+        'supplier': (transaction.get('matched_supplier') or '').strip().lower(),
+    }
+    invoice_fields = sorted(
+        (
+            c['invoice'].get('id') or 0,
+            json.dumps([
+                round(normalize_amount(c['invoice'].get('invoice_value')), 2),
+                round(normalize_amount(c['invoice'].get('value_ron')), 2),
+                round(normalize_amount(c['invoice'].get('value_eur')), 2),
+                c['invoice'].get('currency'),
+                c['invoice'].get('invoice_number'),
+                c['invoice'].get('supplier'),
+                str(c['invoice'].get('invoice_date') or '')[:10],
+            ], default=str)
+        )
+        for c in candidates[:AI_MAX_CANDIDATES]
+    )
+    payload = json.dumps({'transaction': txn_fields, 'invoices': invoice_fields}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _record_ai_cache(hit: bool):
+    with _ai_cache_stats_lock:
+        _ai_cache_stats['hits' if hit else 'misses'] += 1
+
+
+def get_ai_match_cache_stats() -> dict:
+    """Process-wide AI decision cache hits, misses (= Claude calls) and hit ratio."""
+    with _ai_cache_stats_lock:
+        lookups = _ai_cache_stats['hits'] + _ai_cache_stats['misses']
+        return {
+            **_ai_cache_stats,
+            'hit_ratio': round(_ai_cache_stats['hits'] / lookups, 3) if lookups else 0.0,
+        }
+
+
+def _get_cached_ai_decision(cache_key: str) -> dict | None:
+    try:
+        return get_ai_match_decision(cache_key)
+    except Exception as e:
+        logger.warning(f'AI match cache lookup failed: {e}')
+        return None
+
+
+def _save_cached_ai_decision(cache_key: str, candidates: list, decision: dict):
+    candidate_ids = sorted({c['invoice'].get('id') for c in candidates[:AI_MAX_CANDIDATES]} - {None})
+    try:
+        save_ai_match_decision(cache_key, candidate_ids, decision)
+    except Exception as e:
+        logger.warning(f'AI match cache write failed: {e}')
+
+
 def match_with_ai(transaction: dict, candidates: list, use_cache: bool = True) -> dict:
     """
     Use Claude AI to analyze transaction and suggest best invoice match.
@@ -279,13 +462,30 @@ def match_with_ai(transaction: dict, candidates: list, use_cache: bool = True) -
     Args:
         transaction: Transaction dict with description, amount, date, etc.
         candidates: List of candidate invoices from heuristic scoring
-        use_cache: Whether to use cached results (not implemented yet)
+        use_cache: Reuse a stored decision for the same transaction and candidate
+            invoices (see ai_match_cache_key) instead of calling Claude
 
     Returns:
-        Match result with invoice_id, confidence, reasoning, and alternatives.
+        Match result with invoice_id, confidence, reasoning, and alternatives;
+        'cached' tells whether it came from the decision cache.
     """
     import anthropic
 
+    cache_key = None
+    if use_cache and candidates:
+        cache_key = ai_match_cache_key(transaction, candidates)
+        cached = _get_cached_ai_decision(cache_key)
+        _record_ai_cache(cached is not None)
+        if cached is not None:
+            return {
+                'invoice_id': cached.get('invoice_id'),
+                'confidence': cached.get('confidence') or 0,
+                'method': 'ai',
+                'reasoning': cached.get('reasoning'),
+                'alternatives': cached.get('alternatives') or [],
+                'cached': True
+            }
+
     api_key = os.environ.get('ANTHROPIC_API_KEY')
     if not api_key:
         logger.warning('ANTHROPIC_API_KEY not set, skipping AI matching')
@@ -306,7 +506,7 @@ def match_with_ai(transaction: dict, candidates: list, use_cache: bool = True) -
 
     # Prepare candidate invoices for the prompt
     invoices_for_prompt = []
-    for c in candidates[:5]:  # Max 5 candidates for AI
+    for c in candidates[:AI_MAX_CANDIDATES]:
         inv = c['invoice']
         invoices_for_prompt.append({
             'invoice_id': inv.get('id'),
@@ -369,13 +569,17 @@ Return ONLY valid JSON, no other text."""
 
         result = json.loads(response_text)
 
-        return {
+        decision = {
             'invoice_id': result.get('best_match_invoice_id'),
             'confidence': result.get('confidence', 0),
             'method': 'ai',
             'reasoning': result.get('reasoning'),
-            'alternatives': result.get('alternative_matches', [])
+            'alternatives': result.get('alternative_matches', []),
+            'cached': False
         }
+        if cache_key:
+            _save_cached_ai_decision(cache_key, candidates, decision)
+        return decision
 
     except json.JSONDecodeError as e:
         logger.error(f'AI matching JSON parse error: {e}')
@@ -395,7 +599,8 @@ Return ONLY valid JSON, no other text."""
         }
 
 
-def auto_match_transaction(transaction: dict, invoices: list, use_ai: bool = True) -> dict:
+def auto_match_transaction(transaction: dict, invoices: list, use_ai: bool = True,
+                           ai_stats: dict = None) -> dict:
     """
     Match a single transaction to an invoice using the 3-layer approach.
 
@@ -403,6 +608,7 @@ def auto_match_transaction(transaction: dict, invoices: list, use_ai: bool = Tru
         transaction: Transaction dict
         invoices: List of candidate invoices
         use_ai: Whether to use AI fallback
+        ai_stats: Optional {'hits': n, 'misses': n} counter of AI decision cache use
 
     Returns:
         Match result dict with:
@@ -456,6 +662,8 @@ def auto_match_transaction(transaction: dict, invoices: list, use_ai: bool = Tru
     # Layer 3: AI fallback
     if use_ai and candidates:
         ai_result = match_with_ai(transaction, candidates)
+        if ai_stats is not None and 'cached' in ai_result:
+            ai_stats['hits' if ai_result['cached'] else 'misses'] += 1
 
         if ai_result.get('invoice_id') and ai_result.get('confidence', 0) >= AUTO_ACCEPT_THRESHOLD:
             return {
@@ -494,7 +702,7 @@ def auto_match_transactions(transactions: list, invoices: list, use_ai: bool = T
 
     Args:
         transactions: List of transaction dicts
-        invoices: List of invoice dicts
+        invoices: List of invoice dicts (or an InvoiceMatchIndex)
         use_ai: Whether to enable AI fallback
         min_confidence: Minimum confidence for suggestions
 
@@ -504,12 +712,18 @@ def auto_match_transactions(transactions: list, invoices: list, use_ai: bool = T
         - suggested: Count of suggestions requiring review
         - unmatched: Count of unmatched transactions
         - results: List of individual match results
+        - ai_cache: AI decision cache hits, misses (Claude calls) and hit_ratio for this run
     """
     results = []
+    ai_stats = {'hits': 0, 'misses': 0}
     matched_count = 0
     suggested_count = 0
     unmatched_count = 0
 
+    # Index once, reused by every transaction in the batch
+    if not isinstance(invoices, InvoiceMatchIndex):
+        invoices = InvoiceMatchIndex(invoices)
+
     for txn in transactions:
         # Skip already resolved transactions
         if txn.get('status') == 'resolved' or txn.get('invoice_id'):
@@ -519,7 +733,7 @@ def auto_match_transactions(transactions: list, invoices: list, use_ai: bool = T
         if txn.get('status') == 'ignored':
             continue
 
-        result = auto_match_transaction(txn, invoices, use_ai=use_ai)
+        result = auto_match_transaction(txn, invoices, use_ai=use_ai, ai_stats=ai_stats)
         result['transaction_id'] = txn.get('id')
 
         if result['auto_accepted'] and result['invoice_id']:
@@ -531,9 +745,14 @@ def auto_match_transactions(transactions: list, invoices: list, use_ai: bool = T
 
         results.append(result)
 
+    ai_lookups = ai_stats['hits'] + ai_stats['misses']
     return {
         'matched': matched_count,
         'suggested': suggested_count,
         'unmatched': unmatched_count,
-        'results': results
+        'results': results,
+        'ai_cache': {
+            **ai_stats,
+            'hit_ratio': round(ai_stats['hits'] / ai_lookups, 3) if ai_lookups else 0.0
+        }
     }
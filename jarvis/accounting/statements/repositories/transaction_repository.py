@@ -22,6 +22,7 @@ from ..database import (
     accept_suggested_match,
     reject_suggested_match,
     update_transaction_match,
+    get_ai_match_cache_summary,
 )
 
 
@@ -231,7 +232,7 @@ class TransactionRepository:
         amount: float = None,
         amount_tolerance: float = 0.05,
         currency: str = 'RON',
-        limit: int = 200
+        limit: Optional[int] = 200
     ) -> List[Dict[str, Any]]:
         """Get candidate invoices for matching.
 
@@ -240,7 +241,7 @@ class TransactionRepository:
             amount: Filter by amount
             amount_tolerance: Amount tolerance percentage
             currency: Filter by currency
-            limit: Maximum results
+            limit: Maximum results (None = all open invoices)
 
         Returns:
             List of invoice dictionaries
@@ -264,6 +265,14 @@ class TransactionRepository:
         """
         return bulk_update_transaction_matches(results)
 
+    def get_ai_match_cache_summary(self) -> Dict[str, Any]:
+        """Get entry count and lifetime hits of the AI match decision cache.
+
+        Returns:
+            Dict with entries and total_hits
+        """
+        return get_ai_match_cache_summary()
+
     def accept_match(self, transaction_id: int) -> bool:
         """Accept a suggested match.
 
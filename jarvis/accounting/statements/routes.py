@@ -3,6 +3,7 @@
 Routes call StatementsService for all business logic.
 """
 import re
+import json
 import logging
 import time
 import csv
@@ -199,6 +200,8 @@ def upload_statements():
     Upload and parse bank statement PDF(s).
 
     Accepts multipart/form-data with file(s) under 'files' key.
+    With ?stream=1 (or Accept: application/x-ndjson) the response is NDJSON:
+    one line per file as soon as it is saved, then a final summary line.
     """
     if 'files' not in request.files:
         return jsonify({'success': False, 'error': 'No files provided'}), 400
@@ -212,11 +215,9 @@ def upload_statements():
     if not is_valid:
         return jsonify({'success': False, 'error': error_msg}), 400
 
-    results = []
-    total_new = 0
-    total_duplicates = 0
     user_id = current_user.id if current_user.is_authenticated else None
 
+    pdf_files = []
     for file in files:
         if not file.filename:
             continue
@@ -225,31 +226,24 @@ def upload_statements():
             logger.warning(f'Skipping non-PDF file: {file.filename}')
             continue
 
-        try:
-            pdf_bytes = file.read()
-
-            # Process single statement using service
-            result = statements_service.process_statement(pdf_bytes, file.filename, user_id)
-
-            if result.success:
-                data = result.data
-                # Track totals (skipped files don't have these keys)
-                if not data.get('skipped'):
-                    total_new += data.get('new_transactions', 0)
-                    total_duplicates += data.get('duplicate_transactions', 0)
-                results.append(data)
-            else:
-                results.append({
-                    'filename': file.filename,
-                    'error': result.error
-                })
-
-        except Exception as e:
-            logger.exception(f'Error parsing {file.filename}')
-            results.append({
-                'filename': file.filename,
-                'error': str(e)
-            })
+        pdf_files.append((file.read(), file.filename))
+
+    # Parsing runs in a process pool while parsed statements are saved
+    processed = statements_service.process_statements(pdf_files, user_id)
+
+    if _wants_ndjson():
+        return Response(_stream_upload_results(processed, len(pdf_files)), mimetype='application/x-ndjson')
+
+    results = [None] * len(pdf_files)
+    total_new = 0
+    total_duplicates = 0
+    for index, filename, result in processed:
+        data = _upload_result_data(filename, result)
+        # Track totals (skipped files don't have these keys)
+        if not data.get('skipped'):
+            total_new += data.get('new_transactions', 0)
+            total_duplicates += data.get('duplicate_transactions', 0)
+        results[index] = data
 
     return jsonify({
         'success': True,
@@ -259,6 +253,55 @@ def upload_statements():
     })
 
 
+def _wants_ndjson() -> bool:
+    """Stream per-file upload results when asked via ?stream=1 or the Accept header."""
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return True
+    return request.accept_mimetypes.best == 'application/x-ndjson'
+
+
+def _upload_result_data(filename: str, result) -> dict:
+    """Per-file upload result as returned to the client."""
+    if result.success:
+        return result.data
+    return {
+        'filename': filename,
+        'error': result.error
+    }
+
+
+def _stream_upload_results(processed, total_files: int):
+    """NDJSON lines: one {"type": "file"} per statement as it finishes, then {"type": "done"}."""
+    total_new = 0
+    total_duplicates = 0
+    completed = 0
+    try:
+        for index, filename, result in processed:
+            data = _upload_result_data(filename, result)
+            if not data.get('skipped'):
+                total_new += data.get('new_transactions', 0)
+                total_duplicates += data.get('duplicate_transactions', 0)
+            completed += 1
+            yield json.dumps({
+                'type': 'file',
+                'index': index,
+                'completed': completed,
+                'total_files': total_files,
+                **data
+            }, default=str) + '\n'
+    except Exception as e:
+        logger.exception('Statement upload stream failed')
+        yield json.dumps({'type': 'done', 'success': False, 'error': str(e)}) + '\n'
+        return
+
+    yield json.dumps({
+        'type': 'done',
+        'success': True,
+        'total_new': total_new,
+        'total_duplicates': total_duplicates
+    }) + '\n'
+
+
 # ============== STATEMENT MANAGEMENT ==============
 
 @statements_bp.route('/api/statements', methods=['GET'])
@@ -478,50 +521,63 @@ def transactions_summary():
     })
 
 
+EXPORT_PAGE_SIZE = 1000
+EXPORT_HEADERS = ['Date', 'Description', 'Amount', 'Currency', 'Status', 'Matched Supplier', 'Company']
+
+
+def _iter_export_transactions(filters: dict):
+    """Yield filtered transactions page by page (newest first, stable order)."""
+    offset = 0
+    while True:
+        page = statements_service.get_all_transactions(**filters, limit=EXPORT_PAGE_SIZE, offset=offset)
+        yield from page
+        if len(page) < EXPORT_PAGE_SIZE:
+            return
+        offset += EXPORT_PAGE_SIZE
+
+
+def _export_filters() -> dict:
+    """Same filters as the list endpoint."""
+    return {
+        'status': request.args.get('status'),
+        'company_cui': request.args.get('company_cui'),
+        'supplier': request.args.get('supplier'),
+        'date_from': request.args.get('date_from'),
+        'date_to': request.args.get('date_to'),
+    }
+
+
 @statements_bp.route('/api/export/csv', methods=['GET'])
 @api_login_required
 def export_transactions_csv():
-    """Export transactions to CSV format."""
-    # Get transactions with same filters as list endpoint
-    transactions = statements_service.get_all_transactions(
-        status=request.args.get('status'),
-        company_cui=request.args.get('company_cui'),
-        supplier=request.args.get('supplier'),
-        date_from=request.args.get('date_from'),
-        date_to=request.args.get('date_to'),
-        limit=10000,  # Higher limit for export
-        offset=0
-    )
-
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL)
-
-    # Header row
-    writer.writerow([
-        'Date', 'Description', 'Amount', 'Currency',
-        'Status', 'Matched Supplier', 'Company'
-    ])
-
-    # Data rows
-    for txn in transactions:
-        writer.writerow([
-            str(txn.get('transaction_date', '')),
-            txn.get('description', ''),
-            txn.get('amount', ''),
-            txn.get('currency', 'RON'),
-            txn.get('status', ''),
-            txn.get('matched_supplier', ''),
-            txn.get('company_name', '')
-        ])
+    """Export transactions to CSV format, streamed one page at a time."""
+    filters = _export_filters()
+
+    def generate():
+        output = io.StringIO()
+        writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(EXPORT_HEADERS)
+        for txn in _iter_export_transactions(filters):
+            writer.writerow([
+                str(txn.get('transaction_date', '')),
+                txn.get('description', ''),
+                txn.get('amount', ''),
+                txn.get('currency', 'RON'),
+                txn.get('status', ''),
+                txn.get('matched_supplier', ''),
+                txn.get('company_name', '')
+            ])
+            if output.tell() >= 64 * 1024:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+        yield output.getvalue()
 
     # Generate filename with today's date
     filename = f"transactions_{date.today().isoformat()}.csv"
 
-    # Return CSV response
-    output.seek(0)
     return Response(
-        output.getvalue(),
+        generate(),
         mimetype='text/csv',
         headers={
             'Content-Disposition': f'attachment; filename={filename}',
@@ -530,6 +586,42 @@ def export_transactions_csv():
     )
 
 
+@statements_bp.route('/api/export/xlsx', methods=['GET'])
+@api_login_required
+def export_transactions_xlsx():
+    """Export transactions to XLSX, written in openpyxl write-only mode."""
+    from core.utils.xlsx_stream import (
+        stream_table_xlsx, prefetch_stream, xlsx_download_headers, XLSX_MIMETYPE, MONEY_FORMAT, DATE_FORMAT,
+    )
+    filters = _export_filters()
+
+    def rows():
+        for txn in _iter_export_transactions(filters):
+            txn_date = txn.get('transaction_date')
+            yield [
+                date.fromisoformat(txn_date[:10]) if txn_date else None,
+                txn.get('description'),
+                float(txn['amount']) if txn.get('amount') is not None else None,
+                txn.get('currency') or 'RON',
+                txn.get('status'),
+                txn.get('matched_supplier'),
+                txn.get('company_name'),
+            ]
+
+    try:
+        chunks = prefetch_stream(stream_table_xlsx(
+            'Transactions', EXPORT_HEADERS, rows(),
+            column_widths=[12, 60, 14, 9, 12, 30, 30],
+            number_formats={0: DATE_FORMAT, 2: MONEY_FORMAT},
+        ))
+    except Exception as e:
+        logger.exception('Transactions XLSX export failed')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    filename = f"transactions_{date.today().isoformat()}.xlsx"
+    return Response(chunks, mimetype=XLSX_MIMETYPE, headers=xlsx_download_headers(filename))
+
+
 # ============== VENDOR MAPPINGS ==============
 
 @statements_bp.route('/api/mappings', methods=['GET'])
@@ -750,6 +842,22 @@ def auto_match_invoices():
     }), 500
 
 
+@statements_bp.route('/api/transactions/auto-match/cache-stats', methods=['GET'])
+@api_login_required
+def ai_match_cache_stats():
+    """AI match-decision cache hit ratio and size."""
+    result = statements_service.get_ai_match_cache_stats()
+    if result.success:
+        return jsonify({
+            'success': True,
+            'stats': result.data
+        })
+    return jsonify({
+        'success': False,
+        'error': result.error
+    }), 500
+
+
 @statements_bp.route('/api/transactions/<int:transaction_id>/suggestions', methods=['GET'])
 @api_login_required
 def get_invoice_suggestions(transaction_id):
@@ -3,9 +3,12 @@
 This module contains all business logic related to bank statements.
 Routes should call these methods instead of accessing the database directly.
 """
+import os
 import hashlib
 import logging
-from typing import Optional, List, Dict, Any
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 from dataclasses import dataclass
 
 from ..repositories import (
@@ -13,12 +16,22 @@ from ..repositories import (
     TransactionRepository,
     VendorMappingRepository,
 )
-from ..parser import parse_statement
+from parsing.statements import parse_statement
 from ..vendors import match_transactions, reload_patterns
-from ..invoice_matcher import auto_match_transactions, score_candidates
+from ..invoice_matcher import (
+    auto_match_transactions, score_candidates, InvoiceMatchIndex, get_ai_match_cache_stats,
+)
 
 logger = logging.getLogger('jarvis.statements.service')
 
+# Multi-file uploads: PDF text extraction and the statement parser are
+# CPU-bound, so batches of STATEMENT_PARALLEL_MIN_FILES or more are parsed in a
+# process pool while the request thread saves already-parsed statements.
+STATEMENT_PARSE_WORKERS = int(os.environ.get('STATEMENT_PARSE_WORKERS', min(4, os.cpu_count() or 1)))
+STATEMENT_PARALLEL_MIN_FILES = int(os.environ.get('STATEMENT_PARALLEL_MIN_FILES', 2))
+# forkserver children start clean instead of copying the threaded web worker
+STATEMENT_START_METHOD = os.environ.get('STATEMENT_PARSE_START_METHOD', 'forkserver')
+
 
 @dataclass
 class ServiceResult:
@@ -59,15 +72,7 @@ class StatementsService:
             # Check if this exact file was already uploaded
             existing = self.statement_repo.check_duplicate(file_hash)
             if existing:
-                return ServiceResult(
-                    success=True,
-                    data={
-                        'filename': filename,
-                        'error': f'This file was already uploaded on {existing["uploaded_at"]}',
-                        'existing_statement_id': existing['id'],
-                        'skipped': True
-                    }
-                )
+                return self._already_uploaded(filename, existing)
 
             # Ensure vendor mappings are seeded
             self.mapping_repo.seed_defaults()
@@ -75,65 +80,183 @@ class StatementsService:
             # Parse the statement
             parsed = parse_statement(pdf_bytes, filename)
 
-            # Match transactions to vendors
-            transactions = match_transactions(parsed['transactions'])
-
-            # Create statement record
-            period = parsed.get('period', {})
-            statement_id = self.statement_repo.create(
-                filename=filename,
-                file_hash=file_hash,
-                company_name=parsed.get('company_name'),
-                company_cui=parsed.get('company_cui'),
-                account_number=parsed.get('account_number'),
-                period_from=period.get('from'),
-                period_to=period.get('to'),
-                total_transactions=len(transactions),
-                uploaded_by=user_id
-            )
+            return self._save_parsed_statement(parsed, file_hash, filename, user_id)
 
-            # Save transactions with duplicate detection
-            save_result = self.transaction_repo.save_with_dedup(transactions, statement_id)
+        except Exception as e:
+            logger.exception(f'Error processing statement {filename}')
+            return ServiceResult(success=False, error=str(e))
 
-            # Update statement with actual counts
-            self.statement_repo.update(
-                statement_id,
-                new_transactions=save_result['new_count'],
-                duplicate_transactions=save_result['duplicate_count']
-            )
+    def process_statements(
+        self,
+        files: List[Tuple[bytes, str]],
+        user_id: int,
+        workers: int = None
+    ) -> Iterator[Tuple[int, str, ServiceResult]]:
+        """Process several PDF statements, yielding each result as soon as it is ready.
+
+        Parsing runs in a process pool (for STATEMENT_PARALLEL_MIN_FILES or more
+        files) while this thread matches vendors, saves and auto-matches the
+        statements that have already been parsed, so a batch takes about as long
+        as its slowest file plus the database work. Results come in completion
+        order, not upload order.
 
-            # Auto-match new transactions to invoices
-            invoice_matched_count = self._auto_match_new_transactions(save_result['new_ids'])
+        Args:
+            files: List of (pdf_bytes, filename)
+            user_id: ID of the uploading user
+            workers: Max parser processes (default STATEMENT_PARSE_WORKERS; 1 = inline)
 
-            # Count vendor-matched (has supplier) - for reporting
-            vendor_matched_count = sum(1 for t in transactions if t.get('matched_supplier'))
+        Yields:
+            (index, filename, ServiceResult) per file; index is the position in `files`
+        """
+        workers = STATEMENT_PARSE_WORKERS if workers is None else workers
 
-            return ServiceResult(
-                success=True,
-                data={
+        pending = []  # (index, filename, pdf_bytes, file_hash)
+        seen_hashes = {}
+        for index, (pdf_bytes, filename) in enumerate(files):
+            file_hash = hashlib.md5(pdf_bytes).hexdigest()
+            try:
+                existing = self.statement_repo.check_duplicate(file_hash)
+            except Exception as e:
+                logger.exception(f'Error processing statement {filename}')
+                yield index, filename, ServiceResult(success=False, error=str(e))
+                continue
+            if existing:
+                yield index, filename, self._already_uploaded(filename, existing)
+            elif file_hash in seen_hashes:
+                yield index, filename, ServiceResult(success=True, data={
                     'filename': filename,
-                    'statement_id': statement_id,
-                    'company_name': parsed.get('company_name'),
-                    'company_cui': parsed.get('company_cui'),
-                    'total_transactions': len(transactions),
-                    'new_transactions': save_result['new_count'],
-                    'duplicate_transactions': save_result['duplicate_count'],
-                    'vendor_matched_count': vendor_matched_count,
-                    'invoice_matched_count': invoice_matched_count,
-                    'period': period,
-                    'summary': parsed.get('summary')
-                }
-            )
+                    'error': f'Same file as {seen_hashes[file_hash]} in this upload',
+                    'skipped': True
+                })
+            else:
+                seen_hashes[file_hash] = filename
+                pending.append((index, filename, pdf_bytes, file_hash))
+
+        if not pending:
+            return
+
+        self.mapping_repo.seed_defaults()
+        # Open invoices are loaded and indexed once for the whole batch
+        match_context = {}
+
+        def save(index, filename, file_hash, parsed=None, error=None):
+            if error is not None:
+                logger.error(f'Error parsing statement {filename}: {error}')
+                return index, filename, ServiceResult(success=False, error=error)
+            try:
+                return index, filename, self._save_parsed_statement(
+                    parsed, file_hash, filename, user_id, match_context=match_context
+                )
+            except Exception as e:
+                logger.exception(f'Error processing statement {filename}')
+                return index, filename, ServiceResult(success=False, error=str(e))
+
+        if workers <= 1 or len(pending) < STATEMENT_PARALLEL_MIN_FILES:
+            for index, filename, pdf_bytes, file_hash in pending:
+                try:
+                    parsed = parse_statement(pdf_bytes, filename)
+                except Exception as e:
+                    yield save(index, filename, file_hash, error=str(e) or type(e).__name__)
+                    continue
+                yield save(index, filename, file_hash, parsed)
+            return
+
+        context = multiprocessing.get_context(STATEMENT_START_METHOD)
+        if STATEMENT_START_METHOD == 'forkserver':
+            # The parser lives outside the accounting package, so neither the
+            # fork server nor the workers import the blueprints or database.py
+            context.set_forkserver_preload(['parsing.statements'])
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), mp_context=context) as pool:
+            futures = {
+                pool.submit(parse_statement, pdf_bytes, filename): (index, filename, file_hash)
+                for index, filename, pdf_bytes, file_hash in pending
+            }
+            for future in as_completed(futures):
+                index, filename, file_hash = futures[future]
+                try:
+                    parsed = future.result()
+                except Exception as e:
+                    yield save(index, filename, file_hash, error=str(e) or type(e).__name__)
+                    continue
+                yield save(index, filename, file_hash, parsed)
+
+    def _already_uploaded(self, filename: str, existing: Dict[str, Any]) -> ServiceResult:
+        return ServiceResult(
+            success=True,
+            data={
+                'filename': filename,
+                'error': f'This file was already uploaded on {existing["uploaded_at"]}',
+                'existing_statement_id': existing['id'],
+                'skipped': True
+            }
+        )
 
-        except Exception as e:
-            logger.exception(f'Error processing statement {filename}')
-            return ServiceResult(success=False, error=str(e))
+    def _save_parsed_statement(
+        self,
+        parsed: Dict[str, Any],
+        file_hash: str,
+        filename: str,
+        user_id: int,
+        match_context: Dict[str, Any] = None
+    ) -> ServiceResult:
+        """Match vendors, store the statement and its transactions, and auto-match invoices."""
+        # Match transactions to vendors
+        transactions = match_transactions(parsed['transactions'])
+
+        # Create statement record
+        period = parsed.get('period', {})
+        statement_id = self.statement_repo.create(
+            filename=filename,
+            file_hash=file_hash,
+            company_name=parsed.get('company_name'),
+            company_cui=parsed.get('company_cui'),
+            account_number=parsed.get('account_number'),
+            period_from=period.get('from'),
+            period_to=period.get('to'),
+            total_transactions=len(transactions),
+            uploaded_by=user_id
+        )
+
+        # Save transactions with duplicate detection
+        save_result = self.transaction_repo.save_with_dedup(transactions, statement_id)
+
+        # Update statement with actual counts
+        self.statement_repo.update(
+            statement_id,
+            new_transactions=save_result['new_count'],
+            duplicate_transactions=save_result['duplicate_count']
+        )
+
+        # Auto-match new transactions to invoices
+        invoice_matched_count = self._auto_match_new_transactions(save_result['new_ids'], match_context)
+
+        # Count vendor-matched (has supplier) - for reporting
+        vendor_matched_count = sum(1 for t in transactions if t.get('matched_supplier'))
+
+        return ServiceResult(
+            success=True,
+            data={
+                'filename': filename,
+                'statement_id': statement_id,
+                'company_name': parsed.get('company_name'),
+                'company_cui': parsed.get('company_cui'),
+                'total_transactions': len(transactions),
+                'new_transactions': save_result['new_count'],
+                'duplicate_transactions': save_result['duplicate_count'],
+                'vendor_matched_count': vendor_matched_count,
+                'invoice_matched_count': invoice_matched_count,
+                'period': period,
+                'summary': parsed.get('summary')
+            }
+        )
 
-    def _auto_match_new_transactions(self, new_ids: List[int]) -> int:
+    def _auto_match_new_transactions(self, new_ids: List[int], match_context: Dict[str, Any] = None) -> int:
         """Auto-match newly saved transactions to invoices.
 
         Args:
             new_ids: List of new transaction IDs
+            match_context: Optional dict shared across a multi-file upload; the
+                invoice index is built on first use and reused for later files
 
         Returns:
             Number of transactions matched to invoices
@@ -149,9 +272,14 @@ class StatementsService:
             if not new_txns:
                 return 0
 
-            # Get candidate invoices
-            invoices = self.transaction_repo.get_candidate_invoices(limit=200)
-            if not invoices:
+            # Match against every open invoice; the matcher indexes them
+            if match_context is not None and 'invoices' in match_context:
+                invoices = match_context['invoices']
+            else:
+                invoices = InvoiceMatchIndex(self.transaction_repo.get_candidate_invoices(limit=None))
+                if match_context is not None:
+                    match_context['invoices'] = invoices
+            if not len(invoices):
                 return 0
 
             # Run auto-match
@@ -421,8 +549,8 @@ class StatementsService:
                     'message': 'No transactions to match'
                 })
 
-            # Get candidate invoices
-            invoices = self.transaction_repo.get_candidate_invoices(limit=200)
+            # Match against every open invoice; the matcher indexes them
+            invoices = self.transaction_repo.get_candidate_invoices(limit=None)
 
             if not invoices:
                 return ServiceResult(success=True, data={
@@ -451,6 +579,17 @@ class StatementsService:
             logger.exception('Error in auto-match')
             return ServiceResult(success=False, error=str(e))
 
+    def get_ai_match_cache_stats(self) -> ServiceResult:
+        """AI match-decision cache: this process's hits/misses plus stored entries."""
+        try:
+            return ServiceResult(success=True, data={
+                **get_ai_match_cache_stats(),
+                **self.transaction_repo.get_ai_match_cache_summary()
+            })
+        except Exception as e:
+            logger.exception('Error reading AI match cache stats')
+            return ServiceResult(success=False, error=str(e))
+
     def get_invoice_suggestions(self, transaction_id: int) -> ServiceResult:
         """Get invoice suggestions for a transaction."""
         txn = self.transaction_repo.get_by_id(transaction_id)
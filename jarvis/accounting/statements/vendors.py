@@ -12,37 +12,156 @@ from .database import get_all_vendor_mappings
 
 logger = logging.getLogger('jarvis.statements.vendors')
 
-# Cache for compiled patterns with thread-safety
-_compiled_patterns = None
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# Characters IGNORECASE matches to an ASCII letter: ASCII upper case plus the
+# few non-ASCII letters that case-fold onto one (dotted/dotless I, long S, Kelvin)
+_FOLD = str.maketrans({
+    **{chr(c): chr(c + 32) for c in range(ord('A'), ord('Z') + 1)},
+    '\u0130': 'i', '\u0131': 'i', '\u017f': 's', '\u212a': 'k',
+})
+
+
+def _required_literal(pattern: str, flags: int) -> Optional[str]:
+    """Longest ASCII literal every match of pattern must contain, folded to lower case.
+
+    Only top-level literal runs count ('FACEBK\\s*\\*' -> 'facebk'); a pattern
+    that is a top-level alternation or has no literal run returns None.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except Exception:
+        return None
+
+    best, run = '', ''
+    for op, av in parsed:
+        if op is sre_parse.LITERAL and av < 128:
+            run += chr(av)
+        else:
+            run = ''
+        if len(run) > len(best):
+            best = run
+    return best.translate(_FOLD) or None
+
+
+def _trie_regex(node: dict) -> str:
+    """Regex for a literal trie; greedy, so it matches the longest literal at a position."""
+    branches = [re.escape(char) + _trie_regex(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    return f'(?:{body})?' if '' in node else body
+
+
+class VendorMatcher:
+    """First-match vendor classifier over an ordered list of patterns.
+
+    Rather than calling .search() with every pattern in turn, each pattern's
+    required literal (e.g. 'facebk' for 'FACEBK\\s*\\*') goes into a trie that
+    is compiled to a single regex. One scan over the case-folded text finds
+    every literal present - literals found at the same position are prefixes of
+    the longest one found there - and only patterns whose literal occurs (plus
+    those without one) are searched, in priority order. The first pattern that
+    matches wins, exactly as in the sequential loop.
+    """
+
+    def __init__(self, entries: list[dict], flags: int = re.IGNORECASE):
+        """
+        Args:
+            entries: Dicts with a 'pattern' key (regex string), in priority order.
+                Invalid patterns are logged and skipped.
+            flags: Regex flags applied to every pattern
+        """
+        self.entries = []
+        self._regexes = []
+        literals = {}     # literal -> positions of patterns requiring it
+        self._always = []  # positions of patterns without a usable literal
+
+        for entry in entries:
+            try:
+                regex = re.compile(entry['pattern'], flags)
+            except re.error as e:
+                logger.error(f"Invalid regex pattern '{entry['pattern']}': {e}")
+                continue
+            position = len(self.entries)
+            self.entries.append(entry)
+            self._regexes.append(regex)
+            literal = _required_literal(entry['pattern'], flags)
+            if literal:
+                literals.setdefault(literal, []).append(position)
+            else:
+                self._always.append(position)
+
+        # A scan hit on a literal also means all its prefixes that are literals occur
+        self._candidates = {
+            literal: tuple(p for n in range(1, len(literal) + 1) for p in literals.get(literal[:n], ()))
+            for literal in literals
+        }
+        trie = {}
+        for literal in literals:
+            node = trie
+            for char in literal:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        self._scanner = re.compile(f'(?=({_trie_regex(trie)}))') if literals else None
+
+    def match(self, text: str) -> Optional[dict]:
+        """Return the first entry (in priority order) whose pattern matches text, or None."""
+        if not text:
+            return None
+        candidates = set(self._always)
+        if self._scanner is not None:
+            for hit in self._scanner.finditer(text.translate(_FOLD)):
+                candidates.update(self._candidates[hit.group(1)])
+        for position in sorted(candidates):
+            if self._regexes[position].search(text):
+                return self.entries[position]
+        return None
+
+    def match_many(self, texts: list[str]) -> list[Optional[dict]]:
+        """Classify a batch of texts; repeated texts are matched once."""
+        seen = {}
+        results = []
+        for text in texts:
+            if text not in seen:
+                seen[text] = self.match(text)
+            results.append(seen[text])
+        return results
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+# Cache for the compiled matcher with thread-safety
+_matcher = None
 _patterns_loaded = False
 _patterns_lock = threading.RLock()
 
 
 def _load_patterns():
-    """Load and compile vendor patterns from database.
+    """Load vendor patterns from database and compile them into a matcher.
 
     Note: Caller must hold _patterns_lock.
     """
-    global _compiled_patterns, _patterns_loaded
+    global _matcher, _patterns_loaded
 
     mappings = get_all_vendor_mappings(active_only=True)
-    _compiled_patterns = []
-
-    for mapping in mappings:
-        try:
-            pattern = re.compile(mapping['pattern'], re.IGNORECASE)
-            _compiled_patterns.append({
-                'id': mapping['id'],
-                'pattern': pattern,
-                'supplier_name': mapping['supplier_name'],
-                'supplier_vat': mapping.get('supplier_vat'),
-                'template_id': mapping.get('template_id')
-            })
-        except re.error as e:
-            logger.error(f"Invalid regex pattern '{mapping['pattern']}': {e}")
+    _matcher = VendorMatcher([
+        {
+            'id': mapping['id'],
+            'pattern': mapping['pattern'],
+            'supplier_name': mapping['supplier_name'],
+            'supplier_vat': mapping.get('supplier_vat'),
+            'template_id': mapping.get('template_id')
+        }
+        for mapping in mappings
+    ])
 
     _patterns_loaded = True
-    logger.info(f'Loaded {len(_compiled_patterns)} vendor patterns')
+    logger.info(f'Loaded {len(_matcher)} vendor patterns')
 
 
 def reload_patterns():
@@ -53,32 +172,16 @@ def reload_patterns():
         _load_patterns()
 
 
-def match_vendor(description: str) -> dict:
-    """
-    Match a transaction description to a known vendor.
-
-    Args:
-        description: Transaction description text
-
-    Returns:
-        {
-            'matched': bool,
-            'vendor_name': str or None,  # Extracted vendor name from description
-            'supplier_name': str or None,  # Mapped supplier name
-            'supplier_vat': str or None,
-            'template_id': int or None,
-            'mapping_id': int or None
-        }
-    """
-    global _compiled_patterns, _patterns_loaded
-
-    # Thread-safe pattern loading
+def _get_matcher() -> VendorMatcher:
+    """Thread-safe access to the current matcher, loading it on first use."""
     with _patterns_lock:
         if not _patterns_loaded:
             _load_patterns()
-        # Copy reference to avoid race conditions during iteration
-        patterns = _compiled_patterns
+        # Return the reference; reload_patterns() swaps in a new matcher
+        return _matcher
+
 
+def _vendor_result(description: str, mapping: Optional[dict]) -> dict:
     result = {
         'matched': False,
         'vendor_name': None,
@@ -94,35 +197,57 @@ def match_vendor(description: str) -> dict:
     # Extract a human-readable vendor name from description
     result['vendor_name'] = extract_vendor_name(description)
 
-    # Try to match against known patterns (using local reference)
-    for mapping in patterns:
-        if mapping['pattern'].search(description):
-            result['matched'] = True
-            result['supplier_name'] = mapping['supplier_name']
-            result['supplier_vat'] = mapping['supplier_vat']
-            result['template_id'] = mapping['template_id']
-            result['mapping_id'] = mapping['id']
-            logger.debug(f"Matched '{description[:50]}...' to {mapping['supplier_name']}")
-            return result
+    if mapping:
+        result['matched'] = True
+        result['supplier_name'] = mapping['supplier_name']
+        result['supplier_vat'] = mapping['supplier_vat']
+        result['template_id'] = mapping['template_id']
+        result['mapping_id'] = mapping['id']
+        logger.debug(f"Matched '{description[:50]}...' to {mapping['supplier_name']}")
 
     return result
 
 
-def extract_vendor_name(description: str) -> Optional[str]:
+def match_vendor(description: str) -> dict:
     """
-    Extract a readable vendor name from transaction description.
+    Match a transaction description to a known vendor.
 
-    Examples:
-        'FACEBK *9DGR2CRV62' -> 'FACEBK'
-        'GOOGLE *ADS3555304242' -> 'GOOGLE ADS'
-        'CLAUDE.AI SUBSCRIPTION' -> 'CLAUDE.AI'
-        'OPENAI *CHATGPT SUBSCR' -> 'OPENAI CHATGPT'
+    Args:
+        description: Transaction description text
+
+    Returns:
+        {
+            'matched': bool,
+            'vendor_name': str or None,  # Extracted vendor name from description
+            'supplier_name': str or None,  # Mapped supplier name
+            'supplier_vat': str or None,
+            'template_id': int or None,
+            'mapping_id': int or None
+        }
     """
-    if not description:
-        return None
+    return _vendor_result(description, _get_matcher().match(description))
 
-    # Common vendor patterns with readable names
-    vendor_patterns = [
+
+def match_vendors(descriptions: list[str]) -> list[dict]:
+    """
+    Match a batch of descriptions to known vendors.
+
+    Same result per description as match_vendor(), but the matcher is looked
+    up once and repeated descriptions (recurring subscriptions, ad charges)
+    are classified once.
+    """
+    matcher = _get_matcher()
+    unique = {}
+    for description in descriptions:
+        if description not in unique:
+            unique[description] = _vendor_result(description, matcher.match(description))
+    return [dict(unique[description]) for description in descriptions]
+
+
+# Common vendor patterns with readable names
+_VENDOR_NAMES = VendorMatcher([
+    {'pattern': pattern, 'name': name}
+    for pattern, name in [
         (r'FACEBK\s*\*\w+', 'FACEBK'),
         (r'GOOGLE\s*\*\s*ADS\d+', 'GOOGLE ADS'),
         (r'GOOGLE\s*CLOUD\s*\w+', 'GOOGLE CLOUD'),
@@ -140,14 +265,30 @@ def extract_vendor_name(description: str) -> Optional[str]:
         (r'AWESOME\s*PROJECTS', 'AWESOME PROJECTS'),
         (r'AIRALO', 'AIRALO'),
     ]
+])
+_VENDOR_NAME_FALLBACK = re.compile(r'\d{4}\.\d{2}\.\d{2}\s+([A-Z][A-Za-z0-9.*]+(?:\s+[A-Z][A-Za-z0-9]+)?)')
+
 
-    for pattern, name in vendor_patterns:
-        if re.search(pattern, description, re.IGNORECASE):
-            return name
+def extract_vendor_name(description: str) -> Optional[str]:
+    """
+    Extract a readable vendor name from transaction description.
+
+    Examples:
+        'FACEBK *9DGR2CRV62' -> 'FACEBK'
+        'GOOGLE *ADS3555304242' -> 'GOOGLE ADS'
+        'CLAUDE.AI SUBSCRIPTION' -> 'CLAUDE.AI'
+        'OPENAI *CHATGPT SUBSCR' -> 'OPENAI CHATGPT'
+    """
+    if not description:
+        return None
+
+    vendor = _VENDOR_NAMES.match(description)
+    if vendor:
+        return vendor['name']
 
     # Fallback: Try to extract first recognizable word/phrase
     # Look for capitalized words that might be vendor names
-    match = re.search(r'\d{4}\.\d{2}\.\d{2}\s+([A-Z][A-Za-z0-9.*]+(?:\s+[A-Z][A-Za-z0-9]+)?)', description)
+    match = _VENDOR_NAME_FALLBACK.search(description)
     if match:
         return match.group(1).strip()
 
@@ -167,9 +308,9 @@ def match_transactions(transactions: list[dict]) -> list[dict]:
         - matched_supplier
         - status ('matched' or 'pending')
     """
-    for txn in transactions:
-        match_result = match_vendor(txn.get('description', ''))
+    match_results = match_vendors([txn.get('description', '') for txn in transactions])
 
+    for txn, match_result in zip(transactions, match_results):
         txn['vendor_name'] = match_result['vendor_name']
         txn['matched_supplier'] = match_result['supplier_name']
 
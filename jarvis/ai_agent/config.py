@@ -19,10 +19,18 @@ class AIAgentConfig:
     RAG_EMBEDDING_DIMENSIONS: int = 1536
     RAG_TOP_K: int = 5                    # Number of documents to retrieve
     RAG_MIN_SIMILARITY: float = 0.7       # Minimum similarity score
+    RAG_SEARCH_MODE: str = "hybrid"       # hybrid, vector or text
+    RAG_HYBRID_VECTOR_WEIGHT: float = 0.7 # Weight of similarity vs text rank in hybrid
+    RAG_HYBRID_CANDIDATES: int = 50       # Candidates taken from each index in hybrid
+    RAG_HNSW_EF_SEARCH: int = 40          # HNSW recall/latency knob (higher = better recall)
+    RAG_IVFFLAT_PROBES: int = 10          # IVFFlat recall/latency knob
 
     # Context Settings
-    MAX_CONTEXT_MESSAGES: int = 10        # Messages to include in context
-    MAX_CONTEXT_TOKENS: int = 8000        # Max tokens for context
+    MAX_CONTEXT_MESSAGES: int = 40        # Max history messages sent verbatim
+    MAX_CONTEXT_TOKENS: int = 8000        # Prompt budget: system, RAG, summary, history
+    CONTEXT_SUMMARY_ENABLED: bool = True  # Summarize turns that fall out of the budget
+    CONTEXT_SUMMARY_MAX_TOKENS: int = 500 # Max tokens of the rolling summary
+    CONTEXT_HISTORY_FETCH_LIMIT: int = 200  # Unsummarized messages read per query
 
     # Response Settings
     DEFAULT_MAX_TOKENS: int = 2048
@@ -37,8 +45,9 @@ class AIAgentConfig:
     LOG_CONVERSATIONS: bool = True
 
     # Performance
-    EMBEDDING_BATCH_SIZE: int = 100
-    REINDEX_BATCH_SIZE: int = 500
+    EMBEDDING_BATCH_SIZE: int = 100       # Texts per embeddings API call
+    EMBEDDING_CONCURRENCY: int = 4        # Embeddings API calls in flight while indexing
+    REINDEX_BATCH_SIZE: int = 500         # Invoices fetched and upserted per indexing batch
 
     # Feature Flags
     RAG_ENABLED: bool = True              # Enable RAG (requires OpenAI key)
@@ -55,8 +64,41 @@ class AIAgentConfig:
             RAG_MIN_SIMILARITY=float(os.environ.get(
                 'AI_AGENT_RAG_MIN_SIMILARITY', '0.7'
             )),
+            RAG_SEARCH_MODE=os.environ.get(
+                'AI_AGENT_RAG_SEARCH_MODE', 'hybrid'
+            ).lower(),
+            RAG_HYBRID_VECTOR_WEIGHT=float(os.environ.get(
+                'AI_AGENT_RAG_HYBRID_VECTOR_WEIGHT', '0.7'
+            )),
+            RAG_HNSW_EF_SEARCH=int(os.environ.get(
+                'AI_AGENT_RAG_EF_SEARCH', '40'
+            )),
+            RAG_IVFFLAT_PROBES=int(os.environ.get(
+                'AI_AGENT_RAG_IVFFLAT_PROBES', '10'
+            )),
             MAX_CONTEXT_MESSAGES=int(os.environ.get(
-                'AI_AGENT_MAX_CONTEXT_MESSAGES', '10'
+                'AI_AGENT_MAX_CONTEXT_MESSAGES', '40'
+            )),
+            MAX_CONTEXT_TOKENS=int(os.environ.get(
+                'AI_AGENT_MAX_CONTEXT_TOKENS', '8000'
+            )),
+            CONTEXT_SUMMARY_ENABLED=os.environ.get(
+                'AI_AGENT_CONTEXT_SUMMARY', 'true'
+            ).lower() == 'true',
+            CONTEXT_SUMMARY_MAX_TOKENS=int(os.environ.get(
+                'AI_AGENT_CONTEXT_SUMMARY_MAX_TOKENS', '500'
+            )),
+            CONTEXT_HISTORY_FETCH_LIMIT=int(os.environ.get(
+                'AI_AGENT_CONTEXT_HISTORY_FETCH_LIMIT', '200'
+            )),
+            EMBEDDING_BATCH_SIZE=int(os.environ.get(
+                'AI_AGENT_EMBEDDING_BATCH_SIZE', '100'
+            )),
+            EMBEDDING_CONCURRENCY=int(os.environ.get(
+                'AI_AGENT_EMBEDDING_CONCURRENCY', '4'
+            )),
+            REINDEX_BATCH_SIZE=int(os.environ.get(
+                'AI_AGENT_REINDEX_BATCH_SIZE', '500'
             )),
             DEFAULT_MAX_TOKENS=int(os.environ.get(
                 'AI_AGENT_MAX_TOKENS', '2048'
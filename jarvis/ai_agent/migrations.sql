@@ -115,6 +115,11 @@ CREATE TABLE IF NOT EXISTS ai_agent.messages (
 CREATE INDEX IF NOT EXISTS idx_messages_conversation ON ai_agent.messages(conversation_id);
 CREATE INDEX IF NOT EXISTS idx_messages_created ON ai_agent.messages(created_at);
 
+-- Cached token count of content, used to pack history into the context budget
+-- (rows saved before this column get it on their next use as context)
+ALTER TABLE ai_agent.messages
+    ADD COLUMN IF NOT EXISTS content_tokens INTEGER;
+
 -- ============================================================
 -- RAG Documents (indexed JARVIS data)
 -- ============================================================
@@ -151,12 +156,6 @@ BEGIN
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
 
-    -- Vector similarity search index (IVFFlat for good balance)
-    CREATE INDEX IF NOT EXISTS idx_rag_documents_embedding
-    ON ai_agent.rag_documents
-    USING ivfflat (embedding vector_cosine_ops)
-    WITH (lists = 100);
-
 EXCEPTION WHEN undefined_object THEN
     -- pgvector not available, create table without vector column
     RAISE NOTICE 'Creating rag_documents without vector support (pgvector not installed)';
@@ -182,10 +181,50 @@ CREATE INDEX IF NOT EXISTS idx_rag_documents_source ON ai_agent.rag_documents(so
 CREATE INDEX IF NOT EXISTS idx_rag_documents_company ON ai_agent.rag_documents(company_id);
 CREATE INDEX IF NOT EXISTS idx_rag_documents_active ON ai_agent.rag_documents(is_active) WHERE is_active = TRUE;
 
--- Full-text search index (fallback when pgvector not available)
-CREATE INDEX IF NOT EXISTS idx_rag_documents_content_fts
+-- Full-text search: a maintained tsvector column with a GIN index, so text
+-- search and hybrid ranking don't run to_tsvector() on every row per query.
+-- Replaces the earlier expression index idx_rag_documents_content_fts.
+ALTER TABLE ai_agent.rag_documents
+    ADD COLUMN IF NOT EXISTS content_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', content)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_rag_documents_content_tsv
 ON ai_agent.rag_documents
-USING gin(to_tsvector('english', content));
+USING gin(content_tsv);
+
+DROP INDEX IF EXISTS ai_agent.idx_rag_documents_content_fts;
+
+-- Approximate nearest-neighbour index for vector search. HNSW (pgvector
+-- 0.5+) needs no training data, so it stays accurate as documents are added;
+-- recall vs latency is tuned per query with hnsw.ef_search
+-- (AI_AGENT_RAG_EF_SEARCH). On older pgvector this falls back to IVFFlat,
+-- tuned with ivfflat.probes (AI_AGENT_RAG_IVFFLAT_PROBES) - rebuild it after
+-- bulk indexing so its lists match the data (lists ~ rows / 1000).
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'ai_agent' AND table_name = 'rag_documents' AND column_name = 'embedding'
+    ) THEN
+        BEGIN
+            CREATE INDEX IF NOT EXISTS idx_rag_documents_embedding_hnsw
+            ON ai_agent.rag_documents
+            USING hnsw (embedding vector_cosine_ops)
+            WITH (m = 16, ef_construction = 64);
+
+            -- IVFFlat index from earlier versions, built on an empty table
+            DROP INDEX IF EXISTS ai_agent.idx_rag_documents_embedding;
+        EXCEPTION WHEN undefined_object THEN
+            RAISE NOTICE 'pgvector without HNSW support - using IVFFlat';
+
+            CREATE INDEX IF NOT EXISTS idx_rag_documents_embedding
+            ON ai_agent.rag_documents
+            USING ivfflat (embedding vector_cosine_ops)
+            WITH (lists = 100);
+        END;
+    END IF;
+END
+$$;
 
 -- ============================================================
 -- Conversation Context (query analysis cache)
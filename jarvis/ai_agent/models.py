@@ -127,6 +127,8 @@ class Message:
     model_config_id: Optional[int] = None
     response_time_ms: Optional[int] = None
 
+    content_tokens: Optional[int] = None  # Cached token count of content
+
     created_at: Optional[datetime] = None
 
     def __post_init__(self):
@@ -208,6 +210,42 @@ class LLMResponse:
     finish_reason: Optional[str] = None
 
 
+@dataclass
+class LLMStreamChunk:
+    """Piece of a streamed LLM response.
+
+    Text chunks carry a content delta; the last chunk has done=True and the
+    token counts and finish reason of the whole response.
+    """
+    content: str = ""
+    done: bool = False
+    input_tokens: int = 0
+    output_tokens: int = 0
+    model: Optional[str] = None
+    finish_reason: Optional[str] = None
+
+
+@dataclass
+class PromptContext:
+    """Prompt packed into the context token budget.
+
+    unbudgeted_tokens is what the same turn would cost with the whole
+    history sent verbatim and the RAG context at its full share.
+    """
+    messages: List[Dict[str, str]]
+    system: str
+    prompt_tokens: int = 0
+    unbudgeted_tokens: int = 0
+    history_messages: int = 0
+    summary_used: bool = False
+    summary_input_tokens: int = 0
+    summary_output_tokens: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.unbudgeted_tokens - self.prompt_tokens)
+
+
 @dataclass
 class ServiceResult:
     """Result of a service operation."""
@@ -224,3 +262,4 @@ class ChatResponse:
     tokens_used: int = 0
     cost: Decimal = field(default_factory=lambda: Decimal("0"))
     response_time_ms: int = 0
+    prompt_tokens_saved: int = 0
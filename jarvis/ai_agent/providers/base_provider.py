@@ -5,9 +5,9 @@ Abstract base class for LLM providers.
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 
-from ..models import LLMResponse
+from ..models import LLMResponse, LLMStreamChunk
 
 
 class BaseProvider(ABC):
@@ -45,6 +45,28 @@ class BaseProvider(ABC):
         """
         pass
 
+    @abstractmethod
+    def generate_stream(
+        self,
+        model_name: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 2048,
+        temperature: float = 0.7,
+        api_key: Optional[str] = None,
+        **kwargs,
+    ) -> Iterator[LLMStreamChunk]:
+        """
+        Generate a response from the LLM as it is produced.
+
+        Same arguments as generate(). Yields text chunks as the provider
+        sends them, then one final chunk with done=True carrying the token
+        counts. Closing the iterator early closes the provider stream.
+
+        Yields:
+            LLMStreamChunk deltas, then the final usage chunk
+        """
+        pass
+
     def format_messages(
         self,
         messages: List[Dict[str, str]],
@@ -5,12 +5,12 @@ Anthropic Claude LLM provider implementation.
 """
 
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 import anthropic
 
 from core.utils.logging_config import get_logger
-from ..models import LLMResponse
+from ..models import LLMResponse, LLMStreamChunk
 from ..exceptions import LLMProviderError, LLMRateLimitError, LLMAuthenticationError
 from .base_provider import BaseProvider
 
@@ -52,40 +52,12 @@ class ClaudeProvider(BaseProvider):
             LLMRateLimitError: If rate limited
             LLMAuthenticationError: If API key invalid
         """
-        # Get API key
-        key = api_key or os.environ.get('ANTHROPIC_API_KEY')
-        if not key:
-            raise LLMAuthenticationError("ANTHROPIC_API_KEY not found")
-
-        # Extract system message if present
-        system_content, remaining_messages = self.extract_system_message(messages)
-
-        # Allow system override from kwargs
-        if 'system' in kwargs:
-            system_content = kwargs.pop('system')
-
-        # Format messages for Claude API
-        formatted_messages = self.format_messages(remaining_messages)
-
-        # Clamp temperature to Claude's range (0.0-1.0)
-        temperature = max(0.0, min(1.0, temperature))
+        client, request_params = self._build_request(
+            model_name, messages, max_tokens, temperature, api_key, kwargs
+        )
 
         try:
-            client = anthropic.Anthropic(api_key=key)
-
-            # Build request parameters
-            request_params = {
-                'model': model_name,
-                'max_tokens': max_tokens,
-                'temperature': temperature,
-                'messages': formatted_messages,
-            }
-
-            # Add system message if present
-            if system_content:
-                request_params['system'] = system_content
-
-            logger.debug(f"Claude API request: model={model_name}, messages={len(formatted_messages)}")
+            logger.debug(f"Claude API request: model={model_name}, messages={len(request_params['messages'])}")
 
             response = client.messages.create(**request_params)
 
@@ -108,21 +80,116 @@ class ClaudeProvider(BaseProvider):
                 finish_reason=response.stop_reason,
             )
 
-        except anthropic.RateLimitError as e:
+        except Exception as e:
+            raise self._translate_error(e)
+
+    def generate_stream(
+        self,
+        model_name: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 2048,
+        temperature: float = 0.7,
+        api_key: Optional[str] = None,
+        **kwargs,
+    ) -> Iterator[LLMStreamChunk]:
+        """
+        Stream a response from Claude (messages.stream()).
+
+        Args:
+            Same as generate()
+
+        Yields:
+            LLMStreamChunk text deltas, then a done chunk with token counts
+
+        Raises:
+            LLMProviderError: If API call fails
+            LLMRateLimitError: If rate limited
+            LLMAuthenticationError: If API key invalid
+        """
+        client, request_params = self._build_request(
+            model_name, messages, max_tokens, temperature, api_key, kwargs
+        )
+
+        try:
+            logger.debug(f"Claude API stream: model={model_name}, messages={len(request_params['messages'])}")
+
+            with client.messages.stream(**request_params) as stream:
+                for text in stream.text_stream:
+                    if text:
+                        yield LLMStreamChunk(content=text)
+                response = stream.get_final_message()
+
+            input_tokens = response.usage.input_tokens if response.usage else 0
+            output_tokens = response.usage.output_tokens if response.usage else 0
+
+            logger.debug(f"Claude API stream done: tokens_in={input_tokens}, tokens_out={output_tokens}")
+
+            yield LLMStreamChunk(
+                done=True,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                model=model_name,
+                finish_reason=response.stop_reason,
+            )
+
+        except Exception as e:
+            raise self._translate_error(e)
+
+    def _build_request(
+        self,
+        model_name: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        api_key: Optional[str],
+        kwargs: Dict[str, Any],
+    ) -> Tuple[anthropic.Anthropic, Dict[str, Any]]:
+        """Client and Messages API parameters shared by generate() and generate_stream()."""
+        # Get API key
+        key = api_key or os.environ.get('ANTHROPIC_API_KEY')
+        if not key:
+            raise LLMAuthenticationError("ANTHROPIC_API_KEY not found")
+
+        # Extract system message if present
+        system_content, remaining_messages = self.extract_system_message(messages)
+
+        # Allow system override from kwargs
+        if 'system' in kwargs:
+            system_content = kwargs.pop('system')
+
+        # Clamp temperature to Claude's range (0.0-1.0)
+        temperature = max(0.0, min(1.0, temperature))
+
+        # Build request parameters
+        request_params = {
+            'model': model_name,
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+            'messages': self.format_messages(remaining_messages),
+        }
+
+        # Add system message if present
+        if system_content:
+            request_params['system'] = system_content
+
+        return anthropic.Anthropic(api_key=key), request_params
+
+    def _translate_error(self, e: Exception) -> Exception:
+        """Map an Anthropic SDK error to the module's provider exceptions."""
+        if isinstance(e, anthropic.RateLimitError):
             logger.warning(f"Claude rate limit exceeded: {e}")
-            raise LLMRateLimitError(f"Rate limit exceeded: {e}")
+            return LLMRateLimitError(self.name)
 
-        except anthropic.AuthenticationError as e:
+        if isinstance(e, anthropic.AuthenticationError):
             logger.error(f"Claude authentication failed: {e}")
-            raise LLMAuthenticationError(f"Authentication failed: {e}")
+            return LLMAuthenticationError(self.name)
 
-        except anthropic.APIError as e:
+        if isinstance(e, anthropic.APIError):
             logger.error(f"Claude API error: {e}")
-            raise LLMProviderError(f"Claude API error: {e}")
+            return LLMProviderError(self.name, f"Claude API error: {e}")
 
-        except Exception as e:
-            logger.error(f"Unexpected error calling Claude: {e}")
-            raise LLMProviderError(f"Failed to call Claude API: {e}")
+        logger.error(f"Unexpected error calling Claude: {e}")
+        return LLMProviderError(self.name, f"Failed to call Claude API: {e}")
 
     def format_messages(
         self,
@@ -5,10 +5,10 @@ Google Gemini LLM provider implementation.
 """
 
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 
 from core.utils.logging_config import get_logger
-from ..models import LLMResponse
+from ..models import LLMResponse, LLMStreamChunk
 from ..exceptions import LLMProviderError, LLMRateLimitError, LLMAuthenticationError
 from .base_provider import BaseProvider
 
@@ -50,39 +50,11 @@ class GeminiProvider(BaseProvider):
             LLMRateLimitError: If rate limited
             LLMAuthenticationError: If API key invalid
         """
-        try:
-            import google.generativeai as genai
-        except ImportError:
-            raise LLMProviderError("google-generativeai package not installed. Run: pip install google-generativeai")
-
-        # Get API key
-        key = api_key or os.environ.get('GOOGLE_AI_API_KEY')
-        if not key:
-            raise LLMAuthenticationError("GOOGLE_AI_API_KEY not found")
-
-        # Configure the API
-        genai.configure(api_key=key)
-
-        # Extract system instruction if provided
-        system_instruction = kwargs.pop('system', None)
-
-        # Format messages for Gemini
-        formatted_messages = self._format_for_gemini(messages)
-
-        # Clamp temperature to Gemini's range (0.0-1.0)
-        temperature = max(0.0, min(1.0, temperature))
+        genai, model_kwargs, formatted_messages, generation_config = self._build_request(
+            model_name, messages, max_tokens, temperature, api_key, kwargs
+        )
 
         try:
-            # Create model with system instruction if provided
-            generation_config = {
-                'temperature': temperature,
-                'max_output_tokens': max_tokens,
-            }
-
-            model_kwargs = {'model_name': model_name}
-            if system_instruction:
-                model_kwargs['system_instruction'] = system_instruction
-
             model = genai.GenerativeModel(**model_kwargs)
 
             logger.debug(f"Gemini API request: model={model_name}, messages={len(formatted_messages)}")
@@ -97,14 +69,7 @@ class GeminiProvider(BaseProvider):
             # Extract content
             content = response.text if response.text else ""
 
-            # Estimate token counts (Gemini doesn't always provide exact counts)
-            input_tokens = sum(len(m.get('parts', [''])[0]) // 4 for m in formatted_messages)
-            output_tokens = len(content) // 4
-
-            # Try to get actual token counts if available
-            if hasattr(response, 'usage_metadata') and response.usage_metadata:
-                input_tokens = getattr(response.usage_metadata, 'prompt_token_count', input_tokens)
-                output_tokens = getattr(response.usage_metadata, 'candidates_token_count', output_tokens)
+            input_tokens, output_tokens = self._token_counts(response, formatted_messages, len(content))
 
             logger.debug(f"Gemini API response: tokens_in={input_tokens}, tokens_out={output_tokens}")
 
@@ -117,16 +82,136 @@ class GeminiProvider(BaseProvider):
             )
 
         except Exception as e:
-            error_str = str(e).lower()
-            if 'quota' in error_str or 'rate' in error_str:
-                logger.warning(f"Gemini rate limit exceeded: {e}")
-                raise LLMRateLimitError(f"Rate limit exceeded: {e}")
-            elif 'api key' in error_str or 'auth' in error_str:
-                logger.error(f"Gemini authentication failed: {e}")
-                raise LLMAuthenticationError(f"Authentication failed: {e}")
-            else:
-                logger.error(f"Gemini API error: {e}")
-                raise LLMProviderError(f"Gemini API error: {e}")
+            raise self._translate_error(e)
+
+    def generate_stream(
+        self,
+        model_name: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 2048,
+        temperature: float = 0.7,
+        api_key: Optional[str] = None,
+        **kwargs,
+    ) -> Iterator[LLMStreamChunk]:
+        """
+        Stream a response from Google Gemini (send_message(stream=True)).
+
+        Args:
+            Same as generate()
+
+        Yields:
+            LLMStreamChunk text deltas, then a done chunk with token counts
+
+        Raises:
+            LLMProviderError: If API call fails
+            LLMRateLimitError: If rate limited
+            LLMAuthenticationError: If API key invalid
+        """
+        genai, model_kwargs, formatted_messages, generation_config = self._build_request(
+            model_name, messages, max_tokens, temperature, api_key, kwargs
+        )
+
+        try:
+            model = genai.GenerativeModel(**model_kwargs)
+
+            logger.debug(f"Gemini API stream: model={model_name}, messages={len(formatted_messages)}")
+
+            chat = model.start_chat(history=formatted_messages[:-1] if len(formatted_messages) > 1 else [])
+            last_message = formatted_messages[-1]['parts'][0] if formatted_messages else ""
+            response = chat.send_message(last_message, generation_config=generation_config, stream=True)
+
+            output_chars = 0
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. only a finish reason)
+                    continue
+                if text:
+                    output_chars += len(text)
+                    yield LLMStreamChunk(content=text)
+
+            input_tokens, output_tokens = self._token_counts(response, formatted_messages, output_chars)
+
+            logger.debug(f"Gemini API stream done: tokens_in={input_tokens}, tokens_out={output_tokens}")
+
+            yield LLMStreamChunk(
+                done=True,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                model=model_name,
+                finish_reason='stop',
+            )
+
+        except Exception as e:
+            raise self._translate_error(e)
+
+    def _build_request(
+        self,
+        model_name: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        api_key: Optional[str],
+        kwargs: Dict[str, Any],
+    ) -> tuple:
+        """SDK module, model kwargs, history and generation config for generate() and generate_stream()."""
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            raise LLMProviderError(self.name, "google-generativeai package not installed. Run: pip install google-generativeai")
+
+        # Get API key
+        key = api_key or os.environ.get('GOOGLE_AI_API_KEY')
+        if not key:
+            raise LLMAuthenticationError("GOOGLE_AI_API_KEY not found")
+
+        # Configure the API
+        genai.configure(api_key=key)
+
+        # Extract system instruction if provided
+        system_instruction = kwargs.pop('system', None)
+
+        # Clamp temperature to Gemini's range (0.0-1.0)
+        temperature = max(0.0, min(1.0, temperature))
+
+        generation_config = {
+            'temperature': temperature,
+            'max_output_tokens': max_tokens,
+        }
+
+        # Create model with system instruction if provided
+        model_kwargs = {'model_name': model_name}
+        if system_instruction:
+            model_kwargs['system_instruction'] = system_instruction
+
+        return genai, model_kwargs, self._format_for_gemini(messages), generation_config
+
+    def _token_counts(self, response, formatted_messages: List[Dict[str, Any]], output_chars: int) -> tuple:
+        """Token counts from usage_metadata, estimated (4 chars per token) when missing."""
+        # Estimate token counts (Gemini doesn't always provide exact counts)
+        input_tokens = sum(len(m.get('parts', [''])[0]) // 4 for m in formatted_messages)
+        output_tokens = output_chars // 4
+
+        # Try to get actual token counts if available
+        if hasattr(response, 'usage_metadata') and response.usage_metadata:
+            input_tokens = getattr(response.usage_metadata, 'prompt_token_count', input_tokens)
+            output_tokens = getattr(response.usage_metadata, 'candidates_token_count', output_tokens)
+
+        return input_tokens, output_tokens
+
+    def _translate_error(self, e: Exception) -> Exception:
+        """Map a Gemini error to the module's provider exceptions (by message)."""
+        error_str = str(e).lower()
+        if 'quota' in error_str or 'rate' in error_str:
+            logger.warning(f"Gemini rate limit exceeded: {e}")
+            return LLMRateLimitError(self.name)
+        elif 'api key' in error_str or 'auth' in error_str:
+            logger.error(f"Gemini authentication failed: {e}")
+            return LLMAuthenticationError(self.name)
+        else:
+            logger.error(f"Gemini API error: {e}")
+            return LLMProviderError(self.name, f"Gemini API error: {e}")
 
     def _format_for_gemini(
         self,
@@ -5,10 +5,10 @@ Groq LLM provider implementation for ultra-fast inference.
 """
 
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 from core.utils.logging_config import get_logger
-from ..models import LLMResponse
+from ..models import LLMResponse, LLMStreamChunk
 from ..exceptions import LLMProviderError, LLMRateLimitError, LLMAuthenticationError
 from .base_provider import BaseProvider
 
@@ -50,32 +50,11 @@ class GroqProvider(BaseProvider):
             LLMRateLimitError: If rate limited
             LLMAuthenticationError: If API key invalid
         """
-        try:
-            from groq import Groq
-        except ImportError:
-            raise LLMProviderError("groq package not installed. Run: pip install groq")
-
-        # Get API key
-        key = api_key or os.environ.get('GROQ_API_KEY')
-        if not key:
-            raise LLMAuthenticationError("GROQ_API_KEY not found")
-
-        # Format messages for Groq API (OpenAI-compatible)
-        formatted_messages = self.format_messages(messages)
-
-        # Add system message if provided in kwargs
-        if 'system' in kwargs:
-            formatted_messages.insert(0, {
-                'role': 'system',
-                'content': kwargs.pop('system'),
-            })
-
-        # Clamp temperature
-        temperature = max(0.0, min(2.0, temperature))
+        client, formatted_messages, temperature = self._build_request(
+            messages, temperature, api_key, kwargs
+        )
 
         try:
-            client = Groq(api_key=key)
-
             logger.debug(f"Groq API request: model={model_name}, messages={len(formatted_messages)}")
 
             response = client.chat.completions.create(
@@ -107,16 +86,122 @@ class GroqProvider(BaseProvider):
             )
 
         except Exception as e:
-            error_str = str(e).lower()
-            if 'rate' in error_str and 'limit' in error_str:
-                logger.warning(f"Groq rate limit exceeded: {e}")
-                raise LLMRateLimitError(f"Rate limit exceeded: {e}")
-            elif 'auth' in error_str or 'key' in error_str or 'unauthorized' in error_str:
-                logger.error(f"Groq authentication failed: {e}")
-                raise LLMAuthenticationError(f"Authentication failed: {e}")
-            else:
-                logger.error(f"Groq API error: {e}")
-                raise LLMProviderError(f"Groq API error: {e}")
+            raise self._translate_error(e)
+
+    def generate_stream(
+        self,
+        model_name: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 2048,
+        temperature: float = 0.7,
+        api_key: Optional[str] = None,
+        **kwargs,
+    ) -> Iterator[LLMStreamChunk]:
+        """
+        Stream a response from Groq (stream=True).
+
+        Groq reports usage on the last chunk, under x_groq.usage.
+
+        Args:
+            Same as generate()
+
+        Yields:
+            LLMStreamChunk text deltas, then a done chunk with token counts
+
+        Raises:
+            LLMProviderError: If API call fails
+            LLMRateLimitError: If rate limited
+            LLMAuthenticationError: If API key invalid
+        """
+        client, formatted_messages, temperature = self._build_request(
+            messages, temperature, api_key, kwargs
+        )
+
+        try:
+            logger.debug(f"Groq API stream: model={model_name}, messages={len(formatted_messages)}")
+
+            stream = client.chat.completions.create(
+                model=model_name,
+                messages=formatted_messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+            )
+
+            input_tokens = output_tokens = 0
+            finish_reason = None
+            try:
+                for chunk in stream:
+                    if chunk.choices:
+                        choice = chunk.choices[0]
+                        if choice.delta and choice.delta.content:
+                            yield LLMStreamChunk(content=choice.delta.content)
+                        finish_reason = choice.finish_reason or finish_reason
+                    usage = getattr(getattr(chunk, 'x_groq', None), 'usage', None) or getattr(chunk, 'usage', None)
+                    if usage:
+                        input_tokens = usage.prompt_tokens
+                        output_tokens = usage.completion_tokens
+            finally:
+                stream.close()
+
+            logger.debug(f"Groq API stream done: tokens_in={input_tokens}, tokens_out={output_tokens}")
+
+            yield LLMStreamChunk(
+                done=True,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                model=model_name,
+                finish_reason=finish_reason,
+            )
+
+        except Exception as e:
+            raise self._translate_error(e)
+
+    def _build_request(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        api_key: Optional[str],
+        kwargs: Dict[str, Any],
+    ) -> Tuple[Any, List[Dict[str, str]], float]:
+        """Client, messages and clamped temperature shared by generate() and generate_stream()."""
+        try:
+            from groq import Groq
+        except ImportError:
+            raise LLMProviderError(self.name, "groq package not installed. Run: pip install groq")
+
+        # Get API key
+        key = api_key or os.environ.get('GROQ_API_KEY')
+        if not key:
+            raise LLMAuthenticationError("GROQ_API_KEY not found")
+
+        # Format messages for Groq API (OpenAI-compatible)
+        formatted_messages = self.format_messages(messages)
+
+        # Add system message if provided in kwargs
+        if 'system' in kwargs:
+            formatted_messages.insert(0, {
+                'role': 'system',
+                'content': kwargs.pop('system'),
+            })
+
+        # Clamp temperature
+        temperature = max(0.0, min(2.0, temperature))
+
+        return Groq(api_key=key), formatted_messages, temperature
+
+    def _translate_error(self, e: Exception) -> Exception:
+        """Map a Groq error to the module's provider exceptions (by message)."""
+        error_str = str(e).lower()
+        if 'rate' in error_str and 'limit' in error_str:
+            logger.warning(f"Groq rate limit exceeded: {e}")
+            return LLMRateLimitError(self.name)
+        elif 'auth' in error_str or 'key' in error_str or 'unauthorized' in error_str:
+            logger.error(f"Groq authentication failed: {e}")
+            return LLMAuthenticationError(self.name)
+        else:
+            logger.error(f"Groq API error: {e}")
+            return LLMProviderError(self.name, f"Groq API error: {e}")
 
     def format_messages(
         self,
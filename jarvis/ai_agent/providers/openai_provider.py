@@ -5,12 +5,12 @@ OpenAI GPT LLM provider implementation.
 """
 
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 import openai
 
 from core.utils.logging_config import get_logger
-from ..models import LLMResponse
+from ..models import LLMResponse, LLMStreamChunk
 from ..exceptions import LLMProviderError, LLMRateLimitError, LLMAuthenticationError
 from .base_provider import BaseProvider
 
@@ -52,27 +52,11 @@ class OpenAIProvider(BaseProvider):
             LLMRateLimitError: If rate limited
             LLMAuthenticationError: If API key invalid
         """
-        # Get API key
-        key = api_key or os.environ.get('OPENAI_API_KEY')
-        if not key:
-            raise LLMAuthenticationError("OPENAI_API_KEY not found")
-
-        # Format messages for OpenAI API
-        formatted_messages = self.format_messages(messages)
-
-        # Add system message if provided in kwargs
-        if 'system' in kwargs:
-            formatted_messages.insert(0, {
-                'role': 'system',
-                'content': kwargs.pop('system'),
-            })
-
-        # Clamp temperature to OpenAI's range (0.0-2.0)
-        temperature = max(0.0, min(2.0, temperature))
+        client, formatted_messages, temperature = self._build_request(
+            messages, temperature, api_key, kwargs
+        )
 
         try:
-            client = openai.OpenAI(api_key=key)
-
             logger.debug(f"OpenAI API request: model={model_name}, messages={len(formatted_messages)}")
 
             response = client.chat.completions.create(
@@ -103,21 +87,123 @@ class OpenAIProvider(BaseProvider):
                 finish_reason=finish_reason,
             )
 
-        except openai.RateLimitError as e:
+        except Exception as e:
+            raise self._translate_error(e)
+
+    def generate_stream(
+        self,
+        model_name: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 2048,
+        temperature: float = 0.7,
+        api_key: Optional[str] = None,
+        **kwargs,
+    ) -> Iterator[LLMStreamChunk]:
+        """
+        Stream a response from OpenAI GPT (stream=True).
+
+        Usage is requested with stream_options.include_usage and arrives in
+        the last chunk, which has no choices.
+
+        Args:
+            Same as generate()
+
+        Yields:
+            LLMStreamChunk text deltas, then a done chunk with token counts
+
+        Raises:
+            LLMProviderError: If API call fails
+            LLMRateLimitError: If rate limited
+            LLMAuthenticationError: If API key invalid
+        """
+        client, formatted_messages, temperature = self._build_request(
+            messages, temperature, api_key, kwargs
+        )
+
+        try:
+            logger.debug(f"OpenAI API stream: model={model_name}, messages={len(formatted_messages)}")
+
+            stream = client.chat.completions.create(
+                model=model_name,
+                messages=formatted_messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+                stream_options={'include_usage': True},
+            )
+
+            input_tokens = output_tokens = 0
+            finish_reason = None
+            try:
+                for chunk in stream:
+                    if chunk.choices:
+                        choice = chunk.choices[0]
+                        if choice.delta and choice.delta.content:
+                            yield LLMStreamChunk(content=choice.delta.content)
+                        finish_reason = choice.finish_reason or finish_reason
+                    if chunk.usage:
+                        input_tokens = chunk.usage.prompt_tokens
+                        output_tokens = chunk.usage.completion_tokens
+            finally:
+                stream.close()
+
+            logger.debug(f"OpenAI API stream done: tokens_in={input_tokens}, tokens_out={output_tokens}")
+
+            yield LLMStreamChunk(
+                done=True,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                model=model_name,
+                finish_reason=finish_reason,
+            )
+
+        except Exception as e:
+            raise self._translate_error(e)
+
+    def _build_request(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        api_key: Optional[str],
+        kwargs: Dict[str, Any],
+    ) -> Tuple[openai.OpenAI, List[Dict[str, str]], float]:
+        """Client, messages and clamped temperature shared by generate() and generate_stream()."""
+        # Get API key
+        key = api_key or os.environ.get('OPENAI_API_KEY')
+        if not key:
+            raise LLMAuthenticationError("OPENAI_API_KEY not found")
+
+        # Format messages for OpenAI API
+        formatted_messages = self.format_messages(messages)
+
+        # Add system message if provided in kwargs
+        if 'system' in kwargs:
+            formatted_messages.insert(0, {
+                'role': 'system',
+                'content': kwargs.pop('system'),
+            })
+
+        # Clamp temperature to OpenAI's range (0.0-2.0)
+        temperature = max(0.0, min(2.0, temperature))
+
+        return openai.OpenAI(api_key=key), formatted_messages, temperature
+
+    def _translate_error(self, e: Exception) -> Exception:
+        """Map an OpenAI SDK error to the module's provider exceptions."""
+        if isinstance(e, openai.RateLimitError):
             logger.warning(f"OpenAI rate limit exceeded: {e}")
-            raise LLMRateLimitError(f"Rate limit exceeded: {e}")
+            return LLMRateLimitError(self.name)
 
-        except openai.AuthenticationError as e:
+        if isinstance(e, openai.AuthenticationError):
             logger.error(f"OpenAI authentication failed: {e}")
-            raise LLMAuthenticationError(f"Authentication failed: {e}")
+            return LLMAuthenticationError(self.name)
 
-        except openai.APIError as e:
+        if isinstance(e, openai.APIError):
             logger.error(f"OpenAI API error: {e}")
-            raise LLMProviderError(f"OpenAI API error: {e}")
+            return LLMProviderError(self.name, f"OpenAI API error: {e}")
 
-        except Exception as e:
-            logger.error(f"Unexpected error calling OpenAI: {e}")
-            raise LLMProviderError(f"Failed to call OpenAI API: {e}")
+        logger.error(f"Unexpected error calling OpenAI: {e}")
+        return LLMProviderError(self.name, f"Failed to call OpenAI API: {e}")
 
     def format_messages(
         self,
@@ -0,0 +1,122 @@
+"""
+RAG Query Caches
+
+Two caches in front of RAGService.search(), both stored in the core.cache
+backend (per-process LRU, or shared by all Gunicorn workers with
+CACHE_BACKEND=socket):
+
+    ai_query_embeddings   '<model>:<sha256(normalized query)>' -> embedding
+    ai_rag_retrieval      sha256(generation, mode, query, embedding, filters,
+                          ranking knobs) -> [RAGSource, ...]
+
+Query embeddings don't change for a given model, so a repeated question skips
+the embeddings API round-trip. Retrieval results depend on the indexed
+documents: every write to ai_agent.rag_documents calls invalidate_retrieval(),
+which starts a new index generation and drops the namespace. A search that
+was already running when the write happened stores its result under the old
+generation, where it is never read.
+
+Sizes and TTLs are set with AI_AGENT_EMBEDDING_CACHE_SIZE / _TTL and
+AI_AGENT_RETRIEVAL_CACHE_SIZE / _TTL; a size of 0 disables that cache.
+"""
+
+import os
+import time
+import struct
+import hashlib
+from typing import Any, List, Optional
+
+from core.cache import get_cache_backend, register_namespace
+
+EMBEDDING_NAMESPACE = 'ai_query_embeddings'
+RETRIEVAL_NAMESPACE = 'ai_rag_retrieval'
+GENERATION_NAMESPACE = 'ai_rag_generation'
+
+EMBEDDING_CACHE_SIZE = int(os.environ.get('AI_AGENT_EMBEDDING_CACHE_SIZE', 1000))
+EMBEDDING_CACHE_TTL = int(os.environ.get('AI_AGENT_EMBEDDING_CACHE_TTL', 86400))
+RETRIEVAL_CACHE_SIZE = int(os.environ.get('AI_AGENT_RETRIEVAL_CACHE_SIZE', 500))
+RETRIEVAL_CACHE_TTL = int(os.environ.get('AI_AGENT_RETRIEVAL_CACHE_TTL', 300))
+
+# Outlives every retrieval entry, so an expired generation can't resurrect one
+GENERATION_TTL = 30 * 86400
+
+register_namespace(EMBEDDING_NAMESPACE, ttl=EMBEDDING_CACHE_TTL, max_entries=max(1, EMBEDDING_CACHE_SIZE))
+register_namespace(RETRIEVAL_NAMESPACE, ttl=RETRIEVAL_CACHE_TTL, max_entries=max(1, RETRIEVAL_CACHE_SIZE))
+register_namespace(GENERATION_NAMESPACE, ttl=GENERATION_TTL, max_entries=1)
+
+
+def normalize_query(text: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return ' '.join(text.casefold().split()).rstrip('?!.;, ')
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+
+def embedding_key(model: str, text: str) -> str:
+    return f'{model}:{_digest(normalize_query(text))}'
+
+
+def get_query_embedding(model: str, text: str) -> Optional[List[float]]:
+    """Cached embedding of a query for a model, or None."""
+    if EMBEDDING_CACHE_SIZE <= 0:
+        return None
+    return get_cache_backend().get(EMBEDDING_NAMESPACE, embedding_key(model, text))
+
+
+def set_query_embedding(model: str, text: str, embedding: List[float]):
+    if EMBEDDING_CACHE_SIZE > 0:
+        get_cache_backend().set(EMBEDDING_NAMESPACE, embedding_key(model, text), list(embedding))
+
+
+def index_generation() -> int:
+    """Current index generation (started lazily, e.g. after a cache server restart)."""
+    backend = get_cache_backend()
+    generation = backend.get(GENERATION_NAMESPACE, 'generation')
+    if generation is None:
+        generation = time.time_ns()
+        backend.set(GENERATION_NAMESPACE, 'generation', generation)
+    return generation
+
+
+def retrieval_key(query: str, embedding: Optional[List[float]], **params: Any) -> str:
+    """Key for one search: generation, normalized query, embedding and every parameter."""
+    vector = struct.pack(f'{len(embedding)}d', *embedding) if embedding else b''
+    return _digest(
+        index_generation(),
+        normalize_query(query),
+        hashlib.sha256(vector).hexdigest(),
+        sorted(params.items()),
+    )
+
+
+def get_retrieval(key: str) -> Optional[list]:
+    """Cached search results for a retrieval_key(), or None."""
+    if RETRIEVAL_CACHE_SIZE <= 0:
+        return None
+    return get_cache_backend().get(RETRIEVAL_NAMESPACE, key)
+
+
+def set_retrieval(key: str, results: list):
+    if RETRIEVAL_CACHE_SIZE > 0:
+        get_cache_backend().set(RETRIEVAL_NAMESPACE, key, results)
+
+
+def invalidate_retrieval():
+    """Start a new index generation and drop cached results (rag_documents changed)."""
+    backend = get_cache_backend()
+    backend.set(GENERATION_NAMESPACE, 'generation', time.time_ns())
+    backend.invalidate(RETRIEVAL_NAMESPACE)
+
+
+def get_stats() -> dict:
+    """Hits, misses, hit_ratio, size and invalidations of both caches."""
+    stats = get_cache_backend().stats()
+    empty = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'size': 0, 'hit_ratio': 0.0}
+    return {
+        'query_embeddings': {**empty, **stats.get(EMBEDDING_NAMESPACE, {}),
+                             'enabled': EMBEDDING_CACHE_SIZE > 0},
+        'retrieval': {**empty, **stats.get(RETRIEVAL_NAMESPACE, {}),
+                      'enabled': RETRIEVAL_CACHE_SIZE > 0},
+    }
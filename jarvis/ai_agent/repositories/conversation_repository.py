@@ -271,6 +271,45 @@ class ConversationRepository:
         finally:
             release_db(conn)
 
+    def update_metadata(
+        self,
+        conversation_id: int,
+        updates: dict,
+    ) -> bool:
+        """
+        Merge keys into the conversation metadata.
+
+        Args:
+            conversation_id: ID of the conversation
+            updates: Top-level keys to set (others are kept)
+
+        Returns:
+            True if updated
+        """
+        conn = get_db()
+        cursor = get_cursor(conn)
+
+        try:
+            cursor.execute("""
+                UPDATE ai_agent.conversations
+                SET metadata = COALESCE(metadata, '{}'::jsonb) || %s::jsonb,
+                    updated_at = NOW()
+                WHERE id = %s
+                RETURNING id
+            """, (json.dumps(updates), conversation_id))
+
+            row = cursor.fetchone()
+            conn.commit()
+            return row is not None
+
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error updating conversation metadata: {e}")
+            raise
+
+        finally:
+            release_db(conn)
+
     def delete(self, conversation_id: int) -> bool:
         """
         Permanently delete a conversation and its messages.
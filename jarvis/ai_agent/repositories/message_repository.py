@@ -7,14 +7,20 @@ Database operations for AI Agent messages.
 import json
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 from core.database import get_db, get_cursor, release_db
 from core.utils.logging_config import get_logger
 from ..models import Message, MessageRole
+from ..tokens import estimate_tokens
 
 logger = get_logger('jarvis.ai_agent.repo.message')
 
+MESSAGE_COLUMNS = """id, conversation_id, role, content,
+                       input_tokens, output_tokens, cost,
+                       rag_sources, model_config_id, response_time_ms,
+                       content_tokens, created_at"""
+
 
 class MessageRepository:
     """Repository for Message entities."""
@@ -29,6 +35,9 @@ class MessageRepository:
         Returns:
             Created Message with ID
         """
+        if message.content_tokens is None:
+            message.content_tokens = estimate_tokens(message.content)
+
         conn = get_db()
         cursor = get_cursor(conn)
 
@@ -38,12 +47,12 @@ class MessageRepository:
                     conversation_id, role, content,
                     input_tokens, output_tokens, cost,
                     rag_sources, model_config_id, response_time_ms,
-                    created_at
+                    content_tokens, created_at
                 ) VALUES (
                     %(conversation_id)s, %(role)s, %(content)s,
                     %(input_tokens)s, %(output_tokens)s, %(cost)s,
                     %(rag_sources)s, %(model_config_id)s, %(response_time_ms)s,
-                    NOW()
+                    %(content_tokens)s, NOW()
                 )
                 RETURNING id, created_at
             """, {
@@ -56,6 +65,7 @@ class MessageRepository:
                 'rag_sources': json.dumps(message.rag_sources) if message.rag_sources else '[]',
                 'model_config_id': message.model_config_id,
                 'response_time_ms': message.response_time_ms,
+                'content_tokens': message.content_tokens,
             })
 
             row = cursor.fetchone()
@@ -87,11 +97,8 @@ class MessageRepository:
         cursor = get_cursor(conn)
 
         try:
-            cursor.execute("""
-                SELECT id, conversation_id, role, content,
-                       input_tokens, output_tokens, cost,
-                       rag_sources, model_config_id, response_time_ms,
-                       created_at
+            cursor.execute(f"""
+                SELECT {MESSAGE_COLUMNS}
                 FROM ai_agent.messages
                 WHERE id = %s
             """, (message_id,))
@@ -130,10 +137,7 @@ class MessageRepository:
         try:
             order_dir = 'ASC' if order == 'asc' else 'DESC'
             cursor.execute(f"""
-                SELECT id, conversation_id, role, content,
-                       input_tokens, output_tokens, cost,
-                       rag_sources, model_config_id, response_time_ms,
-                       created_at
+                SELECT {MESSAGE_COLUMNS}
                 FROM ai_agent.messages
                 WHERE conversation_id = %s
                 ORDER BY created_at {order_dir}
@@ -149,6 +153,8 @@ class MessageRepository:
         self,
         conversation_id: int,
         limit: int = 10,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
     ) -> List[Message]:
         """
         Get recent messages for building context.
@@ -158,6 +164,8 @@ class MessageRepository:
         Args:
             conversation_id: ID of the conversation
             limit: Maximum messages to return
+            after_id: Only messages with a higher ID (e.g. not yet summarized)
+            before_id: Only messages with a lower ID (e.g. the current one)
 
         Returns:
             List of Messages in chronological order
@@ -166,17 +174,24 @@ class MessageRepository:
         cursor = get_cursor(conn)
 
         try:
+            conditions = ["conversation_id = %s"]
+            params = [conversation_id]
+            if after_id is not None:
+                conditions.append("id > %s")
+                params.append(after_id)
+            if before_id is not None:
+                conditions.append("id < %s")
+                params.append(before_id)
+            params.append(limit)
+
             # Get newest first, then reverse for chronological order
-            cursor.execute("""
-                SELECT id, conversation_id, role, content,
-                       input_tokens, output_tokens, cost,
-                       rag_sources, model_config_id, response_time_ms,
-                       created_at
+            cursor.execute(f"""
+                SELECT {MESSAGE_COLUMNS}
                 FROM ai_agent.messages
-                WHERE conversation_id = %s
-                ORDER BY created_at DESC
+                WHERE {' AND '.join(conditions)}
+                ORDER BY created_at DESC, id DESC
                 LIMIT %s
-            """, (conversation_id, limit))
+            """, params)
 
             messages = [self._row_to_message(row) for row in cursor.fetchall()]
             # Reverse to get chronological order
@@ -186,6 +201,43 @@ class MessageRepository:
         finally:
             release_db(conn)
 
+    def set_content_tokens(self, counts: Dict[int, int]) -> int:
+        """
+        Store token counts for messages saved before content_tokens existed.
+
+        Args:
+            counts: Token count by message ID
+
+        Returns:
+            Number of messages updated
+        """
+        if not counts:
+            return 0
+
+        conn = get_db()
+        cursor = get_cursor(conn)
+
+        try:
+            from psycopg2.extras import execute_values
+            execute_values(cursor, """
+                UPDATE ai_agent.messages AS m
+                SET content_tokens = v.tokens
+                FROM (VALUES %s) AS v(id, tokens)
+                WHERE m.id = v.id
+            """, list(counts.items()))
+
+            count = cursor.rowcount
+            conn.commit()
+            return count
+
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error storing message token counts: {e}")
+            raise
+
+        finally:
+            release_db(conn)
+
     def count_by_conversation(self, conversation_id: int) -> int:
         """
         Count messages in a conversation.
@@ -263,5 +315,6 @@ class MessageRepository:
             rag_sources=rag_sources,
             model_config_id=row['model_config_id'],
             response_time_ms=row['response_time_ms'],
+            content_tokens=row.get('content_tokens'),
             created_at=row['created_at'],
         )
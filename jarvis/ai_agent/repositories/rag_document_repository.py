@@ -10,10 +10,163 @@ from typing import Optional, List, Dict, Any
 
 from core.database import get_db, get_cursor, release_db
 from core.utils.logging_config import get_logger
+from .. import rag_cache
 from ..models import RAGDocument, RAGSourceType
 
 logger = get_logger('jarvis.ai_agent.repo.rag_document')
 
+RAG_DOCUMENTS_TABLE = 'ai_agent.rag_documents'
+DOCUMENT_COLUMNS = (
+    'id', 'source_type', 'source_id', 'source_table', 'content', 'content_hash',
+    'metadata', 'company_id', 'is_active', 'created_at', 'updated_at',
+)
+# Same expression as the generated content_tsv column; used until migrations.sql adds it
+TSVECTOR_EXPRESSION = "to_tsvector('english', content)"
+
+
+# ============== Search Queries ==============
+#
+# Builders return (sql, params) with named placeholders so the retrieval
+# benchmark can run the exact queries against a scratch table.
+
+def _columns(alias: str = '') -> str:
+    prefix = f'{alias}.' if alias else ''
+    return ', '.join(prefix + column for column in DOCUMENT_COLUMNS)
+
+
+def vector_literal(embedding: List[float]) -> str:
+    """pgvector text form ('[0.1,0.2,...]'), cheaper to send than an ARRAY of numerics."""
+    return '[' + ','.join(repr(float(x)) for x in embedding) + ']'
+
+
+def _search_filters(
+    company_id: Optional[int],
+    source_types: Optional[List[RAGSourceType]],
+) -> tuple:
+    filters = ["is_active = TRUE"]
+    params: Dict[str, Any] = {}
+
+    if company_id:
+        filters.append("(company_id = %(company_id)s OR company_id IS NULL)")
+        params['company_id'] = company_id
+
+    if source_types:
+        filters.append("source_type = ANY(%(source_types)s)")
+        params['source_types'] = [st.value for st in source_types]
+
+    return ' AND '.join(filters), params
+
+
+def build_vector_search_query(
+    embedding: List[float],
+    limit: int,
+    company_id: Optional[int] = None,
+    source_types: Optional[List[RAGSourceType]] = None,
+    table: str = RAG_DOCUMENTS_TABLE,
+) -> tuple:
+    """Nearest neighbours by cosine distance; ORDER BY distance LIMIT k uses the ANN index."""
+    where_clause, params = _search_filters(company_id, source_types)
+    params.update(embedding=vector_literal(embedding), limit=limit)
+    sql = f"""
+        SELECT {_columns()},
+               1 - (embedding <=> %(embedding)s::vector) as score
+        FROM {table}
+        WHERE {where_clause}
+        ORDER BY embedding <=> %(embedding)s::vector
+        LIMIT %(limit)s
+    """
+    return sql, params
+
+
+def build_text_search_query(
+    query: str,
+    limit: int,
+    company_id: Optional[int] = None,
+    source_types: Optional[List[RAGSourceType]] = None,
+    tsvector: str = 'content_tsv',
+    table: str = RAG_DOCUMENTS_TABLE,
+) -> tuple:
+    """Full-text matches ranked by ts_rank normalized to 0-1 (rank / (rank + 1))."""
+    where_clause, params = _search_filters(company_id, source_types)
+    params.update(query=query, limit=limit)
+    sql = f"""
+        SELECT {_columns()},
+               ts_rank({tsvector}, q, 32) as score
+        FROM {table}, plainto_tsquery('english', %(query)s) q
+        WHERE {where_clause}
+          AND {tsvector} @@ q
+        ORDER BY score DESC
+        LIMIT %(limit)s
+    """
+    return sql, params
+
+
+def build_hybrid_search_query(
+    query: str,
+    embedding: List[float],
+    limit: int,
+    company_id: Optional[int] = None,
+    source_types: Optional[List[RAGSourceType]] = None,
+    vector_weight: float = 0.7,
+    candidates: int = 50,
+    tsvector: str = 'content_tsv',
+    table: str = RAG_DOCUMENTS_TABLE,
+) -> tuple:
+    """
+    Candidates from the ANN and GIN indexes, ranked by a weighted score.
+
+    Both scores are computed for every candidate, so a document found by
+    only one index still gets credit for the other.
+    """
+    where_clause, params = _search_filters(company_id, source_types)
+    params.update(
+        query=query, embedding=vector_literal(embedding), limit=limit,
+        candidates=max(candidates, limit), vector_weight=vector_weight,
+    )
+    sql = f"""
+        WITH vector_hits AS (
+            SELECT id
+            FROM {table}
+            WHERE {where_clause}
+            ORDER BY embedding <=> %(embedding)s::vector
+            LIMIT %(candidates)s
+        ),
+        text_hits AS (
+            SELECT id
+            FROM {table}, plainto_tsquery('english', %(query)s) q
+            WHERE {where_clause}
+              AND {tsvector} @@ q
+            ORDER BY ts_rank({tsvector}, q, 32) DESC
+            LIMIT %(candidates)s
+        ),
+        scored AS (
+            SELECT {_columns('d')},
+                   COALESCE(1 - (d.embedding <=> %(embedding)s::vector), 0) as vector_score,
+                   CASE WHEN {tsvector} @@ q THEN ts_rank({tsvector}, q, 32) ELSE 0 END as text_score
+            FROM (SELECT id FROM vector_hits UNION SELECT id FROM text_hits) c
+            JOIN {table} d ON d.id = c.id,
+                 plainto_tsquery('english', %(query)s) q
+        )
+        SELECT *,
+               %(vector_weight)s * vector_score + (1 - %(vector_weight)s) * text_score as score
+        FROM scored
+        ORDER BY score DESC
+        LIMIT %(limit)s
+    """
+    return sql, params
+
+
+def set_ann_recall(cursor, ef_search: int, probes: int):
+    """Set the ANN recall/latency knobs for the current transaction only.
+
+    The connection must not be in autocommit mode, or the settings end
+    before the search runs.
+    """
+    cursor.execute(
+        "SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true)",
+        (str(int(ef_search)), str(int(probes)))
+    )
+
 
 class RAGDocumentRepository:
     """
@@ -28,6 +181,7 @@ class RAGDocumentRepository:
     def __init__(self):
         """Initialize repository and detect pgvector availability."""
         self._has_pgvector = None
+        self._has_content_tsv = None
 
     def _check_pgvector(self, cursor) -> bool:
         """Check if pgvector is available."""
@@ -100,6 +254,7 @@ class RAGDocumentRepository:
 
             row = cursor.fetchone()
             conn.commit()
+            rag_cache.invalidate_retrieval()
 
             document.id = row['id']
             document.created_at = row['created_at']
@@ -158,6 +313,8 @@ class RAGDocumentRepository:
 
             row = cursor.fetchone()
             conn.commit()
+            if row is not None:
+                rag_cache.invalidate_retrieval()
             return row is not None
 
         except Exception as e:
@@ -168,6 +325,133 @@ class RAGDocumentRepository:
         finally:
             release_db(conn)
 
+    def bulk_upsert(
+        self,
+        documents: List[RAGDocument],
+        unchanged_ids: Optional[List[int]] = None,
+    ) -> Dict[str, int]:
+        """
+        Write a batch of indexed documents in one transaction.
+
+        Documents with an id replace the content, hash, metadata and embedding
+        of that row (one UPDATE ... FROM (VALUES ...)); the rest are inserted
+        with one multi-row INSERT. unchanged_ids only get updated_at bumped,
+        so they stop showing up as stale.
+
+        Args:
+            documents: Documents to write (embedding may be None)
+            unchanged_ids: Ids of documents whose content hash still matches
+
+        Returns:
+            Dict with inserted, updated and unchanged counts
+        """
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        if not documents and not unchanged_ids:
+            return counts
+
+        from psycopg2.extras import execute_values, Json
+
+        conn = get_db()
+        cursor = get_cursor(conn)
+
+        try:
+            has_pgvector = self._check_pgvector(cursor)
+            embedding_column = ', embedding' if has_pgvector else ''
+            embedding_template = ', %s::vector' if has_pgvector else ''
+
+            def values(document: RAGDocument, *leading) -> tuple:
+                row = leading + (
+                    document.content,
+                    document.content_hash,
+                    Json(document.metadata or {}),
+                    document.company_id,
+                )
+                return row + (document.embedding,) if has_pgvector else row
+
+            if unchanged_ids:
+                cursor.execute("""
+                    UPDATE ai_agent.rag_documents
+                    SET updated_at = NOW()
+                    WHERE id = ANY(%s)
+                """, (list(unchanged_ids),))
+                counts['unchanged'] = cursor.rowcount
+
+            existing = [doc for doc in documents if doc.id]
+            if existing:
+                # A stale embedding is cleared rather than kept for the new content
+                embedding_set = ', embedding = v.embedding' if has_pgvector else ''
+                updated = execute_values(
+                    cursor,
+                    f"""
+                        UPDATE ai_agent.rag_documents AS d
+                        SET content = v.content, content_hash = v.content_hash,
+                            metadata = v.metadata, company_id = v.company_id,
+                            updated_at = NOW(){embedding_set}
+                        FROM (VALUES %s) AS v(id, content, content_hash, metadata, company_id{embedding_column})
+                        WHERE d.id = v.id
+                        RETURNING d.id
+                    """,
+                    [values(doc, doc.id) for doc in existing],
+                    template=f'(%s::integer, %s::text, %s::varchar, %s::jsonb, %s::integer{embedding_template})',
+                    page_size=len(existing),
+                    fetch=True,
+                )
+                counts['updated'] = len(updated)
+
+            new = [doc for doc in documents if not doc.id]
+            if new:
+                inserted = execute_values(
+                    cursor,
+                    f"""
+                        INSERT INTO ai_agent.rag_documents
+                        (source_type, source_id, source_table, content, content_hash,
+                         metadata, company_id{embedding_column})
+                        VALUES %s
+                        RETURNING id
+                    """,
+                    [values(doc, doc.source_type.value, doc.source_id, doc.source_table) for doc in new],
+                    template=f'(%s, %s, %s, %s, %s, %s, %s{embedding_template})',
+                    page_size=len(new),
+                    fetch=True,
+                )
+                for doc, row in zip(new, inserted):
+                    doc.id = row['id']
+                counts['inserted'] = len(inserted)
+
+            conn.commit()
+            # Touched-only rows don't change what a search returns
+            if counts['inserted'] or counts['updated']:
+                rag_cache.invalidate_retrieval()
+            return counts
+
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error writing RAG documents: {e}")
+            raise
+
+        finally:
+            release_db(conn)
+
+    def _check_content_tsv(self, cursor) -> bool:
+        """Check if the maintained content_tsv column exists (migrations.sql)."""
+        if self._has_content_tsv is None:
+            try:
+                cursor.execute("""
+                    SELECT EXISTS (
+                        SELECT 1 FROM information_schema.columns
+                        WHERE table_schema = 'ai_agent'
+                          AND table_name = 'rag_documents'
+                          AND column_name = 'content_tsv'
+                    )
+                """)
+                self._has_content_tsv = cursor.fetchone()['exists']
+            except Exception:
+                self._has_content_tsv = False
+        return self._has_content_tsv
+
+    def _tsvector(self, cursor) -> str:
+        return 'content_tsv' if self._check_content_tsv(cursor) else TSVECTOR_EXPRESSION
+
     def search_by_vector(
         self,
         embedding: List[float],
@@ -175,21 +459,31 @@ class RAGDocumentRepository:
         company_id: Optional[int] = None,
         source_types: Optional[List[RAGSourceType]] = None,
         min_score: float = 0.0,
+        ef_search: int = 40,
+        probes: int = 10,
     ) -> List[RAGDocument]:
         """
         Search documents by vector similarity (cosine distance).
 
+        Uses the HNSW (or IVFFlat) index on embedding; ef_search / probes
+        trade latency for recall.
+
         Args:
             embedding: Query embedding vector
             limit: Maximum results
             company_id: Optional company filter for access control
             source_types: Optional source type filter
             min_score: Minimum similarity score (0-1)
+            ef_search: HNSW candidate list size (higher = better recall, slower)
+            probes: IVFFlat lists probed (same trade-off)
 
         Returns:
             List of RAGDocuments with scores
         """
         conn = get_db()
+        # get_db() connections autocommit; the recall settings and the search
+        # must share one transaction for set_ann_recall() to apply
+        conn.autocommit = False
         cursor = get_cursor(conn)
 
         try:
@@ -197,33 +491,8 @@ class RAGDocumentRepository:
                 logger.warning("pgvector not available, falling back to text search")
                 return []
 
-            # Build query with filters
-            filters = ["is_active = TRUE"]
-            params = [embedding]
-
-            if company_id:
-                filters.append("(company_id = %s OR company_id IS NULL)")
-                params.append(company_id)
-
-            if source_types:
-                placeholders = ', '.join(['%s'] * len(source_types))
-                filters.append(f"source_type IN ({placeholders})")
-                params.extend([st.value for st in source_types])
-
-            where_clause = ' AND '.join(filters)
-            params.append(limit)
-
-            # Cosine similarity: 1 - cosine_distance
-            cursor.execute(f"""
-                SELECT id, source_type, source_id, source_table,
-                       content, content_hash, metadata, company_id,
-                       is_active, created_at, updated_at,
-                       1 - (embedding <=> %s::vector) as score
-                FROM ai_agent.rag_documents
-                WHERE {where_clause}
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s
-            """, [embedding] + params[1:-1] + [embedding, limit])
+            set_ann_recall(cursor, ef_search, probes)
+            cursor.execute(*build_vector_search_query(embedding, limit, company_id, source_types))
 
             documents = []
             for row in cursor.fetchall():
@@ -236,6 +505,8 @@ class RAGDocumentRepository:
             return documents
 
         finally:
+            # End the read transaction; the recall settings end with it
+            conn.rollback()
             release_db(conn)
 
     def search_by_text(
@@ -248,6 +519,9 @@ class RAGDocumentRepository:
         """
         Search documents by full-text search (fallback when pgvector unavailable).
 
+        Matches and ranks on the GIN-indexed content_tsv column instead of
+        computing to_tsvector() for every row.
+
         Args:
             query: Search query text
             limit: Maximum results
@@ -255,50 +529,80 @@ class RAGDocumentRepository:
             source_types: Optional source type filter
 
         Returns:
-            List of RAGDocuments with relevance scores
+            List of RAGDocuments with relevance scores (0-1)
         """
         conn = get_db()
         cursor = get_cursor(conn)
 
         try:
-            # Build query with filters
-            filters = ["is_active = TRUE"]
-            params = [query]
+            cursor.execute(*build_text_search_query(
+                query, limit, company_id, source_types, tsvector=self._tsvector(cursor)
+            ))
 
-            if company_id:
-                filters.append("(company_id = %s OR company_id IS NULL)")
-                params.append(company_id)
+            documents = []
+            for row in cursor.fetchall():
+                doc = self._row_to_document(row)
+                doc.score = float(row['score']) if row['score'] else 0.0
+                documents.append(doc)
 
-            if source_types:
-                placeholders = ', '.join(['%s'] * len(source_types))
-                filters.append(f"source_type IN ({placeholders})")
-                params.extend([st.value for st in source_types])
+            logger.debug(f"Text search found {len(documents)} documents")
+            return documents
 
-            where_clause = ' AND '.join(filters)
-            params.append(limit)
+        finally:
+            release_db(conn)
 
-            cursor.execute(f"""
-                SELECT id, source_type, source_id, source_table,
-                       content, content_hash, metadata, company_id,
-                       is_active, created_at, updated_at,
-                       ts_rank(to_tsvector('english', content), plainto_tsquery('english', %s)) as score
-                FROM ai_agent.rag_documents
-                WHERE {where_clause}
-                  AND to_tsvector('english', content) @@ plainto_tsquery('english', %s)
-                ORDER BY score DESC
-                LIMIT %s
-            """, [query] + params[1:-1] + [query, limit])
+    def search_hybrid(
+        self,
+        query: str,
+        embedding: List[float],
+        limit: int = 5,
+        company_id: Optional[int] = None,
+        source_types: Optional[List[RAGSourceType]] = None,
+        vector_weight: float = 0.7,
+        candidates: int = 50,
+        min_score: float = 0.0,
+        ef_search: int = 40,
+        probes: int = 10,
+    ) -> List[RAGDocument]:
+        """
+        Search with vector similarity and full-text rank combined.
+
+        The top `candidates` of each index are merged and ranked by
+        vector_weight * similarity + (1 - vector_weight) * text rank, so exact
+        tokens (invoice numbers, CIFs) the embedding misses still surface.
+        Documents below min_score similarity are kept only if the text matched.
+
+        Returns:
+            List of RAGDocuments with combined scores
+        """
+        conn = get_db()
+        conn.autocommit = False  # see search_by_vector()
+        cursor = get_cursor(conn)
+
+        try:
+            if not self._check_pgvector(cursor):
+                return []
+
+            set_ann_recall(cursor, ef_search, probes)
+            cursor.execute(*build_hybrid_search_query(
+                query, embedding, limit, company_id, source_types,
+                vector_weight=vector_weight, candidates=candidates,
+                tsvector=self._tsvector(cursor),
+            ))
 
             documents = []
             for row in cursor.fetchall():
+                if row['vector_score'] < min_score and not row['text_score']:
+                    continue
                 doc = self._row_to_document(row)
-                doc.score = float(row['score']) if row['score'] else 0.0
+                doc.score = float(row['score'])
                 documents.append(doc)
 
-            logger.debug(f"Text search found {len(documents)} documents")
+            logger.debug(f"Hybrid search found {len(documents)} documents")
             return documents
 
         finally:
+            conn.rollback()
             release_db(conn)
 
     def get_by_source(
@@ -401,6 +705,8 @@ class RAGDocumentRepository:
 
             row = cursor.fetchone()
             conn.commit()
+            if row is not None:
+                rag_cache.invalidate_retrieval()
             return row is not None
 
         except Exception as e:
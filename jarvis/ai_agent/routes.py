@@ -4,8 +4,11 @@ AI Agent Routes
 API endpoints and page routes for AI Agent module.
 """
 
+import json
 from functools import wraps
-from flask import render_template, request, jsonify, redirect, url_for, flash
+from flask import (
+    render_template, request, jsonify, redirect, url_for, flash, Response, stream_with_context,
+)
 from flask_login import login_required, current_user
 
 from core.utils.logging_config import get_logger
@@ -273,7 +276,8 @@ def api_chat():
             },
             "tokens_used": int,
             "cost": str,
-            "response_time_ms": int
+            "response_time_ms": int,
+            "prompt_tokens_saved": int
         }
     """
     service = get_service()
@@ -303,10 +307,86 @@ def api_chat():
         logger.error(f"Chat failed: {result.error}")
         return jsonify({'error': result.error}), 500
 
-    response = result.data
-    msg = response.message
+    return jsonify(_chat_response_json(result.data))
 
-    return jsonify({
+
+@ai_agent_bp.route('/api/chat/stream', methods=['POST'])
+@login_required
+@ai_agent_required
+def api_chat_stream():
+    """
+    API: Send a message and stream the AI response as server-sent events.
+
+    Request body: same as /api/chat.
+
+    Events (each `data:` is JSON):
+        sources   [{"doc_id", "score", "snippet", "source_type"}, ...]
+        delta     {"content": str}   - next piece of the answer
+        done      same body as /api/chat, sent after the message is saved
+        error     {"error": str}
+    """
+    service = get_service()
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'Request body required'}), 400
+
+    conversation_id = data.get('conversation_id')
+    message = data.get('message', '').strip()
+    model_config_id = data.get('model_config_id')
+
+    if not conversation_id:
+        return jsonify({'error': 'conversation_id required'}), 400
+
+    if not message:
+        return jsonify({'error': 'message required'}), 400
+
+    events = service.chat_stream(
+        conversation_id=conversation_id,
+        user_id=current_user.id,
+        user_message=message,
+        model_config_id=model_config_id,
+    )
+
+    def generate():
+        for event, payload in events:
+            if event == 'sources':
+                payload = _rag_sources_json(payload)
+            elif event == 'delta':
+                payload = {'content': payload}
+            elif event == 'done':
+                payload = _chat_response_json(payload)
+            else:
+                logger.error(f"Chat stream failed: {payload}")
+                payload = {'error': payload}
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Don't let a reverse proxy hold the events back
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
+
+def _rag_sources_json(sources) -> list:
+    return [
+        {
+            'doc_id': src.doc_id,
+            'score': src.score,
+            'snippet': src.snippet,
+            'source_type': src.source_type,
+        }
+        for src in sources
+    ]
+
+
+def _chat_response_json(response) -> dict:
+    msg = response.message
+    return {
         'message': {
             'id': msg.id,
             'role': msg.role.value,
@@ -317,19 +397,12 @@ def api_chat():
             'response_time_ms': msg.response_time_ms,
             'created_at': msg.created_at.isoformat() if msg.created_at else None,
         },
-        'rag_sources': [
-            {
-                'doc_id': src.doc_id,
-                'score': src.score,
-                'snippet': src.snippet,
-                'source_type': src.source_type,
-            }
-            for src in response.rag_sources
-        ],
+        'rag_sources': _rag_sources_json(response.rag_sources),
         'tokens_used': response.tokens_used,
         'cost': str(response.cost),
         'response_time_ms': response.response_time_ms,
-    })
+        'prompt_tokens_saved': response.prompt_tokens_saved,
+    }
 
 
 @ai_agent_bp.route('/api/models', methods=['GET'])
@@ -380,16 +453,26 @@ def api_rag_reindex():
     rag_service = RAGService()
 
     data = request.get_json() or {}
+    # limit: null indexes everything; after_id resumes an interrupted run
     limit = data.get('limit', 100)
+    after_id = int(data.get('after_id') or 0)
+    full = bool(data.get('full', False))
 
-    result = rag_service.index_invoices_batch(limit=limit)
+    result = rag_service.index_invoices_batch(limit=limit, after_id=after_id, full=full)
+    progress = result.data or {}
 
     if not result.success:
-        return jsonify({'error': result.error}), 500
+        return jsonify({'error': result.error, 'last_id': progress.get('last_id')}), 500
 
     return jsonify({
         'success': True,
-        'indexed': result.data.get('indexed', 0),
+        'indexed': progress.get('indexed', 0),
+        'unchanged': progress.get('unchanged', 0),
+        'failed': progress.get('failed', 0),
+        'last_id': progress.get('last_id'),
+        'done': progress.get('done', False),
+        'duration_seconds': progress.get('duration_seconds'),
+        'docs_per_sec': progress.get('docs_per_sec'),
     })
 
 
@@ -400,7 +483,8 @@ def api_rag_stats():
     """
     API: Get RAG statistics.
 
-    Returns document counts and capability status.
+    Returns document counts, capability status and query/retrieval cache
+    hit rates.
     """
     from .services import RAGService
     rag_service = RAGService()
@@ -412,4 +496,5 @@ def api_rag_stats():
         'by_source_type': stats.get('by_source_type', {}),
         'has_pgvector': stats.get('has_pgvector', False),
         'has_embeddings': stats.get('has_embeddings', False),
+        'cache': stats.get('cache', {}),
     })
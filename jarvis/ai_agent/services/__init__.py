@@ -5,12 +5,14 @@ Business logic layer for AI Agent module.
 """
 
 from .ai_agent_service import AIAgentService
+from .context_builder import ContextBuilder
 from .embedding_service import EmbeddingService
 from .rag_service import RAGService
 from .security_service import SecurityService
 
 __all__ = [
     'AIAgentService',
+    'ContextBuilder',
     'EmbeddingService',
     'RAGService',
     'SecurityService',
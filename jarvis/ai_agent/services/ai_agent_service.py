@@ -6,14 +6,15 @@ Handles chat requests, context management, and provider coordination.
 """
 
 import time
+from contextlib import closing
 from decimal import Decimal
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 
 from core.utils.logging_config import get_logger
 from ..models import (
     Conversation, Message, MessageRole, ConversationStatus,
     ModelConfig, LLMProvider, ChatResponse, ServiceResult,
-    RAGSource,
+    RAGSource, LLMResponse,
 )
 from ..config import AIAgentConfig
 from ..exceptions import (
@@ -24,6 +25,8 @@ from ..repositories import (
     ConversationRepository, MessageRepository, ModelConfigRepository
 )
 from ..providers import BaseProvider, ClaudeProvider, OpenAIProvider, GroqProvider, GeminiProvider
+from ..tokens import estimate_tokens
+from .context_builder import ContextBuilder
 from .rag_service import RAGService
 
 logger = get_logger('jarvis.ai_agent.service')
@@ -230,148 +233,299 @@ class AIAgentService:
         start_time = time.time()
 
         try:
-            # 1. Get and validate conversation
-            conversation = self.conversation_repo.get_by_id(conversation_id)
-            if not conversation:
-                raise ConversationNotFoundError(conversation_id)
+            prepared = self._prepare_chat(conversation_id, user_id, user_message, model_config_id)
 
-            if conversation.user_id != user_id:
-                raise ConversationNotFoundError(conversation_id)
+            llm_response = prepared['provider'].generate(**prepared['request'])
 
-            # 2. Get model configuration
-            config_id = model_config_id or conversation.model_config_id
-            model_config = None
-            if config_id:
-                model_config = self.model_config_repo.get_by_id(config_id)
+            chat_response = self._complete_chat(prepared, llm_response, start_time)
+            return ServiceResult(success=True, data=chat_response)
 
-            if not model_config:
-                model_config = self.model_config_repo.get_default()
+        except ConversationNotFoundError:
+            return ServiceResult(success=False, error="Conversation not found")
+        except LLMProviderError as e:
+            logger.error(f"LLM provider error: {e}")
+            return ServiceResult(success=False, error=str(e))
+        except Exception as e:
+            logger.error(f"Chat failed: {e}", exc_info=True)
+            return ServiceResult(success=False, error=str(e))
 
-            if not model_config:
-                raise ConfigurationError("No model configuration available")
+    def chat_stream(
+        self,
+        conversation_id: int,
+        user_id: int,
+        user_message: str,
+        model_config_id: Optional[int] = None,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Send a message and stream the AI response as it is generated.
 
-            # 3. Save user message
-            user_msg = Message(
-                conversation_id=conversation_id,
-                role=MessageRole.USER,
-                content=user_message,
-                model_config_id=model_config.id,
-            )
-            saved_user_msg = self.message_repo.create(user_msg)
-
-            # 4. Retrieve RAG context if enabled
-            rag_sources = []
-            rag_context = None
-            if self.config.RAG_ENABLED:
-                try:
-                    rag_sources = self.rag_service.search(
-                        query=user_message,
-                        limit=self.config.RAG_TOP_K,
-                        company_id=None,  # TODO: Get user's company for filtering
-                    )
-                    if rag_sources:
-                        rag_context = self.rag_service.format_context(
-                            rag_sources,
-                            max_tokens=self.config.MAX_CONTEXT_TOKENS // 2,
-                        )
-                        logger.debug(f"RAG found {len(rag_sources)} sources")
-                except Exception as e:
-                    logger.warning(f"RAG retrieval failed: {e}")
-
-            # 5. Build context messages
-            context_messages = self._build_context_messages(
-                conversation_id=conversation_id,
-                current_message=user_message,
-            )
+        Same steps as chat(), but the provider's generate_stream() deltas are
+        passed on as they arrive. The assistant message, cost and conversation
+        stats are saved once the stream completes; if the consumer stops early
+        (client disconnected) the provider stream is closed and nothing more
+        is saved.
 
-            # 6. Get provider and generate response
-            provider = self.get_provider(model_config.provider.value)
+        Args:
+            conversation_id: Conversation ID
+            user_id: User ID (for access control)
+            user_message: User's message text
+            model_config_id: Optional model override
 
-            # Build system prompt with RAG context
-            system_prompt = self._build_system_prompt(rag_context=rag_context)
+        Yields:
+            ('sources', [RAGSource]) before the first token,
+            ('delta', str) for each piece of the answer,
+            ('done', ChatResponse) after the message is saved, or
+            ('error', str) if the chat failed
+        """
+        start_time = time.time()
 
-            llm_response = provider.generate(
-                model_name=model_config.model_name,
-                messages=context_messages,
-                max_tokens=model_config.max_tokens,
-                temperature=float(model_config.default_temperature),
-                system=system_prompt,
-            )
+        try:
+            prepared = self._prepare_chat(conversation_id, user_id, user_message, model_config_id)
+        except ConversationNotFoundError:
+            yield 'error', "Conversation not found"
+            return
+        except Exception as e:
+            logger.error(f"Chat failed: {e}", exc_info=True)
+            yield 'error', str(e)
+            return
+
+        yield 'sources', prepared['rag_sources']
 
-            # 7. Calculate cost
-            cost = self._calculate_cost(
-                model_config=model_config,
-                input_tokens=llm_response.input_tokens,
-                output_tokens=llm_response.output_tokens,
+        parts = []
+        final = None
+        first_token_ms = None
+        try:
+            with closing(prepared['provider'].generate_stream(**prepared['request'])) as stream:
+                for chunk in stream:
+                    if chunk.done:
+                        final = chunk
+                    elif chunk.content:
+                        if first_token_ms is None:
+                            first_token_ms = int((time.time() - start_time) * 1000)
+                        parts.append(chunk.content)
+                        yield 'delta', chunk.content
+
+            content = ''.join(parts)
+            input_tokens = final.input_tokens if final else 0
+            output_tokens = final.output_tokens if final else 0
+            if not input_tokens and not output_tokens:
+                # Stream ended without its usage chunk: estimate so cost is not under-reported
+                logger.warning(
+                    f"Stream for conv={conversation_id} ended without token usage, using estimates"
+                )
+                input_tokens = prepared['prompt'].prompt_tokens
+                output_tokens = estimate_tokens(content)
+
+            llm_response = LLMResponse(
+                content=content,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                model=prepared['request']['model_name'],
+                finish_reason=final.finish_reason if final else None,
             )
+            chat_response = self._complete_chat(prepared, llm_response, start_time)
+            logger.debug(f"Streamed chat: conv={conversation_id}, first_token={first_token_ms}ms")
 
-            # 8. Calculate response time
-            response_time_ms = int((time.time() - start_time) * 1000)
-
-            # 9. Format RAG sources for storage
-            rag_sources_data = [
-                {
-                    'doc_id': src.doc_id,
-                    'score': src.score,
-                    'snippet': src.snippet[:200],  # Truncate for storage
-                    'source_type': src.source_type,
-                    'source_id': src.source_id,
-                }
-                for src in rag_sources
-            ]
+        except LLMProviderError as e:
+            logger.error(f"LLM provider error: {e}")
+            yield 'error', str(e)
+            return
+        except Exception as e:
+            logger.error(f"Chat failed: {e}", exc_info=True)
+            yield 'error', str(e)
+            return
 
-            # 10. Save assistant message
-            assistant_msg = Message(
-                conversation_id=conversation_id,
-                role=MessageRole.ASSISTANT,
-                content=llm_response.content,
-                input_tokens=llm_response.input_tokens,
-                output_tokens=llm_response.output_tokens,
-                cost=cost,
-                model_config_id=model_config.id,
-                response_time_ms=response_time_ms,
-                rag_sources=rag_sources_data,
-            )
-            saved_assistant_msg = self.message_repo.create(assistant_msg)
+        yield 'done', chat_response
 
-            # 11. Update conversation stats
-            total_tokens = llm_response.input_tokens + llm_response.output_tokens
-            self.conversation_repo.update_stats(
-                conversation_id=conversation_id,
-                tokens=total_tokens,
-                cost=cost,
-                messages=2,  # User + assistant messages
-            )
+    def _prepare_chat(
+        self,
+        conversation_id: int,
+        user_id: int,
+        user_message: str,
+        model_config_id: Optional[int],
+    ) -> Dict[str, Any]:
+        """
+        Chat steps up to the LLM call: access check, model config, user
+        message, RAG context and prompt.
 
-            # 12. Auto-generate title if first message
-            if conversation.message_count == 0:
-                self._auto_title_conversation(conversation_id, user_message)
+        Returns:
+            Dict with conversation, model_config, provider, rag_sources,
+            user_message, prompt (PromptContext) and request (the
+            generate() / generate_stream() arguments)
 
-            logger.info(
-                f"Chat completed: conv={conversation_id}, "
-                f"tokens={total_tokens}, cost={cost}, time={response_time_ms}ms, "
-                f"rag_sources={len(rag_sources)}"
-            )
+        Raises:
+            ConversationNotFoundError: If missing or not the user's
+            ConfigurationError: If no model configuration is available
+        """
+        # 1. Get and validate conversation
+        conversation = self.conversation_repo.get_by_id(conversation_id)
+        if not conversation:
+            raise ConversationNotFoundError(conversation_id)
 
-            # 13. Build response
-            chat_response = ChatResponse(
-                message=saved_assistant_msg,
-                rag_sources=rag_sources,
-                tokens_used=total_tokens,
-                cost=cost,
-                response_time_ms=response_time_ms,
-            )
+        if conversation.user_id != user_id:
+            raise ConversationNotFoundError(conversation_id)
 
-            return ServiceResult(success=True, data=chat_response)
+        # 2. Get model configuration
+        config_id = model_config_id or conversation.model_config_id
+        model_config = None
+        if config_id:
+            model_config = self.model_config_repo.get_by_id(config_id)
 
-        except ConversationNotFoundError:
-            return ServiceResult(success=False, error="Conversation not found")
-        except LLMProviderError as e:
-            logger.error(f"LLM provider error: {e}")
-            return ServiceResult(success=False, error=str(e))
-        except Exception as e:
-            logger.error(f"Chat failed: {e}", exc_info=True)
-            return ServiceResult(success=False, error=str(e))
+        if not model_config:
+            model_config = self.model_config_repo.get_default()
+
+        if not model_config:
+            raise ConfigurationError("No model configuration available")
+
+        # 3. Save user message
+        user_msg = Message(
+            conversation_id=conversation_id,
+            role=MessageRole.USER,
+            content=user_message,
+            model_config_id=model_config.id,
+        )
+        self.message_repo.create(user_msg)
+
+        # 4. Retrieve RAG sources if enabled
+        rag_sources = []
+        if self.config.RAG_ENABLED:
+            try:
+                rag_sources = self.rag_service.search(
+                    query=user_message,
+                    limit=self.config.RAG_TOP_K,
+                    company_id=None,  # TODO: Get user's company for filtering
+                )
+                logger.debug(f"RAG found {len(rag_sources)} sources")
+            except Exception as e:
+                logger.warning(f"RAG retrieval failed: {e}")
+
+        # 5. Pack system prompt, RAG context, summary and history into the token budget
+        provider = self.get_provider(model_config.provider.value)
+        prompt = self._context_builder().build(
+            conversation=conversation,
+            current_message=user_msg,
+            rag_sources=rag_sources,
+            provider=provider,
+            model_config=model_config,
+        )
+
+        # 6. Build the provider request
+        return {
+            'conversation_id': conversation_id,
+            'conversation': conversation,
+            'model_config': model_config,
+            'provider': provider,
+            'rag_sources': rag_sources,
+            'user_message': user_message,
+            'prompt': prompt,
+            'request': {
+                'model_name': model_config.model_name,
+                'messages': prompt.messages,
+                'max_tokens': model_config.max_tokens,
+                'temperature': float(model_config.default_temperature),
+                'system': prompt.system,
+            },
+        }
+
+    def _complete_chat(
+        self,
+        prepared: Dict[str, Any],
+        llm_response: LLMResponse,
+        start_time: float,
+    ) -> ChatResponse:
+        """
+        Chat steps after the LLM call: cost, assistant message, conversation
+        stats and title.
+
+        Args:
+            prepared: Result of _prepare_chat()
+            llm_response: Complete (or fully streamed) LLM response
+            start_time: time.time() when the request started
+
+        Returns:
+            ChatResponse
+        """
+        conversation = prepared['conversation']
+        model_config = prepared['model_config']
+        rag_sources = prepared['rag_sources']
+        conversation_id = prepared['conversation_id']
+
+        prompt = prepared['prompt']
+
+        # 7. Calculate cost
+        cost = self._calculate_cost(
+            model_config=model_config,
+            input_tokens=llm_response.input_tokens,
+            output_tokens=llm_response.output_tokens,
+        )
+        summary_tokens = prompt.summary_input_tokens + prompt.summary_output_tokens
+        summary_cost = self._calculate_cost(
+            model_config=model_config,
+            input_tokens=prompt.summary_input_tokens,
+            output_tokens=prompt.summary_output_tokens,
+        )
+
+        # 8. Calculate response time
+        response_time_ms = int((time.time() - start_time) * 1000)
+
+        # 9. Format RAG sources for storage
+        rag_sources_data = [
+            {
+                'doc_id': src.doc_id,
+                'score': src.score,
+                'snippet': src.snippet[:200],  # Truncate for storage
+                'source_type': src.source_type,
+                'source_id': src.source_id,
+            }
+            for src in rag_sources
+        ]
+
+        # 10. Save assistant message
+        assistant_msg = Message(
+            conversation_id=conversation_id,
+            role=MessageRole.ASSISTANT,
+            content=llm_response.content,
+            input_tokens=llm_response.input_tokens,
+            output_tokens=llm_response.output_tokens,
+            cost=cost,
+            model_config_id=model_config.id,
+            response_time_ms=response_time_ms,
+            rag_sources=rag_sources_data,
+            content_tokens=llm_response.output_tokens or None,
+        )
+        saved_assistant_msg = self.message_repo.create(assistant_msg)
+
+        # 11. Update conversation stats (including a summary refresh this turn)
+        total_tokens = llm_response.input_tokens + llm_response.output_tokens + summary_tokens
+        total_cost = cost + summary_cost
+        self.conversation_repo.update_stats(
+            conversation_id=conversation_id,
+            tokens=total_tokens,
+            cost=total_cost,
+            messages=2,  # User + assistant messages
+        )
+
+        # 12. Auto-generate title if first message
+        if conversation.message_count == 0:
+            self._auto_title_conversation(conversation_id, prepared['user_message'])
+
+        logger.info(
+            f"Chat completed: conv={conversation_id}, "
+            f"tokens={total_tokens}, cost={total_cost}, time={response_time_ms}ms, "
+            f"rag_sources={len(rag_sources)}, prompt_tokens={prompt.prompt_tokens}, "
+            f"prompt_tokens_saved={prompt.tokens_saved}, history={prompt.history_messages}, "
+            f"summary={prompt.summary_used}"
+        )
+
+        # 13. Build response
+        return ChatResponse(
+            message=saved_assistant_msg,
+            rag_sources=rag_sources,
+            tokens_used=total_tokens,
+            cost=total_cost,
+            response_time_ms=response_time_ms,
+            prompt_tokens_saved=prompt.tokens_saved,
+        )
 
     def archive_conversation(
         self,
@@ -458,54 +612,27 @@ class AIAgentService:
             logger.error(f"Failed to get available models: {e}")
             return ServiceResult(success=False, error=str(e))
 
-    def _build_context_messages(
-        self,
-        conversation_id: int,
-        current_message: str,
-    ) -> List[Dict[str, str]]:
-        """
-        Build message context for LLM call.
-
-        Includes recent conversation history up to token limit.
-
-        Args:
-            conversation_id: Conversation ID
-            current_message: Current user message
-
-        Returns:
-            List of message dicts for LLM
-        """
-        # Get recent messages for context
-        recent_messages = self.message_repo.get_recent_for_context(
-            conversation_id=conversation_id,
-            limit=self.config.MAX_CONTEXT_MESSAGES,
+    def _context_builder(self) -> ContextBuilder:
+        """Context builder over this service's repositories and prompt."""
+        return ContextBuilder(
+            config=self.config,
+            message_repo=self.message_repo,
+            conversation_repo=self.conversation_repo,
+            rag_service=self.rag_service,
+            system_prompt=self._build_system_prompt,
         )
 
-        # Convert to LLM format
-        context = []
-        for msg in recent_messages:
-            context.append({
-                'role': msg.role.value,
-                'content': msg.content,
-            })
-
-        # Add current message
-        context.append({
-            'role': 'user',
-            'content': current_message,
-        })
-
-        return context
-
     def _build_system_prompt(
         self,
         rag_context: Optional[str] = None,
+        summary: Optional[str] = None,
     ) -> str:
         """
         Build system prompt for LLM.
 
         Args:
             rag_context: Optional RAG context to include
+            summary: Optional summary of earlier conversation turns
 
         Returns:
             Complete system prompt
@@ -521,6 +648,12 @@ Guidelines:
 - Use Romanian language conventions for dates and numbers when appropriate
 - Format currency values with appropriate symbols (RON, EUR, USD)"""
 
+        if summary:
+            base_prompt = f"""{base_prompt}
+
+EARLIER IN THIS CONVERSATION (summary):
+{summary}"""
+
         if rag_context:
             return f"""{base_prompt}
 
@@ -0,0 +1,316 @@
+"""
+Context Builder
+
+Packs the prompt of a chat turn into the MAX_CONTEXT_TOKENS budget:
+system prompt, RAG context, a rolling summary of older turns and as much
+recent history as fits. Turns that fall out of the budget are folded into
+the summary, stored in conversation metadata, instead of being dropped.
+"""
+
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+from core.utils.logging_config import get_logger
+from ..models import (
+    Conversation, Message, MessageRole, ModelConfig, PromptContext, RAGSource,
+)
+from ..config import AIAgentConfig
+from ..providers import BaseProvider
+from ..tokens import MESSAGE_OVERHEAD_TOKENS, estimate_tokens, estimate_message_tokens
+
+logger = get_logger('jarvis.ai_agent.context')
+
+# conversations.metadata key of the rolling summary:
+# {text, through_id, tokens, source_tokens, messages}
+SUMMARY_KEY = 'context_summary'
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a conversation between a user and JARVIS, an assistant for an enterprise platform (invoices, transactions, company data).
+
+Keep facts the user may refer back to: names, companies, invoice numbers, amounts, dates, decisions and open questions. Write in the language of the conversation. Answer with the summary only."""
+
+SUMMARY_PROMPT = """Update the summary with the new messages, in at most {words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{transcript}"""
+
+
+class ContextBuilder:
+    """
+    Builds the token-budgeted prompt for one chat turn.
+
+    Budget order: system prompt and current message (always sent), RAG
+    context (up to half the budget), rolling summary, then history newest
+    first. When history no longer fits, the oldest turns are summarized down
+    to half the history budget, so the summary is refreshed every few turns
+    rather than on every turn.
+    """
+
+    def __init__(
+        self,
+        config: AIAgentConfig,
+        message_repo,
+        conversation_repo,
+        rag_service,
+        system_prompt: Callable[[Optional[str], Optional[str]], str],
+    ):
+        """
+        Initialize context builder.
+
+        Args:
+            config: AIAgentConfig with the context budget settings
+            message_repo: MessageRepository for history
+            conversation_repo: ConversationRepository for the stored summary
+            rag_service: RAGService to format RAG context
+            system_prompt: Builds the system prompt from (rag_context, summary)
+        """
+        self.config = config
+        self.message_repo = message_repo
+        self.conversation_repo = conversation_repo
+        self.rag_service = rag_service
+        self.system_prompt = system_prompt
+
+    def build(
+        self,
+        conversation: Conversation,
+        current_message: Message,
+        rag_sources: List[RAGSource],
+        provider: BaseProvider,
+        model_config: ModelConfig,
+    ) -> PromptContext:
+        """
+        Build the prompt for the current user message.
+
+        Args:
+            conversation: Conversation (metadata holds the summary)
+            current_message: Saved user message of this turn
+            rag_sources: Retrieved RAG sources (may be empty)
+            provider: Provider used to refresh the summary
+            model_config: Model used to refresh the summary
+
+        Returns:
+            PromptContext with messages, system prompt and token accounting
+        """
+        budget = self.config.MAX_CONTEXT_TOKENS
+        current = {'role': MessageRole.USER.value, 'content': current_message.content}
+        base_tokens = estimate_tokens(self.system_prompt(None, None))
+        fixed_tokens = base_tokens + estimate_message_tokens(current)
+
+        # RAG context: its usual half of the budget, less if the question is huge
+        rag_budget = min(budget // 2, budget - fixed_tokens)
+        rag_context = self._format_rag(rag_sources, rag_budget)
+        rag_tokens = self._section_tokens(base_tokens, rag_context=rag_context)
+
+        summary = dict((conversation.metadata or {}).get(SUMMARY_KEY) or {})
+        earlier_tokens = summary.get('source_tokens', 0)
+
+        limit = self.config.CONTEXT_HISTORY_FETCH_LIMIT
+        history = self.message_repo.get_recent_for_context(
+            conversation_id=conversation.id,
+            limit=limit,
+            after_id=summary.get('through_id'),
+            before_id=current_message.id,
+        )
+        self._cache_token_counts(history)
+
+        # A full window means older unsummarized messages (e.g. a conversation
+        # from before summaries existed): fold them in before packing
+        backlog = []
+        backlog_folded = True
+        usage = (0, 0)
+        if history and len(history) >= limit and self.config.CONTEXT_SUMMARY_ENABLED:
+            backlog = self._fetch_backlog(conversation, summary.get('through_id'), history[0].id)
+            self._cache_token_counts(backlog)
+            try:
+                for start in range(0, len(backlog), limit):
+                    summary, page_usage = self._summarize(
+                        conversation, summary, backlog[start:start + limit], provider, model_config)
+                    usage = (usage[0] + page_usage[0], usage[1] + page_usage[1])
+            except Exception as e:
+                # The backlog is left out of this prompt; the next turn retries.
+                # Newer turns are not summarized either, so through_id never skips it
+                backlog_folded = False
+                logger.warning(f"Conversation backlog summary failed for conv={conversation.id}: {e}")
+
+        summary_tokens = self._section_tokens(base_tokens, summary=summary.get('text'))
+        available = budget - fixed_tokens - rag_tokens - summary_tokens
+        kept, dropped = self._pack(history, available, self.config.MAX_CONTEXT_MESSAGES)
+
+        if dropped and backlog_folded and self.config.CONTEXT_SUMMARY_ENABLED:
+            # Summarize down to half the history budget so the next turns fit as-is
+            target = (available + summary_tokens - self.config.CONTEXT_SUMMARY_MAX_TOKENS) // 2
+            refit, older = self._pack(history, target, max(2, self.config.MAX_CONTEXT_MESSAGES // 2))
+            try:
+                if not older:
+                    raise ValueError("nothing left to summarize")
+                summary, refresh_usage = self._summarize(conversation, summary, older, provider, model_config)
+                usage = (usage[0] + refresh_usage[0], usage[1] + refresh_usage[1])
+                kept = refit
+            except Exception as e:
+                # Older turns are left out of this prompt; the next turn retries
+                logger.warning(f"Conversation summary failed for conv={conversation.id}: {e}")
+
+        messages = [{'role': m.role.value, 'content': m.content} for m in kept]
+        messages.append(current)
+        system = self.system_prompt(rag_context, summary.get('text'))
+        prompt_tokens = estimate_tokens(system) + sum(estimate_message_tokens(m) for m in messages)
+
+        # What this turn would send with every message verbatim and full RAG context
+        if rag_budget != budget // 2:
+            rag_tokens = self._section_tokens(base_tokens, rag_context=self._format_rag(rag_sources, budget // 2))
+        unbudgeted_tokens = (
+            fixed_tokens + rag_tokens
+            + earlier_tokens
+            + sum(self._message_tokens(m) for m in backlog)
+            + sum(self._message_tokens(m) for m in history)
+        )
+
+        return PromptContext(
+            messages=messages,
+            system=system,
+            prompt_tokens=prompt_tokens,
+            unbudgeted_tokens=unbudgeted_tokens,
+            history_messages=len(kept),
+            summary_used=bool(summary.get('text')),
+            summary_input_tokens=usage[0],
+            summary_output_tokens=usage[1],
+        )
+
+    def _format_rag(self, rag_sources: List[RAGSource], max_tokens: int) -> Optional[str]:
+        if not rag_sources or max_tokens <= 0:
+            return None
+        return self.rag_service.format_context(rag_sources, max_tokens=max_tokens) or None
+
+    def _section_tokens(self, base_tokens: int, rag_context: Optional[str] = None,
+                        summary: Optional[str] = None) -> int:
+        """Tokens a RAG context or summary section adds to the system prompt."""
+        if not rag_context and not summary:
+            return 0
+        return max(0, estimate_tokens(self.system_prompt(rag_context, summary)) - base_tokens)
+
+    def _message_tokens(self, message: Message) -> int:
+        return message.content_tokens + MESSAGE_OVERHEAD_TOKENS
+
+    def _cache_token_counts(self, messages: List[Message]) -> None:
+        """Count tokens of messages saved before content_tokens existed, and store them."""
+        missing = {}
+        for message in messages:
+            if message.content_tokens is None:
+                message.content_tokens = estimate_tokens(message.content)
+                if message.id is not None:
+                    missing[message.id] = message.content_tokens
+
+        if missing:
+            try:
+                self.message_repo.set_content_tokens(missing)
+            except Exception as e:
+                logger.warning(f"Failed to store message token counts: {e}")
+
+    def _fetch_backlog(
+        self,
+        conversation: Conversation,
+        after_id: Optional[int],
+        before_id: int,
+    ) -> List[Message]:
+        """
+        Read every message between the summary and the fetched window, a
+        CONTEXT_HISTORY_FETCH_LIMIT page at a time, in chronological order.
+        """
+        limit = self.config.CONTEXT_HISTORY_FETCH_LIMIT
+        pages = []
+        while True:
+            page = self.message_repo.get_recent_for_context(
+                conversation_id=conversation.id,
+                limit=limit,
+                after_id=after_id,
+                before_id=before_id,
+            )
+            if not page:
+                break
+            pages.append(page)
+            if len(page) < limit:
+                break
+            before_id = page[0].id
+
+        return [m for page in reversed(pages) for m in page]
+
+    def _pack(
+        self,
+        history: List[Message],
+        available: int,
+        max_messages: int,
+    ) -> Tuple[List[Message], List[Message]]:
+        """
+        Split chronological history into (kept, older): the newest messages
+        that fit in `available` tokens, and everything before them.
+        """
+        kept = []
+        used = 0
+        for message in reversed(history):
+            tokens = self._message_tokens(message)
+            if len(kept) >= max_messages or used + tokens > available:
+                break
+            kept.append(message)
+            used += tokens
+        kept.reverse()
+
+        # History sent to the provider must open with a user turn
+        while kept and kept[0].role != MessageRole.USER:
+            kept.pop(0)
+
+        return kept, history[:len(history) - len(kept)]
+
+    def _summarize(
+        self,
+        conversation: Conversation,
+        summary: Dict[str, Any],
+        older: List[Message],
+        provider: BaseProvider,
+        model_config: ModelConfig,
+    ) -> Tuple[Dict[str, Any], Tuple[int, int]]:
+        """
+        Fold older messages into the rolling summary and store it.
+
+        Returns:
+            (new summary, (input_tokens, output_tokens) of the summary call)
+        """
+        # Each message gets an equal share of the budget in the summary request
+        max_chars = max(200, self.config.MAX_CONTEXT_TOKENS * 4 // len(older))
+        transcript = "\n".join(
+            f"{m.role.value}: {m.content[:max_chars]}" for m in older
+        )
+
+        response = provider.generate(
+            model_name=model_config.model_name,
+            messages=[{
+                'role': MessageRole.USER.value,
+                'content': SUMMARY_PROMPT.format(
+                    words=self.config.CONTEXT_SUMMARY_MAX_TOKENS * 3 // 4,
+                    summary=summary.get('text') or '(none yet)',
+                    transcript=transcript,
+                ),
+            }],
+            max_tokens=self.config.CONTEXT_SUMMARY_MAX_TOKENS,
+            temperature=0.2,
+            system=SUMMARY_SYSTEM_PROMPT,
+        )
+        text = (response.content or '').strip()
+        if not text:
+            raise ValueError("empty summary")
+
+        new_summary = {
+            'text': text,
+            'through_id': older[-1].id,
+            'tokens': estimate_tokens(text),
+            'source_tokens': summary.get('source_tokens', 0) + sum(self._message_tokens(m) for m in older),
+            'messages': summary.get('messages', 0) + len(older),
+        }
+        self.conversation_repo.update_metadata(conversation.id, {SUMMARY_KEY: new_summary})
+        conversation.metadata = {**(conversation.metadata or {}), SUMMARY_KEY: new_summary}
+
+        logger.debug(
+            f"Summarized {len(older)} messages of conv={conversation.id} "
+            f"through message {new_summary['through_id']}"
+        )
+        return new_summary, (response.input_tokens, response.output_tokens)
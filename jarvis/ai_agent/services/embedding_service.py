@@ -12,6 +12,7 @@ import hashlib
 import openai
 
 from core.utils.logging_config import get_logger
+from .. import rag_cache
 from ..config import AIAgentConfig
 from ..exceptions import EmbeddingError, ConfigurationError
 
@@ -64,7 +65,7 @@ class EmbeddingService:
             client = self._get_client()
 
             response = client.embeddings.create(
-                model=self.config.embedding_model,
+                model=self.config.RAG_EMBEDDING_MODEL,
                 input=text,
             )
 
@@ -85,6 +86,29 @@ class EmbeddingService:
             logger.error(f"Failed to generate embedding: {e}")
             raise EmbeddingError(f"Embedding generation failed: {e}")
 
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Generate the embedding for a search query, through the query cache.
+
+        Repeated (or case/whitespace-variant) questions reuse the cached
+        vector for the configured model instead of calling the API again.
+
+        Args:
+            query: Search query
+
+        Returns:
+            Embedding vector
+
+        Raises:
+            EmbeddingError: If embedding generation fails
+        """
+        model = self.config.RAG_EMBEDDING_MODEL
+        embedding = rag_cache.get_query_embedding(model, query)
+        if embedding is None:
+            embedding = self.generate_embedding(query)
+            rag_cache.set_query_embedding(model, query, embedding)
+        return embedding
+
     def generate_embeddings_batch(
         self,
         texts: List[str],
@@ -123,7 +147,7 @@ class EmbeddingService:
                     continue
 
                 response = client.embeddings.create(
-                    model=self.config.embedding_model,
+                    model=self.config.RAG_EMBEDDING_MODEL,
                     input=valid_texts,
                 )
 
@@ -5,11 +5,14 @@ Retrieval Augmented Generation service for semantic search and context retrieval
 Indexes JARVIS data (invoices, transactions, etc.) for AI queries.
 """
 
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Any
 from decimal import Decimal
 
 from core.database import get_db, get_cursor, release_db
 from core.utils.logging_config import get_logger
+from .. import rag_cache
 from ..models import RAGDocument, RAGSourceType, RAGSource, ServiceResult
 from ..config import AIAgentConfig
 from ..exceptions import RAGError
@@ -53,17 +56,22 @@ class RAGService:
         limit: int = 5,
         company_id: Optional[int] = None,
         source_types: Optional[List[RAGSourceType]] = None,
+        mode: Optional[str] = None,
     ) -> List[RAGSource]:
         """
         Search for relevant documents.
 
-        Uses vector similarity if available, otherwise text search.
+        'hybrid' ranks by vector similarity and text rank combined, 'vector'
+        by similarity only; both need pgvector and embeddings and fall back to
+        text search when unavailable or empty. Query embeddings and results
+        are cached (see rag_cache); results until rag_documents next change.
 
         Args:
             query: Search query
             limit: Maximum results
             company_id: Optional company filter for access control
             source_types: Optional source type filter
+            mode: 'hybrid', 'vector' or 'text' (default RAG_SEARCH_MODE)
 
         Returns:
             List of RAGSource results with scores
@@ -71,28 +79,74 @@ class RAGService:
         if not query or not query.strip():
             return []
 
+        mode = mode or self.config.RAG_SEARCH_MODE
+
         try:
             # Check pgvector availability
             if self._has_pgvector is None:
                 self._has_pgvector = self.document_repo.has_pgvector()
 
+            # Embed the query (cached per model and normalized text)
+            query_embedding = None
+            if mode != 'text' and self._has_pgvector and self._has_embeddings:
+                try:
+                    query_embedding = self.embedding_service.embed_query(query)
+                except Exception as e:
+                    logger.warning(f"Query embedding failed, falling back to text: {e}")
+
+            ann = {
+                'ef_search': self.config.RAG_HNSW_EF_SEARCH,
+                'probes': self.config.RAG_IVFFLAT_PROBES,
+            }
+            cache_key = rag_cache.retrieval_key(
+                query, query_embedding,
+                mode=mode if query_embedding is not None else 'text',
+                limit=limit,
+                company_id=company_id,
+                source_types=sorted(st.value for st in source_types or []),
+                vector_weight=self.config.RAG_HYBRID_VECTOR_WEIGHT,
+                candidates=self.config.RAG_HYBRID_CANDIDATES,
+                min_score=self.config.RAG_MIN_SIMILARITY,
+                **ann,
+            )
+            cached = rag_cache.get_retrieval(cache_key)
+            if cached is not None:
+                logger.debug(f"Retrieval cache hit ({len(cached)} results)")
+                return list(cached)
+
             documents = []
+            cacheable = True
 
-            # Try vector search first
-            if self._has_pgvector and self._has_embeddings:
+            # Try vector (or hybrid) search first
+            if query_embedding is not None:
                 try:
-                    query_embedding = self.embedding_service.generate_embedding(query)
-                    documents = self.document_repo.search_by_vector(
-                        embedding=query_embedding,
-                        limit=limit,
-                        company_id=company_id,
-                        source_types=source_types,
-                        min_score=self.config.rag_min_similarity,
-                    )
-                    logger.debug(f"Vector search returned {len(documents)} results")
+                    if mode == 'hybrid':
+                        documents = self.document_repo.search_hybrid(
+                            query=query,
+                            embedding=query_embedding,
+                            limit=limit,
+                            company_id=company_id,
+                            source_types=source_types,
+                            vector_weight=self.config.RAG_HYBRID_VECTOR_WEIGHT,
+                            candidates=self.config.RAG_HYBRID_CANDIDATES,
+                            min_score=self.config.RAG_MIN_SIMILARITY,
+                            **ann,
+                        )
+                    else:
+                        documents = self.document_repo.search_by_vector(
+                            embedding=query_embedding,
+                            limit=limit,
+                            company_id=company_id,
+                            source_types=source_types,
+                            min_score=self.config.RAG_MIN_SIMILARITY,
+                            **ann,
+                        )
+                    logger.debug(f"{mode.capitalize()} search returned {len(documents)} results")
                 except Exception as e:
-                    logger.warning(f"Vector search failed, falling back to text: {e}")
+                    logger.warning(f"{mode.capitalize()} search failed, falling back to text: {e}")
                     documents = []
+                    # Don't serve the fallback for this key once the index is back
+                    cacheable = False
 
             # Fallback to text search
             if not documents:
@@ -105,7 +159,7 @@ class RAGService:
                 logger.debug(f"Text search returned {len(documents)} results")
 
             # Convert to RAGSource format
-            return [
+            sources = [
                 RAGSource(
                     doc_id=doc.id,
                     score=doc.score,
@@ -116,6 +170,9 @@ class RAGService:
                 )
                 for doc in documents
             ]
+            if cacheable:
+                rag_cache.set_retrieval(cache_key, sources)
+            return list(sources)
 
         except Exception as e:
             logger.error(f"RAG search failed: {e}")
@@ -212,13 +269,7 @@ class RAGService:
                 return ServiceResult(success=True, data=existing)
 
             # Build metadata
-            metadata = {
-                'invoice_number': invoice_data.get('invoice_number'),
-                'supplier': invoice_data.get('supplier'),
-                'date': str(invoice_data.get('invoice_date', '')),
-                'amount': str(invoice_data.get('invoice_value', '')),
-                'currency': invoice_data.get('currency', 'RON'),
-            }
+            metadata = self._build_invoice_metadata(invoice_data)
 
             # Generate embedding if available
             embedding = None
@@ -260,50 +311,181 @@ class RAGService:
 
     def index_invoices_batch(
         self,
-        limit: int = 100,
+        limit: Optional[int] = 100,
+        after_id: int = 0,
+        full: bool = False,
     ) -> ServiceResult:
         """
-        Index multiple invoices in batch.
+        Index invoices that are new or changed since they were last indexed.
+
+        Invoices are processed in id order, REINDEX_BATCH_SIZE at a time. Each
+        batch is fetched with one query (joined to its current document),
+        invoices whose content hash still matches are skipped, the rest are
+        embedded EMBEDDING_BATCH_SIZE texts per API call with up to
+        EMBEDDING_CONCURRENCY calls in flight, and the batch is written with
+        one bulk upsert. Batches commit independently, so an interrupted run
+        resumes by calling again (optionally with after_id=last_id).
 
         Args:
-            limit: Maximum invoices to process
+            limit: Maximum invoices to process (None for all)
+            after_id: Only process invoices with a higher id
+            full: Check every invoice, not only those updated since indexing
 
         Returns:
-            ServiceResult with count of indexed invoices
+            ServiceResult with indexed/unchanged/failed counts, last_id,
+            done and docs_per_sec
         """
+        started = time.monotonic()
+        progress = {
+            'processed': 0,
+            'indexed': 0,
+            'unchanged': 0,
+            'failed': 0,
+            'last_id': after_id,
+            'done': False,
+        }
+
+        def finish(success: bool, error: Optional[str] = None) -> ServiceResult:
+            duration = time.monotonic() - started
+            progress['duration_seconds'] = round(duration, 2)
+            progress['docs_per_sec'] = round(progress['processed'] / duration, 1) if duration else 0.0
+            return ServiceResult(success=success, data=progress, error=error)
+
         try:
-            conn = get_db()
-            cursor = get_cursor(conn)
+            with_embeddings = self._has_embeddings and self.document_repo.has_pgvector()
+
+            while limit is None or progress['processed'] < limit:
+                batch_size = self.config.REINDEX_BATCH_SIZE
+                if limit is not None:
+                    batch_size = min(batch_size, limit - progress['processed'])
+
+                rows = self._fetch_invoices_for_indexing(progress['last_id'], batch_size, full)
+                if rows:
+                    counts = self._index_invoice_rows(rows, with_embeddings)
+                    for key, value in counts.items():
+                        progress[key] += value
+                    progress['processed'] += len(rows)
+                    progress['last_id'] = rows[-1]['id']
+                if len(rows) < batch_size:
+                    progress['done'] = True
+                    break
 
-            # Get invoices not yet indexed or with changed content
-            cursor.execute("""
-                SELECT i.id, i.company_id
+        except Exception as e:
+            logger.error(f"Batch indexing failed after invoice {progress['last_id']}: {e}")
+            return finish(False, str(e))
+
+        result = finish(True)
+        logger.info(
+            f"Batch indexed {progress['indexed']} invoices ({progress['unchanged']} unchanged, "
+            f"{progress['failed']} failed) in {progress['duration_seconds']}s, "
+            f"{progress['docs_per_sec']} docs/sec"
+        )
+        return result
+
+    def _fetch_invoices_for_indexing(
+        self,
+        after_id: int,
+        limit: int,
+        full: bool = False,
+    ) -> List[Dict]:
+        """
+        Fetch the next invoices to index with their current document, in one query.
+
+        Without full, only invoices never indexed or updated since their
+        document was written are returned.
+        """
+        stale_filter = '' if full else 'AND (r.id IS NULL OR r.updated_at < i.updated_at)'
+
+        conn = get_db()
+        cursor = get_cursor(conn)
+
+        try:
+            cursor.execute(f"""
+                SELECT i.*, c.id as company_id,
+                       r.id as rag_document_id, r.content_hash as rag_content_hash
                 FROM invoices i
-                LEFT JOIN ai_agent.rag_documents r
-                    ON r.source_type = 'invoice'
-                    AND r.source_id = i.id
-                    AND r.is_active = TRUE
-                WHERE r.id IS NULL
-                   OR r.updated_at < i.updated_at
-                ORDER BY i.updated_at DESC
+                LEFT JOIN companies c ON c.company = i.dedicated_to
+                LEFT JOIN LATERAL (
+                    SELECT d.id, d.content_hash, d.updated_at
+                    FROM ai_agent.rag_documents d
+                    WHERE d.source_type = 'invoice'
+                      AND d.source_id = i.id
+                      AND d.is_active = TRUE
+                    ORDER BY d.id DESC
+                    LIMIT 1
+                ) r ON TRUE
+                WHERE i.id > %s
+                  {stale_filter}
+                ORDER BY i.id
                 LIMIT %s
-            """, (limit,))
+            """, (after_id, limit))
+
+            return cursor.fetchall()
 
-            invoices = cursor.fetchall()
+        finally:
             release_db(conn)
 
-            indexed = 0
-            for inv in invoices:
-                result = self.index_invoice(inv['id'], inv['company_id'])
-                if result.success:
-                    indexed += 1
+    def _index_invoice_rows(self, rows: List[Dict], with_embeddings: bool) -> Dict[str, int]:
+        """Build, embed and upsert documents for one batch of fetched invoices."""
+        documents = []
+        unchanged_ids = []
 
-            logger.info(f"Batch indexed {indexed} invoices")
-            return ServiceResult(success=True, data={'indexed': indexed})
+        for row in rows:
+            content = self._build_invoice_content(row)
+            content_hash = self.embedding_service.compute_content_hash(content)
 
-        except Exception as e:
-            logger.error(f"Batch indexing failed: {e}")
-            return ServiceResult(success=False, error=str(e))
+            if row.get('rag_document_id') and row.get('rag_content_hash') == content_hash:
+                unchanged_ids.append(row['rag_document_id'])
+                continue
+
+            documents.append(RAGDocument(
+                id=row.get('rag_document_id'),
+                source_type=RAGSourceType.INVOICE,
+                source_id=row['id'],
+                source_table='invoices',
+                content=content,
+                content_hash=content_hash,
+                metadata=self._build_invoice_metadata(row),
+                company_id=row.get('company_id'),
+            ))
+
+        failed = 0
+        if with_embeddings and documents:
+            embedded = self._embed_documents(documents)
+            failed = len(documents) - len(embedded)
+            documents = embedded
+
+        self.document_repo.bulk_upsert(documents, unchanged_ids)
+        return {'indexed': len(documents), 'unchanged': len(unchanged_ids), 'failed': failed}
+
+    def _embed_documents(self, documents: List[RAGDocument]) -> List[RAGDocument]:
+        """
+        Set embeddings on documents, several API calls at a time.
+
+        Documents in a chunk whose call fails are left out (and not written),
+        so they stay stale and the next run retries them.
+        """
+        size = max(1, self.config.EMBEDDING_BATCH_SIZE)
+        chunks = [documents[i:i + size] for i in range(0, len(documents), size)]
+
+        def embed(chunk: List[RAGDocument]) -> List[RAGDocument]:
+            try:
+                embeddings = self.embedding_service.generate_embeddings_batch(
+                    [doc.content for doc in chunk], batch_size=len(chunk)
+                )
+            except Exception as e:
+                logger.warning(f"Failed to generate embeddings for {len(chunk)} documents: {e}")
+                return []
+            if len(embeddings) != len(chunk):
+                logger.warning(f"Expected {len(chunk)} embeddings, got {len(embeddings)}")
+                return []
+            for doc, embedding in zip(chunk, embeddings):
+                doc.embedding = embedding
+            return chunk
+
+        workers = max(1, min(self.config.EMBEDDING_CONCURRENCY, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rag-embed') as executor:
+            return [doc for embedded in executor.map(embed, chunks) for doc in embedded]
 
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -319,6 +501,7 @@ class RAGService:
             'by_source_type': counts,
             'has_pgvector': self.document_repo.has_pgvector(),
             'has_embeddings': self._has_embeddings,
+            'cache': rag_cache.get_stats(),
         }
 
     def _fetch_invoice_data(self, invoice_id: int) -> Optional[Dict]:
@@ -339,6 +522,16 @@ class RAGService:
         finally:
             release_db(conn)
 
+    def _build_invoice_metadata(self, invoice_data: Dict) -> Dict[str, Any]:
+        """Build filterable metadata from invoice data."""
+        return {
+            'invoice_number': invoice_data.get('invoice_number'),
+            'supplier': invoice_data.get('supplier'),
+            'date': str(invoice_data.get('invoice_date', '')),
+            'amount': str(invoice_data.get('invoice_value', '')),
+            'currency': invoice_data.get('currency', 'RON'),
+        }
+
     def _build_invoice_content(self, invoice_data: Dict) -> str:
         """Build searchable content from invoice data."""
         parts = []
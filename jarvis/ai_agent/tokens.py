@@ -0,0 +1,24 @@
+"""
+AI Agent Token Estimates
+
+Token counts for prompt budgeting, without a provider tokenizer.
+Uses the ~4 characters per token rule already applied by
+RAGService.format_context() and the Gemini provider.
+"""
+
+from typing import Dict
+
+# Role and delimiter tokens each chat message adds on top of its content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text (~4 characters per token)."""
+    if not text:
+        return 0
+    return (len(text) + 3) // 4
+
+
+def estimate_message_tokens(message: Dict[str, str]) -> int:
+    """Approximate prompt tokens of one {'role', 'content'} chat message."""
+    return estimate_tokens(message.get('content', '')) + MESSAGE_OVERHEAD_TOKENS
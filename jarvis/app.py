@@ -19,7 +19,8 @@ from services import (
 from accounting.bugetare.invoice_parser import parse_invoice, parse_invoice_with_template_from_bytes, auto_detect_and_parse, generate_template_from_invoice, match_campaigns_with_ai
 from database import (
     get_all_invoices, get_invoice_with_allocations, get_invoices_with_allocations, search_invoices,
-    get_summary_by_company, get_summary_by_department, get_summary_by_brand, get_summary_by_supplier, delete_invoice, update_invoice, save_invoice,
+    get_next_invoice_cursor, iter_all_invoices,
+    get_summary_by_company, get_summary_by_department, get_summary_by_brand, get_brand_split_values, get_summary_by_supplier, delete_invoice, update_invoice, save_invoice,
     update_invoice_allocations,
     get_all_invoice_templates, get_invoice_template, save_invoice_template,
     update_invoice_template, delete_invoice_template,
@@ -30,6 +31,7 @@ from database import (
     get_all_users, get_user, get_user_by_email, save_user, update_user, delete_user, delete_users_bulk,
     get_all_roles, get_role, save_role, update_role, delete_role,
     get_notification_settings, save_notification_settings_bulk, save_notification_setting, get_notification_logs,
+    enqueue_notification, get_notification_outbox_stats,
     get_all_companies, get_company, save_company, update_company, delete_company as delete_company_db,
     get_all_department_structures, get_department_structure, save_department_structure,
     update_department_structure, delete_department_structure, get_unique_departments, get_unique_brands,
@@ -77,6 +79,7 @@ try:
         send_test_email,
         is_smtp_configured
     )
+    from core.services.notification_outbox import get_notification_dispatcher, wake_notification_dispatcher
     NOTIFICATIONS_ENABLED = True
 except ImportError:
     NOTIFICATIONS_ENABLED = False
@@ -756,22 +759,12 @@ def submit_invoice():
             payment_status=data.get('payment_status', 'not_paid'),
             subtract_vat=data.get('subtract_vat', False),
             vat_rate=data.get('vat_rate'),
-            net_value=data.get('net_value')
+            net_value=data.get('net_value'),
+            # Allocation emails are queued with the invoice and sent by the dispatcher
+            notify_allocations=NOTIFICATIONS_ENABLED
         )
-
-        # Send email notifications to responsables
-        notifications_sent = 0
-        if NOTIFICATIONS_ENABLED and is_smtp_configured():
-            invoice_data = {
-                'id': invoice_id,
-                'invoice_number': data['invoice_number'],
-                'supplier': data['supplier'],
-                'invoice_date': data['invoice_date'],
-                'invoice_value': float(data['invoice_value']),
-                'currency': data.get('currency', 'RON'),
-            }
-            results = notify_invoice_allocations(invoice_data, data['distributions'])
-            notifications_sent = sum(1 for r in results if r.get('success'))
+        if NOTIFICATIONS_ENABLED:
+            wake_notification_dispatcher()
 
         # Log the invoice creation
         log_event('invoice_created',
@@ -786,7 +779,7 @@ def submit_invoice():
             'message': f'Successfully saved {len(data["distributions"])} allocation(s)',
             'allocations': len(data['distributions']),
             'invoice_id': invoice_id,
-            'notifications_sent': notifications_sent
+            'notifications_queued': NOTIFICATIONS_ENABLED
         })
 
     except ValueError as e:
@@ -1169,6 +1162,8 @@ def api_db_invoices():
     Query parameters:
     - limit: Max invoices to return (default 100)
     - offset: Pagination offset
+    - cursor: Keyset pagination cursor (empty for the first page). When present,
+      the response is {"invoices": [...], "next_cursor": "..."|null} and offset is ignored
     - company, department, subdepartment, brand: Filter by allocation fields
     - status, payment_status: Filter by invoice status
     - start_date, end_date: Filter by invoice date range
@@ -1188,26 +1183,96 @@ def api_db_invoices():
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     include_allocations = request.args.get('include_allocations', 'false').lower() == 'true'
+    page_cursor = request.args.get('cursor')
 
-    if include_allocations:
-        # Use optimized query that fetches invoices with allocations in single query
-        invoices = get_invoices_with_allocations(
-            limit=limit, offset=offset, company=company,
-            start_date=start_date, end_date=end_date,
-            department=department, subdepartment=subdepartment, brand=brand,
-            status=status, payment_status=payment_status
-        )
-    else:
-        # Original behavior - invoices only, allocations fetched separately
-        invoices = get_all_invoices(
-            limit=limit, offset=offset, company=company,
-            start_date=start_date, end_date=end_date,
-            department=department, subdepartment=subdepartment, brand=brand,
-            status=status, payment_status=payment_status
-        )
+    try:
+        if include_allocations:
+            # Use optimized query that fetches invoices with allocations in single query
+            invoices = get_invoices_with_allocations(
+                limit=limit, offset=offset, company=company,
+                start_date=start_date, end_date=end_date,
+                department=department, subdepartment=subdepartment, brand=brand,
+                status=status, payment_status=payment_status,
+                page_cursor=page_cursor or None
+            )
+        else:
+            # Original behavior - invoices only, allocations fetched separately
+            invoices = get_all_invoices(
+                limit=limit, offset=offset, company=company,
+                start_date=start_date, end_date=end_date,
+                department=department, subdepartment=subdepartment, brand=brand,
+                status=status, payment_status=payment_status,
+                page_cursor=page_cursor or None
+            )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if page_cursor is not None:
+        return jsonify({'invoices': invoices, 'next_cursor': get_next_invoice_cursor(invoices, limit)})
     return jsonify(invoices)
 
 
+INVOICE_EXPORT_HEADERS = ['Date', 'Supplier', 'Invoice #', 'Value', 'Currency', 'Value RON', 'Value EUR',
+                          'Status', 'Payment Status', 'Comment']
+
+
+@app.route('/api/db/invoices/export')
+@login_required
+def api_db_invoices_export():
+    """Stream the filtered invoice list as XLSX.
+
+    Accepts the same filters as /api/db/invoices. Invoices are read in keyset
+    pages and written with openpyxl write-only mode, so memory stays flat for
+    any number of rows.
+    """
+    from datetime import date as date_type, datetime
+    from core.utils.xlsx_stream import (
+        stream_table_xlsx, prefetch_stream, xlsx_download_headers, XLSX_MIMETYPE, MONEY_FORMAT, DATE_FORMAT,
+    )
+
+    if not current_user.can_view_invoices:
+        return jsonify({'error': 'You do not have permission to view invoices'}), 403
+
+    filters = {
+        'company': request.args.get('company'),
+        'department': request.args.get('department'),
+        'subdepartment': request.args.get('subdepartment'),
+        'brand': request.args.get('brand'),
+        'status': request.args.get('status'),
+        'payment_status': request.args.get('payment_status'),
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date'),
+    }
+
+    def rows():
+        for inv in iter_all_invoices(**filters):
+            invoice_date = inv.get('invoice_date')
+            yield [
+                date_type.fromisoformat(invoice_date[:10]) if invoice_date else None,
+                inv.get('supplier'),
+                inv.get('invoice_number'),
+                inv.get('invoice_value'),
+                inv.get('currency'),
+                inv.get('value_ron'),
+                inv.get('value_eur'),
+                inv.get('status'),
+                inv.get('payment_status'),
+                inv.get('comment'),
+            ]
+
+    try:
+        chunks = prefetch_stream(stream_table_xlsx(
+            'Invoices', INVOICE_EXPORT_HEADERS, rows(),
+            column_widths=[12, 35, 22, 14, 9, 14, 14, 14, 15, 50],
+            number_formats={0: DATE_FORMAT, 3: MONEY_FORMAT, 5: MONEY_FORMAT, 6: MONEY_FORMAT},
+        ))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    filename = f'invoices_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+    return Response(chunks, mimetype=XLSX_MIMETYPE, headers=xlsx_download_headers(filename))
+
+
 @app.route('/api/db/invoices/<int:invoice_id>')
 @login_required
 def api_db_invoice_detail(invoice_id):
@@ -1382,7 +1447,7 @@ def api_db_update_invoice(invoice_id):
                 # Check if new status should trigger notifications
                 if should_notify_on_status(new_status, 'invoice_status'):
                     # Send notifications to managers for each allocation
-                    if NOTIFICATIONS_ENABLED and is_smtp_configured():
+                    if NOTIFICATIONS_ENABLED:
                         allocations = current_invoice.get('allocations', [])
                         if allocations:
                             invoice_data = {
@@ -1394,7 +1459,11 @@ def api_db_update_invoice(invoice_id):
                                 'drive_link': current_invoice.get('drive_link'),
                                 'status': new_status,
                             }
-                            notify_invoice_allocations(invoice_data, allocations)
+                            enqueue_notification('invoice_allocations', invoice_id, {
+                                'invoice_data': invoice_data,
+                                'allocations': allocations,
+                            })
+                            wake_notification_dispatcher()
 
             # Log payment status change if it occurred
             if new_payment_status is not None and old_payment_status != new_payment_status:
@@ -1445,9 +1514,9 @@ def api_db_update_allocations(invoice_id):
                       entity_type='invoice', entity_id=invoice_id,
                       details={'old_status': old_status, 'new_status': default_status})
 
-        # Send email notifications to responsables only if explicitly requested
-        notifications_sent = 0
-        if send_notification and NOTIFICATIONS_ENABLED and is_smtp_configured():
+        # Queue email notifications to responsables only if explicitly requested
+        notifications_queued = False
+        if send_notification and NOTIFICATIONS_ENABLED:
             if not current_invoice:
                 current_invoice = get_invoice_with_allocations(invoice_id)
             if current_invoice:
@@ -1459,12 +1528,16 @@ def api_db_update_allocations(invoice_id):
                     'invoice_value': current_invoice.get('invoice_value'),
                     'currency': current_invoice.get('currency', 'RON'),
                 }
-                results = notify_invoice_allocations(invoice_data, allocations)
-                notifications_sent = sum(1 for r in results if r.get('success'))
+                enqueue_notification('invoice_allocations', invoice_id, {
+                    'invoice_data': invoice_data,
+                    'allocations': allocations,
+                })
+                wake_notification_dispatcher()
+                notifications_queued = True
 
         log_event('allocations_updated', f'Updated allocations for invoice ID {invoice_id}',
                   entity_type='invoice', entity_id=invoice_id)
-        return jsonify({'success': True, 'notifications_sent': notifications_sent})
+        return jsonify({'success': True, 'notifications_queued': notifications_queued})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1507,7 +1580,7 @@ def api_update_invoice_drive_link(invoice_id):
 @app.route('/api/db/search')
 @login_required
 def api_db_search():
-    """Search invoices by supplier or invoice number, respecting active filters."""
+    """Search invoices by supplier, invoice number, comment, partner or value, respecting active filters."""
     if not current_user.can_view_invoices:
         return jsonify({'error': 'You do not have permission to view invoices'}), 403
 
@@ -1553,7 +1626,7 @@ def api_invoices_search():
             return jsonify({'success': True, 'invoices': [invoice]})
         # Fall through to text search if not found by ID
 
-    results = search_invoices(query)[:limit]
+    results = search_invoices(query, limit=limit)
     return jsonify({'success': True, 'invoices': results})
 
 
@@ -1612,6 +1685,20 @@ def api_db_summary_brand():
     return jsonify(summary)
 
 
+@app.route('/api/db/summary/brand/splits')
+@login_required
+def api_db_summary_brand_splits():
+    """Get the split values of one brand summary row (row_brand omitted = no brand)."""
+    row_brand = request.args.get('row_brand')
+    company = request.args.get('company')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    department = request.args.get('department')
+    subdepartment = request.args.get('subdepartment')
+    splits = get_brand_split_values(row_brand, company, start_date, end_date, department, subdepartment)
+    return jsonify(splits)
+
+
 @app.route('/api/db/summary/supplier')
 @login_required
 def api_db_summary_supplier():
@@ -2917,6 +3004,24 @@ def api_get_notification_logs():
     return jsonify(logs)
 
 
+@app.route('/api/notification-outbox/stats', methods=['GET'])
+@login_required
+def api_notification_outbox_stats():
+    """Notification outbox backlog by status and this worker's dispatcher counters."""
+    if not NOTIFICATIONS_ENABLED:
+        return jsonify({'success': False, 'error': 'Notifications module not available'}), 500
+
+    try:
+        dispatcher = get_notification_dispatcher()
+        return jsonify({
+            'success': True,
+            'outbox': get_notification_outbox_stats(),
+            'dispatcher': {**dispatcher.stats, 'running': dispatcher.running},
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/notification-settings/test', methods=['POST'])
 def api_test_email():
     """Send a test email to verify SMTP configuration."""
@@ -3153,28 +3258,55 @@ def bulk_processor():
     return render_template('accounting/bugetare/bulk.html')
 
 
-@app.route('/api/bulk/process', methods=['POST'])
-@login_required
-def api_bulk_process():
-    """Process multiple uploaded invoices and return summary."""
-    from accounting.bugetare.bulk_processor import process_bulk_invoices
+def _bulk_report_json(report):
+    """Serialize a process_bulk_invoices() report for the bulk page."""
+    return {
+        'invoices': [{
+            'filename': inv.get('filename'),
+            'invoice_number': inv.get('invoice_number'),
+            'invoice_date': inv.get('invoice_date'),
+            'invoice_value': inv.get('invoice_value'),
+            'currency': inv.get('currency'),
+            'supplier': inv.get('supplier'),
+            'customer_vat': inv.get('customer_vat'),
+            'customer_name': inv.get('customer_name'),
+            'invoice_type': inv.get('invoice_type'),
+            'campaigns': inv.get('campaigns', {})
+        } for inv in report.get('invoices', [])],
+        'errors': report.get('errors', []),
+        'total': report.get('total', 0),
+        'count': report.get('count', 0),
+        'currency': report.get('currency', 'RON'),
+        'by_month': report.get('by_month', {}),
+        'by_campaign': report.get('by_campaign', {}),
+        'by_supplier': report.get('by_supplier', {})
+    }
+
 
+def _collect_bulk_pdf_files():
+    """Read uploaded files[] PDFs as (bytes, filename). Returns (file_data, error_response)."""
     if 'files[]' not in request.files:
-        return jsonify({'success': False, 'error': 'No files uploaded'}), 400
+        return None, (jsonify({'success': False, 'error': 'No files uploaded'}), 400)
 
     files = request.files.getlist('files[]')
     if not files or all(f.filename == '' for f in files):
-        return jsonify({'success': False, 'error': 'No files selected'}), 400
-
-    # Collect file data
-    file_data = []
-    for f in files:
-        if f.filename and f.filename.lower().endswith('.pdf'):
-            file_bytes = f.read()
-            file_data.append((file_bytes, f.filename))
+        return None, (jsonify({'success': False, 'error': 'No files selected'}), 400)
 
+    file_data = [(f.read(), f.filename) for f in files if f.filename and f.filename.lower().endswith('.pdf')]
     if not file_data:
-        return jsonify({'success': False, 'error': 'No valid PDF files found'}), 400
+        return None, (jsonify({'success': False, 'error': 'No valid PDF files found'}), 400)
+    return file_data, None
+
+
+@app.route('/api/bulk/process', methods=['POST'])
+@login_required
+def api_bulk_process():
+    """Process multiple uploaded invoices and return summary."""
+    from accounting.bugetare.bulk_processor import process_bulk_invoices
+
+    file_data, error = _collect_bulk_pdf_files()
+    if error:
+        return error
 
     try:
         report = process_bulk_invoices(file_data)
@@ -3182,26 +3314,7 @@ def api_bulk_process():
         refresh_connection_pool()
         return jsonify({
             'success': True,
-            'report': {
-                'invoices': [{
-                    'filename': inv.get('filename'),
-                    'invoice_number': inv.get('invoice_number'),
-                    'invoice_date': inv.get('invoice_date'),
-                    'invoice_value': inv.get('invoice_value'),
-                    'currency': inv.get('currency'),
-                    'supplier': inv.get('supplier'),
-                    'customer_vat': inv.get('customer_vat'),
-                    'customer_name': inv.get('customer_name'),
-                    'invoice_type': inv.get('invoice_type'),
-                    'campaigns': inv.get('campaigns', {})
-                } for inv in report.get('invoices', [])],
-                'total': report.get('total', 0),
-                'count': report.get('count', 0),
-                'currency': report.get('currency', 'RON'),
-                'by_month': report.get('by_month', {}),
-                'by_campaign': report.get('by_campaign', {}),
-                'by_supplier': report.get('by_supplier', {})
-            }
+            'report': _bulk_report_json(report)
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -3211,48 +3324,94 @@ def api_bulk_process():
 @login_required
 def api_bulk_export():
     """Export bulk processing results to Excel."""
-    from accounting.bugetare.bulk_processor import generate_excel_report, process_bulk_invoices
+    from accounting.bugetare.bulk_processor import stream_excel_report, process_bulk_invoices
+    from core.utils.xlsx_stream import prefetch_stream, xlsx_download_headers, XLSX_MIMETYPE
 
-    if 'files[]' not in request.files:
-        return jsonify({'success': False, 'error': 'No files uploaded'}), 400
-
-    files = request.files.getlist('files[]')
-    if not files or all(f.filename == '' for f in files):
-        return jsonify({'success': False, 'error': 'No files selected'}), 400
-
-    # Collect file data
-    file_data = []
-    for f in files:
-        if f.filename and f.filename.lower().endswith('.pdf'):
-            file_bytes = f.read()
-            file_data.append((file_bytes, f.filename))
-
-    if not file_data:
-        return jsonify({'success': False, 'error': 'No valid PDF files found'}), 400
+    file_data, error = _collect_bulk_pdf_files()
+    if error:
+        return error
 
     try:
         report = process_bulk_invoices(file_data)
-        excel_bytes = generate_excel_report(report)
+        chunks = prefetch_stream(stream_excel_report(report))
 
         # Generate filename with timestamp
         from datetime import datetime
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'Invoice_Report_{timestamp}.xlsx'
 
-        return Response(
-            excel_bytes,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
-        )
+        return Response(chunks, mimetype=XLSX_MIMETYPE, headers=xlsx_download_headers(filename))
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/bulk/jobs', methods=['POST'])
+@login_required
+def api_bulk_job_submit():
+    """Queue uploaded invoices for background processing. Returns a job id to poll."""
+    from accounting.bugetare.bulk_jobs import submit_bulk_job
+
+    file_data, error = _collect_bulk_pdf_files()
+    if error:
+        return error
+
+    job_id = submit_bulk_job(file_data, user_id=current_user.id)
+    return jsonify({'success': True, 'job_id': job_id, 'total_files': len(file_data)}), 202
+
+
+def _get_own_bulk_job(job_id):
+    from accounting.bugetare.bulk_jobs import get_bulk_job
+    job = get_bulk_job(job_id)
+    if job is None or job.get('user_id') != current_user.id:
+        return None
+    return job
+
+
+@app.route('/api/bulk/jobs/<job_id>', methods=['GET'])
+@login_required
+def api_bulk_job_status(job_id):
+    """Job progress: per-file status plus partial by_month/by_supplier totals."""
+    job = _get_own_bulk_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found or expired'}), 404
+    return jsonify({'success': True, 'job': job})
+
+
+@app.route('/api/bulk/jobs/<job_id>/result', methods=['GET'])
+@login_required
+def api_bulk_job_result(job_id):
+    """Download a completed job's report as JSON (default) or XLSX (?format=xlsx)."""
+    from accounting.bugetare.bulk_jobs import get_bulk_job_report, get_bulk_job_excel
+
+    job = _get_own_bulk_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found or expired'}), 404
+    if job['status'] != 'completed':
+        return jsonify({'success': False, 'error': f"Job is {job['status']}", 'status': job['status']}), 409
+
+    if request.args.get('format', 'json') == 'xlsx':
+        from core.utils.xlsx_stream import xlsx_download_headers, XLSX_MIMETYPE
+        try:
+            excel_bytes = get_bulk_job_excel(job_id)
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+        if excel_bytes is None:
+            return jsonify({'success': False, 'error': 'Job result expired'}), 404
+        filename = f"Invoice_Report_{job['created_at'][:19].replace('-', '').replace(':', '').replace('T', '_')}.xlsx"
+        return Response(excel_bytes, mimetype=XLSX_MIMETYPE, headers=xlsx_download_headers(filename))
+
+    report = get_bulk_job_report(job_id)
+    if report is None:
+        return jsonify({'success': False, 'error': 'Job result expired'}), 404
+    return jsonify({'success': True, 'report': _bulk_report_json(report)})
+
+
 @app.route('/api/bulk/export-json', methods=['POST'])
 @login_required
 def api_bulk_export_json():
     """Export bulk processing results from JSON data to Excel."""
-    from accounting.bugetare.bulk_processor import generate_excel_report
+    from accounting.bugetare.bulk_processor import stream_excel_report
+    from core.utils.xlsx_stream import prefetch_stream, xlsx_download_headers, XLSX_MIMETYPE
     from datetime import datetime as dt
 
     data = request.get_json()
@@ -3260,27 +3419,13 @@ def api_bulk_export_json():
         return jsonify({'success': False, 'error': 'No report data provided'}), 400
 
     try:
-        # Reconstruct report data with date objects for Excel
-        report = data['report']
-
-        # Parse date strings back to datetime objects for invoices
-        for inv in report.get('invoices', []):
-            if inv.get('invoice_date'):
-                try:
-                    inv['date_parsed'] = dt.strptime(inv['invoice_date'].split('T')[0], '%Y-%m-%d')
-                except:
-                    inv['date_parsed'] = None
-
-        excel_bytes = generate_excel_report(report)
+        # Invoice dates are read from the posted ISO invoice_date as rows are written
+        chunks = prefetch_stream(stream_excel_report(data['report']))
 
         timestamp = dt.now().strftime('%Y%m%d_%H%M%S')
         filename = f'Invoice_Report_{timestamp}.xlsx'
 
-        return Response(
-            excel_bytes,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
-        )
+        return Response(chunks, mimetype=XLSX_MIMETYPE, headers=xlsx_download_headers(filename))
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
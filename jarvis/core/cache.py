@@ -0,0 +1,344 @@
+"""
+Pluggable cache layer shared by the database TTL caches.
+
+Two backends are available, selected with the CACHE_BACKEND env var:
+
+- local  (default): in-process LRU store. Each Gunicorn worker keeps its own
+  copy, which is fine for single-worker setups, local runs and tests.
+- socket: set by the deploy configs (Procfile, Dockerfile, .do/app.yaml,
+  render.yaml). All workers talk to one CacheServer over a Unix domain socket
+  (CACHE_SOCKET_PATH), so a value warmed by one worker is served to the
+  others and an invalidation from any worker reaches all of them.
+
+The cache server is started by the Gunicorn master (see gunicorn.conf.py).
+If the socket is unreachable the client degrades to a local store and logs
+a warning instead of failing the request.
+
+Every backend keeps per-namespace TTLs, LRU eviction and hit/miss counters:
+
+    backend = get_cache_backend()
+    backend.configure('summary', ttl=60, max_entries=200)
+    backend.set('summary', 'company:2025', rows)
+    backend.get('summary', 'company:2025')   # -> rows (or None on miss)
+    backend.invalidate('summary')            # drops every key in namespace
+    backend.stats()                          # {'summary': {'hits': 1, ...}}
+"""
+
+import os
+import time
+import pickle
+import socket
+import struct
+import logging
+import threading
+import socketserver
+from collections import OrderedDict
+from typing import Any, Optional
+
+logger = logging.getLogger('jarvis.core.cache')
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'local').lower()
+CACHE_SOCKET_PATH = os.environ.get('CACHE_SOCKET_PATH', '/tmp/jarvis-cache.sock')
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 100
+
+# Socket timeout for client requests (seconds). A cache round-trip that takes
+# longer than this is slower than the query it is meant to save.
+SOCKET_TIMEOUT = 0.5
+
+_HEADER = struct.Struct('!I')
+
+
+# ============== LOCAL BACKEND ==============
+
+class LocalCacheBackend:
+    """Thread-safe in-process cache with per-namespace TTL and LRU eviction."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._namespaces = {}  # name -> OrderedDict(key -> (expires_at, value))
+        self._config = {}      # name -> {'ttl': int, 'max_entries': int}
+        self._stats = {}       # name -> {'hits', 'misses', 'evictions', 'invalidations'}
+
+    def _namespace(self, namespace: str) -> OrderedDict:
+        """Return the store for a namespace, creating it on first use.
+
+        Note: Caller must hold self._lock.
+        """
+        if namespace not in self._namespaces:
+            self._namespaces[namespace] = OrderedDict()
+            self._config.setdefault(namespace, {'ttl': DEFAULT_TTL, 'max_entries': DEFAULT_MAX_ENTRIES})
+            self._stats[namespace] = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        return self._namespaces[namespace]
+
+    def configure(self, namespace: str, ttl: int = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """Set TTL (seconds) and max entry count for a namespace."""
+        with self._lock:
+            self._namespace(namespace)
+            self._config[namespace] = {'ttl': ttl, 'max_entries': max_entries}
+
+    def get(self, namespace: str, key: str) -> Any:
+        """Return the cached value or None if missing/expired."""
+        with self._lock:
+            store = self._namespace(namespace)
+            entry = store.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del store[key]
+                self._stats[namespace]['misses'] += 1
+                return None
+            store.move_to_end(key)
+            self._stats[namespace]['hits'] += 1
+            return entry[1]
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None):
+        """Store a value, evicting least recently used entries over the limit."""
+        with self._lock:
+            store = self._namespace(namespace)
+            config = self._config[namespace]
+            expires_at = time.time() + (ttl if ttl is not None else config['ttl'])
+            store[key] = (expires_at, value)
+            store.move_to_end(key)
+            while len(store) > config['max_entries']:
+                store.popitem(last=False)
+                self._stats[namespace]['evictions'] += 1
+
+    def delete(self, namespace: str, key: str):
+        """Remove a single key."""
+        with self._lock:
+            self._namespace(namespace).pop(key, None)
+
+    def invalidate(self, namespace: str):
+        """Remove every key in a namespace."""
+        with self._lock:
+            self._namespace(namespace).clear()
+            self._stats[namespace]['invalidations'] += 1
+
+    def purge_expired(self) -> int:
+        """Drop expired entries from all namespaces. Returns count removed."""
+        removed = 0
+        now = time.time()
+        with self._lock:
+            for store in self._namespaces.values():
+                expired = [k for k, (expires_at, _) in store.items() if expires_at <= now]
+                for key in expired:
+                    del store[key]
+                removed += len(expired)
+        return removed
+
+    def stats(self) -> dict:
+        """Return per-namespace counters, size and hit ratio."""
+        with self._lock:
+            result = {}
+            for name, counters in self._stats.items():
+                lookups = counters['hits'] + counters['misses']
+                result[name] = {
+                    **counters,
+                    'size': len(self._namespaces[name]),
+                    'ttl': self._config[name]['ttl'],
+                    'max_entries': self._config[name]['max_entries'],
+                    'hit_ratio': round(counters['hits'] / lookups, 3) if lookups else 0.0,
+                }
+            return result
+
+
+# ============== SOCKET BACKEND ==============
+
+def _send_frame(sock: socket.socket, payload: Any):
+    data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError('Cache socket closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv_frame(sock: socket.socket) -> Any:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return pickle.loads(_recv_exact(sock, size))
+
+
+class _CacheRequestHandler(socketserver.BaseRequestHandler):
+    """Serves framed (op, args) requests against the server's LocalCacheBackend."""
+
+    OPERATIONS = ('configure', 'get', 'set', 'delete', 'invalidate', 'purge_expired', 'stats')
+
+    def handle(self):
+        backend = self.server.backend
+        while True:
+            try:
+                op, args = _recv_frame(self.request)
+            except (ConnectionError, OSError, EOFError):
+                return
+            if op not in self.OPERATIONS:
+                _send_frame(self.request, (False, f'Unknown operation: {op}'))
+                continue
+            try:
+                _send_frame(self.request, (True, getattr(backend, op)(*args)))
+            except Exception as e:
+                _send_frame(self.request, (False, str(e)))
+
+
+class CacheServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix-socket cache server shared by all workers on the host.
+
+    Usage:
+        server = CacheServer('/tmp/jarvis-cache.sock')
+        server.start()      # serves in a daemon thread
+        ...
+        server.stop()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str = None):
+        self.path = path or CACHE_SOCKET_PATH
+        self.backend = LocalCacheBackend()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        super().__init__(self.path, _CacheRequestHandler)
+        # Socket carries pickled data - restrict to the app user
+        os.chmod(self.path, 0o600)
+        self._thread = None
+
+    def start(self) -> 'CacheServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='jarvis-cache-server', daemon=True)
+        self._thread.start()
+        logger.info(f'Cache server listening on {self.path}')
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class SocketCacheBackend:
+    """Client for CacheServer. One connection per thread, local fallback on errors."""
+
+    def __init__(self, path: str = None):
+        self.path = path or CACHE_SOCKET_PATH
+        self._local = threading.local()
+        self._fallback = LocalCacheBackend()
+        self._configured = {}
+        self._warned = False
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(SOCKET_TIMEOUT)
+            sock.connect(self.path)
+            self._local.sock = sock
+            # Namespace config lives in the server; replay it on (re)connect
+            for namespace, (ttl, max_entries) in self._configured.items():
+                _send_frame(sock, ('configure', (namespace, ttl, max_entries)))
+                _recv_frame(sock)
+        return sock
+
+    def _call(self, op: str, *args):
+        try:
+            sock = self._connection()
+            _send_frame(sock, (op, args))
+            ok, result = _recv_frame(sock)
+        except (OSError, ConnectionError, EOFError, pickle.PickleError) as e:
+            self._drop_connection()
+            if not self._warned:
+                logger.warning(f'Cache server unreachable at {self.path}, using local cache: {e}')
+                self._warned = True
+            return getattr(self._fallback, op)(*args)
+        if not ok:
+            raise RuntimeError(f'Cache server error on {op}: {result}')
+        return result
+
+    def _drop_connection(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def configure(self, namespace: str, ttl: int = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self._configured[namespace] = (ttl, max_entries)
+        self._fallback.configure(namespace, ttl, max_entries)
+        self._call('configure', namespace, ttl, max_entries)
+
+    def get(self, namespace: str, key: str) -> Any:
+        return self._call('get', namespace, key)
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None):
+        self._call('set', namespace, key, value, ttl)
+
+    def delete(self, namespace: str, key: str):
+        self._fallback.delete(namespace, key)
+        self._call('delete', namespace, key)
+
+    def invalidate(self, namespace: str):
+        # Also clear the fallback so a recovered server never coexists with stale local data
+        self._fallback.invalidate(namespace)
+        self._call('invalidate', namespace)
+
+    def purge_expired(self) -> int:
+        return self._call('purge_expired')
+
+    def stats(self) -> dict:
+        return self._call('stats')
+
+
+# ============== BACKEND REGISTRY ==============
+
+_backend = None
+_backend_lock = threading.Lock()
+_backend_pid = None
+
+# Namespace settings declared at import time (e.g. by database.create_cache).
+# Applied to every backend instance, including ones re-created after fork.
+_namespace_config = {}
+
+
+def register_namespace(namespace: str, ttl: int = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+    """Declare TTL and size limit for a namespace on the current and future backends."""
+    _namespace_config[namespace] = (ttl, max_entries)
+    with _backend_lock:
+        backend = _backend if _backend_pid == os.getpid() else None
+    if backend is not None:
+        backend.configure(namespace, ttl, max_entries)
+
+
+def _apply_namespace_config(backend):
+    for namespace, (ttl, max_entries) in _namespace_config.items():
+        backend.configure(namespace, ttl, max_entries)
+
+
+def get_cache_backend():
+    """Get the process-wide cache backend (created lazily, re-created after fork)."""
+    global _backend, _backend_pid
+    with _backend_lock:
+        if _backend is None or _backend_pid != os.getpid():
+            if CACHE_BACKEND == 'socket':
+                _backend = SocketCacheBackend(CACHE_SOCKET_PATH)
+            else:
+                _backend = LocalCacheBackend()
+            _backend_pid = os.getpid()
+            _apply_namespace_config(_backend)
+        return _backend
+
+
+def set_cache_backend(backend):
+    """Replace the process-wide backend (used by tests and custom setups)."""
+    global _backend, _backend_pid
+    with _backend_lock:
+        _backend = backend
+        _backend_pid = os.getpid()
+        _apply_namespace_config(backend)
@@ -7,6 +7,7 @@ Supports both X.509 certificate-based mTLS and OAuth2 Bearer token authenticatio
 
 from .anaf_client import ANAFClient
 from .oauth_client import ANAFOAuthClient, get_anaf_client_for_cif
+from .registry import ANAFClientRegistry, get_client_registry
 from .exceptions import (
     ANAFError,
     AuthenticationError,
@@ -20,6 +21,8 @@ __all__ = [
     'ANAFClient',
     'ANAFOAuthClient',
     'get_anaf_client_for_cif',
+    'ANAFClientRegistry',
+    'get_client_registry',
     'ANAFError',
     'AuthenticationError',
     'RateLimitError',
@@ -8,10 +8,11 @@ This is a core connector - available across all JARVIS sections.
 """
 
 import hashlib
+import threading
 import time
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -34,22 +35,36 @@ logger = get_logger('jarvis.core.connectors.efactura.client')
 
 @dataclass
 class RateLimitState:
-    """Tracks rate limit usage."""
+    """Tracks rate limit usage. Safe to share between threads and clients."""
     requests_made: int = 0
     window_start: datetime = None
     window_hours: int = 1
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
 
     def __post_init__(self):
         if self.window_start is None:
             self.window_start = datetime.now()
 
-    def record_request(self):
-        """Record a request, resetting window if needed."""
+    def _roll_window(self):
         now = datetime.now()
         if now - self.window_start > timedelta(hours=self.window_hours):
             self.requests_made = 0
             self.window_start = now
-        self.requests_made += 1
+
+    def record_request(self):
+        """Record a request, resetting window if needed."""
+        with self._lock:
+            self._roll_window()
+            self.requests_made += 1
+
+    def try_acquire(self, max_requests: int) -> bool:
+        """Reserve one request if the window has budget left. Check and record are atomic."""
+        with self._lock:
+            self._roll_window()
+            if self.requests_made >= max_requests:
+                return False
+            self.requests_made += 1
+            return True
 
     def get_remaining(self, max_requests: int) -> int:
         """Get remaining requests in current window."""
@@ -63,6 +78,45 @@ class RateLimitState:
         return self.get_remaining(max_requests) <= buffer
 
 
+_rate_limits: Dict[str, RateLimitState] = {}
+_rate_limits_lock = threading.Lock()
+
+
+def get_rate_limit_state(company_cif: str) -> RateLimitState:
+    """
+    Process-wide rate limit state for a CIF.
+
+    Clients created for the same CIF share it, so the hourly budget holds
+    across client instances and concurrent sync workers.
+    """
+    with _rate_limits_lock:
+        state = _rate_limits.get(company_cif)
+        if state is None:
+            state = _rate_limits[company_cif] = RateLimitState()
+        return state
+
+
+def create_http_adapter(config: ANAFConfig) -> HTTPAdapter:
+    """
+    HTTPS adapter with retries and a keep-alive pool sized for concurrent use.
+
+    Pooled clients (see client.registry) are shared by sync workers and
+    routes, so the pool must hold at least as many connections as requests
+    in flight or urllib3 discards the extra ones after each request.
+    """
+    retry_strategy = Retry(
+        total=config.MAX_RETRIES,
+        backoff_factor=config.RETRY_BASE_DELAY,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=["HEAD", "GET", "POST", "PUT", "DELETE"],
+    )
+    return HTTPAdapter(
+        pool_connections=config.POOL_CONNECTIONS,
+        pool_maxsize=config.POOL_MAXSIZE,
+        max_retries=retry_strategy,
+    )
+
+
 class ANAFClient:
     """
     Client for ANAF e-Factura REST API.
@@ -77,6 +131,7 @@ class ANAFClient:
         cert_password: str,
         environment: Environment = Environment.TEST,
         config: Optional[ANAFConfig] = None,
+        rate_limit: Optional[RateLimitState] = None,
     ):
         """
         Initialize ANAF client.
@@ -86,6 +141,8 @@ class ANAFClient:
             cert_password: Password to decrypt the certificate
             environment: API environment (test or production)
             config: Optional custom configuration
+            rate_limit: Shared rate limit state (see get_rate_limit_state);
+                a private one is created if omitted
         """
         self.cert_path = cert_path
         self.cert_password = cert_password
@@ -94,7 +151,8 @@ class ANAFClient:
 
         self.base_url = self.config.get_base_url(environment)
         self._session: Optional[requests.Session] = None
-        self._rate_limit = RateLimitState()
+        self._session_lock = threading.Lock()
+        self._rate_limit = rate_limit or RateLimitState()
 
         # Certificate state
         self._cert_loaded = False
@@ -103,22 +161,17 @@ class ANAFClient:
     def _get_session(self) -> requests.Session:
         """Get or create authenticated session with retry logic."""
         if self._session is None:
-            self._session = self._create_session()
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
         return self._session
 
     def _create_session(self) -> requests.Session:
         """Create requests session with certificate and retry config."""
         session = requests.Session()
 
-        # Configure retries with exponential backoff
-        retry_strategy = Retry(
-            total=self.config.MAX_RETRIES,
-            backoff_factor=self.config.RETRY_BASE_DELAY,
-            status_forcelist=[500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "POST", "PUT", "DELETE"],
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
+        # Retries with exponential backoff, keep-alive pool for concurrent use
+        session.mount("https://", create_http_adapter(self.config))
 
         # Configure certificate authentication
         session.cert = self._load_cert_for_requests()
@@ -163,7 +216,7 @@ class ANAFClient:
         return hashlib.sha256(content).hexdigest()[:16]
 
     def _check_rate_limit(self):
-        """Check and enforce rate limit."""
+        """Check and enforce rate limit, reserving one request from the budget."""
         max_requests = (
             self.config.MAX_REQUESTS_PER_HOUR - self.config.RATE_LIMIT_BUFFER
         )
@@ -179,7 +232,7 @@ class ANAFClient:
                 }
             )
 
-        if self._rate_limit.get_remaining(max_requests) <= 0:
+        if not self._rate_limit.try_acquire(max_requests):
             raise RateLimitError(
                 "Rate limit exceeded, please wait before making more requests",
                 retry_after=3600,  # 1 hour
@@ -240,7 +293,6 @@ class ANAFClient:
             )
 
             latency_ms = int((time.time() - start_time) * 1000)
-            self._rate_limit.record_request()
 
             logger.info(
                 "ANAF response",
@@ -387,6 +439,7 @@ class ANAFClient:
         days: int = 60,
         page: int = 1,
         filter_type: Optional[str] = None,
+        since: Optional[datetime] = None,
     ) -> Dict[str, Any]:
         """
         List messages (invoices) for a company using paginated endpoint.
@@ -396,6 +449,8 @@ class ANAFClient:
             days: Number of days to look back
             page: Page number (1-based)
             filter_type: Optional filter - 'P' for received, 'T' for sent, None for all
+            since: Only list messages created from this time on (incremental
+                sync); never earlier than `days` ago
 
         Returns:
             Dict with 'messages', 'has_more', 'next_page', pagination info
@@ -407,6 +462,7 @@ class ANAFClient:
                 'days': days,
                 'page': page,
                 'filter_type': filter_type,
+                'since': since.isoformat() if since else None,
             }
         )
 
@@ -414,6 +470,8 @@ class ANAFClient:
         # (NOT the 'zile' parameter which is deprecated/not recognized)
         end_time = datetime.now()
         start_time = end_time - timedelta(days=days)
+        if since is not None and since > start_time:
+            start_time = since
 
         params = {
             'cif': company_cif,
@@ -6,12 +6,16 @@ Enable by setting EFACTURA_MOCK_MODE=true environment variable.
 """
 
 import io
+import time
 import zipfile
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 import random
 
 from core.utils.logging_config import get_logger
+from .anaf_client import RateLimitState
+from .exceptions import RateLimitError
+from ..config import DEFAULT_CONFIG
 
 logger = get_logger('jarvis.core.connectors.efactura.client.mock')
 
@@ -71,18 +75,47 @@ class MockANAFClient:
     Returns realistic mock data without making real API calls.
     """
 
-    def __init__(self, company_cif: str = 'RO225615'):
-        """Initialize mock client."""
+    def __init__(
+        self,
+        company_cif: str = 'RO225615',
+        rate_limit: Optional[RateLimitState] = None,
+        message_count: int = 25,
+        latency: float = 0.0,
+    ):
+        """
+        Initialize mock client.
+
+        Args:
+            company_cif: Company CIF
+            rate_limit: Shared rate limit state; requests count against it
+                like the real clients (MAX_REQUESTS_PER_HOUR - RATE_LIMIT_BUFFER)
+            message_count: Number of mock invoices to generate
+            latency: Seconds each list/download call sleeps, to simulate ANAF
+                network time in sync tests and benchmarks
+        """
         self.company_cif = company_cif
-        self._generate_mock_messages()
+        self.latency = latency
+        self._rate_limit = rate_limit or RateLimitState()
+        self._generate_mock_messages(message_count)
         logger.info("Mock ANAF client initialized", extra={'cif': company_cif})
 
-    def _generate_mock_messages(self):
+    def _request(self):
+        """Count a request against the rate limit and simulate latency."""
+        max_requests = DEFAULT_CONFIG.MAX_REQUESTS_PER_HOUR - DEFAULT_CONFIG.RATE_LIMIT_BUFFER
+        if not self._rate_limit.try_acquire(max_requests):
+            raise RateLimitError(
+                "Rate limit exceeded, please wait before making more requests",
+                retry_after=3600,
+            )
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _generate_mock_messages(self, count: int = 25):
         """Generate a set of mock messages for testing."""
         self._messages = []
         base_date = datetime.now()
 
-        for i in range(25):  # Generate 25 mock invoices
+        for i in range(count):
             days_ago = random.randint(1, 60)
             msg_date = base_date - timedelta(days=days_ago)
             supplier = random.choice(MOCK_SUPPLIERS)
@@ -114,15 +147,19 @@ class MockANAFClient:
         days: int = 60,
         page: int = 1,
         filter_type: Optional[str] = None,
+        since: Optional[datetime] = None,
     ) -> Dict[str, Any]:
         """Mock list messages with pagination."""
         logger.info(
             "[MOCK] Listing messages",
             extra={'cif': company_cif, 'days': days, 'page': page, 'filter': filter_type}
         )
+        self._request()
 
         # Filter messages
         cutoff_date = datetime.now() - timedelta(days=days)
+        if since is not None and since > cutoff_date:
+            cutoff_date = since
         filtered = []
 
         for msg in self._messages:
@@ -183,6 +220,7 @@ class MockANAFClient:
     def download_message(self, download_id: str) -> bytes:
         """Mock download invoice ZIP file."""
         logger.info("[MOCK] Downloading invoice", extra={'download_id': download_id})
+        self._request()
 
         # Find the message
         message = None
@@ -314,11 +352,14 @@ startxref
     def get_rate_limit_status(self) -> Dict[str, Any]:
         """Mock rate limit status."""
         return {
-            'requests_made': 0,
-            'max_per_hour': 150,
-            'remaining': 150,
-            'window_start': datetime.now().isoformat(),
-            'is_near_limit': False,
+            'requests_made': self._rate_limit.requests_made,
+            'max_per_hour': DEFAULT_CONFIG.MAX_REQUESTS_PER_HOUR,
+            'remaining': self._rate_limit.get_remaining(DEFAULT_CONFIG.MAX_REQUESTS_PER_HOUR),
+            'window_start': self._rate_limit.window_start.isoformat(),
+            'is_near_limit': self._rate_limit.is_near_limit(
+                DEFAULT_CONFIG.MAX_REQUESTS_PER_HOUR,
+                DEFAULT_CONFIG.RATE_LIMIT_BUFFER,
+            ),
             'mock_mode': True,
         }
 
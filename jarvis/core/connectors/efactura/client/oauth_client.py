@@ -8,13 +8,11 @@ This is a core connector - available across all JARVIS sections.
 """
 
 import hashlib
+import threading
 import time
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
-from dataclasses import dataclass
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 from core.utils.logging_config import get_logger
 from .exceptions import (
@@ -27,43 +25,13 @@ from .exceptions import (
     ParseError,
     InvoiceNotFoundError,
 )
+from .anaf_client import RateLimitState, get_rate_limit_state, create_http_adapter
 from ..config import ANAFConfig, DEFAULT_CONFIG, Environment
 from ..services.oauth_service import OAuthTokens, get_oauth_service
 
 logger = get_logger('jarvis.core.connectors.efactura.oauth_client')
 
 
-@dataclass
-class RateLimitState:
-    """Tracks rate limit usage."""
-    requests_made: int = 0
-    window_start: datetime = None
-    window_hours: int = 1
-
-    def __post_init__(self):
-        if self.window_start is None:
-            self.window_start = datetime.now()
-
-    def record_request(self):
-        """Record a request, resetting window if needed."""
-        now = datetime.now()
-        if now - self.window_start > timedelta(hours=self.window_hours):
-            self.requests_made = 0
-            self.window_start = now
-        self.requests_made += 1
-
-    def get_remaining(self, max_requests: int) -> int:
-        """Get remaining requests in current window."""
-        now = datetime.now()
-        if now - self.window_start > timedelta(hours=self.window_hours):
-            return max_requests
-        return max(0, max_requests - self.requests_made)
-
-    def is_near_limit(self, max_requests: int, buffer: int = 10) -> bool:
-        """Check if approaching rate limit."""
-        return self.get_remaining(max_requests) <= buffer
-
-
 class ANAFOAuthClient:
     """
     Client for ANAF e-Factura REST API using OAuth2 Bearer tokens.
@@ -80,6 +48,7 @@ class ANAFOAuthClient:
         expires_at: Optional[datetime] = None,
         environment: Environment = Environment.PRODUCTION,
         config: Optional[ANAFConfig] = None,
+        rate_limit: Optional[RateLimitState] = None,
     ):
         """
         Initialize OAuth ANAF client.
@@ -91,6 +60,8 @@ class ANAFOAuthClient:
             expires_at: Token expiration time
             environment: API environment (test or production)
             config: Optional custom configuration
+            rate_limit: Shared rate limit state; defaults to the CIF's
+                process-wide state (see get_rate_limit_state)
         """
         self.company_cif = company_cif
         self._access_token = access_token
@@ -101,7 +72,13 @@ class ANAFOAuthClient:
 
         self.base_url = self.config.get_base_url(environment)
         self._session: Optional[requests.Session] = None
-        self._rate_limit = RateLimitState()
+        self._session_lock = threading.Lock()
+        self._token_lock = threading.Lock()
+        self._rate_limit = rate_limit or get_rate_limit_state(company_cif)
+
+        # Set when ANAF answers 401: the token was revoked or replaced
+        # elsewhere, so a pooled client must reload it before reuse
+        self.token_rejected = False
 
     @classmethod
     def from_stored_tokens(
@@ -109,6 +86,7 @@ class ANAFOAuthClient:
         company_cif: str,
         environment: Environment = Environment.PRODUCTION,
         config: Optional[ANAFConfig] = None,
+        rate_limit: Optional[RateLimitState] = None,
     ) -> 'ANAFOAuthClient':
         """
         Create client from tokens stored in database.
@@ -117,6 +95,7 @@ class ANAFOAuthClient:
             company_cif: Company CIF
             environment: API environment
             config: Optional custom configuration
+            rate_limit: Shared rate limit state (defaults to the CIF's)
 
         Returns:
             ANAFOAuthClient instance
@@ -134,37 +113,93 @@ class ANAFOAuthClient:
                 code="NO_TOKENS",
             )
 
-        expires_at = None
-        if tokens.get('expires_at'):
-            expires_at_str = tokens['expires_at']
-            if isinstance(expires_at_str, str):
-                expires_at = datetime.fromisoformat(
-                    expires_at_str.replace('Z', '+00:00').replace('+00:00', '')
-                )
+        return cls.from_tokens(company_cif, tokens, environment, config, rate_limit)
 
+    @classmethod
+    def from_tokens(
+        cls,
+        company_cif: str,
+        tokens: Dict[str, Any],
+        environment: Environment = Environment.PRODUCTION,
+        config: Optional[ANAFConfig] = None,
+        rate_limit: Optional[RateLimitState] = None,
+    ) -> 'ANAFOAuthClient':
+        """Create client from a stored token dict (as returned by get_efactura_oauth_tokens)."""
         return cls(
             company_cif=company_cif,
             access_token=tokens['access_token'],
             refresh_token=tokens.get('refresh_token'),
-            expires_at=expires_at,
+            expires_at=_parse_expires_at(tokens.get('expires_at')),
             environment=environment,
             config=config,
+            rate_limit=rate_limit,
         )
 
     def _is_token_expired(self) -> bool:
         """Check if access token is expired or about to expire."""
+        return self.token_expires_within(self.config.OAUTH_TOKEN_EXPIRY_BUFFER)
+
+    def token_expires_within(self, seconds: float) -> bool:
+        """Check if the access token expires in the next `seconds` (False if no expiry is known)."""
         if not self._expires_at:
             return False
+        return datetime.utcnow() >= (self._expires_at - timedelta(seconds=seconds))
 
-        # Add buffer before expiry
-        buffer = timedelta(seconds=self.config.OAUTH_TOKEN_EXPIRY_BUFFER)
-        return datetime.utcnow() >= (self._expires_at - buffer)
+    def apply_tokens(
+        self,
+        access_token: str,
+        refresh_token: Optional[str],
+        expires_at: Optional[datetime],
+    ):
+        """
+        Switch to new tokens without dropping the session.
+
+        Only the Authorization header changes, so pooled keep-alive
+        connections to ANAF survive a token refresh.
+        """
+        self._access_token = access_token
+        self._refresh_token = refresh_token
+        self._expires_at = expires_at
+        self.token_rejected = False
+        if self._session is not None:
+            self._session.headers['Authorization'] = f'Bearer {access_token}'
+
+    def apply_stored_tokens(self, tokens: Dict[str, Any]):
+        """Switch to tokens as stored in the database (see from_stored_tokens)."""
+        self.apply_tokens(
+            tokens['access_token'],
+            tokens.get('refresh_token'),
+            _parse_expires_at(tokens.get('expires_at')),
+        )
 
     def _refresh_token_if_needed(self):
         """Auto-refresh access token if expired."""
-        if not self._is_token_expired():
-            return
+        self.refresh_if_expiring(self.config.OAUTH_TOKEN_EXPIRY_BUFFER)
+
+    def refresh_if_expiring(self, seconds: float) -> bool:
+        """
+        Refresh the access token if it expires in the next `seconds`.
+
+        Returns:
+            True if the token was refreshed
+        """
+        if not self.token_expires_within(seconds):
+            return False
 
+        with self._token_lock:
+            # Another thread sharing this client may have refreshed already
+            if not self.token_expires_within(seconds):
+                return False
+            self.refresh_tokens()
+            return True
+
+    def refresh_tokens(self):
+        """
+        Refresh the access token through the OAuth service and persist it.
+
+        Raises:
+            AuthenticationError: If there is no refresh token or ANAF rejects it
+        """
         if not self._refresh_token:
             raise AuthenticationError(
                 "Access token expired and no refresh token available. Please re-authenticate.",
@@ -172,7 +207,7 @@ class ANAFOAuthClient:
             )
 
         logger.info(
-            "Auto-refreshing expired OAuth token",
+            "Refreshing OAuth token",
             extra={'cif': self.company_cif}
         )
 
@@ -183,20 +218,17 @@ class ANAFOAuthClient:
                 self.company_cif,
             )
 
-            # Update local state
-            self._access_token = new_tokens.access_token
-            self._refresh_token = new_tokens.refresh_token
-            self._expires_at = new_tokens.expires_at
+            # Update local state and the session's Authorization header
+            self.apply_tokens(
+                new_tokens.access_token,
+                new_tokens.refresh_token,
+                new_tokens.expires_at,
+            )
 
             # Persist to database
             from database import save_efactura_oauth_tokens
             save_efactura_oauth_tokens(self.company_cif, new_tokens.to_dict())
 
-            # Reset session to use new token
-            if self._session:
-                self._session.close()
-                self._session = None
-
             logger.info(
                 "OAuth token refreshed successfully",
                 extra={
@@ -220,22 +252,17 @@ class ANAFOAuthClient:
         self._refresh_token_if_needed()
 
         if self._session is None:
-            self._session = self._create_session()
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
         return self._session
 
     def _create_session(self) -> requests.Session:
         """Create requests session with OAuth Bearer token."""
         session = requests.Session()
 
-        # Configure retries with exponential backoff
-        retry_strategy = Retry(
-            total=self.config.MAX_RETRIES,
-            backoff_factor=self.config.RETRY_BASE_DELAY,
-            status_forcelist=[500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "POST", "PUT", "DELETE"],
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
+        # Retries with exponential backoff, keep-alive pool for concurrent use
+        session.mount("https://", create_http_adapter(self.config))
 
         # Set OAuth Bearer token in Authorization header
         session.headers.update({
@@ -264,7 +291,7 @@ class ANAFOAuthClient:
         return hashlib.sha256(content).hexdigest()[:16]
 
     def _check_rate_limit(self):
-        """Check and enforce rate limit."""
+        """Check and enforce rate limit, reserving one request from the budget."""
         max_requests = (
             self.config.MAX_REQUESTS_PER_MINUTE - self.config.RATE_LIMIT_BUFFER
         )
@@ -280,7 +307,7 @@ class ANAFOAuthClient:
                 }
             )
 
-        if self._rate_limit.get_remaining(max_requests) <= 0:
+        if not self._rate_limit.try_acquire(max_requests):
             raise RateLimitError(
                 "Rate limit exceeded, please wait before making more requests",
                 retry_after=60,  # 1 minute
@@ -341,7 +368,6 @@ class ANAFOAuthClient:
             )
 
             latency_ms = int((time.time() - start_time) * 1000)
-            self._rate_limit.record_request()
 
             logger.info(
                 "ANAF OAuth response",
@@ -359,6 +385,7 @@ class ANAFOAuthClient:
             # Handle different status codes
             if response.status_code == 401:
                 # Token might be invalid/expired
+                self.token_rejected = True
                 raise AuthenticationError(
                     "OAuth token rejected - please re-authenticate",
                     details={'status_code': 401},
@@ -462,6 +489,7 @@ class ANAFOAuthClient:
         days: int = 60,
         page: int = 1,
         filter_type: Optional[str] = None,
+        since: Optional[datetime] = None,
     ) -> Dict[str, Any]:
         """
         List messages (invoices) for the company using paginated endpoint.
@@ -471,6 +499,8 @@ class ANAFOAuthClient:
             days: Number of days to look back
             page: Page number (1-based)
             filter_type: Optional filter - 'P' for received, 'T' for sent, None for all
+            since: Only list messages created from this time on (incremental
+                sync); never earlier than `days` ago
 
         Returns:
             Dict with 'messages', 'has_more', 'next_page', pagination info
@@ -486,6 +516,7 @@ class ANAFOAuthClient:
                 'days': days,
                 'page': page,
                 'filter_type': filter_type,
+                'since': since.isoformat() if since else None,
             }
         )
 
@@ -493,6 +524,8 @@ class ANAFOAuthClient:
         # (NOT the 'zile' parameter which is deprecated/not recognized)
         end_time = datetime.now()
         start_time = end_time - timedelta(days=days)
+        if since is not None and since > start_time:
+            start_time = since
 
         params = {
             'cif': self.company_cif,
@@ -687,6 +720,13 @@ class ANAFOAuthClient:
         return False
 
 
+def _parse_expires_at(value) -> Optional[datetime]:
+    """Parse a stored expires_at (ISO string, naive UTC) into a datetime."""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace('Z', '+00:00').replace('+00:00', ''))
+    return value or None
+
+
 def get_anaf_client_for_cif(
     company_cif: str,
     environment: Environment = Environment.PRODUCTION,
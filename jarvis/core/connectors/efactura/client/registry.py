@@ -0,0 +1,377 @@
+"""
+ANAF Client Registry
+
+Process-level pool of ANAF clients keyed by CIF. Routes and sync runs get the
+same client (and its keep-alive requests.Session) back instead of building a
+new one per call, so TLS handshakes, certificate conversion and OAuth token
+lookups happen once per CIF rather than once per request.
+
+OAuth access tokens are cached on the pooled client until shortly before
+they expire; a background thread refreshes them ahead of time through the
+OAuth service so requests never wait for a refresh. Every worker process runs
+its own refresher, so each refresh happens under a per-CIF PostgreSQL
+advisory lock and starts from the tokens stored by the other workers.
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+from core.utils.logging_config import get_logger
+from ..config import ANAFConfig, DEFAULT_CONFIG, Environment
+from .anaf_client import get_rate_limit_state
+
+logger = get_logger('jarvis.core.connectors.efactura.client.registry')
+
+# Refresh tokens expiring within this window in the background (default 1 day)
+TOKEN_REFRESH_AHEAD_SECONDS = int(os.environ.get('EFACTURA_TOKEN_REFRESH_AHEAD_SECONDS', 86400))
+# How often the background refresher checks pooled OAuth clients
+TOKEN_REFRESH_INTERVAL_SECONDS = int(os.environ.get('EFACTURA_TOKEN_REFRESH_INTERVAL_SECONDS', 900))
+BACKGROUND_REFRESH = os.environ.get('EFACTURA_TOKEN_BACKGROUND_REFRESH', 'on').lower() != 'off'
+
+
+def session_connection_stats(session) -> Dict[str, int]:
+    """
+    Connections opened and requests sent through a requests.Session.
+
+    Each new HTTPS connection is one TLS handshake; requests beyond that
+    reused a keep-alive connection from the urllib3 pool.
+    """
+    stats = {'handshakes': 0, 'requests': 0}
+    if session is None:
+        return stats
+    for adapter in session.adapters.values():
+        pools = getattr(getattr(adapter, 'poolmanager', None), 'pools', None)
+        if pools is None:
+            continue
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                stats['handshakes'] += pool.num_connections
+                stats['requests'] += pool.num_requests
+    return stats
+
+
+@dataclass
+class PooledClient:
+    """A client held by the registry with its usage counters."""
+    client: Any
+    auth: str  # 'oauth' or 'certificate'
+    key: tuple
+    created_at: datetime = field(default_factory=datetime.now)
+    last_used: datetime = field(default_factory=datetime.now)
+    reused: int = 0
+
+    def connection_stats(self) -> Dict[str, int]:
+        return session_connection_stats(getattr(self.client, '_session', None))
+
+
+class ANAFClientRegistry:
+    """
+    Shared ANAF clients keyed by CIF.
+
+    Client selection matches EFacturaService.get_anaf_client: OAuth tokens
+    stored for the CIF win, the configured certificate is the fallback.
+    """
+
+    def __init__(
+        self,
+        config: Optional[ANAFConfig] = None,
+        refresh_ahead_seconds: int = TOKEN_REFRESH_AHEAD_SECONDS,
+        refresh_interval_seconds: int = TOKEN_REFRESH_INTERVAL_SECONDS,
+        background_refresh: bool = BACKGROUND_REFRESH,
+    ):
+        self.config = config or DEFAULT_CONFIG
+        self.refresh_ahead_seconds = refresh_ahead_seconds
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.background_refresh = background_refresh
+
+        self._clients: Dict[str, PooledClient] = {}
+        # Guards the pool dict and counters only; building a client (token
+        # lookup, certificate conversion) happens under the CIF's own lock
+        self._lock = threading.RLock()
+        self._cif_locks: Dict[str, threading.Lock] = {}
+        self._counters = {
+            'created': 0,
+            'reused': 0,
+            'token_loads': 0,
+            'background_refreshes': 0,
+            'refresh_failures': 0,
+            'evicted': 0,
+        }
+        # Handshakes/requests of clients no longer in the pool
+        self._retired = {'handshakes': 0, 'requests': 0}
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ============== Client lookup ==============
+
+    def get(self, company_cif: str, environment: Environment):
+        """
+        Get the pooled client for a CIF, creating it on first use.
+
+        Raises:
+            ValueError: If neither OAuth tokens nor a certificate are configured
+        """
+        with self._lock:
+            entry = self._clients.get(company_cif)
+            if entry is not None and entry.key[1] == environment and self._is_fresh(entry):
+                return self._reuse(entry)
+            cif_lock = self._cif_locks.setdefault(company_cif, threading.Lock())
+
+        with cif_lock:
+            # Another thread may have built or reloaded the client meanwhile
+            with self._lock:
+                entry = self._clients.get(company_cif)
+                if entry is not None and entry.key[1] == environment and self._is_fresh(entry):
+                    return self._reuse(entry)
+
+            client = self._oauth_client(company_cif, environment, entry)
+            if client is None:
+                client = self._certificate_client(company_cif, environment, entry)
+            return client
+
+    def _is_fresh(self, entry: PooledClient) -> bool:
+        """OAuth clients are trusted until their token is about to expire or was rejected."""
+        if entry.auth != 'oauth':
+            return True
+        client = entry.client
+        return not client.token_rejected and not client.token_expires_within(
+            self.config.OAUTH_TOKEN_EXPIRY_BUFFER
+        )
+
+    def _reuse(self, entry: PooledClient):
+        with self._lock:
+            entry.reused += 1
+            entry.last_used = datetime.now()
+            self._counters['reused'] += 1
+        return entry.client
+
+    def _oauth_client(self, company_cif: str, environment: Environment, entry: Optional[PooledClient]):
+        """OAuth client from stored tokens, reusing the pooled session when there is one."""
+        try:
+            from database import get_efactura_oauth_tokens
+            with self._lock:
+                self._counters['token_loads'] += 1
+            tokens = get_efactura_oauth_tokens(company_cif)
+        except Exception as e:
+            logger.warning(
+                "Failed to load OAuth tokens, trying certificate",
+                extra={'cif': company_cif, 'error': str(e)}
+            )
+            return None
+
+        if not tokens or not tokens.get('access_token'):
+            return None
+
+        if entry is not None and entry.auth == 'oauth' and entry.key[1] == environment:
+            # Token went stale: pick up what another worker (or the callback)
+            # stored, keeping the session and its open connections
+            entry.client.apply_stored_tokens(tokens)
+            return self._reuse(entry)
+
+        from .oauth_client import ANAFOAuthClient
+        logger.info("Using OAuth ANAF client", extra={'cif': company_cif})
+        client = ANAFOAuthClient.from_tokens(
+            company_cif, tokens, environment,
+            config=self.config,
+            rate_limit=get_rate_limit_state(company_cif),
+        )
+        self._store(company_cif, PooledClient(client, 'oauth', ('oauth', environment)))
+        self._ensure_refresher()
+        return client
+
+    def _certificate_client(self, company_cif: str, environment: Environment, entry: Optional[PooledClient]):
+        cert_path = os.environ.get('EFACTURA_CERT_PATH')
+        cert_password = os.environ.get('EFACTURA_CERT_PASSWORD')
+
+        if not cert_path or not cert_password:
+            if entry is not None:
+                with self._lock:
+                    self._evict(company_cif)
+            raise ValueError(
+                "No authentication available. Either authenticate with ANAF OAuth "
+                "or configure EFACTURA_CERT_PATH and EFACTURA_CERT_PASSWORD."
+            )
+
+        key = ('certificate', environment, cert_path)
+        if entry is not None and entry.key == key:
+            return self._reuse(entry)
+
+        from .anaf_client import ANAFClient
+        client = ANAFClient(
+            cert_path, cert_password, environment,
+            config=self.config,
+            rate_limit=get_rate_limit_state(company_cif),
+        )
+        self._store(company_cif, PooledClient(client, 'certificate', key))
+        return client
+
+    def _store(self, company_cif: str, entry: PooledClient):
+        with self._lock:
+            if company_cif in self._clients:
+                self._evict(company_cif)
+            self._clients[company_cif] = entry
+            self._counters['created'] += 1
+
+    def _evict(self, company_cif: str, close: bool = False):
+        """
+        Drop a client from the pool (caller holds self._lock).
+
+        The session is not closed: sync threads that got the client from get()
+        may still be using it. Its connections go with it once the last of
+        them drops the client and it is garbage-collected.
+        """
+        entry = self._clients.pop(company_cif, None)
+        if entry is None:
+            return
+        for name, value in entry.connection_stats().items():
+            self._retired[name] += value
+        self._counters['evicted'] += 1
+        if close:
+            entry.client.close()
+
+    def invalidate(self, company_cif: str):
+        """
+        Drop the pooled client for a CIF.
+
+        Call after tokens are stored, refreshed or revoked outside the client
+        so the next request picks the new credentials up.
+        """
+        with self._lock:
+            self._evict(company_cif)
+
+    def close_all(self):
+        """Close every pooled session and stop the background refresher."""
+        self._stop.set()
+        with self._lock:
+            for company_cif in list(self._clients):
+                self._evict(company_cif, close=True)
+
+    # ============== Background token refresh ==============
+
+    def _ensure_refresher(self):
+        if not self.background_refresh:
+            return
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, name='efactura-token-refresher', daemon=True
+            )
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval_seconds):
+            try:
+                self.refresh_expiring()
+            except Exception as e:
+                logger.error(f"Background token refresh failed: {e}")
+
+    def refresh_expiring(self) -> int:
+        """
+        Refresh pooled OAuth tokens expiring within the refresh-ahead window.
+
+        Runs from the background thread of every worker. Each CIF is refreshed
+        under its advisory lock, starting from the stored tokens: when another
+        worker refreshed first, its tokens are picked up instead of spending
+        the (possibly rotated) refresh token again. A CIF locked by another
+        worker is skipped until the next round. A failure leaves the client as
+        is so the next request still gets a chance to refresh (or
+        re-authenticate).
+
+        Returns:
+            Number of tokens refreshed
+        """
+        with self._lock:
+            due = [
+                entry for entry in self._clients.values()
+                if entry.auth == 'oauth' and entry.client.token_expires_within(self.refresh_ahead_seconds)
+            ]
+
+        from database import efactura_token_refresh_lock, get_efactura_oauth_tokens
+
+        refreshed = failed = 0
+        for entry in due:
+            client = entry.client
+            try:
+                with efactura_token_refresh_lock(client.company_cif) as acquired:
+                    if not acquired:
+                        continue
+                    tokens = get_efactura_oauth_tokens(client.company_cif)
+                    if tokens and tokens.get('access_token'):
+                        client.apply_stored_tokens(tokens)
+                    if client.refresh_if_expiring(self.refresh_ahead_seconds):
+                        refreshed += 1
+            except Exception as e:
+                failed += 1
+                logger.warning(
+                    "Background OAuth token refresh failed",
+                    extra={'cif': client.company_cif, 'error': str(e)}
+                )
+
+        with self._lock:
+            self._counters['background_refreshes'] += refreshed
+            self._counters['refresh_failures'] += failed
+        return refreshed
+
+    # ============== Stats ==============
+
+    def stats(self) -> Dict[str, Any]:
+        """Reuse ratio, handshakes and per-CIF details of the pool."""
+        with self._lock:
+            counters = dict(self._counters)
+            entries = list(self._clients.items())
+            handshakes = self._retired['handshakes']
+            requests_sent = self._retired['requests']
+
+        clients: List[Dict[str, Any]] = []
+        for company_cif, entry in entries:
+            connections = entry.connection_stats()
+            handshakes += connections['handshakes']
+            requests_sent += connections['requests']
+            expires_at = getattr(entry.client, '_expires_at', None)
+            clients.append({
+                'cif': company_cif,
+                'auth': entry.auth,
+                'environment': entry.key[1].value,
+                'created_at': entry.created_at.isoformat(),
+                'last_used': entry.last_used.isoformat(),
+                'reused': entry.reused,
+                'handshakes': connections['handshakes'],
+                'requests': connections['requests'],
+                'token_expires_at': expires_at.isoformat() if expires_at else None,
+            })
+
+        lookups = counters['created'] + counters['reused']
+        return {
+            **counters,
+            'clients': len(clients),
+            'reuse_ratio': round(counters['reused'] / lookups, 4) if lookups else 0.0,
+            'handshakes': handshakes,
+            'requests': requests_sent,
+            'connection_reuse_ratio': (
+                round(1 - handshakes / requests_sent, 4) if requests_sent else 0.0
+            ),
+            'pool_maxsize': self.config.POOL_MAXSIZE,
+            'background_refresh': self.background_refresh,
+            'refresher_running': bool(self._refresher and self._refresher.is_alive()),
+            'per_client': clients,
+        }
+
+
+# Global registry instance
+_registry: Optional[ANAFClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> ANAFClientRegistry:
+    """Get or create the process-wide client registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ANAFClientRegistry()
+        return _registry
@@ -44,6 +44,8 @@ class ANAFConfig:
 
     # Rate limiting (per ANAF OAuth documentation: 1000 requests/minute)
     MAX_REQUESTS_PER_MINUTE: int = 1000
+    # Budget per CIF for one RateLimitState window (1 hour), shared by all clients
+    MAX_REQUESTS_PER_HOUR: int = 1000
     RATE_LIMIT_BUFFER: int = 50  # Reserve buffer from max
 
     # Retry settings
@@ -54,6 +56,9 @@ class ANAFConfig:
     # Connection settings
     REQUEST_TIMEOUT: int = 30  # seconds
     DOWNLOAD_TIMEOUT: int = 120  # seconds for large ZIP files
+    # Keep-alive pool per client session (one host, shared by sync workers and routes)
+    POOL_CONNECTIONS: int = 2
+    POOL_MAXSIZE: int = int(os.environ.get('EFACTURA_POOL_MAXSIZE', 16))
 
     # Certificate settings
     CERT_EXPIRY_WARNING_DAYS: int = 30
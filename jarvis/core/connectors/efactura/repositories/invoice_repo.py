@@ -474,6 +474,27 @@ class InvoiceRepository:
         finally:
             release_db(conn)
 
+    def get_existing_message_ids(self, message_ids: List[str]) -> set:
+        """
+        Get which ANAF message IDs are already imported, in one query.
+
+        Set-based replacement for calling get_by_message_id_simple() per
+        message during sync.
+        """
+        if not message_ids:
+            return set()
+
+        conn = get_db()
+        try:
+            cursor = get_cursor(conn)
+            cursor.execute("""
+                SELECT DISTINCT message_id FROM efactura_invoice_refs
+                WHERE message_id = ANY(%s)
+            """, (list(message_ids),))
+            return {row['message_id'] for row in cursor.fetchall()}
+        finally:
+            release_db(conn)
+
     def ignore_invoice(self, invoice_id: int, ignored: bool = True) -> bool:
         """
         Mark an invoice as ignored (soft delete).
@@ -345,6 +345,69 @@ class SyncRepository:
         finally:
             release_db(conn)
 
+    def get_high_water_marks(
+        self,
+        company_cifs: List[str],
+        direction: str = 'received',
+    ) -> Dict[str, str]:
+        """
+        Get the incremental sync high-water mark of each company.
+
+        The mark is the cursor_after of the company's latest successful run
+        (see sync_engine.high_water_mark). A run with retryable errors or
+        deferred messages doesn't move it, so the next sync lists those again.
+
+        Args:
+            company_cifs: Companies to look up
+            direction: Sync direction of the runs
+
+        Returns:
+            Dict of CIF -> mark; companies never synced incrementally are absent
+        """
+        if not company_cifs:
+            return {}
+
+        conn = get_db()
+        try:
+            cursor = get_cursor(conn)
+            cursor.execute("""
+                SELECT DISTINCT ON (company_cif) company_cif, cursor_after
+                FROM efactura_sync_runs
+                WHERE company_cif = ANY(%s)
+                AND direction = %s
+                AND success AND cursor_after IS NOT NULL
+                ORDER BY company_cif, finished_at DESC
+            """, (list(company_cifs), direction))
+            return {row['company_cif']: row['cursor_after'] for row in cursor.fetchall()}
+        finally:
+            release_db(conn)
+
+    def get_permanently_failed_message_ids(self, message_ids: List[str]) -> set:
+        """
+        Get which ANAF message IDs failed with a non-retryable error, in one query.
+
+        Sync skips them like imported messages instead of downloading them
+        again on every overlap window or full rescan.
+        """
+        if not message_ids:
+            return set()
+
+        conn = get_db()
+        try:
+            cursor = get_cursor(conn)
+            cursor.execute("""
+                SELECT DISTINCT message_id FROM efactura_sync_errors
+                WHERE message_id = ANY(%s)
+                AND NOT is_retryable
+            """, (list(message_ids),))
+            return {row['message_id'] for row in cursor.fetchall()}
+        finally:
+            release_db(conn)
+
+    def get_high_water_mark(self, company_cif: str, direction: str = 'received') -> Optional[str]:
+        """Get one company's incremental sync high-water mark."""
+        return self.get_high_water_marks([company_cif], direction).get(company_cif)
+
     def get_error_stats(
         self,
         company_cif: Optional[str] = None,
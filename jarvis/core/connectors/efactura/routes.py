@@ -16,6 +16,7 @@ from . import efactura_bp
 from .config import InvoiceDirection, ArtifactType
 from .services import EFacturaService
 from .services.oauth_service import get_oauth_service, OAuthTokens
+from .client.registry import get_client_registry
 
 logger = get_logger('jarvis.core.connectors.efactura.routes')
 
@@ -684,6 +685,31 @@ def anaf_status():
         }), 500
 
 
+@efactura_bp.route('/api/anaf/clients/stats', methods=['GET'])
+@api_login_required
+def anaf_client_stats():
+    """
+    Get pooled ANAF client stats for this process.
+
+    Returns:
+        reuse_ratio: Share of client lookups served from the pool
+        handshakes / requests: New HTTPS connections vs requests sent
+        per_client: Auth type, reuse count and token expiry per CIF
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'data': get_client_registry().stats(),
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting ANAF client stats: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+        }), 500
+
+
 @efactura_bp.route('/api/company/lookup', methods=['GET'])
 @api_login_required
 def lookup_company():
@@ -825,16 +851,19 @@ def sync_all():
     Sync all invoices from all connected companies.
 
     Fetches messages from ANAF for all active connections and imports them.
+    Only messages since each company's last successful sync are listed.
     Automatically skips duplicates (already imported invoices).
 
     Request body (optional):
         days: Number of days to look back (default 60)
+        full: Rescan the whole window instead of syncing incrementally (default false)
     """
     try:
         data = request.get_json() or {}
         days = int(data.get('days', 60))
+        incremental = not data.get('full', False)
 
-        result = efactura_service.sync_all(days=days)
+        result = efactura_service.sync_all(days=days, incremental=incremental)
 
         if not result.success:
             return jsonify({
@@ -848,6 +877,8 @@ def sync_all():
             'total_fetched': result.data['total_fetched'],
             'total_imported': result.data['total_imported'],
             'total_skipped': result.data['total_skipped'],
+            'total_deferred': result.data['total_deferred'],
+            'duration_seconds': result.data['duration_seconds'],
             'errors': result.data['errors'],
             'company_results': result.data['company_results'],
         })
@@ -901,6 +932,7 @@ def sync_single_company():
     Request body:
         cif: Company CIF (required)
         days: Number of days to look back (default 60)
+        full: Rescan the whole window instead of syncing incrementally (default false)
 
     Returns:
         Results for this company's sync operation
@@ -909,6 +941,7 @@ def sync_single_company():
         data = request.get_json() or {}
         cif = data.get('cif')
         days = int(data.get('days', 60))
+        incremental = not data.get('full', False)
 
         if not cif:
             return jsonify({
@@ -916,7 +949,7 @@ def sync_single_company():
                 'error': "Missing required field: cif",
             }), 400
 
-        result = efactura_service.sync_single_company(cif, days=days)
+        result = efactura_service.sync_single_company(cif, days=days, incremental=incremental)
 
         if not result.success:
             return jsonify({
@@ -2012,6 +2045,7 @@ def oauth_callback():
 
         token_data = tokens.to_dict()
         save_efactura_oauth_tokens(session_cif, token_data)
+        get_client_registry().invalidate(session_cif)
 
         # Auto-create company connection if it doesn't exist
         from .repositories.company_repo import CompanyConnectionRepository
@@ -2086,6 +2120,7 @@ def oauth_revoke():
 
         # Remove tokens via database function
         deleted = delete_efactura_oauth_tokens(clean_cif)
+        get_client_registry().invalidate(clean_cif)
 
         if deleted:
             logger.info(
@@ -2196,6 +2231,7 @@ def oauth_refresh():
 
         # Save new tokens
         save_efactura_oauth_tokens(clean_cif, new_tokens.to_dict())
+        get_client_registry().invalidate(clean_cif)
 
         logger.info(
             "OAuth tokens refreshed manually",
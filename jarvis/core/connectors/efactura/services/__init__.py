@@ -6,6 +6,7 @@ Business logic services for the e-Factura connector.
 
 from .invoice_service import InvoiceService
 from .efactura_service import EFacturaService
+from .sync_engine import EFacturaSyncEngine, CompanySyncResult
 from .oauth_service import ANAFOAuthService, OAuthTokens, get_oauth_service
 
 # CertificateAuthService requires cryptography - import lazily
@@ -18,6 +19,8 @@ __all__ = [
     'get_certificate_auth_service',
     'InvoiceService',
     'EFacturaService',
+    'EFacturaSyncEngine',
+    'CompanySyncResult',
     'ANAFOAuthService',
     'OAuthTokens',
     'get_oauth_service',
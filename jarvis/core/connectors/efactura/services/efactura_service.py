@@ -9,6 +9,8 @@ import os
 import io
 import zipfile
 import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Optional, List, Dict, Any, Tuple
 from datetime import date
@@ -69,46 +71,23 @@ class EFacturaService:
         1. Mock client if EFACTURA_MOCK_MODE=true (default for development)
         2. OAuth client if tokens are stored for the CIF
         3. Certificate client if certificate is configured
+
+        Real clients come from the process-wide registry (client.registry),
+        so the session, its keep-alive connections and the OAuth token are
+        reused across routes and sync runs. Don't close them.
         """
         if MOCK_MODE:
+            from ..client.anaf_client import get_rate_limit_state
             from ..client.mock_client import MockANAFClient
             logger.info("Using MOCK ANAF client", extra={'cif': company_cif})
-            return MockANAFClient(company_cif)
+            return MockANAFClient(company_cif, rate_limit=get_rate_limit_state(company_cif))
 
         from ..config import Environment
+        from ..client.registry import get_client_registry
         env = os.environ.get('EFACTURA_ENVIRONMENT', 'production')
         environment = Environment.PRODUCTION if env == 'production' else Environment.TEST
 
-        # Try OAuth tokens first (preferred method)
-        try:
-            from database import get_efactura_oauth_tokens
-            tokens = get_efactura_oauth_tokens(company_cif)
-
-            if tokens and tokens.get('access_token'):
-                from ..client.oauth_client import ANAFOAuthClient
-                logger.info("Using OAuth ANAF client", extra={'cif': company_cif})
-                return ANAFOAuthClient.from_stored_tokens(
-                    company_cif=company_cif,
-                    environment=environment,
-                )
-        except Exception as e:
-            logger.warning(
-                "Failed to load OAuth tokens, trying certificate",
-                extra={'cif': company_cif, 'error': str(e)}
-            )
-
-        # Fall back to certificate-based client
-        cert_path = os.environ.get('EFACTURA_CERT_PATH')
-        cert_password = os.environ.get('EFACTURA_CERT_PASSWORD')
-
-        if not cert_path or not cert_password:
-            raise ValueError(
-                "No authentication available. Either authenticate with ANAF OAuth "
-                "or configure EFACTURA_CERT_PATH and EFACTURA_CERT_PASSWORD."
-            )
-
-        from ..client.anaf_client import ANAFClient
-        return ANAFClient(cert_path, cert_password, environment)
+        return get_client_registry().get(company_cif, environment)
 
     def get_anaf_status(self) -> Dict[str, Any]:
         """Get ANAF client status (mock mode, OAuth, rate limits, etc.)."""
@@ -637,20 +616,31 @@ class EFacturaService:
     def import_from_anaf(
         self,
         cif: str,
-        message_ids: List[str]
+        message_ids: List[str],
+        client=None,
+        workers: int = 1,
+        cursor_before: Optional[str] = None,
+        cursor_after: Optional[str] = None,
     ) -> ServiceResult:
         """
         Import invoices from ANAF into local storage.
 
+        Downloads draw from the CIF's hourly request budget. When it runs out
+        (or ANAF answers 429), the remaining messages are left for the next
+        sync and reported as 'deferred' instead of failing one by one.
+
         Args:
             cif: Company CIF
             message_ids: List of ANAF message IDs to import
+            client: ANAF client to reuse (one is created for the CIF if omitted)
+            workers: Messages downloaded and imported in parallel (1 = sequential)
+            cursor_before: Incremental sync high-water mark the messages were listed from
+            cursor_after: High-water mark to store if the run succeeds
         """
-        import traceback
-        from ..xml_parser import parse_invoice_xml
+        from ..client.exceptions import RateLimitError
 
         # Get ANAF client
-        client = self.get_anaf_client(cif)
+        client = client or self.get_anaf_client(cif)
 
         # Match CIF against companies table to auto-identify company
         matched_company = match_company_by_vat(cif)
@@ -666,298 +656,280 @@ class EFacturaService:
 
         # Create sync run to track this import operation
         sync_run = self.sync_repo.create_run(company_cif=cif, direction='received')
+        sync_run.cursor_before = cursor_before
+        sync_run.cursor_after = cursor_after
         run_id = sync_run.run_id
 
-        imported = 0
-        skipped = 0
-        errors = []
-        errors_count = 0
+        # Already-imported messages, in one query instead of one per message
+        existing = self.invoice_repo.get_existing_message_ids(message_ids)
 
-        for message_id in message_ids:
-            try:
-                # Check if already imported
-                existing = self.invoice_repo.get_by_message_id_simple(message_id)
-                if existing:
-                    skipped += 1
-                    continue
-
-                # Download ZIP from ANAF
-                zip_data = client.download_message(message_id)
-
-                # Extract XML from ZIP
-                # Note: ZIPs may contain multiple XMLs:
-                # - semnatura_*.xml = digital signature (skip)
-                # - *.xml = actual invoice (we want this)
-                xml_content = None
-                xml_filename = None
-                with zipfile.ZipFile(io.BytesIO(zip_data), 'r') as zf:
-                    for filename in zf.namelist():
-                        # Skip signature files and .p7s files
-                        if filename.startswith('semnatura') or filename.endswith('.p7s'):
-                            continue
-                        if filename.endswith('.xml'):
-                            xml_content = zf.read(filename).decode('utf-8')
-                            xml_filename = filename
-                            break
-
-                if not xml_content:
-                    error_msg = f"No XML in message {message_id}"
-                    errors.append(error_msg)
-                    errors_count += 1
-                    self.sync_repo.record_error(
-                        run_id=run_id,
-                        error_type='PARSE',
-                        error_message=error_msg,
-                        message_id=message_id,
-                        is_retryable=True,
-                    )
-                    continue
+        budget_exhausted = threading.Event()
 
-                # Parse XML to extract invoice data
-                parsed = parse_invoice_xml(xml_content)
-
-                # Validate that this is actually an invoice (not a signature or other XML)
-                if not parsed.invoice_number:
-                    # Check if it's a signature XML
-                    if '<Signature' in xml_content or '<ds:Signature' in xml_content:
-                        error_msg = f"Message {message_id} contains signature XML, not invoice"
-                    else:
-                        error_msg = f"Message {message_id} contains invalid/empty invoice XML"
-                    errors.append(error_msg)
-                    errors_count += 1
-                    self.sync_repo.record_error(
-                        run_id=run_id,
-                        error_type='PARSE',
-                        error_message=error_msg,
-                        message_id=message_id,
-                        is_retryable=False,
-                    )
-                    continue
-
-                # Determine direction based on CIF
-                direction = InvoiceDirection.RECEIVED
-                if parsed.seller_cif and parsed.seller_cif.replace('RO', '') == cif:
-                    direction = InvoiceDirection.SENT
-
-                # Create invoice record
-                invoice = Invoice(
-                    cif_owner=cif,
-                    company_id=company_id,
-                    direction=direction,
-                    partner_cif=parsed.buyer_cif if direction == InvoiceDirection.SENT else parsed.seller_cif,
-                    partner_name=parsed.buyer_name if direction == InvoiceDirection.SENT else parsed.seller_name,
-                    invoice_number=parsed.invoice_number,
-                    invoice_series=parsed.invoice_series,
-                    issue_date=parsed.issue_date,
-                    due_date=parsed.due_date,
-                    total_amount=parsed.total_amount,
-                    total_vat=parsed.total_vat,
-                    total_without_vat=parsed.total_without_vat,
-                    currency=parsed.currency,
-                )
-
-                # Create external reference
-                xml_hash = hashlib.sha256(xml_content.encode()).hexdigest()
-                external_ref = InvoiceExternalRef(
-                    message_id=message_id,
-                    xml_hash=xml_hash,
-                )
-
-                # Create artifact for XML storage
-                artifact = InvoiceArtifact(
-                    artifact_type=ArtifactType.XML,
-                    storage_uri=f"efactura/{cif}/{message_id}.xml",
-                    original_filename=xml_filename,
-                    mime_type="application/xml",
-                    checksum=xml_hash,
-                    size_bytes=len(xml_content.encode()),
-                )
-
-                # Save to database
-                created_invoice = self.invoice_repo.create_with_refs(
-                    invoice, external_ref, artifact, xml_content
-                )
-
-                if created_invoice:
-                    imported += 1
-                    # Note: No auto-hide here - visibility is now controlled dynamically
-                    # by partner type settings (hide_in_filter flag)
-                else:
-                    error_msg = f"Failed to save message {message_id}"
-                    errors.append(error_msg)
-                    errors_count += 1
-                    self.sync_repo.record_error(
-                        run_id=run_id,
-                        error_type='SYSTEM',
-                        error_message=error_msg,
-                        message_id=message_id,
-                        invoice_ref=parsed.invoice_number,
-                        is_retryable=True,
+        def import_one(message_id: str) -> Tuple[str, Optional[str], bool]:
+            if message_id in existing:
+                return 'skipped', None, False
+            if budget_exhausted.is_set():
+                return 'deferred', None, False
+            try:
+                return self._import_message(client, cif, company_id, run_id, message_id)
+            except RateLimitError as e:
+                if not budget_exhausted.is_set():
+                    budget_exhausted.set()
+                    logger.warning(
+                        "ANAF rate limit reached, deferring remaining messages",
+                        extra={'cif': cif, 'retry_after': e.retry_after}
                     )
+                return 'deferred', None, False
 
-            except Exception as e:
-                logger.error(f"Error importing message {message_id}: {e}")
-                error_msg = f"Error with {message_id}: {str(e)}"
-                errors.append(error_msg)
-                errors_count += 1
-                self.sync_repo.record_error(
-                    run_id=run_id,
-                    error_type='SYSTEM',
-                    error_message=error_msg,
-                    message_id=message_id,
-                    stack_trace=traceback.format_exc(),
-                    is_retryable=True,
-                )
+        if workers > 1 and len(message_ids) > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='efactura-import') as pool:
+                outcomes = list(pool.map(import_one, message_ids))
+        else:
+            outcomes = [import_one(message_id) for message_id in message_ids]
+
+        imported = sum(1 for outcome, _, _ in outcomes if outcome == 'imported')
+        skipped = sum(1 for outcome, _, _ in outcomes if outcome == 'skipped')
+        deferred = sum(1 for outcome, _, _ in outcomes if outcome == 'deferred')
+        downloaded = sum(1 for _, _, was_downloaded in outcomes if was_downloaded)
+        errors = [error_msg for outcome, error_msg, _ in outcomes if outcome in ('error', 'failed')]
+        errors_count = len(errors)
+        # Messages that will never import (recorded with is_retryable=False)
+        permanent_errors = sum(1 for outcome, _, _ in outcomes if outcome == 'failed')
+
+        if deferred:
+            self.sync_repo.record_error(
+                run_id=run_id,
+                error_type='API',
+                error_code='RATE_LIMIT',
+                error_message=f"Rate limit reached, {deferred} messages deferred to next sync",
+                is_retryable=True,
+            )
 
         # Complete the sync run with statistics
         sync_run.messages_checked = len(message_ids)
+        sync_run.invoices_fetched = downloaded
         sync_run.invoices_created = imported
         sync_run.invoices_skipped = skipped
         sync_run.errors_count = errors_count
+        summary = [
+            f"{errors_count} errors" if errors_count > 0 else None,
+            f"{deferred} deferred (rate limit)" if deferred else None,
+        ]
+        # Only retryable errors fail the run: a successful run moves the
+        # high-water mark, and permanent failures are skipped by later syncs
         self.sync_repo.complete_run(
             run=sync_run,
-            success=errors_count == 0,
-            error_summary=f"{errors_count} errors" if errors_count > 0 else None,
+            success=errors_count == permanent_errors and deferred == 0,
+            error_summary=', '.join(part for part in summary if part) or None,
         )
 
         return ServiceResult(success=True, data={
             'imported': imported,
             'skipped': skipped,
+            'deferred': deferred,
+            'downloaded': downloaded,
             'errors': errors if errors else None,
             'errors_count': errors_count,
+            'permanent_errors': permanent_errors,
             'sync_run_id': run_id,
             'company_matched': matched_company.get('company') if matched_company else None,
             'company_id': company_id,
         })
 
-    def sync_all(self, days: int = 60) -> ServiceResult:
+    def _import_message(
+        self,
+        client,
+        cif: str,
+        company_id: Optional[int],
+        run_id: str,
+        message_id: str,
+    ) -> Tuple[str, Optional[str], bool]:
         """
-        Sync all invoices from all connected companies.
-
-        Fetches messages from ANAF for all active connections and imports them.
-        Automatically skips duplicates (already imported invoices).
-
-        Args:
-            days: Number of days to look back (default 60)
+        Download, parse and store one ANAF message.
 
         Returns:
-            ServiceResult with summary of sync operation
+            (outcome, error message, downloaded) - outcome is 'imported',
+            'error' (retryable) or 'failed' (the message itself is invalid and
+            never will import); already-imported messages are filtered out by
+            the caller.
+            RateLimitError is re-raised so the caller can stop downloading.
         """
-        logger.info("Starting sync_all operation", extra={'days': days})
+        import traceback
+        from ..xml_parser import parse_invoice_xml
+        from ..client.exceptions import RateLimitError
 
-        # Get all active company connections
-        connections = self.get_all_connections()
+        downloaded = False
+        try:
+            # Download ZIP from ANAF
+            zip_data = client.download_message(message_id)
+            downloaded = True
 
-        if not connections:
-            return ServiceResult(
-                success=False,
-                error="No active company connections found. Go to Connector Settings to add a connection."
-            )
+            # Extract XML from ZIP
+            # Note: ZIPs may contain multiple XMLs:
+            # - semnatura_*.xml = digital signature (skip)
+            # - *.xml = actual invoice (we want this)
+            xml_bytes = None
+            xml_filename = None
+            with zipfile.ZipFile(io.BytesIO(zip_data), 'r') as zf:
+                for filename in zf.namelist():
+                    # Skip signature files and .p7s files
+                    if filename.startswith('semnatura') or filename.endswith('.p7s'):
+                        continue
+                    if filename.endswith('.xml'):
+                        xml_bytes = zf.read(filename)
+                        xml_filename = filename
+                        break
+
+            if not xml_bytes:
+                error_msg = f"No XML in message {message_id}"
+                self.sync_repo.record_error(
+                    run_id=run_id,
+                    error_type='PARSE',
+                    error_message=error_msg,
+                    message_id=message_id,
+                    is_retryable=True,
+                )
+                return 'error', error_msg, downloaded
 
-        total_fetched = 0
-        total_imported = 0
-        total_skipped = 0
-        all_errors = []
-        company_results = []
+            xml_content = xml_bytes.decode('utf-8')
 
-        for conn in connections:
-            cif = conn['cif']
-            display_name = conn.get('display_name', cif)
+            # Parse XML to extract invoice data. The parser reads the bytes
+            # directly; line items aren't stored, so they're skipped.
+            parsed = parse_invoice_xml(xml_bytes, include_lines=False)
 
-            try:
-                logger.info(f"Syncing company {display_name} ({cif})")
-
-                # Fetch all messages from ANAF (all pages)
-                all_message_ids = []
-                page = 1
-                max_pages = 50  # Safety limit
-
-                while page <= max_pages:
-                    fetch_result = self.fetch_anaf_messages(
-                        cif=cif,
-                        days=days,
-                        page=page,
-                        filter_type='P',  # Only fetch Received (Primite) invoices
-                    )
+            # Validate that this is actually an invoice (not a signature or other XML)
+            if not parsed.invoice_number:
+                # Check if it's a signature XML
+                if '<Signature' in xml_content or '<ds:Signature' in xml_content:
+                    error_msg = f"Message {message_id} contains signature XML, not invoice"
+                else:
+                    error_msg = f"Message {message_id} contains invalid/empty invoice XML"
+                self.sync_repo.record_error(
+                    run_id=run_id,
+                    error_type='PARSE',
+                    error_message=error_msg,
+                    message_id=message_id,
+                    is_retryable=False,
+                )
+                return 'failed', error_msg, downloaded
+
+            # Determine direction based on CIF
+            direction = InvoiceDirection.RECEIVED
+            if parsed.seller_cif and parsed.seller_cif.replace('RO', '') == cif:
+                direction = InvoiceDirection.SENT
+
+            # Create invoice record
+            invoice = Invoice(
+                cif_owner=cif,
+                company_id=company_id,
+                direction=direction,
+                partner_cif=parsed.buyer_cif if direction == InvoiceDirection.SENT else parsed.seller_cif,
+                partner_name=parsed.buyer_name if direction == InvoiceDirection.SENT else parsed.seller_name,
+                invoice_number=parsed.invoice_number,
+                invoice_series=parsed.invoice_series,
+                issue_date=parsed.issue_date,
+                due_date=parsed.due_date,
+                total_amount=parsed.total_amount,
+                total_vat=parsed.total_vat,
+                total_without_vat=parsed.total_without_vat,
+                currency=parsed.currency,
+            )
 
-                    if not fetch_result.success:
-                        all_errors.append(f"{display_name}: Failed to fetch - {fetch_result.error}")
-                        break
+            # Create external reference
+            xml_hash = hashlib.sha256(xml_bytes).hexdigest()
+            external_ref = InvoiceExternalRef(
+                message_id=message_id,
+                xml_hash=xml_hash,
+            )
 
-                    messages = fetch_result.data.get('messages', [])
-                    if not messages:
-                        break
+            # Create artifact for XML storage
+            artifact = InvoiceArtifact(
+                artifact_type=ArtifactType.XML,
+                storage_uri=f"efactura/{cif}/{message_id}.xml",
+                original_filename=xml_filename,
+                mime_type="application/xml",
+                checksum=xml_hash,
+                size_bytes=len(xml_bytes),
+            )
 
-                    # Extract message IDs
-                    for msg in messages:
-                        msg_id = str(msg.get('id', ''))
-                        if msg_id:
-                            all_message_ids.append(msg_id)
+            # Save to database
+            created_invoice = self.invoice_repo.create_with_refs(
+                invoice, external_ref, artifact, xml_content
+            )
 
-                    # Check if there are more pages
-                    pagination = fetch_result.data.get('pagination', {})
-                    if not pagination.get('has_more', False):
-                        break
+            if created_invoice:
+                # Note: No auto-hide here - visibility is now controlled dynamically
+                # by partner type settings (hide_in_filter flag)
+                return 'imported', None, downloaded
+
+            error_msg = f"Failed to save message {message_id}"
+            self.sync_repo.record_error(
+                run_id=run_id,
+                error_type='SYSTEM',
+                error_message=error_msg,
+                message_id=message_id,
+                invoice_ref=parsed.invoice_number,
+                is_retryable=True,
+            )
+            return 'error', error_msg, downloaded
 
-                    page += 1
+        except RateLimitError:
+            raise
+        except Exception as e:
+            logger.error(f"Error importing message {message_id}: {e}")
+            error_msg = f"Error with {message_id}: {str(e)}"
+            self.sync_repo.record_error(
+                run_id=run_id,
+                error_type='SYSTEM',
+                error_message=error_msg,
+                message_id=message_id,
+                stack_trace=traceback.format_exc(),
+                is_retryable=True,
+            )
+            return 'error', error_msg, downloaded
 
-                total_fetched += len(all_message_ids)
+    def sync_all(self, days: int = 60, incremental: bool = True) -> ServiceResult:
+        """
+        Sync all invoices from all connected companies.
 
-                if not all_message_ids:
-                    company_results.append({
-                        'company': display_name,
-                        'cif': cif,
-                        'fetched': 0,
-                        'imported': 0,
-                        'skipped': 0,
-                        'errors': 0,
-                    })
-                    continue
+        Fetches messages from ANAF for all active connections and imports them.
+        Companies run concurrently and each downloads with a bounded worker
+        pool (see EFacturaSyncEngine), within its CIF's hourly request budget.
+        Incremental by default: only messages since each company's last
+        successful sync are listed. Automatically skips duplicates (already
+        imported invoices).
 
-                # Import all messages (duplicates are automatically skipped)
-                import_result = self.import_from_anaf(cif, all_message_ids)
+        Args:
+            days: Number of days to look back (default 60); the most an
+                incremental sync lists
+            incremental: False rescans the whole `days` window
 
-                if import_result.success:
-                    imported = import_result.data.get('imported', 0)
-                    skipped = import_result.data.get('skipped', 0)
-                    errors = import_result.data.get('errors', [])
+        Returns:
+            ServiceResult with summary of sync operation and per-company throughput
+        """
+        import time
+        from .sync_engine import EFacturaSyncEngine
 
-                    total_imported += imported
-                    total_skipped += skipped
+        logger.info("Starting sync_all operation", extra={'days': days, 'incremental': incremental})
 
-                    if errors:
-                        all_errors.extend([f"{display_name}: {e}" for e in errors])
+        # Get all active company connections
+        connections = self.get_all_connections()
 
-                    company_results.append({
-                        'company': display_name,
-                        'cif': cif,
-                        'fetched': len(all_message_ids),
-                        'imported': imported,
-                        'skipped': skipped,
-                        'errors': len(errors) if errors else 0,
-                    })
-                else:
-                    all_errors.append(f"{display_name}: Import failed - {import_result.error}")
-                    company_results.append({
-                        'company': display_name,
-                        'cif': cif,
-                        'fetched': len(all_message_ids),
-                        'imported': 0,
-                        'skipped': 0,
-                        'errors': 1,
-                    })
+        if not connections:
+            return ServiceResult(
+                success=False,
+                error="No active company connections found. Go to Connector Settings to add a connection."
+            )
 
-            except Exception as e:
-                logger.error(f"Error syncing company {cif}: {e}")
-                all_errors.append(f"{display_name}: {str(e)}")
-                company_results.append({
-                    'company': display_name,
-                    'cif': cif,
-                    'fetched': 0,
-                    'imported': 0,
-                    'skipped': 0,
-                    'errors': 1,
-                })
+        start = time.monotonic()
+        results = EFacturaSyncEngine(self).sync_companies(connections, days=days, incremental=incremental)
+        duration = time.monotonic() - start
+
+        all_errors = [f"{r.company}: {e}" for r in results for e in r.errors]
+        total_fetched = sum(r.fetched for r in results)
+        total_imported = sum(r.imported for r in results)
+        total_skipped = sum(r.skipped for r in results)
+        total_deferred = sum(r.deferred for r in results)
 
         logger.info(
             "Sync_all completed",
@@ -966,7 +938,9 @@ class EFacturaService:
                 'total_fetched': total_fetched,
                 'total_imported': total_imported,
                 'total_skipped': total_skipped,
+                'total_deferred': total_deferred,
                 'total_errors': len(all_errors),
+                'duration_seconds': round(duration, 2),
             }
         )
 
@@ -978,12 +952,14 @@ class EFacturaService:
             'total_fetched': total_fetched,
             'total_imported': total_imported,
             'total_skipped': total_skipped,
+            'total_deferred': total_deferred,
+            'duration_seconds': round(duration, 2),
             'errors': all_errors if all_errors else None,
-            'company_results': company_results,
+            'company_results': [r.to_dict() for r in results],
             'duplicates_found': duplicates,
         })
 
-    def sync_single_company(self, cif: str, days: int = 60) -> ServiceResult:
+    def sync_single_company(self, cif: str, days: int = 60, incremental: bool = True) -> ServiceResult:
         """
         Sync invoices for a single company.
 
@@ -992,12 +968,16 @@ class EFacturaService:
 
         Args:
             cif: Company CIF to sync
-            days: Number of days to look back (default 60)
+            days: Number of days to look back (default 60); the most an
+                incremental sync lists
+            incremental: False rescans the whole `days` window
 
         Returns:
             ServiceResult with sync results for this company
         """
-        logger.info(f"Syncing single company", extra={'cif': cif, 'days': days})
+        from .sync_engine import EFacturaSyncEngine
+
+        logger.info(f"Syncing single company", extra={'cif': cif, 'days': days, 'incremental': incremental})
 
         # Find company display name
         connections = self.get_all_connections()
@@ -1007,78 +987,20 @@ class EFacturaService:
                 display_name = conn.get('display_name', cif)
                 break
 
-        try:
-            # Fetch all messages from ANAF (all pages)
-            all_message_ids = []
-            page = 1
-            max_pages = 50  # Safety limit
-
-            while page <= max_pages:
-                fetch_result = self.fetch_anaf_messages(
-                    cif=cif,
-                    days=days,
-                    page=page,
-                    filter_type='P',  # Only fetch Received (Primite) invoices
-                )
-
-                if not fetch_result.success:
-                    return ServiceResult(
-                        success=False,
-                        error=f"Failed to fetch messages: {fetch_result.error}"
-                    )
-
-                messages = fetch_result.data.get('messages', [])
-                if not messages:
-                    break
-
-                # Extract message IDs
-                for msg in messages:
-                    msg_id = str(msg.get('id', ''))
-                    if msg_id:
-                        all_message_ids.append(msg_id)
-
-                # Check if there are more pages
-                pagination = fetch_result.data.get('pagination', {})
-                if not pagination.get('has_more', False):
-                    break
-
-                page += 1
-
-            if not all_message_ids:
-                return ServiceResult(success=True, data={
-                    'company': display_name,
-                    'cif': cif,
-                    'fetched': 0,
-                    'imported': 0,
-                    'skipped': 0,
-                    'errors': [],
-                })
-
-            # Import all messages (duplicates are automatically skipped)
-            import_result = self.import_from_anaf(cif, all_message_ids)
-
-            if import_result.success:
-                imported = import_result.data.get('imported', 0)
-                skipped = import_result.data.get('skipped', 0)
-                import_errors = import_result.data.get('errors', []) or []
+        result = EFacturaSyncEngine(self).sync_company(cif, display_name, days=days, incremental=incremental)
 
-                return ServiceResult(success=True, data={
-                    'company': display_name,
-                    'cif': cif,
-                    'fetched': len(all_message_ids),
-                    'imported': imported,
-                    'skipped': skipped,
-                    'errors': import_errors,
-                })
-            else:
-                return ServiceResult(
-                    success=False,
-                    error=f"Import failed: {import_result.error}"
-                )
+        if result.fetch_error:
+            return ServiceResult(
+                success=False,
+                error=f"Failed to fetch messages: {result.fetch_error}"
+            )
+        if result.error:
+            return ServiceResult(success=False, error=result.error)
 
-        except Exception as e:
-            logger.error(f"Error syncing company {cif}: {e}")
-            return ServiceResult(success=False, error=str(e))
+        return ServiceResult(success=True, data={
+            **result.to_dict(),
+            'errors': result.errors,
+        })
 
     # ============== Unallocated Invoices ==============
 
@@ -2077,6 +1999,11 @@ Only mark as duplicate if you're confident (>0.7) it's the same invoice."""
 
             conn.commit()
 
+            # Keep summary rollups in sync with the new allocations
+            if alloc_values:
+                from database import refresh_allocation_rollups
+                refresh_allocation_rollups([jarvis_id for _, jarvis_id in mappings])
+
             # Send notifications for created allocations (after commit)
             logger.info(
                 f"Notification check: allocations_created={len(allocations_created)}, "
@@ -0,0 +1,366 @@
+"""
+Concurrent e-Factura sync engine.
+
+Syncs several companies at once. Within a company, the message list pages
+after the first and the message downloads run on a bounded thread pool, so a
+nightly sync is limited by the slowest company rather than the sum of all of
+them.
+
+Every ANAF call for a CIF draws from the same hourly budget (the shared
+RateLimitState from get_rate_limit_state), so parallel workers can't exceed
+it. When a company's budget runs out its sync stops early: messages not yet
+downloaded are reported as 'deferred' and picked up by the next sync, since
+already-imported messages are skipped.
+
+Syncs are incremental: each successful run stores a high-water mark (the
+newest listed message) in its cursor_after, and the next run only lists
+messages created since then, minus a small overlap. Listed messages that are
+already imported are filtered out with one set-based query, so a routine sync
+with nothing new costs one list call and one lookup.
+
+Each download worker holds a database connection while it stores its
+message, so companies x downloads is capped at SYNC_DB_CONNECTIONS, derived
+from the connection pool size: the pool raises PoolError when it is empty
+instead of waiting.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, TYPE_CHECKING
+
+from core.database import POOL_MAX_CONN
+from core.utils.logging_config import get_logger
+
+if TYPE_CHECKING:
+    from .efactura_service import EFacturaService
+
+logger = get_logger('jarvis.core.connectors.efactura.sync_engine')
+
+# Companies synced at the same time
+SYNC_COMPANY_WORKERS = int(os.environ.get('EFACTURA_SYNC_COMPANY_WORKERS', 4))
+# Parallel list/download requests per company
+SYNC_DOWNLOAD_WORKERS = int(os.environ.get('EFACTURA_SYNC_DOWNLOAD_WORKERS', 4))
+# Pool connections sync workers may hold at once; the rest stay free for requests
+SYNC_DB_CONNECTIONS = int(os.environ.get('EFACTURA_SYNC_DB_CONNECTIONS', max(1, POOL_MAX_CONN - 4)))
+# Safety limit on message list pages per company
+MAX_PAGES = 50
+# Incremental syncs re-list this far before the high-water mark, in case ANAF
+# lists a message some time after its data_creare
+HIGH_WATER_OVERLAP = timedelta(minutes=int(os.environ.get('EFACTURA_SYNC_OVERLAP_MINUTES', 60)))
+
+
+def _message_created_at(message: Dict[str, Any]) -> Optional[datetime]:
+    """Parse ANAF data_creare ('YYYYMMDDHHMM'; the mock client adds seconds)."""
+    value = str(message.get('data_creare') or '')
+    # By length: strptime would also read 'HHMM' as 'HMS'
+    fmt = {12: '%Y%m%d%H%M', 14: '%Y%m%d%H%M%S'}.get(len(value))
+    if fmt is None:
+        return None
+    try:
+        return datetime.strptime(value, fmt)
+    except ValueError:
+        return None
+
+
+def high_water_mark(messages: List[Dict[str, Any]]) -> Optional[str]:
+    """Cursor of the newest message: 'YYYYMMDDHHMMSS:message_id'."""
+    newest = None
+    for msg in messages:
+        created_at = _message_created_at(msg)
+        if created_at is not None:
+            key = (created_at, str(msg.get('id', '')))
+            if newest is None or key > newest:
+                newest = key
+    if newest is None:
+        return None
+    return f"{newest[0]:%Y%m%d%H%M%S}:{newest[1]}"
+
+
+def parse_high_water_mark(mark: Optional[str]) -> Optional[datetime]:
+    """Creation time stored in a high_water_mark() cursor."""
+    if not mark:
+        return None
+    try:
+        return datetime.strptime(mark.split(':', 1)[0], '%Y%m%d%H%M%S')
+    except ValueError:
+        return None
+
+
+@dataclass
+class CompanySyncResult:
+    """Outcome and throughput of one company's sync."""
+    cif: str
+    company: str
+    fetched: int = 0
+    new: int = 0  # Listed messages not imported yet
+    imported: int = 0
+    skipped: int = 0
+    deferred: int = 0
+    api_requests: int = 0
+    errors: List[str] = field(default_factory=list)
+    fetch_error: Optional[str] = None  # First message list page failed
+    error: Optional[str] = None        # Unexpected failure that stopped the sync
+    duration_seconds: float = 0.0
+    budget_remaining: Optional[int] = None
+    high_water_mark: Optional[str] = None
+
+    @property
+    def messages_per_second(self) -> float:
+        processed = self.imported + self.skipped
+        return round(processed / self.duration_seconds, 2) if self.duration_seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Per-company entry for sync_all's company_results."""
+        return {
+            'company': self.company,
+            'cif': self.cif,
+            'fetched': self.fetched,
+            'new': self.new,
+            'imported': self.imported,
+            'skipped': self.skipped,
+            'deferred': self.deferred,
+            'errors': len(self.errors),
+            'api_requests': self.api_requests,
+            'duration_seconds': round(self.duration_seconds, 2),
+            'messages_per_second': self.messages_per_second,
+            'budget_remaining': self.budget_remaining,
+            'high_water_mark': self.high_water_mark,
+        }
+
+
+class EFacturaSyncEngine:
+    """Runs received-invoice syncs for many companies concurrently."""
+
+    def __init__(
+        self,
+        service: 'EFacturaService',
+        company_workers: Optional[int] = None,
+        download_workers: Optional[int] = None,
+    ):
+        self.service = service
+        company_workers = max(1, company_workers or SYNC_COMPANY_WORKERS)
+        download_workers = max(1, download_workers or SYNC_DOWNLOAD_WORKERS)
+
+        # Every download worker of every company may hold a pool connection;
+        # fewer companies at once first, then fewer downloads per company
+        slots = max(1, SYNC_DB_CONNECTIONS)
+        self.company_workers = max(1, min(company_workers, slots // download_workers))
+        self.download_workers = max(1, min(download_workers, slots // self.company_workers))
+        if (self.company_workers, self.download_workers) != (company_workers, download_workers):
+            logger.info(
+                f"Sync workers reduced to {self.company_workers} companies x "
+                f"{self.download_workers} downloads to fit {slots} database connections"
+            )
+
+    def sync_companies(
+        self,
+        connections: List[Dict[str, Any]],
+        days: int = 60,
+        incremental: bool = True,
+    ) -> List[CompanySyncResult]:
+        """Sync all connections in parallel. Results keep the connections' order."""
+        if not connections:
+            return []
+
+        # All companies' high-water marks in one query
+        marks = self._high_water_marks([conn['cif'] for conn in connections]) if incremental else {}
+
+        def sync(conn):
+            return self._sync_company(conn['cif'], conn.get('display_name', conn['cif']), days, marks.get(conn['cif']))
+
+        workers = min(self.company_workers, len(connections))
+        if workers == 1:
+            return [sync(conn) for conn in connections]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='efactura-sync') as pool:
+            return list(pool.map(sync, connections))
+
+    def sync_company(
+        self,
+        cif: str,
+        display_name: Optional[str] = None,
+        days: int = 60,
+        incremental: bool = True,
+    ) -> CompanySyncResult:
+        """
+        List a company's received messages and import the new ones.
+
+        Args:
+            cif: Company CIF
+            display_name: Company name for results and logs
+            days: Look-back window; the most an incremental sync lists
+            incremental: List only messages since the last successful sync
+                (False rescans the whole window)
+        """
+        mark = self._high_water_marks([cif]).get(cif) if incremental else None
+        return self._sync_company(cif, display_name, days, mark)
+
+    def _high_water_marks(self, cifs: List[str]) -> Dict[str, str]:
+        try:
+            return self.service.sync_repo.get_high_water_marks(cifs)
+        except Exception as e:
+            # A full rescan is always safe, just slower
+            logger.warning(f"Could not load sync high-water marks, rescanning: {e}")
+            return {}
+
+    def _sync_company(
+        self,
+        cif: str,
+        display_name: Optional[str],
+        days: int,
+        mark: Optional[str],
+    ) -> CompanySyncResult:
+        result = CompanySyncResult(cif=cif, company=display_name or cif, high_water_mark=mark)
+        start = time.monotonic()
+        client = None
+
+        try:
+            since = parse_high_water_mark(mark)
+            if since is not None:
+                since -= HIGH_WATER_OVERLAP
+            logger.info(
+                f"Syncing company {result.company} ({cif})",
+                extra={'since': since.isoformat() if since else None},
+            )
+            client = self.service.get_anaf_client(cif)
+
+            messages = self._list_messages(client, cif, days, since, result)
+            result.fetched = len(messages)
+            message_ids = [str(msg['id']) for msg in messages]
+
+            # Already-imported messages (the overlap window, or everything on a
+            # full rescan) and messages that failed permanently are dropped
+            # with set-based lookups
+            known = set()
+            if message_ids:
+                known = self.service.invoice_repo.get_existing_message_ids(message_ids)
+                known |= self.service.sync_repo.get_permanently_failed_message_ids(message_ids)
+            new_ids = [msg_id for msg_id in message_ids if msg_id not in known]
+            result.new = len(new_ids)
+            result.skipped = len(message_ids) - len(new_ids)
+
+            # A failed page may hide messages older than the newest one, so
+            # the mark only moves when the whole listing succeeded
+            new_mark = high_water_mark(messages) if not result.errors else None
+            if new_mark and mark and new_mark < mark:
+                new_mark = mark
+
+            # Nothing new: no sync run, the mark stays. The first sync of a
+            # company still records one so the next sync can be incremental.
+            if new_ids or (new_mark and not mark):
+                import_result = self.service.import_from_anaf(
+                    cif, new_ids, client=client, workers=self.download_workers,
+                    cursor_before=mark, cursor_after=new_mark,
+                )
+                if import_result.success:
+                    data = import_result.data
+                    result.imported = data.get('imported', 0)
+                    result.skipped += data.get('skipped', 0)
+                    result.deferred = data.get('deferred', 0)
+                    result.api_requests += data.get('downloaded', 0)
+                    result.errors.extend(data.get('errors') or [])
+                    # Permanent failures are recorded and skipped from now on,
+                    # so only retryable errors hold the mark back
+                    retryable_errors = data.get('errors_count', 0) - data.get('permanent_errors', 0)
+                    if new_mark and not retryable_errors and not result.deferred:
+                        result.high_water_mark = new_mark
+                    if result.deferred:
+                        result.errors.append(
+                            f"Rate limit reached, {result.deferred} messages deferred to next sync"
+                        )
+                else:
+                    result.errors.append(f"Import failed - {import_result.error}")
+
+        except Exception as e:
+            logger.error(f"Error syncing company {cif}: {e}")
+            result.error = str(e)
+            result.errors.append(str(e))
+        finally:
+            result.duration_seconds = time.monotonic() - start
+            # Clients are pooled per CIF (client.registry), so the session
+            # stays open for the next run instead of being closed here
+            if client is not None:
+                try:
+                    result.budget_remaining = client.get_rate_limit_status().get('remaining')
+                except Exception:
+                    pass
+
+        logger.info(
+            "Company sync completed",
+            extra={
+                'cif': cif,
+                'fetched': result.fetched,
+                'new': result.new,
+                'imported': result.imported,
+                'deferred': result.deferred,
+                'api_requests': result.api_requests,
+                'duration_seconds': round(result.duration_seconds, 2),
+                'messages_per_second': result.messages_per_second,
+            }
+        )
+        return result
+
+    def _list_messages(
+        self,
+        client,
+        cif: str,
+        days: int,
+        since: Optional[datetime],
+        result: CompanySyncResult,
+    ) -> List[Dict[str, Any]]:
+        """
+        Received messages across all pages, without duplicates.
+
+        The first page gives the page count; the rest are fetched in parallel.
+        A failed first page sets result.fetch_error; a failed later page is
+        recorded and the other pages are still imported.
+        """
+        def list_page(page: int) -> Dict[str, Any]:
+            return client.list_messages(
+                company_cif=cif,
+                days=days,
+                page=page,
+                filter_type='P',  # Only fetch Received (Primite) invoices
+                since=since,
+            )
+
+        result.api_requests += 1
+        try:
+            pages = [list_page(1)]
+        except Exception as e:
+            result.fetch_error = str(e)
+            result.errors.append(f"Failed to fetch - {e}")
+            return []
+
+        total_pages = pages[0].get('total_pages', 1) if pages[0].get('has_more') else 1
+        if total_pages > MAX_PAGES:
+            # Messages on the pages left out were never seen, so this is an
+            # error: it keeps the high-water mark from moving past them
+            result.errors.append(
+                f"Listing truncated at {MAX_PAGES} of {total_pages} pages - "
+                f"high-water mark kept, later pages not imported"
+            )
+            total_pages = MAX_PAGES
+        if total_pages > 1:
+            result.api_requests += total_pages - 1
+            workers = min(self.download_workers, total_pages - 1)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='efactura-list') as pool:
+                futures = {page: pool.submit(list_page, page) for page in range(2, total_pages + 1)}
+                for page, future in futures.items():
+                    try:
+                        pages.append(future.result())
+                    except Exception as e:
+                        result.errors.append(f"Failed to fetch page {page} - {e}")
+
+        # The same message can't be imported twice concurrently
+        messages = []
+        seen = set()
+        for page in pages:
+            for msg in page.get('messages', []):
+                msg_id = str(msg.get('id', ''))
+                if msg_id and msg_id not in seen:
+                    seen.add(msg_id)
+                    messages.append(msg)
+        return messages
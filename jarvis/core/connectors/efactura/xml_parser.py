@@ -3,12 +3,17 @@ e-Factura XML Parser
 
 Parses UBL 2.1 XML invoices from ANAF e-Factura system.
 Extracts invoice data into structured ParsedInvoice objects.
+
+The parser streams: invoice lines are parsed as soon as each one ends and are
+then dropped, so only the header stays in memory. Invoices with thousands of
+lines (fuel cards, telecom) no longer need a full element tree.
 """
 
+import io
 import re
 from decimal import Decimal, InvalidOperation
 from datetime import date
-from typing import Optional
+from typing import Optional, Union, IO, Callable
 from xml.etree import ElementTree as ET
 
 from core.utils.logging_config import get_logger
@@ -24,106 +29,144 @@ NAMESPACES = {
     'ext': 'urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2',
 }
 
-
-def parse_invoice_xml(xml_content: str) -> ParsedInvoice:
+for _prefix, _uri in NAMESPACES.items():
+    ET.register_namespace(_prefix, _uri)
+
+INVOICE_LINE_TAG = f"{{{NAMESPACES['cac']}}}InvoiceLine"
+
+# Document-level lookups. The tree parser took the first match anywhere in
+# the document, so one missing from the header could come from a line (e.g. a
+# line's cbc:Note); the streaming parser keeps that by remembering the first
+# line match of each lookup the header doesn't have.
+HEADER_PATHS = (
+    './/cbc:ID',
+    './/cbc:IssueDate',
+    './/cbc:DueDate',
+    './/cbc:DocumentCurrencyCode',
+    './/cac:AccountingSupplierParty/cac:Party',
+    './/cac:AccountingCustomerParty/cac:Party',
+    './/cac:LegalMonetaryTotal',
+    './/cac:TaxTotal',
+    './/cac:PaymentMeans',
+    './/cac:PaymentTerms',
+    './/cbc:Note',
+)
+
+
+def _clark(path: str) -> str:
+    """'cac:Party' -> '{urn:...}Party'"""
+    prefix, _, local = path.rpartition(':')
+    return f'{{{NAMESPACES[prefix]}}}{local}' if prefix else path
+
+
+# First tag of each header path, to skip lines that can't contain a match
+_HEADER_PATH_TAGS = {path: _clark(path[3:].split('/')[0]) for path in HEADER_PATHS}
+
+# Invoice line tags, matched directly instead of through namespaced find()
+_LINE_ID = _clark('cbc:ID')
+_LINE_ITEM = _clark('cac:Item')
+_LINE_QUANTITY = _clark('cbc:InvoicedQuantity')
+_LINE_PRICE = _clark('cac:Price')
+_LINE_AMOUNT = _clark('cbc:LineExtensionAmount')
+_ITEM_DESCRIPTION = _clark('cbc:Description')
+_ITEM_NAME = _clark('cbc:Name')
+_ITEM_SELLERS_ID = _clark('cac:SellersItemIdentification')
+_ITEM_BUYERS_ID = _clark('cac:BuyersItemIdentification')
+_ITEM_COMMODITY = _clark('cac:CommodityClassification')
+_ITEM_CLASSIFICATION_CODE = _clark('cbc:ItemClassificationCode')
+_ITEM_TAX_CATEGORY = _clark('cac:ClassifiedTaxCategory')
+_PERCENT = _clark('cbc:Percent')
+_PRICE_AMOUNT = _clark('cbc:PriceAmount')
+
+
+def parse_invoice_xml(xml_content: Union[str, bytes], include_lines: bool = True) -> ParsedInvoice:
     """
     Parse e-Factura UBL 2.1 XML content into a ParsedInvoice object.
 
     Args:
-        xml_content: The XML content as a string
+        xml_content: The XML content as a string, or raw bytes (parsed
+            without decoding to a string first)
+        include_lines: Parse line items; False skips them when only the
+            header and totals are needed
 
     Returns:
         ParsedInvoice object with extracted data
     """
-    try:
-        # Parse XML
-        root = ET.fromstring(xml_content)
+    source = io.BytesIO(xml_content) if isinstance(xml_content, bytes) else io.StringIO(xml_content)
+    return parse_invoice_stream(source, include_lines=include_lines)
 
-        # Register namespaces for searching
-        for prefix, uri in NAMESPACES.items():
-            ET.register_namespace(prefix, uri)
 
-        invoice = ParsedInvoice()
+def parse_invoice_stream(source: IO, include_lines: bool = True) -> ParsedInvoice:
+    """
+    Parse e-Factura UBL 2.1 XML incrementally from a file-like object.
 
-        # Basic invoice info
-        invoice.invoice_number = _get_text(root, './/cbc:ID')
-        invoice.issue_date = _parse_date(_get_text(root, './/cbc:IssueDate'))
-        invoice.due_date = _parse_date(_get_text(root, './/cbc:DueDate'))
-
-        # Currency
-        invoice.currency = _get_text(root, './/cbc:DocumentCurrencyCode') or 'RON'
-
-        # Seller (supplier) info
-        seller = root.find('.//cac:AccountingSupplierParty/cac:Party', NAMESPACES)
-        if seller is not None:
-            invoice.seller_name = _get_party_name(seller)
-            invoice.seller_cif = _get_party_cif(seller)
-            invoice.seller_address = _get_party_address(seller)
-            invoice.seller_reg_number = _get_text(seller, './/cbc:CompanyID')
-
-        # Buyer (customer) info
-        buyer = root.find('.//cac:AccountingCustomerParty/cac:Party', NAMESPACES)
-        if buyer is not None:
-            invoice.buyer_name = _get_party_name(buyer)
-            invoice.buyer_cif = _get_party_cif(buyer)
-            invoice.buyer_address = _get_party_address(buyer)
-
-        # Amounts from LegalMonetaryTotal
-        monetary_total = root.find('.//cac:LegalMonetaryTotal', NAMESPACES)
-        if monetary_total is not None:
-            invoice.total_without_vat = _parse_decimal(
-                _get_text(monetary_total, 'cbc:TaxExclusiveAmount')
-            )
-            invoice.total_amount = _parse_decimal(
-                _get_text(monetary_total, 'cbc:TaxInclusiveAmount') or
-                _get_text(monetary_total, 'cbc:PayableAmount')
-            )
+    Reads `source` in chunks (e.g. straight from zipfile.ZipFile.open()),
+    appends each InvoiceLineItem as its element ends and then discards the
+    element. The result is the same as parsing the whole tree.
 
-        # VAT from TaxTotal
-        tax_total = root.find('.//cac:TaxTotal', NAMESPACES)
-        if tax_total is not None:
-            invoice.total_vat = _parse_decimal(
-                _get_text(tax_total, 'cbc:TaxAmount')
-            )
+    Args:
+        source: Binary or text file-like object with the XML
+        include_lines: Parse line items; False skips them
 
-            # VAT breakdown
-            for subtotal in tax_total.findall('cac:TaxSubtotal', NAMESPACES):
-                category = subtotal.find('cac:TaxCategory', NAMESPACES)
-                if category is not None:
-                    rate = _parse_decimal(_get_text(category, 'cbc:Percent'))
-                    amount = _parse_decimal(_get_text(subtotal, 'cbc:TaxAmount'))
-                    taxable = _parse_decimal(_get_text(subtotal, 'cbc:TaxableAmount'))
-
-                    invoice.vat_breakdown.append({
-                        'rate': rate,
-                        'amount': amount,
-                        'taxable': taxable,
-                    })
-
-        # If totals not found in LegalMonetaryTotal, calculate from VAT
-        if invoice.total_amount == Decimal('0') and invoice.total_without_vat > 0:
-            invoice.total_amount = invoice.total_without_vat + invoice.total_vat
-
-        # Payment info
-        payment_means = root.find('.//cac:PaymentMeans', NAMESPACES)
-        if payment_means is not None:
-            invoice.payment_means = _get_text(payment_means, 'cbc:PaymentMeansCode')
-            account = payment_means.find('cac:PayeeFinancialAccount', NAMESPACES)
-            if account is not None:
-                invoice.bank_account = _get_text(account, 'cbc:ID')
-
-        payment_terms = root.find('.//cac:PaymentTerms', NAMESPACES)
-        if payment_terms is not None:
-            invoice.payment_terms = _get_text(payment_terms, 'cbc:Note')
-
-        # Notes
-        invoice.invoice_note = _get_text(root, './/cbc:Note')
-
-        # Line items (optional - can be omitted for performance)
-        for line_elem in root.findall('.//cac:InvoiceLine', NAMESPACES):
-            line = _parse_line_item(line_elem)
-            if line:
-                invoice.line_items.append(line)
+    Returns:
+        ParsedInvoice object with extracted data
+    """
+    try:
+        invoice = ParsedInvoice()
+        root = None
+        depth = 0
+        header_matched = None  # Header paths matched before the first line
+        line_matches = {}      # Header path -> first match inside a line
+        pending = ()           # Header paths still looked for in lines
+        line_tags = set()
+
+        for event, elem in ET.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                elif depth == 1 and elem.tag == INVOICE_LINE_TAG and header_matched is None:
+                    header_matched = _header_matches(root, elem)
+                    pending = [p for p in HEADER_PATHS if p not in header_matched]
+                elif depth > 1 and pending:
+                    line_tags.add(elem.tag)
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth != 1 or elem.tag != INVOICE_LINE_TAG:
+                continue
+
+            if pending and line_tags:
+                for path in pending:
+                    if _HEADER_PATH_TAGS[path] in line_tags:
+                        found = elem.find(path, NAMESPACES)
+                        if found is not None:
+                            line_matches[path] = found
+                pending = [p for p in pending if p not in line_matches]
+                line_tags.clear()
+
+            if include_lines:
+                line = _parse_line_item(elem)
+                if line:
+                    invoice.line_items.append(line)
+
+            # Earlier lines are already gone, so this is near the front
+            root.remove(elem)
+            elem.clear()
+
+        if include_lines and root is not None:
+            # Lines nested below the root's children (not valid UBL) were kept
+            for line_elem in root.findall('.//cac:InvoiceLine', NAMESPACES):
+                line = _parse_line_item(line_elem)
+                if line:
+                    invoice.line_items.append(line)
+
+        def find(path: str) -> Optional[ET.Element]:
+            if header_matched is not None and path not in header_matched and path in line_matches:
+                return line_matches[path]
+            return root.find(path, NAMESPACES)
+
+        _parse_header(invoice, find)
 
         logger.info(
             "Parsed e-Factura XML",
@@ -132,6 +175,7 @@ def parse_invoice_xml(xml_content: str) -> ParsedInvoice:
                 'seller': invoice.seller_name,
                 'buyer': invoice.buyer_name,
                 'total': str(invoice.total_amount),
+                'lines': len(invoice.line_items),
             }
         )
 
@@ -145,15 +189,138 @@ def parse_invoice_xml(xml_content: str) -> ParsedInvoice:
         raise
 
 
+def _header_matches(root: ET.Element, first_line: ET.Element) -> set:
+    """
+    HEADER_PATHS that match before the first invoice line.
+
+    iterparse builds the tree ahead of the events it yields, so the root may
+    already hold later lines; only its children before first_line count.
+    """
+    header = ET.Element(root.tag)
+    for child in root:
+        if child is first_line:
+            break
+        header.append(child)
+    return {path for path in HEADER_PATHS if header.find(path, NAMESPACES) is not None}
+
+
+def _parse_invoice_tree(xml_content: Union[str, bytes]) -> ParsedInvoice:
+    """
+    Previous implementation: build the whole tree, then search it.
+
+    Kept as the reference the streaming parser must match (tests and
+    scripts/benchmark_efactura_parser.py).
+    """
+    try:
+        root = ET.fromstring(xml_content)
+    except ET.ParseError as e:
+        raise ValueError(f"Invalid XML: {e}")
+
+    invoice = ParsedInvoice()
+    _parse_header(invoice, lambda path: root.find(path, NAMESPACES))
+    for line_elem in root.findall('.//cac:InvoiceLine', NAMESPACES):
+        line = _parse_line_item_tree(line_elem)
+        if line:
+            invoice.line_items.append(line)
+    return invoice
+
+
+def _parse_header(invoice: ParsedInvoice, find: Callable[[str], Optional[ET.Element]]) -> None:
+    """
+    Fill everything but the line items.
+
+    Args:
+        invoice: Invoice to fill
+        find: Resolves one of HEADER_PATHS to the document's first match
+    """
+    # Basic invoice info
+    invoice.invoice_number = _element_text(find('.//cbc:ID'))
+    invoice.issue_date = _parse_date(_element_text(find('.//cbc:IssueDate')))
+    invoice.due_date = _parse_date(_element_text(find('.//cbc:DueDate')))
+
+    # Currency
+    invoice.currency = _element_text(find('.//cbc:DocumentCurrencyCode')) or 'RON'
+
+    # Seller (supplier) info
+    seller = find('.//cac:AccountingSupplierParty/cac:Party')
+    if seller is not None:
+        invoice.seller_name = _get_party_name(seller)
+        invoice.seller_cif = _get_party_cif(seller)
+        invoice.seller_address = _get_party_address(seller)
+        invoice.seller_reg_number = _get_text(seller, './/cbc:CompanyID')
+
+    # Buyer (customer) info
+    buyer = find('.//cac:AccountingCustomerParty/cac:Party')
+    if buyer is not None:
+        invoice.buyer_name = _get_party_name(buyer)
+        invoice.buyer_cif = _get_party_cif(buyer)
+        invoice.buyer_address = _get_party_address(buyer)
+
+    # Amounts from LegalMonetaryTotal
+    monetary_total = find('.//cac:LegalMonetaryTotal')
+    if monetary_total is not None:
+        invoice.total_without_vat = _parse_decimal(
+            _get_text(monetary_total, 'cbc:TaxExclusiveAmount')
+        )
+        invoice.total_amount = _parse_decimal(
+            _get_text(monetary_total, 'cbc:TaxInclusiveAmount') or
+            _get_text(monetary_total, 'cbc:PayableAmount')
+        )
+
+    # VAT from TaxTotal
+    tax_total = find('.//cac:TaxTotal')
+    if tax_total is not None:
+        invoice.total_vat = _parse_decimal(
+            _get_text(tax_total, 'cbc:TaxAmount')
+        )
+
+        # VAT breakdown
+        for subtotal in tax_total.findall('cac:TaxSubtotal', NAMESPACES):
+            category = subtotal.find('cac:TaxCategory', NAMESPACES)
+            if category is not None:
+                rate = _parse_decimal(_get_text(category, 'cbc:Percent'))
+                amount = _parse_decimal(_get_text(subtotal, 'cbc:TaxAmount'))
+                taxable = _parse_decimal(_get_text(subtotal, 'cbc:TaxableAmount'))
+
+                invoice.vat_breakdown.append({
+                    'rate': rate,
+                    'amount': amount,
+                    'taxable': taxable,
+                })
+
+    # If totals not found in LegalMonetaryTotal, calculate from VAT
+    if invoice.total_amount == Decimal('0') and invoice.total_without_vat > 0:
+        invoice.total_amount = invoice.total_without_vat + invoice.total_vat
+
+    # Payment info
+    payment_means = find('.//cac:PaymentMeans')
+    if payment_means is not None:
+        invoice.payment_means = _get_text(payment_means, 'cbc:PaymentMeansCode')
+        account = payment_means.find('cac:PayeeFinancialAccount', NAMESPACES)
+        if account is not None:
+            invoice.bank_account = _get_text(account, 'cbc:ID')
+
+    payment_terms = find('.//cac:PaymentTerms')
+    if payment_terms is not None:
+        invoice.payment_terms = _get_text(payment_terms, 'cbc:Note')
+
+    # Notes
+    invoice.invoice_note = _element_text(find('.//cbc:Note'))
+
+
+def _element_text(found: Optional[ET.Element]) -> Optional[str]:
+    """Stripped text of an element, None if missing or empty."""
+    if found is not None and found.text:
+        return found.text.strip()
+    return None
+
+
 def _get_text(element: Optional[ET.Element], path: str) -> Optional[str]:
     """Get text content from element at path."""
     if element is None:
         return None
 
-    found = element.find(path, NAMESPACES)
-    if found is not None and found.text:
-        return found.text.strip()
-    return None
+    return _element_text(element.find(path, NAMESPACES))
 
 
 def _parse_date(date_str: Optional[str]) -> Optional[date]:
@@ -270,8 +437,8 @@ def _get_party_address(party: ET.Element) -> Optional[str]:
     return ', '.join(parts) if parts else None
 
 
-def _parse_line_item(line: ET.Element) -> Optional[InvoiceLineItem]:
-    """Parse a single invoice line item."""
+def _parse_line_item_tree(line: ET.Element) -> Optional[InvoiceLineItem]:
+    """Parse a single invoice line item with namespaced finds (tree parser)."""
     try:
         item = InvoiceLineItem()
 
@@ -329,3 +496,81 @@ def _parse_line_item(line: ET.Element) -> Optional[InvoiceLineItem]:
     except Exception as e:
         logger.warning(f"Error parsing line item: {e}")
         return None
+
+
+def _first_children(element: ET.Element) -> dict:
+    """Tag -> first direct child with that tag (what find('prefix:tag') returns)."""
+    first = {}
+    for child in element:
+        if child.tag not in first:
+            first[child.tag] = child
+    return first
+
+
+def _nested_child(element: ET.Element, tag: str, child_tag: str) -> Optional[ET.Element]:
+    """What find('tag/child_tag') returns: the first child_tag under any tag child."""
+    for child in element:
+        if child.tag == tag:
+            for grandchild in child:
+                if grandchild.tag == child_tag:
+                    return grandchild
+    return None
+
+
+def _parse_line_item(line: ET.Element) -> Optional[InvoiceLineItem]:
+    """
+    Parse a single invoice line item.
+
+    One pass over the line's children; gives the same result as
+    _parse_line_item_tree().
+    """
+    try:
+        item = InvoiceLineItem()
+        children = _first_children(line)
+
+        item.line_number = int(_element_text(children.get(_LINE_ID)) or '0')
+
+        # Get item info
+        item_elem = children.get(_LINE_ITEM)
+        if item_elem is not None:
+            item_children = _first_children(item_elem)
+            item.description = _element_text(item_children.get(_ITEM_DESCRIPTION)) or \
+                _element_text(item_children.get(_ITEM_NAME)) or ''
+
+            # Item identification codes
+            item.seller_item_id = _element_text(_nested_child(item_elem, _ITEM_SELLERS_ID, _LINE_ID))
+            item.buyer_item_id = _element_text(_nested_child(item_elem, _ITEM_BUYERS_ID, _LINE_ID))
+
+            # Commodity code
+            commodity = _nested_child(item_elem, _ITEM_COMMODITY, _ITEM_CLASSIFICATION_CODE)
+            if commodity is not None:
+                item.commodity_code = commodity.text
+
+            # VAT rate
+            tax_cat = item_children.get(_ITEM_TAX_CATEGORY)
+            if tax_cat is not None:
+                item.vat_rate = _parse_decimal(_element_text(tax_cat.find(_PERCENT)))
+
+        # Quantity and unit
+        qty_elem = children.get(_LINE_QUANTITY)
+        item.quantity = _parse_decimal(_element_text(qty_elem))
+        if qty_elem is not None:
+            item.unit = qty_elem.get('unitCode', 'BUC')
+
+        # Pricing
+        price = children.get(_LINE_PRICE)
+        if price is not None:
+            item.unit_price = _parse_decimal(_element_text(price.find(_PRICE_AMOUNT)))
+
+        # Line total
+        item.line_amount = _parse_decimal(_element_text(children.get(_LINE_AMOUNT)))
+
+        # Calculate VAT amount if we have rate and amount
+        if item.vat_rate > 0 and item.line_amount > 0:
+            item.vat_amount = item.line_amount * (item.vat_rate / 100)
+
+        return item
+
+    except Exception as e:
+        logger.warning(f"Error parsing line item: {e}")
+        return None
@@ -45,6 +45,7 @@ from database import (
     _is_cache_valid,
     _get_cache_data,
     _set_cache_data,
+    get_cache_stats,
 )
 
 # Also export psycopg2 for type hints and error handling
@@ -69,6 +70,7 @@ __all__ = [
     '_is_cache_valid',
     '_get_cache_data',
     '_set_cache_data',
+    'get_cache_stats',
     'psycopg2',
     'RealDictCursor',
 ]
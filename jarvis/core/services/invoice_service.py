@@ -14,6 +14,7 @@ from database import (
     get_all_invoices,
     get_invoice_with_allocations,
     get_invoices_with_allocations,
+    get_next_invoice_cursor,
     search_invoices,
     get_summary_by_company,
     get_summary_by_department,
@@ -68,6 +69,7 @@ class InvoiceService:
         payment_status: Optional[str] = None,
         include_deleted: bool = False,
         include_allocations: bool = False,
+        cursor: Optional[str] = None,
     ) -> ServiceResult:
         """
         Get all invoices with optional filters.
@@ -85,9 +87,12 @@ class InvoiceService:
             payment_status: Filter by payment status
             include_deleted: Include soft-deleted invoices
             include_allocations: Include allocation details
+            cursor: Keyset pagination cursor. '' requests the first page;
+                None keeps offset pagination.
 
         Returns:
-            ServiceResult with list of invoices
+            ServiceResult with list of invoices, or with
+            {'invoices': [...], 'next_cursor': str | None} when cursor is given
         """
         try:
             if include_allocations:
@@ -103,6 +108,7 @@ class InvoiceService:
                     status=status,
                     payment_status=payment_status,
                     include_deleted=include_deleted,
+                    page_cursor=cursor or None,
                 )
             else:
                 invoices = get_all_invoices(
@@ -117,8 +123,14 @@ class InvoiceService:
                     status=status,
                     payment_status=payment_status,
                     include_deleted=include_deleted,
+                    page_cursor=cursor or None,
                 )
 
+            if cursor is not None:
+                return ServiceResult(success=True, data={
+                    'invoices': invoices,
+                    'next_cursor': get_next_invoice_cursor(invoices, limit),
+                })
             return ServiceResult(success=True, data=invoices)
 
         except Exception as e:
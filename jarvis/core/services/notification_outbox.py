@@ -0,0 +1,385 @@
+"""Background dispatcher for the notification outbox.
+
+Saving an invoice queues its allocation emails in notification_outbox within
+the same transaction (see database.save_invoice). The dispatcher drains the
+outbox off the request path: it claims due events in batches, sends all of a
+batch's emails over one SMTP connection, records each email in
+notification_log and schedules failed events for retry with exponential
+backoff.
+
+Usage:
+    dispatcher = get_notification_dispatcher().start()  # daemon thread per worker
+    ...
+    wake_notification_dispatcher()  # after queueing, send without waiting for the poll
+"""
+
+import os
+import json
+import smtplib
+import ssl
+import threading
+from typing import Optional
+
+from core.utils.logging_config import get_logger
+from core.services.notification_service import (
+    get_smtp_config,
+    is_notifications_enabled,
+    build_email,
+    allocation_email_subject,
+    create_allocation_email_html,
+    create_allocation_email_text,
+    find_responsables_for_allocation,
+    fill_allocation_amounts,
+)
+from database import (
+    claim_notification_outbox,
+    complete_notification_outbox,
+    get_responsables_by_department,
+    get_department_cc_email,
+    log_notification,
+    update_notification_status,
+)
+
+logger = get_logger('jarvis.notification.outbox')
+
+# Events claimed (and emails sent over one SMTP connection) per batch
+OUTBOX_BATCH_SIZE = int(os.environ.get('NOTIFICATION_OUTBOX_BATCH_SIZE', 50))
+# Idle wait between outbox polls; queueing wakes the dispatcher immediately
+OUTBOX_POLL_SECONDS = float(os.environ.get('NOTIFICATION_OUTBOX_POLL_SECONDS', 5))
+# Attempts per event before it is marked failed; retries back off exponentially
+MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', 5))
+RETRY_BASE_SECONDS = float(os.environ.get('NOTIFICATION_RETRY_BASE_SECONDS', 60))
+RETRY_MAX_SECONDS = 3600
+# Events left in 'processing' this long (dispatcher died mid-batch) are claimed again
+STALE_AFTER_SECONDS = 600
+SMTP_TIMEOUT_SECONDS = 30
+# 'off' disables the in-process dispatcher (e.g. when a separate process drains the outbox)
+DISPATCHER_ENABLED = os.environ.get('NOTIFICATION_DISPATCHER', 'on').lower() != 'off'
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before the next attempt: 60s, 2m, 4m, ... capped at 1h."""
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+
+
+class SMTPConnection:
+    """One SMTP connection reused for every email of a dispatch batch.
+
+    Connects on the first send. If the server drops an idle connection, it
+    reconnects once and resends; a failed connect is remembered so the rest
+    of the batch fails fast instead of reconnecting per email.
+    """
+
+    def __init__(self, config: dict, timeout: float = SMTP_TIMEOUT_SECONDS):
+        self.config = config
+        self.timeout = timeout
+        self.connections = 0
+        self.connect_error: Optional[str] = None
+        self._server: Optional[smtplib.SMTP] = None
+
+    def _connect(self):
+        config = self.config
+        try:
+            server = smtplib.SMTP(config['host'], config['port'], timeout=self.timeout)
+            try:
+                if config['use_tls']:
+                    server.starttls(context=ssl.create_default_context())
+                if config['username'] and config['password']:
+                    server.login(config['username'], config['password'])
+            except Exception:
+                server.close()
+                raise
+        except smtplib.SMTPAuthenticationError as e:
+            self.connect_error = f"SMTP authentication failed: {str(e)}"
+            raise
+        except Exception as e:
+            self.connect_error = f"SMTP connection failed: {str(e)}"
+            raise
+        self.connections += 1
+        self._server = server
+
+    def send(self, recipients: list[str], message: str):
+        if self.connect_error:
+            raise smtplib.SMTPConnectError(-1, self.connect_error)
+        if self._server is None:
+            self._connect()
+        try:
+            self._server.sendmail(self.config['from_email'], recipients, message)
+        except smtplib.SMTPServerDisconnected:
+            self._server = None
+            self._connect()
+            self._server.sendmail(self.config['from_email'], recipients, message)
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            self._server.close()
+        self._server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class _BatchLookups:
+    """Responsable and department CC lookups memoized for one batch.
+
+    Invoices in a batch usually share departments, so each (company,
+    department) pair is queried once per batch instead of once per allocation.
+    """
+
+    def __init__(self):
+        self._responsables = {}
+        self._department_cc = {}
+
+    def responsables(self, department: str, company: str = None) -> list[dict]:
+        key = (department, company)
+        if key not in self._responsables:
+            self._responsables[key] = get_responsables_by_department(department, company)
+        return self._responsables[key]
+
+    def department_cc(self, company: str, department: str) -> Optional[str]:
+        if not company or not department:
+            return None
+        key = (company, department)
+        if key not in self._department_cc:
+            self._department_cc[key] = get_department_cc_email(company, department)
+        return self._department_cc[key]
+
+
+def build_allocation_messages(invoice_data: dict, allocations: list[dict], lookups: _BatchLookups) -> list[dict]:
+    """Allocation emails for an invoice, one per (allocation, responsable) with an email address.
+
+    Each message has a stable key ('<allocation index>:<responsable id>') used
+    to track delivery across retries.
+    """
+    messages = []
+    subject = allocation_email_subject(invoice_data)
+    for index, allocation in enumerate(allocations):
+        allocation = fill_allocation_amounts(invoice_data, dict(allocation))
+        department_cc = lookups.department_cc(allocation.get('company', ''), allocation.get('department', ''))
+        for responsable in find_responsables_for_allocation(allocation, lookup=lookups.responsables):
+            if not responsable.get('email'):
+                continue
+            name = responsable.get('name', 'User')
+            messages.append({
+                'key': f"{index}:{responsable.get('id')}",
+                'responsable_id': responsable.get('id'),
+                'email': responsable['email'],
+                'subject': subject,
+                'html_body': create_allocation_email_html(name, invoice_data, allocation),
+                'text_body': create_allocation_email_text(name, invoice_data, allocation),
+                'department_cc': department_cc,
+            })
+    return messages
+
+
+class NotificationDispatcher:
+    """Drains notification_outbox in a daemon thread (or on demand via dispatch_batch)."""
+
+    def __init__(
+        self,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_seconds: float = OUTBOX_POLL_SECONDS,
+        max_attempts: int = MAX_ATTEMPTS,
+        enabled: bool = DISPATCHER_ENABLED,
+    ):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.enabled = enabled
+        self.stats = {
+            'batches': 0,
+            'events': 0,
+            'emails_sent': 0,
+            'emails_failed': 0,
+            'smtp_connections': 0,
+            'retries_scheduled': 0,
+            'events_failed': 0,
+        }
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ============== Dispatch ==============
+
+    def dispatch_batch(self) -> dict:
+        """Claim due outbox events and send their emails over one SMTP connection.
+
+        Returns:
+            Dict with events, sent, failed and smtp_connections for this batch
+        """
+        result = {'events': 0, 'sent': 0, 'failed': 0, 'smtp_connections': 0}
+        events = claim_notification_outbox(self.batch_size, STALE_AFTER_SECONDS)
+        if not events:
+            return result
+        result['events'] = len(events)
+
+        config = get_smtp_config()
+        if not (config['host'] and config['from_email']) or not is_notifications_enabled():
+            logger.info(f"SMTP not configured or notifications disabled, skipping {len(events)} outbox events")
+            for event in events:
+                complete_notification_outbox(
+                    event['id'], 'skipped', event.get('progress') or {},
+                    'SMTP not configured or notifications disabled'
+                )
+            return result
+
+        lookups = _BatchLookups()
+        with SMTPConnection(config) as connection:
+            for event in events:
+                sent, failed = self._dispatch_event(event, config, connection, lookups)
+                result['sent'] += sent
+                result['failed'] += failed
+            result['smtp_connections'] = connection.connections
+
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['events'] += result['events']
+            self.stats['emails_sent'] += result['sent']
+            self.stats['emails_failed'] += result['failed']
+            self.stats['smtp_connections'] += result['smtp_connections']
+
+        logger.info(
+            f"Notification outbox batch: {result['events']} events, {result['sent']} sent, "
+            f"{result['failed']} failed, {result['smtp_connections']} SMTP connection(s)"
+        )
+        return result
+
+    def _dispatch_event(self, event: dict, config: dict, connection: SMTPConnection,
+                        lookups: _BatchLookups) -> tuple[int, int]:
+        """Send one event's emails, skipping those delivered by an earlier attempt."""
+        progress = dict(event.get('progress') or {})
+        errors = []
+        sent = 0
+
+        try:
+            if event['event_type'] != 'invoice_allocations':
+                raise ValueError(f"Unknown notification event type: {event['event_type']}")
+            payload = event['payload']
+            if isinstance(payload, str):
+                payload = json.loads(payload)
+            invoice_data = payload['invoice_data']
+            messages = build_allocation_messages(invoice_data, payload.get('allocations') or [], lookups)
+
+            for message in messages:
+                delivery = dict(progress.get(message['key']) or {})
+                if delivery.get('sent'):
+                    continue
+                if not delivery.get('log_id'):
+                    delivery['log_id'] = log_notification(
+                        responsable_id=message['responsable_id'],
+                        invoice_id=event.get('invoice_id'),
+                        notification_type='allocation',
+                        subject=message['subject'],
+                        message=message['text_body'],
+                        status='pending'
+                    )
+                try:
+                    email, recipients = build_email(
+                        config, message['email'], message['subject'], message['html_body'],
+                        message['text_body'], message['department_cc']
+                    )
+                    connection.send(recipients, email)
+                    delivery['sent'] = True
+                    sent += 1
+                    update_notification_status(delivery['log_id'], 'sent')
+                except Exception as e:
+                    error = connection.connect_error or f"Failed to send email: {str(e)}"
+                    errors.append(error)
+                    update_notification_status(delivery['log_id'], 'failed', error)
+                progress[message['key']] = delivery
+
+        except Exception as e:
+            logger.error(f"Error dispatching notification outbox event {event['id']}: {e}")
+            errors.append(str(e))
+
+        self._complete(event, progress, errors)
+        return sent, len(errors)
+
+    def _complete(self, event: dict, progress: dict, errors: list[str]):
+        if not errors:
+            complete_notification_outbox(event['id'], 'sent', progress)
+        elif event['attempts'] >= self.max_attempts:
+            logger.error(f"Notification outbox event {event['id']} failed after {event['attempts']} attempts: {errors[0]}")
+            complete_notification_outbox(event['id'], 'failed', progress, errors[0])
+            with self._lock:
+                self.stats['events_failed'] += 1
+        else:
+            delay = retry_delay(event['attempts'])
+            logger.warning(f"Notification outbox event {event['id']} will retry in {delay:.0f}s: {errors[0]}")
+            complete_notification_outbox(event['id'], 'pending', progress, errors[0], retry_in_seconds=delay)
+            with self._lock:
+                self.stats['retries_scheduled'] += 1
+
+    # ============== Background thread ==============
+
+    def start(self) -> 'NotificationDispatcher':
+        """Start the dispatcher thread if it isn't running (no-op when disabled)."""
+        if not self.enabled:
+            return self
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='notification-dispatcher', daemon=True)
+            self._thread.start()
+        logger.info('Notification dispatcher started')
+        return self
+
+    def wake(self):
+        """Dispatch now instead of at the next poll (starts the thread if needed)."""
+        self.start()
+        self._wake.set()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                result = self.dispatch_batch()
+            except Exception as e:
+                logger.error(f"Notification dispatcher batch failed: {e}")
+                result = None
+            # A full batch means more events are probably due - keep draining
+            if result and result['events'] >= self.batch_size:
+                continue
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+
+# Global dispatcher instance
+_dispatcher: Optional[NotificationDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_notification_dispatcher() -> NotificationDispatcher:
+    """Get or create the process-wide notification dispatcher."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher()
+        return _dispatcher
+
+
+def wake_notification_dispatcher():
+    """Send queued notifications now; never raises (queueing already succeeded)."""
+    try:
+        get_notification_dispatcher().wake()
+    except Exception as e:
+        logger.warning(f"Could not wake notification dispatcher: {e}")
@@ -47,6 +47,50 @@ def is_notifications_enabled() -> bool:
     return settings.get('notify_on_allocation', 'true').lower() == 'true'
 
 
+def build_email(
+    config: dict,
+    to_email: str,
+    subject: str,
+    html_body: str,
+    text_body: Optional[str] = None,
+    department_cc: Optional[str] = None,
+    skip_global_cc: bool = False
+) -> tuple[str, list[str]]:
+    """
+    Build a MIME email from SMTP config.
+
+    Returns:
+        tuple: (message as string, recipients - To plus all CCs)
+    """
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = f"{config['from_name']} <{config['from_email']}>" if config['from_name'] else config['from_email']
+    msg['To'] = to_email
+
+    # Build CC list from global CC and department CC
+    cc_addresses = []
+    global_cc = config.get('global_cc', '').strip()
+    if global_cc and not skip_global_cc:
+        cc_addresses.append(global_cc)
+    if department_cc and department_cc.strip():
+        dept_cc = department_cc.strip()
+        # Avoid duplicate if department CC is same as global CC
+        if dept_cc not in cc_addresses:
+            cc_addresses.append(dept_cc)
+
+    if cc_addresses:
+        msg['Cc'] = ', '.join(cc_addresses)
+
+    if text_body:
+        msg.attach(MIMEText(text_body, 'plain'))
+    msg.attach(MIMEText(html_body, 'html'))
+
+    # Build recipient list (To + all CCs)
+    recipients = [to_email]
+    recipients.extend(cc_addresses)
+    return msg.as_string(), recipients
+
+
 def send_email(
     to_email: str,
     subject: str,
@@ -78,32 +122,10 @@ def send_email(
         return False, "From email not configured"
 
     try:
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = f"{config['from_name']} <{config['from_email']}>" if config['from_name'] else config['from_email']
-        msg['To'] = to_email
-
-        # Build CC list from global CC and department CC
-        cc_addresses = []
-        global_cc = config.get('global_cc', '').strip()
-        if global_cc and not skip_global_cc:
-            cc_addresses.append(global_cc)
-        if department_cc and department_cc.strip():
-            dept_cc = department_cc.strip()
-            # Avoid duplicate if department CC is same as global CC
-            if dept_cc not in cc_addresses:
-                cc_addresses.append(dept_cc)
-
-        if cc_addresses:
-            msg['Cc'] = ', '.join(cc_addresses)
-
-        if text_body:
-            msg.attach(MIMEText(text_body, 'plain'))
-        msg.attach(MIMEText(html_body, 'html'))
-
-        # Build recipient list (To + all CCs)
-        recipients = [to_email]
-        recipients.extend(cc_addresses)
+        message, recipients = build_email(
+            config, to_email, subject, html_body, text_body, department_cc, skip_global_cc
+        )
+        cc_addresses = recipients[1:]
 
         if config['use_tls']:
             context = ssl.create_default_context()
@@ -111,12 +133,12 @@ def send_email(
                 server.starttls(context=context)
                 if config['username'] and config['password']:
                     server.login(config['username'], config['password'])
-                server.sendmail(config['from_email'], recipients, msg.as_string())
+                server.sendmail(config['from_email'], recipients, message)
         else:
             with smtplib.SMTP(config['host'], config['port']) as server:
                 if config['username'] and config['password']:
                     server.login(config['username'], config['password'])
-                server.sendmail(config['from_email'], recipients, msg.as_string())
+                server.sendmail(config['from_email'], recipients, message)
 
         logger.info(f"Email sent to {to_email}, CC: {cc_addresses if cc_addresses else 'none'}")
         return True, ""
@@ -159,6 +181,11 @@ def format_currency(value: float, currency: str = 'RON') -> str:
     return f"{value:,.2f} {currency}"
 
 
+def allocation_email_subject(invoice_data: dict) -> str:
+    """Subject line of allocation notification emails."""
+    return f"O noua bugetare MKT - {invoice_data.get('invoice_number', 'Factura')}"
+
+
 def create_allocation_email_html(
     responsable_name: str,
     invoice_data: dict,
@@ -372,13 +399,19 @@ Va rugam sa nu raspundeti la acest email.
 """
 
 
-def find_responsables_for_allocation(allocation: dict) -> list[dict]:
+def find_responsables_for_allocation(allocation: dict, lookup=None) -> list[dict]:
     """
     Find all responsables that should be notified for a given allocation.
 
     Matches responsables based on their company AND department assignments.
     If reinvoice_to is set, also notifies the reinvoice company/department's responsables.
+
+    Args:
+        allocation: Allocation dict (company, department, reinvoice_to, ...)
+        lookup: Optional replacement for get_responsables_by_department(department, company),
+            e.g. a memoized one shared across a dispatch batch
     """
+    lookup_responsables = lookup or get_responsables_by_department
     all_responsables = []
     seen_ids = set()
 
@@ -388,7 +421,7 @@ def find_responsables_for_allocation(allocation: dict) -> list[dict]:
     logger.info(f"Finding responsables for allocation: company='{company}', department='{department}'")
     if department:
         # Pass company to filter responsables by both company AND department
-        responsables = get_responsables_by_department(department, company)
+        responsables = lookup_responsables(department, company)
         logger.info(f"Found {len(responsables)} responsables for company='{company}', dept='{department}'")
         for r in responsables:
             if r.get('is_active', True) and r.get('notify_on_allocation', True):
@@ -408,7 +441,7 @@ def find_responsables_for_allocation(allocation: dict) -> list[dict]:
     reinvoice_department = allocation.get('reinvoice_department', '')
     if reinvoice_to and reinvoice_department:
         # Pass reinvoice company to filter by both company AND department
-        reinvoice_responsables = get_responsables_by_department(reinvoice_department, reinvoice_to)
+        reinvoice_responsables = lookup_responsables(reinvoice_department, reinvoice_to)
         logger.debug(f"Found {len(reinvoice_responsables)} responsables for reinvoice company '{reinvoice_to}', department '{reinvoice_department}'")
         for r in reinvoice_responsables:
             if r.get('is_active', True) and r.get('notify_on_allocation', True):
@@ -419,6 +452,34 @@ def find_responsables_for_allocation(allocation: dict) -> list[dict]:
     return all_responsables
 
 
+def fill_allocation_amounts(invoice_data: dict, allocation: dict) -> dict:
+    """
+    Set allocation_percent and allocation_value on an allocation if not provided.
+
+    Frontend sends 'allocation' as decimal (0.5 = 50%), templates expect
+    'allocation_percent' (50) and the allocated value.
+    """
+    invoice_value = float(invoice_data.get('invoice_value', 0) or 0)
+
+    allocation_decimal = allocation.get('allocation')
+    if allocation_decimal is None or allocation_decimal == 0:
+        # Try to get from allocation_percent if available
+        pct = allocation.get('allocation_percent', 0)
+        allocation_decimal = float(pct) / 100 if pct else 0
+    else:
+        allocation_decimal = float(allocation_decimal)
+
+    # Set allocation_percent (e.g., 50 for 50%)
+    if not allocation.get('allocation_percent'):
+        allocation['allocation_percent'] = round(allocation_decimal * 100, 2)
+
+    # Set allocation_value (calculated from invoice_value * decimal)
+    if not allocation.get('allocation_value'):
+        allocation['allocation_value'] = round(invoice_value * allocation_decimal, 2)
+
+    return allocation
+
+
 def notify_allocation(invoice_data: dict, allocation: dict) -> list[dict]:
     """
     Send notification emails for a single allocation.
@@ -442,30 +503,13 @@ def notify_allocation(invoice_data: dict, allocation: dict) -> list[dict]:
     responsables = find_responsables_for_allocation(allocation)
 
     invoice_id = invoice_data.get('id')
-    invoice_value = float(invoice_data.get('invoice_value', 0) or 0)
 
     # Look up department CC email
     company = allocation.get('company', '')
     department = allocation.get('department', '')
     department_cc = get_department_cc_email(company, department) if company and department else None
 
-    # Calculate allocation_percent and allocation_value if not provided
-    # Frontend sends 'allocation' as decimal (0.5 = 50%), template expects 'allocation_percent' (50)
-    allocation_decimal = allocation.get('allocation')
-    if allocation_decimal is None or allocation_decimal == 0:
-        # Try to get from allocation_percent if available
-        pct = allocation.get('allocation_percent', 0)
-        allocation_decimal = float(pct) / 100 if pct else 0
-    else:
-        allocation_decimal = float(allocation_decimal)
-
-    # Set allocation_percent (e.g., 50 for 50%)
-    if not allocation.get('allocation_percent'):
-        allocation['allocation_percent'] = round(allocation_decimal * 100, 2)
-
-    # Set allocation_value (calculated from invoice_value * decimal)
-    if not allocation.get('allocation_value'):
-        allocation['allocation_value'] = round(invoice_value * allocation_decimal, 2)
+    fill_allocation_amounts(invoice_data, allocation)
 
     for responsable in responsables:
         responsable_id = responsable.get('id')
@@ -475,7 +519,7 @@ def notify_allocation(invoice_data: dict, allocation: dict) -> list[dict]:
         if not responsable_email:
             continue
 
-        subject = f"O noua bugetare MKT - {invoice_data.get('invoice_number', 'Factura')}"
+        subject = allocation_email_subject(invoice_data)
         html_body = create_allocation_email_html(responsable_name, invoice_data, allocation)
         text_body = create_allocation_email_text(responsable_name, invoice_data, allocation)
 
@@ -0,0 +1,152 @@
+"""
+Streaming XLSX export helpers.
+
+Workbooks are built with openpyxl's write-only mode: each appended row is
+serialized to a temporary file straight away instead of being kept as cell
+objects, so memory stays flat regardless of row count. The finished file is
+then yielded in chunks, ready to hand to a Flask Response:
+
+    rows = (row_values(inv) for inv in iter_invoices())
+    return Response(
+        prefetch_stream(stream_table_xlsx('Invoices', HEADERS, rows)),
+        mimetype=XLSX_MIMETYPE,
+        headers=xlsx_download_headers('invoices.xlsx'),
+    )
+
+Generators are lazy. prefetch_stream() runs one up to its first chunk (the
+workbook is complete at that point) so errors surface before the response
+starts; the rows themselves are still consumed one at a time.
+"""
+
+import itertools
+import tempfile
+from typing import Iterable, Iterator, Optional
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from openpyxl.utils import get_column_letter
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CHUNK_SIZE = 64 * 1024
+
+HEADER_FONT = Font(bold=True, color='FFFFFF')
+HEADER_FILL = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+MONEY_FORMAT = '#,##0.00'
+DATE_FORMAT = 'DD.MM.YYYY'
+
+
+def styled_cell(ws, value, font: Font = None, fill: PatternFill = None, border: Border = None,
+                number_format: str = None, alignment: Alignment = None) -> WriteOnlyCell:
+    """Create a write-only cell with optional styling."""
+    cell = WriteOnlyCell(ws, value=value)
+    if font is not None:
+        cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    if border is not None:
+        cell.border = border
+    if number_format is not None:
+        cell.number_format = number_format
+    if alignment is not None:
+        cell.alignment = alignment
+    return cell
+
+
+def header_cells(ws, headers: Iterable[str]) -> list[WriteOnlyCell]:
+    """Blue bold header row cells."""
+    return [
+        styled_cell(ws, header, font=HEADER_FONT, fill=HEADER_FILL, border=THIN_BORDER,
+                    alignment=Alignment(horizontal='center'))
+        for header in headers
+    ]
+
+
+def set_column_widths(ws, widths: Iterable[float]):
+    """Set column widths. In write-only mode this must happen before the first append."""
+    for col, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+
+
+def discard_workbook(wb: Workbook):
+    """Close the open row writers and temp files of a write-only workbook that won't be saved."""
+    for ws in wb.worksheets:
+        if getattr(ws, 'closed', True):
+            continue
+        try:
+            ws.close()
+            # Rows were spooled to an openpyxl temp file that only save() removes
+            ws._writer.cleanup()
+        except Exception:
+            pass
+
+
+def stream_workbook(wb: Workbook, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Save a workbook to a temporary file and yield it in chunks."""
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def stream_table_xlsx(sheet_title: str, headers: list[str], rows: Iterable[list],
+                      column_widths: Optional[list[float]] = None,
+                      number_formats: Optional[dict[int, str]] = None) -> Iterator[bytes]:
+    """Stream a single-sheet table: styled header row, then one row per item in `rows`.
+
+    Args:
+        sheet_title: Worksheet name
+        headers: Header labels
+        rows: Iterable of row value lists (consumed lazily)
+        column_widths: Optional widths per column
+        number_formats: Optional {column_index (0-based): number format}
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_title)
+    if column_widths:
+        set_column_widths(ws, column_widths)
+    ws.freeze_panes = 'A2'
+    ws.append(header_cells(ws, headers))
+
+    number_formats = number_formats or {}
+    try:
+        for values in rows:
+            if number_formats:
+                values = [
+                    styled_cell(ws, value, number_format=number_formats[i]) if i in number_formats and value is not None else value
+                    for i, value in enumerate(values)
+                ]
+            ws.append(values)
+    except Exception:
+        discard_workbook(wb)
+        raise
+
+    yield from stream_workbook(wb)
+
+
+def prefetch_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Run a chunk generator up to its first chunk before the response starts.
+
+    The workbook is fully written when the first chunk is produced, so query
+    or formatting errors raise here (and can become a JSON error) instead of
+    truncating a download that has already started.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return iter(())
+    return itertools.chain([first], chunks)
+
+
+def xlsx_download_headers(filename: str) -> dict:
+    return {'Content-Disposition': f'attachment; filename={filename}'}
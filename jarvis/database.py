@@ -1,9 +1,12 @@
 import os
+import re
 import json
+import base64
 import time
 import threading
 import logging
 from datetime import datetime
+from decimal import Decimal
 from typing import Optional
 from contextlib import contextmanager
 
@@ -12,12 +15,21 @@ from psycopg2 import pool
 from psycopg2.extras import RealDictCursor
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from core.cache import get_cache_backend, register_namespace
+
 # Thread-safe lock for cache operations
 # Prevents race conditions in multi-threaded Gunicorn environment
 _cache_lock = threading.RLock()
 
 
 # ============== CACHE UTILITIES ==============
+#
+# Caches created with a namespace are stored in the pluggable backend from
+# core.cache (per-process LRU by default, or a Unix-socket server shared by
+# all Gunicorn workers when CACHE_BACKEND=socket). The dict returned by
+# create_cache() is only a handle holding the namespace and TTL, so
+# invalidating it reaches every worker that uses the same backend.
+# Caches without a namespace keep the legacy in-dict behaviour.
 
 def _is_cache_valid(cache_entry: dict) -> bool:
     """Check if a cache entry is still valid."""
@@ -27,24 +39,55 @@ def _is_cache_valid(cache_entry: dict) -> bool:
 
 
 def _get_cache_data(cache_dict: dict, key: str = 'data'):
-    """Thread-safe getter for cache data."""
+    """Thread-safe getter for cache data.
+
+    For namespaced caches, returns None on a miss or expired entry.
+    """
+    namespace = cache_dict.get('namespace')
+    if namespace:
+        return get_cache_backend().get(namespace, key)
     with _cache_lock:
         return cache_dict.get(key)
 
 
 def _set_cache_data(cache_dict: dict, data, key: str = 'data'):
     """Thread-safe setter for cache data with timestamp update."""
+    namespace = cache_dict.get('namespace')
+    if namespace:
+        get_cache_backend().set(namespace, key, data, cache_dict.get('ttl'))
+        return
     with _cache_lock:
         cache_dict[key] = data
         cache_dict['timestamp'] = time.time()
 
 
-def create_cache(ttl: int = 300) -> dict:
-    """Create a new cache dictionary with specified TTL."""
+def _invalidate_cache(cache_dict: dict):
+    """Drop all cached data for a cache (in every worker for shared backends)."""
+    namespace = cache_dict.get('namespace')
+    if namespace:
+        get_cache_backend().invalidate(namespace)
+        return
+    with _cache_lock:
+        cache_dict['data'] = None
+        cache_dict['timestamp'] = 0
+
+
+def create_cache(ttl: int = 300, namespace: Optional[str] = None, max_entries: int = 1) -> dict:
+    """Create a new cache with specified TTL.
+
+    Args:
+        ttl: Time-to-live in seconds (overridable via CACHE_TTL_<NAMESPACE> env var)
+        namespace: Backend namespace. Without one, data lives in the returned dict.
+        max_entries: LRU limit for the namespace (number of distinct keys)
+    """
+    if namespace:
+        ttl = int(os.environ.get(f'CACHE_TTL_{namespace.upper()}', ttl))
+        register_namespace(namespace, ttl, max_entries)
     return {
         'data': None,
         'timestamp': 0,
-        'ttl': ttl
+        'ttl': ttl,
+        'namespace': namespace,
     }
 
 
@@ -53,114 +96,62 @@ def get_cache_lock():
     return _cache_lock
 
 
+def get_cache_stats() -> dict:
+    """Get hit/miss counters, sizes and TTLs for every cache namespace."""
+    return get_cache_backend().stats()
+
+
 # Configure module logger
 logger = logging.getLogger('jarvis.database')
 
 # PostgreSQL connection - DATABASE_URL is required
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
-# In-memory cache for invoice templates (rarely change)
-_templates_cache = {
-    'data': None,
-    'timestamp': 0,
-    'ttl': 300  # 5 minutes TTL
-}
-
-# In-memory cache for companies with VAT
-_companies_vat_cache = {
-    'data': None,
-    'timestamp': 0,
-    'ttl': 300
-}
-
-# In-memory cache for users (formerly responsables)
-_users_cache = {
-    'data': None,
-    'timestamp': 0,
-    'ttl': 300
-}
-
-# In-memory cache for invoice list (shorter TTL since data changes more frequently)
-_invoices_cache = {
-    'data': None,
-    'timestamp': 0,
-    'ttl': 60,  # 1 minute TTL
-    'key': None  # Cache key based on query params
-}
-
-# In-memory cache for summary queries (By Company, By Department, By Brand tabs)
-# Uses dict to store multiple cached results with different filter combinations
-_summary_cache = {
-    'company': {},     # key -> {'data': [...], 'timestamp': ...}
-    'department': {},
-    'brand': {},
-    'supplier': {},
-    'ttl': 60  # 1 minute TTL
-}
-
 # Maximum entries per summary cache type to prevent unbounded growth
 MAX_SUMMARY_CACHE_ENTRIES = 50
 
+# Invoice templates (rarely change)
+_templates_cache = create_cache(300, namespace='templates')
 
-def _is_cache_valid(cache_entry: dict) -> bool:
-    """Check if a cache entry is still valid."""
-    if cache_entry.get('data') is None:
-        return False
-    return (time.time() - cache_entry.get('timestamp', 0)) < cache_entry.get('ttl', 300)
+# Companies with VAT
+_companies_vat_cache = create_cache(300, namespace='companies_vat')
 
+# Users (formerly responsables)
+_users_cache = create_cache(300, namespace='users')
 
-# Thread-safe cache access helpers
-def _get_cache_data(cache_dict: dict, key: str = 'data'):
-    """Thread-safe getter for cache data."""
-    with _cache_lock:
-        return cache_dict.get(key)
+# Invoice list pages (shorter TTL since data changes more frequently), keyed by query params
+_invoices_cache = create_cache(60, namespace='invoices', max_entries=50)
 
-
-def _set_cache_data(cache_dict: dict, data, key: str = 'data'):
-    """Thread-safe setter for cache data with timestamp update."""
-    with _cache_lock:
-        cache_dict[key] = data
-        cache_dict['timestamp'] = time.time()
+# Summary queries (By Company, By Department, By Brand, By Supplier tabs)
+# Keys are prefixed with the summary type: 'company:<filters>'
+_summary_cache = create_cache(60, namespace='summary', max_entries=MAX_SUMMARY_CACHE_ENTRIES * 4)
 
 
 def _get_summary_cache(cache_type: str, cache_key: str):
-    """Thread-safe getter for summary cache entries."""
-    with _cache_lock:
-        cache = _summary_cache.get(cache_type, {})
-        entry = cache.get(cache_key)
-        if entry and (time.time() - entry.get('timestamp', 0)) < _summary_cache.get('ttl', 60):
-            return entry.get('data')
-        return None
+    """Getter for summary cache entries."""
+    return _get_cache_data(_summary_cache, f'{cache_type}:{cache_key}')
 
 
 def _set_summary_cache(cache_type: str, cache_key: str, data):
-    """Thread-safe setter for summary cache entries."""
-    with _cache_lock:
-        _summary_cache[cache_type][cache_key] = {'data': data, 'timestamp': time.time()}
-        _enforce_summary_cache_limit(cache_type)
+    """Setter for summary cache entries (LRU-bounded by the backend)."""
+    _set_cache_data(_summary_cache, data, f'{cache_type}:{cache_key}')
 
 
 def clear_templates_cache():
     """Clear the templates cache. Call this after template updates."""
-    global _templates_cache
-    with _cache_lock:
-        _templates_cache = {'data': None, 'timestamp': 0, 'ttl': 300}
+    _invalidate_cache(_templates_cache)
     logger.debug('Templates cache cleared')
 
 
 def clear_companies_vat_cache():
     """Clear the companies VAT cache. Call this after company updates."""
-    global _companies_vat_cache
-    with _cache_lock:
-        _companies_vat_cache = {'data': None, 'timestamp': 0, 'ttl': 300}
+    _invalidate_cache(_companies_vat_cache)
     logger.debug('Companies VAT cache cleared')
 
 
 def clear_users_cache():
     """Clear the users cache. Call this after user updates."""
-    global _users_cache
-    with _cache_lock:
-        _users_cache = {'data': None, 'timestamp': 0, 'ttl': 300}
+    _invalidate_cache(_users_cache)
 
 
 # Backwards compatibility alias
@@ -172,55 +163,23 @@ def clear_responsables_cache():
 
 def clear_invoices_cache():
     """Clear the invoices and summary caches. Call this after invoice CRUD operations."""
-    global _invoices_cache, _summary_cache
-    with _cache_lock:
-        _invoices_cache = {'data': None, 'timestamp': 0, 'ttl': 60, 'key': None}
-        # Also clear summary cache since summaries depend on invoice/allocation data
-        _summary_cache = {'company': {}, 'department': {}, 'brand': {}, 'supplier': {}, 'ttl': 60}
+    _invalidate_cache(_invoices_cache)
+    # Also clear summary cache since summaries depend on invoice/allocation data
+    _invalidate_cache(_summary_cache)
     logger.debug('Invoices and summary caches cleared')
 
 
 def clear_summary_cache():
     """Clear the summary cache only. Call this for summary-specific invalidation."""
-    global _summary_cache
-    with _cache_lock:
-        _summary_cache = {'company': {}, 'department': {}, 'brand': {}, 'supplier': {}, 'ttl': 60}
+    _invalidate_cache(_summary_cache)
     logger.debug('Summary cache cleared')
 
 
-def _enforce_summary_cache_limit(cache_type: str):
-    """Remove oldest entries if cache exceeds MAX_SUMMARY_CACHE_ENTRIES.
-
-    Note: Caller must hold _cache_lock.
-    """
-    global _summary_cache
-    cache = _summary_cache.get(cache_type, {})
-    if len(cache) > MAX_SUMMARY_CACHE_ENTRIES:
-        # Sort by timestamp and remove oldest entries
-        sorted_keys = sorted(cache.keys(), key=lambda k: cache[k].get('timestamp', 0))
-        entries_to_remove = len(cache) - MAX_SUMMARY_CACHE_ENTRIES
-        for key in sorted_keys[:entries_to_remove]:
-            del cache[key]
-        logger.debug(f'Evicted {entries_to_remove} entries from {cache_type} cache')
-
-
 def cleanup_expired_caches():
-    """Remove expired entries from summary caches. Call periodically to prevent memory growth."""
-    global _summary_cache
-    with _cache_lock:
-        now = time.time()
-        ttl = _summary_cache.get('ttl', 60)
-        total_removed = 0
-
-        for cache_type in ['company', 'department', 'brand']:
-            cache = _summary_cache.get(cache_type, {})
-            expired_keys = [k for k, v in cache.items() if (now - v.get('timestamp', 0)) > ttl]
-            for key in expired_keys:
-                del cache[key]
-            total_removed += len(expired_keys)
-
-        if total_removed > 0:
-            logger.debug(f'Cleaned up {total_removed} expired cache entries')
+    """Remove expired entries from all caches. Call periodically to prevent memory growth."""
+    total_removed = get_cache_backend().purge_expired()
+    if total_removed > 0:
+        logger.debug(f'Cleaned up {total_removed} expired cache entries')
 
 
 if not DATABASE_URL:
@@ -2331,6 +2290,358 @@ def _seed_companies(cursor):
     cursor.executemany(query, companies_data)
 
 
+# ============== SCHEMA MIGRATIONS ==============
+#
+# init_db() is the idempotent baseline (migration 1). Schema changes after the
+# baseline are appended to MIGRATIONS as new versions. Workers only compare
+# schema_version against SCHEMA_VERSION at startup (one query); pending
+# migrations are applied once per deploy with `python migrate.py`.
+
+# Arbitrary constant key for pg_advisory_lock so only one process migrates at a time
+SCHEMA_MIGRATION_LOCK_ID = 725_001
+
+# Startup behaviour when the database is behind SCHEMA_VERSION:
+#   auto - apply pending migrations (first worker migrates, others wait on the lock)
+#   warn - log a warning and continue (use when migrate.py runs as a deploy step)
+#   off  - skip the check entirely (used by migrate.py itself)
+DB_SCHEMA_CHECK = os.environ.get('DB_SCHEMA_CHECK', 'auto').lower()
+
+
+def _migration_002_invoices_keyset_index():
+    """Composite index backing keyset pagination of the invoice list."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_invoices_created_at_id
+            ON invoices (created_at DESC, id DESC)
+        ''')
+    finally:
+        release_db(conn)
+
+
+def _migration_003_allocation_rollups():
+    """Daily allocation rollup table used by the summary tabs, plus initial build."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS allocation_rollups_daily (
+                id SERIAL PRIMARY KEY,
+                invoice_date DATE NOT NULL,
+                company TEXT,
+                department TEXT,
+                subdepartment TEXT,
+                brand TEXT,
+                supplier TEXT,
+                value_ron DOUBLE PRECISION NOT NULL DEFAULT 0,
+                value_eur DOUBLE PRECISION NOT NULL DEFAULT 0,
+                exchange_rate_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                allocation_count INTEGER NOT NULL DEFAULT 0,
+                invoice_ids INTEGER[] NOT NULL DEFAULT '{}',
+                invoice_count INTEGER NOT NULL DEFAULT 0,
+                split_invoice_ids INTEGER[] NOT NULL DEFAULT '{}'
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_allocation_rollups_date ON allocation_rollups_daily(invoice_date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_allocation_rollups_company ON allocation_rollups_daily(company)')
+    finally:
+        release_db(conn)
+    rebuild_allocation_rollups()
+
+
+def _migration_004_invoice_search():
+    """Trigram + full-text search indexes for search_invoices()."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        try:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except Exception as e:
+            logger.warning(f'pg_trgm unavailable, invoice search will not use trigram index: {e}')
+        # Partner name/CIF of the linked e-Factura invoice, kept in sync by trigger
+        cursor.execute('ALTER TABLE invoices ADD COLUMN IF NOT EXISTS partner_search TEXT')
+        cursor.execute('''
+            CREATE OR REPLACE FUNCTION sync_invoice_partner_search() RETURNS trigger AS $$
+            BEGIN
+                IF NEW.jarvis_invoice_id IS NOT NULL THEN
+                    UPDATE invoices
+                    SET partner_search = TRIM(COALESCE(NEW.partner_name, '') || ' ' || COALESCE(NEW.partner_cif, ''))
+                    WHERE id = NEW.jarvis_invoice_id;
+                END IF;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        cursor.execute('DROP TRIGGER IF EXISTS trg_efactura_invoice_partner_search ON efactura_invoices')
+        cursor.execute('''
+            CREATE TRIGGER trg_efactura_invoice_partner_search
+            AFTER INSERT OR UPDATE OF jarvis_invoice_id, partner_name, partner_cif ON efactura_invoices
+            FOR EACH ROW EXECUTE FUNCTION sync_invoice_partner_search()
+        ''')
+        cursor.execute('''
+            UPDATE invoices i
+            SET partner_search = TRIM(COALESCE(e.partner_name, '') || ' ' || COALESCE(e.partner_cif, ''))
+            FROM efactura_invoices e
+            WHERE e.jarvis_invoice_id = i.id
+        ''')
+        # Expression indexes - search_invoices() must use the identical expressions
+        try:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_invoices_search_trgm ON invoices USING gin (({_invoice_search_document()}) gin_trgm_ops)')
+        except Exception as e:
+            logger.warning(f'Could not create invoice trigram index: {e}')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_invoices_search_vector ON invoices USING gin (({_invoice_search_vector()}))')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_invoices_invoice_value ON invoices(invoice_value)')
+    finally:
+        release_db(conn)
+
+
+def _migration_005_ai_match_cache():
+    """Persistent cache of AI statement-to-invoice match decisions."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS statement_ai_match_cache (
+                cache_key TEXT PRIMARY KEY,
+                invoice_id INTEGER,
+                confidence REAL,
+                reasoning TEXT,
+                alternatives JSONB NOT NULL DEFAULT '[]',
+                candidate_invoice_ids INTEGER[] NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_hit_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_ai_match_cache_candidates
+            ON statement_ai_match_cache USING gin (candidate_invoice_ids)
+        ''')
+        # A decision is stale once any invoice it was made from changes
+        cursor.execute('''
+            CREATE OR REPLACE FUNCTION expire_ai_match_cache() RETURNS trigger AS $$
+            BEGIN
+                DELETE FROM statement_ai_match_cache WHERE candidate_invoice_ids @> ARRAY[OLD.id];
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        cursor.execute('DROP TRIGGER IF EXISTS trg_invoices_expire_ai_match_cache ON invoices')
+        cursor.execute('''
+            CREATE TRIGGER trg_invoices_expire_ai_match_cache
+            AFTER DELETE OR UPDATE OF supplier, invoice_number, invoice_date, invoice_value,
+                currency, value_ron, value_eur, deleted_at ON invoices
+            FOR EACH ROW EXECUTE FUNCTION expire_ai_match_cache()
+        ''')
+    finally:
+        release_db(conn)
+
+
+def _migration_006_efactura_sync_high_water():
+    """Index the latest successful e-Factura sync run per CIF (incremental sync high-water mark)."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_efactura_sync_runs_high_water
+            ON efactura_sync_runs (company_cif, direction, finished_at DESC)
+            WHERE success AND cursor_after IS NOT NULL
+        ''')
+    finally:
+        release_db(conn)
+
+
+def _migration_007_notification_outbox():
+    """Transactional outbox for notification emails, drained by the background dispatcher."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id SERIAL PRIMARY KEY,
+                event_type TEXT NOT NULL,
+                invoice_id INTEGER REFERENCES invoices(id) ON DELETE CASCADE,
+                payload JSONB NOT NULL,
+                progress JSONB NOT NULL DEFAULT '{}',
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                locked_at TIMESTAMP,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                processed_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_notification_outbox_due
+            ON notification_outbox (next_attempt_at, id)
+            WHERE status IN ('pending', 'processing')
+        ''')
+    finally:
+        release_db(conn)
+
+
+def _migration_008_bulk_jobs():
+    """Background bulk processing jobs, shared by all workers."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bulk_jobs (
+                job_id TEXT PRIMARY KEY,
+                user_id INTEGER,
+                status JSONB NOT NULL,
+                report BYTEA,
+                excel BYTEA,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bulk_jobs_expires ON bulk_jobs (expires_at)')
+    finally:
+        release_db(conn)
+
+
+def _migration_009_efactura_permanent_failures():
+    """Index messages that failed permanently, which sync skips."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_efactura_sync_errors_permanent
+            ON efactura_sync_errors (message_id)
+            WHERE NOT is_retryable AND message_id IS NOT NULL
+        ''')
+    finally:
+        release_db(conn)
+
+
+def _migration_010_rollup_invoice_counts():
+    """Per-rollup invoice counts and split invoice ids, so summaries don't unnest every id."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            ALTER TABLE allocation_rollups_daily
+                ADD COLUMN IF NOT EXISTS invoice_count INTEGER NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS split_invoice_ids INTEGER[] NOT NULL DEFAULT '{}'
+        ''')
+    finally:
+        release_db(conn)
+    rebuild_allocation_rollups()
+
+
+# version -> (description, function). Functions manage their own connection.
+MIGRATIONS = {
+    1: ('Baseline schema (tables, indexes, seed data)', init_db),
+    2: ('Index invoices (created_at, id) for keyset pagination', _migration_002_invoices_keyset_index),
+    3: ('Daily allocation rollups for summary tabs', _migration_003_allocation_rollups),
+    4: ('Trigram and full-text search indexes for invoices', _migration_004_invoice_search),
+    5: ('Persistent cache of AI statement match decisions', _migration_005_ai_match_cache),
+    6: ('Index e-Factura sync high-water marks', _migration_006_efactura_sync_high_water),
+    7: ('Notification outbox for background email delivery', _migration_007_notification_outbox),
+    8: ('Bulk processing jobs shared by all workers', _migration_008_bulk_jobs),
+    9: ('Index e-Factura messages that failed permanently', _migration_009_efactura_permanent_failures),
+    10: ('Rollup invoice counts without unnesting every invoice id', _migration_010_rollup_invoice_counts),
+}
+
+SCHEMA_VERSION = max(MIGRATIONS)
+
+
+def _ensure_schema_version_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INTEGER
+        )
+    ''')
+
+
+def get_schema_version() -> int:
+    """Get the applied schema version (0 if no migrations have run yet)."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL AS has_table")
+        if not cursor.fetchone()['has_table']:
+            return 0
+        cursor.execute('SELECT COALESCE(MAX(version), 0) AS version FROM schema_version')
+        return int(cursor.fetchone()['version'])
+    finally:
+        release_db(conn)
+
+
+def get_pending_migrations() -> list[tuple[int, str]]:
+    """List (version, description) of migrations not yet applied."""
+    current = get_schema_version()
+    return [(v, MIGRATIONS[v][0]) for v in sorted(MIGRATIONS) if v > current]
+
+
+def run_migrations(target: Optional[int] = None) -> list[int]:
+    """Apply pending migrations up to target (default: latest).
+
+    Holds a PostgreSQL advisory lock for the duration, so concurrent callers
+    (e.g. several workers booting at once) wait and then find nothing to do.
+
+    Returns:
+        List of applied version numbers
+    """
+    target = target or SCHEMA_VERSION
+    applied = []
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('SELECT pg_advisory_lock(%s)', (SCHEMA_MIGRATION_LOCK_ID,))
+        try:
+            _ensure_schema_version_table(cursor)
+            cursor.execute('SELECT COALESCE(MAX(version), 0) AS version FROM schema_version')
+            current = int(cursor.fetchone()['version'])
+
+            for version in sorted(MIGRATIONS):
+                if version <= current or version > target:
+                    continue
+                description, migrate = MIGRATIONS[version]
+                logger.info(f'Applying schema migration {version}: {description}')
+                started = time.time()
+                migrate()
+                duration_ms = int((time.time() - started) * 1000)
+                cursor.execute('''
+                    INSERT INTO schema_version (version, description, duration_ms)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (version) DO NOTHING
+                ''', (version, description, duration_ms))
+                applied.append(version)
+        finally:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', (SCHEMA_MIGRATION_LOCK_ID,))
+    finally:
+        release_db(conn)
+
+    if applied:
+        logger.info(f'Schema migrated to version {applied[-1]}')
+    return applied
+
+
+def ensure_schema():
+    """Startup schema check - a single version query when the schema is current.
+
+    Behaviour when behind is controlled by DB_SCHEMA_CHECK (auto/warn/off).
+    """
+    if DB_SCHEMA_CHECK == 'off':
+        return
+    current = get_schema_version()
+    if current >= SCHEMA_VERSION:
+        return
+    if DB_SCHEMA_CHECK == 'warn':
+        logger.warning(f'Database schema is at version {current}, expected {SCHEMA_VERSION}. '
+                       f'Run `python migrate.py` to apply pending migrations.')
+        return
+    run_migrations()
+
+
 def dict_from_row(row):
     """Convert a database row to a dictionary with proper date serialization."""
     if row is None:
@@ -2365,136 +2676,215 @@ def save_invoice(
     payment_status: str = 'not_paid',
     subtract_vat: bool = False,
     vat_rate: float = None,
-    net_value: float = None
+    net_value: float = None,
+    notify_allocations: bool = False
 ) -> int:
     """
     Save invoice and its allocations to database.
     Returns the invoice ID.
-    """
-    conn = get_db()
-    cursor = get_cursor(conn)
 
+    With notify_allocations, an allocation email event is written to
+    notification_outbox in the same transaction; the notification dispatcher
+    sends it in the background, so saving never waits on SMTP.
+    """
+    # The invoice, its allocations and the outbox event commit (or roll back) together
     try:
-        cursor.execute('''
-            INSERT INTO invoices (supplier, invoice_template, invoice_number, invoice_date, invoice_value, currency, drive_link, value_ron, value_eur, exchange_rate, comment, payment_status, subtract_vat, vat_rate, net_value)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        ''', (supplier, invoice_template, invoice_number, invoice_date, invoice_value, currency, drive_link, value_ron, value_eur, exchange_rate, comment, payment_status, subtract_vat, vat_rate, net_value))
-        invoice_id = cursor.fetchone()['id']
-
-        # Insert allocations
-        # Use net_value for allocation calculations if VAT subtraction is enabled
-        base_value = net_value if subtract_vat and net_value else invoice_value
-        for dist in distributions:
-            # Calculate gross allocation value
-            gross_allocation_value = base_value * dist['allocation']
-
-            # Calculate net allocation value (after reinvoice deduction - Variant 2)
-            reinvoice_dests = dist.get('reinvoice_destinations', [])
-            total_reinvoice_percent = sum(rd.get('percentage', 0) for rd in reinvoice_dests)
-            net_percent = max(0, 100 - total_reinvoice_percent)
-            allocation_value = gross_allocation_value * net_percent / 100
-
-            # Look up the responsible (manager) from department_structure if not provided
-            responsible = dist.get('responsible', '')
-            responsible_user_id = dist.get('responsible_user_id')
-            if not responsible and dist['company'] and dist['department']:
-                # Build query with optional brand and subdepartment filters
-                conditions = ['ds.company = %s', 'ds.department = %s']
-                params = [dist['company'], dist['department']]
-
-                brand = dist.get('brand')
-                if brand:
-                    conditions.append('ds.brand = %s')
-                    params.append(brand)
-
-                subdept = dist.get('subdepartment')
-                if subdept:
-                    conditions.append('ds.subdepartment = %s')
-                    params.append(subdept)
-
-                # Use manager_ids joined with users to get manager names and user ID
-                cursor.execute(f'''
-                    SELECT COALESCE(
-                        (SELECT string_agg(u.name, ', ')
-                         FROM unnest(ds.manager_ids) AS mid
-                         JOIN users u ON u.id = mid),
-                        ds.manager,
-                        ''
-                    ) AS manager_name,
-                    (SELECT mid FROM unnest(ds.manager_ids) AS mid LIMIT 1) AS manager_user_id
-                    FROM department_structure ds
-                    WHERE {' AND '.join(conditions)}
-                    LIMIT 1
-                ''', tuple(params))
-                row = cursor.fetchone()
-                if row and row['manager_name']:
-                    responsible = row['manager_name']
-                    responsible_user_id = row.get('manager_user_id')
-
+        with transaction() as conn:
+            cursor = get_cursor(conn)
             cursor.execute('''
-                INSERT INTO allocations (invoice_id, company, brand, department, subdepartment, allocation_percent, allocation_value, responsible, responsible_user_id, reinvoice_to, reinvoice_brand, reinvoice_department, reinvoice_subdepartment, locked, comment)
+                INSERT INTO invoices (supplier, invoice_template, invoice_number, invoice_date, invoice_value, currency, drive_link, value_ron, value_eur, exchange_rate, comment, payment_status, subtract_vat, vat_rate, net_value)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 RETURNING id
-            ''', (
-                invoice_id,
-                dist['company'],
-                dist.get('brand'),
-                dist['department'],
-                dist.get('subdepartment'),
-                dist['allocation'] * 100,
-                allocation_value,
-                responsible,
-                responsible_user_id,
-                dist.get('reinvoice_to'),
-                dist.get('reinvoice_brand'),
-                dist.get('reinvoice_department'),
-                dist.get('reinvoice_subdepartment'),
-                dist.get('locked', False),
-                dist.get('comment')
-            ))
-            allocation_id = cursor.fetchone()['id']
+            ''', (supplier, invoice_template, invoice_number, invoice_date, invoice_value, currency, drive_link, value_ron, value_eur, exchange_rate, comment, payment_status, subtract_vat, vat_rate, net_value))
+            invoice_id = cursor.fetchone()['id']
+
+            # Insert allocations
+            # Use net_value for allocation calculations if VAT subtraction is enabled
+            base_value = net_value if subtract_vat and net_value else invoice_value
+            for dist in distributions:
+                # Calculate gross allocation value
+                gross_allocation_value = base_value * dist['allocation']
+
+                # Calculate net allocation value (after reinvoice deduction - Variant 2)
+                reinvoice_dests = dist.get('reinvoice_destinations', [])
+                total_reinvoice_percent = sum(rd.get('percentage', 0) for rd in reinvoice_dests)
+                net_percent = max(0, 100 - total_reinvoice_percent)
+                allocation_value = gross_allocation_value * net_percent / 100
+
+                # Look up the responsible (manager) from department_structure if not provided
+                responsible = dist.get('responsible', '')
+                responsible_user_id = dist.get('responsible_user_id')
+                if not responsible and dist['company'] and dist['department']:
+                    # Build query with optional brand and subdepartment filters
+                    conditions = ['ds.company = %s', 'ds.department = %s']
+                    params = [dist['company'], dist['department']]
+
+                    brand = dist.get('brand')
+                    if brand:
+                        conditions.append('ds.brand = %s')
+                        params.append(brand)
+
+                    subdept = dist.get('subdepartment')
+                    if subdept:
+                        conditions.append('ds.subdepartment = %s')
+                        params.append(subdept)
+
+                    # Use manager_ids joined with users to get manager names and user ID
+                    cursor.execute(f'''
+                        SELECT COALESCE(
+                            (SELECT string_agg(u.name, ', ')
+                             FROM unnest(ds.manager_ids) AS mid
+                             JOIN users u ON u.id = mid),
+                            ds.manager,
+                            ''
+                        ) AS manager_name,
+                        (SELECT mid FROM unnest(ds.manager_ids) AS mid LIMIT 1) AS manager_user_id
+                        FROM department_structure ds
+                        WHERE {' AND '.join(conditions)}
+                        LIMIT 1
+                    ''', tuple(params))
+                    row = cursor.fetchone()
+                    if row and row['manager_name']:
+                        responsible = row['manager_name']
+                        responsible_user_id = row.get('manager_user_id')
 
-            # Insert reinvoice destinations if provided (value calculated from gross allocation)
-            for rd in reinvoice_dests:
-                rd_value = gross_allocation_value * (rd['percentage'] / 100)
                 cursor.execute('''
-                    INSERT INTO reinvoice_destinations
-                    (allocation_id, company, brand, department, subdepartment, percentage, value)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    INSERT INTO allocations (invoice_id, company, brand, department, subdepartment, allocation_percent, allocation_value, responsible, responsible_user_id, reinvoice_to, reinvoice_brand, reinvoice_department, reinvoice_subdepartment, locked, comment)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
                 ''', (
-                    allocation_id,
-                    rd['company'],
-                    rd.get('brand'),
-                    rd.get('department'),
-                    rd.get('subdepartment'),
-                    rd['percentage'],
-                    rd_value
+                    invoice_id,
+                    dist['company'],
+                    dist.get('brand'),
+                    dist['department'],
+                    dist.get('subdepartment'),
+                    dist['allocation'] * 100,
+                    allocation_value,
+                    responsible,
+                    responsible_user_id,
+                    dist.get('reinvoice_to'),
+                    dist.get('reinvoice_brand'),
+                    dist.get('reinvoice_department'),
+                    dist.get('reinvoice_subdepartment'),
+                    dist.get('locked', False),
+                    dist.get('comment')
                 ))
+                allocation_id = cursor.fetchone()['id']
 
-        conn.commit()
-        clear_invoices_cache()  # Invalidate cache on new invoice
-        return invoice_id
-
+                # Insert reinvoice destinations if provided (value calculated from gross allocation)
+                for rd in reinvoice_dests:
+                    rd_value = gross_allocation_value * (rd['percentage'] / 100)
+                    cursor.execute('''
+                        INSERT INTO reinvoice_destinations
+                        (allocation_id, company, brand, department, subdepartment, percentage, value)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ''', (
+                        allocation_id,
+                        rd['company'],
+                        rd.get('brand'),
+                        rd.get('department'),
+                        rd.get('subdepartment'),
+                        rd['percentage'],
+                        rd_value
+                    ))
+
+            if notify_allocations:
+                _insert_notification_outbox(cursor, 'invoice_allocations', invoice_id, {
+                    'invoice_data': {
+                        'id': invoice_id,
+                        'invoice_number': invoice_number,
+                        'supplier': supplier,
+                        'invoice_date': invoice_date,
+                        'invoice_value': invoice_value,
+                        'currency': currency,
+                    },
+                    'allocations': distributions,
+                })
     except Exception as e:
-        conn.rollback()
         if 'unique' in str(e).lower() or 'duplicate' in str(e).lower():
             raise ValueError(f"Invoice {invoice_number} already exists in database")
         raise
+
+    conn = get_db()
+    try:
+        _refresh_allocation_rollups(get_cursor(conn), [invoice_date])
     finally:
         release_db(conn)
+    clear_invoices_cache()  # Invalidate cache on new invoice
+    return invoice_id
+
+
+# ============== INVOICE LIST PAGINATION ==============
+#
+# Invoice lists are ordered by (created_at DESC, id DESC). Besides LIMIT/OFFSET,
+# they accept an opaque cursor encoding the last row's (created_at, id), so the
+# next page is a keyset seek on idx_invoices_created_at_id instead of scanning
+# and discarding `offset` rows.
+
+def encode_invoice_cursor(invoice: dict) -> str:
+    """Build an opaque pagination cursor from the last invoice of a page."""
+    raw = json.dumps([invoice['created_at'], invoice['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_invoice_cursor(token: str) -> tuple[str, int]:
+    """Decode a pagination cursor into (created_at, id).
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        created_at, invoice_id = json.loads(raw)
+        datetime.fromisoformat(created_at)
+        return created_at, int(invoice_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f'Invalid pagination cursor: {token}') from e
+
+
+def get_next_invoice_cursor(invoices: list[dict], limit: int) -> Optional[str]:
+    """Cursor for the page after `invoices`, or None if this was the last page."""
+    if not invoices or len(invoices) < limit:
+        return None
+    return encode_invoice_cursor(invoices[-1])
+
+
+def iter_all_invoices(batch_size: int = 500, **filters):
+    """Yield every invoice matching get_all_invoices() filters, one keyset page at a time.
+
+    Memory is bounded by batch_size regardless of how many invoices match,
+    which keeps large exports flat.
+    """
+    page_cursor = None
+    while True:
+        page = get_all_invoices(limit=batch_size, page_cursor=page_cursor, **filters)
+        yield from page
+        page_cursor = get_next_invoice_cursor(page, batch_size)
+        if not page_cursor:
+            return
+
+
+def _invoice_from_row(row) -> dict:
+    """Invoice row as an API dict, without columns that exist only for search."""
+    invoice = dict_from_row(row)
+    invoice.pop('partner_search', None)
+    return invoice
 
 
 def get_all_invoices(limit: int = 100, offset: int = 0, company: Optional[str] = None,
                      start_date: Optional[str] = None, end_date: Optional[str] = None,
                      department: Optional[str] = None, subdepartment: Optional[str] = None,
                      brand: Optional[str] = None, status: Optional[str] = None,
-                     payment_status: Optional[str] = None, include_deleted: bool = False) -> list[dict]:
+                     payment_status: Optional[str] = None, include_deleted: bool = False,
+                     page_cursor: Optional[str] = None) -> list[dict]:
     """Get all invoices with pagination and optional filtering by allocation fields.
 
     By default, deleted invoices (with deleted_at set) are excluded.
     Set include_deleted=True to get only deleted invoices (for the bin view).
+    Pass page_cursor (see get_next_invoice_cursor) to seek past the previous page
+    instead of using offset.
     """
+    cursor_position = decode_invoice_cursor(page_cursor) if page_cursor else None
     conn = get_db()
     try:
         cursor = get_cursor(conn)
@@ -2549,14 +2939,20 @@ def get_all_invoices(limit: int = 100, offset: int = 0, company: Optional[str] =
             conditions.append('i.payment_status = %s')
             params.append(payment_status)
 
+        # Keyset pagination
+        if cursor_position:
+            conditions.append('(i.created_at, i.id) < (%s::timestamp, %s)')
+            params.extend(cursor_position)
+            offset = 0
+
         if conditions:
             query += ' WHERE ' + ' AND '.join(conditions)
 
-        query += ' ORDER BY i.created_at DESC LIMIT %s OFFSET %s'
+        query += ' ORDER BY i.created_at DESC, i.id DESC LIMIT %s OFFSET %s'
         params.extend([limit, offset])
 
         cursor.execute(query, params)
-        invoices = [dict_from_row(row) for row in cursor.fetchall()]
+        invoices = [_invoice_from_row(row) for row in cursor.fetchall()]
         return invoices
     finally:
         release_db(conn)
@@ -2577,7 +2973,7 @@ def get_invoice_with_allocations(invoice_id: int) -> Optional[dict]:
         if not invoice:
             return None
 
-        invoice = dict_from_row(invoice)
+        invoice = _invoice_from_row(invoice)
 
         cursor.execute('SELECT * FROM allocations WHERE invoice_id = %s', (invoice_id,))
         allocations = [dict_from_row(row) for row in cursor.fetchall()]
@@ -2615,23 +3011,31 @@ def get_invoices_with_allocations(limit: int = 100, offset: int = 0, company: Op
                                    start_date: Optional[str] = None, end_date: Optional[str] = None,
                                    department: Optional[str] = None, subdepartment: Optional[str] = None,
                                    brand: Optional[str] = None, status: Optional[str] = None,
-                                   payment_status: Optional[str] = None, include_deleted: bool = False) -> list[dict]:
+                                   payment_status: Optional[str] = None, include_deleted: bool = False,
+                                   page_cursor: Optional[str] = None) -> list[dict]:
     """Get all invoices with their allocations in a single optimized query.
 
     Uses PostgreSQL JSON aggregation to fetch invoices and allocations together,
     avoiding N+1 query problems. This is much faster than fetching invoices
     then making separate queries for each invoice's allocations.
 
+    Both branches order by (created_at DESC, id DESC). Pass page_cursor
+    (see get_next_invoice_cursor) for keyset pagination: every page costs
+    the same as the first, unlike deep OFFSETs.
+
     Results are cached for 60 seconds to reduce database load on repeated page views.
     """
-    global _invoices_cache
+    cursor_position = decode_invoice_cursor(page_cursor) if page_cursor else None
+    if cursor_position:
+        offset = 0
 
     # Build cache key from all parameters
-    cache_key = f"{limit}:{offset}:{company}:{start_date}:{end_date}:{department}:{subdepartment}:{brand}:{status}:{payment_status}:{include_deleted}"
+    cache_key = f"{limit}:{offset}:{page_cursor}:{company}:{start_date}:{end_date}:{department}:{subdepartment}:{brand}:{status}:{payment_status}:{include_deleted}"
 
     # Check cache
-    if _is_cache_valid(_invoices_cache) and _invoices_cache.get('key') == cache_key:
-        return _invoices_cache['data']
+    cached = _get_cache_data(_invoices_cache, cache_key)
+    if cached is not None:
+        return cached
 
     conn = get_db()
     try:
@@ -2663,6 +3067,11 @@ def get_invoices_with_allocations(limit: int = 100, offset: int = 0, company: Op
             conditions.append('i.payment_status = %s')
             params.append(payment_status)
 
+        # Keyset pagination
+        if cursor_position:
+            conditions.append('(i.created_at, i.id) < (%s::timestamp, %s)')
+            params.extend(cursor_position)
+
         # Allocation filters - if any are set, filter invoices that have matching allocations
         allocation_filters = []
         if company:
@@ -2681,15 +3090,19 @@ def get_invoices_with_allocations(limit: int = 100, offset: int = 0, company: Op
         where_clause = ' AND '.join(conditions) if conditions else '1=1'
 
         if allocation_filters:
-            # If we have allocation filters, use a subquery to filter invoices
+            # If we have allocation filters, use a semi-join to filter invoices
+            # (EXISTS keeps the created_at order walkable by index, unlike DISTINCT)
             allocation_filter_clause = ' AND '.join(allocation_filters)
             query = f'''
             WITH filtered_invoices AS (
-                SELECT DISTINCT i.id
+                SELECT i.id
                 FROM invoices i
-                JOIN allocations a ON a.invoice_id = i.id
-                WHERE {where_clause} AND {allocation_filter_clause}
-                ORDER BY i.id DESC
+                WHERE {where_clause}
+                  AND EXISTS (
+                      SELECT 1 FROM allocations a
+                      WHERE a.invoice_id = i.id AND {allocation_filter_clause}
+                  )
+                ORDER BY i.created_at DESC, i.id DESC
                 LIMIT %s OFFSET %s
             )
             SELECT
@@ -2734,20 +3147,20 @@ def get_invoices_with_allocations(limit: int = 100, offset: int = 0, company: Op
             JOIN invoices i ON i.id = fi.id
             LEFT JOIN allocations a ON a.invoice_id = i.id
             GROUP BY i.id
-            ORDER BY i.created_at DESC
+            ORDER BY i.created_at DESC, i.id DESC
             '''
         else:
             # No allocation filters - simpler query
             query = f'''
             WITH paginated_invoices AS (
-                SELECT i.*
+                SELECT i.id
                 FROM invoices i
                 WHERE {where_clause}
-                ORDER BY i.created_at DESC
+                ORDER BY i.created_at DESC, i.id DESC
                 LIMIT %s OFFSET %s
             )
             SELECT
-                pi.*,
+                i.*,
                 COALESCE(
                     json_agg(
                         json_build_object(
@@ -2785,12 +3198,10 @@ def get_invoices_with_allocations(limit: int = 100, offset: int = 0, company: Op
                     '[]'::json
                 ) as allocations
             FROM paginated_invoices pi
-            LEFT JOIN allocations a ON a.invoice_id = pi.id
-            GROUP BY pi.id, pi.supplier, pi.invoice_template, pi.invoice_number, pi.invoice_date,
-                     pi.invoice_value, pi.currency, pi.value_ron, pi.value_eur, pi.exchange_rate,
-                     pi.drive_link, pi.comment, pi.status, pi.payment_status, pi.deleted_at,
-                     pi.created_at, pi.updated_at, pi.subtract_vat, pi.vat_rate, pi.net_value
-            ORDER BY pi.created_at DESC
+            JOIN invoices i ON i.id = pi.id
+            LEFT JOIN allocations a ON a.invoice_id = i.id
+            GROUP BY i.id
+            ORDER BY i.created_at DESC, i.id DESC
             '''
 
         params.extend([limit, offset])
@@ -2798,16 +3209,14 @@ def get_invoices_with_allocations(limit: int = 100, offset: int = 0, company: Op
 
         invoices = []
         for row in cursor.fetchall():
-            invoice = dict_from_row(row)
+            invoice = _invoice_from_row(row)
             # The allocations field is already JSON from the query
             if isinstance(invoice.get('allocations'), str):
                 invoice['allocations'] = json.loads(invoice['allocations'])
             invoices.append(invoice)
 
         # Cache the results
-        _invoices_cache['data'] = invoices
-        _invoices_cache['timestamp'] = time.time()
-        _invoices_cache['key'] = cache_key
+        _set_cache_data(_invoices_cache, invoices, cache_key)
 
         return invoices
     finally:
@@ -2850,74 +3259,239 @@ def get_allocations_by_department(company: str, department: str) -> list[dict]:
     return results
 
 
+# ============== ALLOCATION ROLLUPS ==============
+#
+# allocation_rollups_daily holds one row per (invoice_date, company, department,
+# subdepartment, brand, supplier) with RON/EUR sums, so the summary tabs aggregate
+# dimension combinations instead of re-joining every allocation. Writers that
+# touch invoices or allocations call _refresh_allocation_rollups() with the
+# affected invoice dates; each refresh recomputes those days from base tables
+# in a single statement, so rollups never drift.
+#
+# Distinct invoice counts are summable without reading every invoice id: an
+# invoice whose allocations all fall in one dimension combination is counted in
+# invoice_count of that single row. Only invoices split across several rows
+# (all on the same invoice_date) are listed in split_invoice_ids, and only
+# those need a distinct count per summary group.
+
+# Arbitrary constant key for pg_advisory_lock serializing rollup refreshes
+ALLOCATION_ROLLUP_LOCK_ID = 725_002
+
+_ROLLUP_REFRESH_SQL = '''
+    WITH removed AS (
+        DELETE FROM allocation_rollups_daily WHERE {date_filter}
+    ),
+    per_invoice AS (
+        SELECT
+            i.invoice_date, a.company, a.department, a.subdepartment, a.brand, i.supplier,
+            i.id AS invoice_id,
+            SUM(CASE WHEN i.invoice_value > 0 AND i.value_ron IS NOT NULL
+                THEN a.allocation_value * i.value_ron / i.invoice_value
+                ELSE a.allocation_value END) AS value_ron,
+            SUM(CASE WHEN i.invoice_value > 0 AND i.value_eur IS NOT NULL
+                THEN a.allocation_value * i.value_eur / i.invoice_value
+                ELSE a.allocation_value / COALESCE(i.exchange_rate, 5.0) END) AS value_eur,
+            SUM(COALESCE(i.exchange_rate, 5.0)) AS exchange_rate_sum,
+            COUNT(*) AS allocation_count,
+            COUNT(*) OVER (PARTITION BY i.id) AS invoice_rows
+        FROM allocations a
+        JOIN invoices i ON a.invoice_id = i.id
+        WHERE i.deleted_at IS NULL AND {date_filter_i}
+        GROUP BY i.invoice_date, a.company, a.department, a.subdepartment, a.brand, i.supplier, i.id
+    )
+    INSERT INTO allocation_rollups_daily (
+        invoice_date, company, department, subdepartment, brand, supplier,
+        value_ron, value_eur, exchange_rate_sum, allocation_count, invoice_ids,
+        invoice_count, split_invoice_ids
+    )
+    SELECT
+        invoice_date, company, department, subdepartment, brand, supplier,
+        SUM(value_ron), SUM(value_eur), SUM(exchange_rate_sum), SUM(allocation_count),
+        ARRAY_AGG(invoice_id ORDER BY invoice_id),
+        COUNT(*),
+        COALESCE(ARRAY_AGG(invoice_id ORDER BY invoice_id) FILTER (WHERE invoice_rows > 1), '{{}}')
+    FROM per_invoice
+    GROUP BY invoice_date, company, department, subdepartment, brand, supplier
+'''
+
+
+def _refresh_allocation_rollups(cursor, invoice_dates) -> None:
+    """Recompute rollup rows for the given invoice dates.
+
+    Failures are logged rather than raised: the invoice write has already
+    succeeded, and rebuild_allocation_rollups() repairs any gap.
+    """
+    dates = sorted({str(d)[:10] for d in invoice_dates if d})
+    if not dates:
+        return
+    query = _ROLLUP_REFRESH_SQL.format(
+        date_filter='invoice_date = ANY(%s::date[])',
+        date_filter_i='i.invoice_date = ANY(%s::date[])',
+    )
+    try:
+        cursor.execute('SELECT pg_advisory_lock(%s)', (ALLOCATION_ROLLUP_LOCK_ID,))
+        try:
+            cursor.execute(query, (dates, dates))
+        finally:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', (ALLOCATION_ROLLUP_LOCK_ID,))
+    except Exception as e:
+        logger.error(f'Allocation rollup refresh failed for {dates}: {e}')
+
+
+def refresh_allocation_rollups(invoice_ids: list[int]) -> None:
+    """Refresh rollups for the dates of the given invoices.
+
+    For callers outside this module that write invoices/allocations directly.
+    """
+    if not invoice_ids:
+        return
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('SELECT DISTINCT invoice_date FROM invoices WHERE id = ANY(%s)', (list(invoice_ids),))
+        _refresh_allocation_rollups(cursor, [row['invoice_date'] for row in cursor.fetchall()])
+    finally:
+        release_db(conn)
+    clear_summary_cache()
+
+
+def rebuild_allocation_rollups() -> None:
+    """Recompute the whole rollup table from allocations and invoices."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('SELECT pg_advisory_lock(%s)', (ALLOCATION_ROLLUP_LOCK_ID,))
+        try:
+            cursor.execute(_ROLLUP_REFRESH_SQL.format(date_filter='TRUE', date_filter_i='TRUE'))
+        finally:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', (ALLOCATION_ROLLUP_LOCK_ID,))
+    finally:
+        release_db(conn)
+    clear_summary_cache()
+
+
+def _get_invoice_dates(cursor, invoice_ids: list[int]) -> list:
+    """Get invoice dates for the given invoice IDs."""
+    cursor.execute('SELECT invoice_date FROM invoices WHERE id = ANY(%s)', (list(invoice_ids),))
+    return [row['invoice_date'] for row in cursor.fetchall()]
+
+
+def _summary_from_rollups(cursor, group_columns: list[str], company: Optional[str] = None,
+                          start_date: Optional[str] = None, end_date: Optional[str] = None,
+                          department: Optional[str] = None, subdepartment: Optional[str] = None,
+                          brand: Optional[str] = None, invoice_numbers: bool = False) -> list[dict]:
+    """Aggregate allocation_rollups_daily by group_columns with the summary filters.
+
+    invoice_count is the sum of the rows' invoice_count, corrected with a
+    distinct count over split_invoice_ids only, so an invoice split across
+    several departments of one company still counts once without unnesting
+    every invoice id. With invoice_numbers, each group also gets its invoices'
+    numbers, looked up by the rows' invoice_ids (invoices primary key;
+    allocations are not read).
+    """
+    params = []
+    conditions = []
+
+    if company:
+        conditions.append('company = %s')
+        params.append(company)
+    if start_date:
+        conditions.append('invoice_date >= %s')
+        params.append(start_date)
+    if end_date:
+        conditions.append('invoice_date <= %s')
+        params.append(end_date)
+    if department:
+        conditions.append('department = %s')
+        params.append(department)
+    if subdepartment:
+        conditions.append('subdepartment = %s')
+        params.append(subdepartment)
+    if brand:
+        conditions.append('brand = %s')
+        params.append(brand)
+
+    where_clause = ' AND '.join(conditions) if conditions else 'TRUE'
+    columns = ', '.join(group_columns)
+    filtered_columns = ', '.join(f'filtered.{c}' for c in group_columns)
+    select_columns = ', '.join(f't.{c}' for c in group_columns)
+
+    def join_on(alias):
+        return ' AND '.join(f't.{c} IS NOT DISTINCT FROM {alias}.{c}' for c in group_columns)
+
+    numbers_cte = numbers_select = numbers_join = ''
+    if invoice_numbers:
+        numbers_cte = f''',
+        numbers AS (
+            SELECT {filtered_columns},
+                   STRING_AGG(DISTINCT i.invoice_number, ', ') AS invoice_numbers
+            FROM filtered
+            CROSS JOIN unnest(filtered.invoice_ids) AS invoice_id
+            JOIN invoices i ON i.id = invoice_id
+            GROUP BY {filtered_columns}
+        )'''
+        numbers_select = ', n.invoice_numbers'
+        numbers_join = f'LEFT JOIN numbers n ON {join_on("n")}'
+
+    cursor.execute(f'''
+        WITH filtered AS (
+            SELECT * FROM allocation_rollups_daily WHERE {where_clause}
+        ),
+        totals AS (
+            SELECT {columns},
+                   SUM(value_ron) AS total_value_ron,
+                   SUM(value_eur) AS total_value_eur,
+                   SUM(exchange_rate_sum) / NULLIF(SUM(allocation_count), 0) AS avg_exchange_rate,
+                   SUM(invoice_count - cardinality(split_invoice_ids)) AS unsplit_count
+            FROM filtered
+            GROUP BY {columns}
+        ),
+        splits AS (
+            SELECT {filtered_columns},
+                   COUNT(DISTINCT invoice_id) AS split_count
+            FROM filtered
+            CROSS JOIN unnest(filtered.split_invoice_ids) AS invoice_id
+            GROUP BY {filtered_columns}
+        ){numbers_cte}
+        SELECT {select_columns}, t.total_value_ron, t.total_value_eur,
+               t.unsplit_count + COALESCE(s.split_count, 0) AS invoice_count,
+               t.avg_exchange_rate{numbers_select}
+        FROM totals t
+        LEFT JOIN splits s ON {join_on("s")}
+        {numbers_join}
+        ORDER BY t.total_value_ron DESC
+    ''', params)
+    return [dict_from_row(row) for row in cursor.fetchall()]
+
+
 def get_summary_by_company(start_date: Optional[str] = None, end_date: Optional[str] = None,
                           department: Optional[str] = None, subdepartment: Optional[str] = None,
                           brand: Optional[str] = None) -> list[dict]:
     """Get total allocation values grouped by company.
 
     Returns totals in both RON and EUR for currency toggle support.
+    Reads from allocation_rollups_daily (see _summary_from_rollups).
     Results are cached for 60 seconds to reduce DB load on dashboard tab switches.
     """
-    global _summary_cache
-
     # Build cache key from parameters
     cache_key = f"{start_date}:{end_date}:{department}:{subdepartment}:{brand}"
-    cache_entry = _summary_cache['company'].get(cache_key)
+    cached = _get_summary_cache('company', cache_key)
 
     # Check cache
-    if cache_entry and (time.time() - cache_entry['timestamp']) < _summary_cache['ttl']:
-        return cache_entry['data']
+    if cached is not None:
+        return cached
 
     conn = get_db()
     try:
         cursor = get_cursor(conn)
+        results = _summary_from_rollups(
+            cursor, ['company'],
+            start_date=start_date, end_date=end_date,
+            department=department, subdepartment=subdepartment, brand=brand
+        )
 
-        # Calculate allocation values in RON and EUR based on invoice conversion rates
-        query = '''
-            SELECT
-                a.company,
-                SUM(CASE WHEN i.invoice_value > 0 AND i.value_ron IS NOT NULL
-                    THEN a.allocation_value * i.value_ron / i.invoice_value
-                    ELSE a.allocation_value END) as total_value_ron,
-                SUM(CASE WHEN i.invoice_value > 0 AND i.value_eur IS NOT NULL
-                    THEN a.allocation_value * i.value_eur / i.invoice_value
-                    ELSE a.allocation_value / COALESCE(i.exchange_rate, 5.0) END) as total_value_eur,
-                COUNT(DISTINCT a.invoice_id) as invoice_count,
-                AVG(COALESCE(i.exchange_rate, 5.0)) as avg_exchange_rate
-            FROM allocations a
-            JOIN invoices i ON a.invoice_id = i.id
-            WHERE i.deleted_at IS NULL
-        '''
-        params = []
-        conditions = []
-
-        if start_date:
-            conditions.append('i.invoice_date >= %s')
-            params.append(start_date)
-        if end_date:
-            conditions.append('i.invoice_date <= %s')
-            params.append(end_date)
-        if department:
-            conditions.append('a.department = %s')
-            params.append(department)
-        if subdepartment:
-            conditions.append('a.subdepartment = %s')
-            params.append(subdepartment)
-        if brand:
-            conditions.append('a.brand = %s')
-            params.append(brand)
-
-        if conditions:
-            query += ' AND ' + ' AND '.join(conditions)
-
-        query += ' GROUP BY a.company ORDER BY total_value_ron DESC'
-
-        cursor.execute(query, params)
-        results = [dict_from_row(row) for row in cursor.fetchall()]
-
-        # Cache results and enforce size limit
-        _summary_cache['company'][cache_key] = {'data': results, 'timestamp': time.time()}
-        _enforce_summary_cache_limit('company')
+        # Cache results (LRU-bounded)
+        _set_summary_cache('company', cache_key, results)
 
         return results
     finally:
@@ -2929,73 +3503,28 @@ def get_summary_by_department(company: Optional[str] = None, start_date: Optiona
                               brand: Optional[str] = None) -> list[dict]:
     """Get total allocation values grouped by department.
 
+    Reads from allocation_rollups_daily (see _summary_from_rollups).
     Results are cached for 60 seconds to reduce DB load on dashboard tab switches.
     """
-    global _summary_cache
-
     # Build cache key from parameters
     cache_key = f"{company}:{start_date}:{end_date}:{department}:{subdepartment}:{brand}"
-    cache_entry = _summary_cache['department'].get(cache_key)
+    cached = _get_summary_cache('department', cache_key)
 
     # Check cache
-    if cache_entry and (time.time() - cache_entry['timestamp']) < _summary_cache['ttl']:
-        return cache_entry['data']
+    if cached is not None:
+        return cached
 
     conn = get_db()
     try:
         cursor = get_cursor(conn)
+        results = _summary_from_rollups(
+            cursor, ['company', 'department', 'subdepartment'],
+            company=company, start_date=start_date, end_date=end_date,
+            department=department, subdepartment=subdepartment, brand=brand
+        )
 
-        # Calculate allocation values in RON and EUR based on invoice conversion rates
-        query = '''
-            SELECT
-                a.company,
-                a.department,
-                a.subdepartment,
-                SUM(CASE WHEN i.invoice_value > 0 AND i.value_ron IS NOT NULL
-                    THEN a.allocation_value * i.value_ron / i.invoice_value
-                    ELSE a.allocation_value END) as total_value_ron,
-                SUM(CASE WHEN i.invoice_value > 0 AND i.value_eur IS NOT NULL
-                    THEN a.allocation_value * i.value_eur / i.invoice_value
-                    ELSE a.allocation_value / COALESCE(i.exchange_rate, 5.0) END) as total_value_eur,
-                COUNT(DISTINCT a.invoice_id) as invoice_count,
-                AVG(COALESCE(i.exchange_rate, 5.0)) as avg_exchange_rate
-            FROM allocations a
-            JOIN invoices i ON a.invoice_id = i.id
-            WHERE i.deleted_at IS NULL
-        '''
-        params = []
-        conditions = []
-
-        if company:
-            conditions.append('a.company = %s')
-            params.append(company)
-        if start_date:
-            conditions.append('i.invoice_date >= %s')
-            params.append(start_date)
-        if end_date:
-            conditions.append('i.invoice_date <= %s')
-            params.append(end_date)
-        if department:
-            conditions.append('a.department = %s')
-            params.append(department)
-        if subdepartment:
-            conditions.append('a.subdepartment = %s')
-            params.append(subdepartment)
-        if brand:
-            conditions.append('a.brand = %s')
-            params.append(brand)
-
-        if conditions:
-            query += ' AND ' + ' AND '.join(conditions)
-
-        query += ' GROUP BY a.company, a.department, a.subdepartment ORDER BY total_value_ron DESC'
-
-        cursor.execute(query, params)
-        results = [dict_from_row(row) for row in cursor.fetchall()]
-
-        # Cache results and enforce size limit
-        _summary_cache['department'][cache_key] = {'data': results, 'timestamp': time.time()}
-        _enforce_summary_cache_limit('department')
+        # Cache results (LRU-bounded)
+        _set_summary_cache('department', cache_key, results)
 
         return results
     finally:
@@ -3005,96 +3534,102 @@ def get_summary_by_department(company: Optional[str] = None, start_date: Optiona
 def get_summary_by_brand(company: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None,
                          department: Optional[str] = None, subdepartment: Optional[str] = None,
                          brand: Optional[str] = None) -> list[dict]:
-    """Get total allocation values grouped by brand (Linie de business) with invoice details.
+    """Get total allocation values grouped by brand (Linie de business) with invoice numbers.
 
+    Reads from allocation_rollups_daily (see _summary_from_rollups). The
+    per-allocation split values are loaded for one brand row at a time by
+    get_brand_split_values(), when the row is expanded.
     Results are cached for 60 seconds to reduce DB load on dashboard tab switches.
     """
-    global _summary_cache
-
     # Build cache key from parameters
     cache_key = f"{company}:{start_date}:{end_date}:{department}:{subdepartment}:{brand}"
-    cache_entry = _summary_cache['brand'].get(cache_key)
+    cached = _get_summary_cache('brand', cache_key)
 
     # Check cache
-    if cache_entry and (time.time() - cache_entry['timestamp']) < _summary_cache['ttl']:
-        return cache_entry['data']
+    if cached is not None:
+        return cached
 
     conn = get_db()
     try:
         cursor = get_cursor(conn)
+        results = _summary_from_rollups(
+            cursor, ['brand'],
+            company=company, start_date=start_date, end_date=end_date,
+            department=department, subdepartment=subdepartment, brand=brand,
+            invoice_numbers=True
+        )
 
-        # Calculate allocation values in RON and EUR based on invoice conversion rates
-        query = '''
-            SELECT a.brand,
-                   SUM(CASE WHEN i.invoice_value > 0 AND i.value_ron IS NOT NULL
-                       THEN a.allocation_value * i.value_ron / i.invoice_value
-                       ELSE a.allocation_value END) as total_value_ron,
-                   SUM(CASE WHEN i.invoice_value > 0 AND i.value_eur IS NOT NULL
-                       THEN a.allocation_value * i.value_eur / i.invoice_value
-                       ELSE a.allocation_value / COALESCE(i.exchange_rate, 5.0) END) as total_value_eur,
-                   COUNT(DISTINCT a.invoice_id) as invoice_count,
-                   AVG(COALESCE(i.exchange_rate, 5.0)) as avg_exchange_rate,
-                   STRING_AGG(DISTINCT i.invoice_number, ', ') as invoice_numbers,
-                   JSON_AGG(JSON_BUILD_OBJECT(
-                       'department', a.department,
-                       'subdepartment', a.subdepartment,
-                       'brand', a.brand,
-                       'value', a.allocation_value,
-                       'value_ron', CASE WHEN i.invoice_value > 0 AND i.value_ron IS NOT NULL
-                           THEN a.allocation_value * i.value_ron / i.invoice_value
-                           ELSE a.allocation_value END,
-                       'value_eur', CASE WHEN i.invoice_value > 0 AND i.value_eur IS NOT NULL
-                           THEN a.allocation_value * i.value_eur / i.invoice_value
-                           ELSE a.allocation_value / COALESCE(i.exchange_rate, 5.0) END,
-                       'percent', ROUND(a.allocation_percent),
-                       'reinvoice_to', a.reinvoice_to,
-                       'reinvoice_brand', a.reinvoice_brand,
-                       'reinvoice_department', a.reinvoice_department,
-                       'reinvoice_subdepartment', a.reinvoice_subdepartment,
-                       'currency', i.currency
-                   )) as split_values
-            FROM allocations a
-            JOIN invoices i ON a.invoice_id = i.id
-            WHERE i.deleted_at IS NULL
-        '''
-        params = []
-        conditions = []
+        # Cache results (LRU-bounded)
+        _set_summary_cache('brand', cache_key, results)
 
-        if company:
-            conditions.append('a.company = %s')
-            params.append(company)
-        if start_date:
-            conditions.append('i.invoice_date >= %s')
-            params.append(start_date)
-        if end_date:
-            conditions.append('i.invoice_date <= %s')
-            params.append(end_date)
-        if department:
-            conditions.append('a.department = %s')
-            params.append(department)
-        if subdepartment:
-            conditions.append('a.subdepartment = %s')
-            params.append(subdepartment)
-        if brand:
-            conditions.append('a.brand = %s')
-            params.append(brand)
+        return results
+    finally:
+        release_db(conn)
 
-        if conditions:
-            query += ' AND ' + ' AND '.join(conditions)
 
-        query += ' GROUP BY a.brand ORDER BY total_value_ron DESC'
+def get_brand_split_values(row_brand: Optional[str], company: Optional[str] = None,
+                           start_date: Optional[str] = None, end_date: Optional[str] = None,
+                           department: Optional[str] = None, subdepartment: Optional[str] = None) -> list[dict]:
+    """Get the allocations behind one row of the brand summary (row_brand None = no brand).
+
+    Values are converted per allocation for the split view. Results are cached
+    with the other summaries.
+    """
+    cache_key = f"{row_brand}:{company}:{start_date}:{end_date}:{department}:{subdepartment}"
+    cached = _get_summary_cache('brand_splits', cache_key)
+    if cached is not None:
+        return cached
+
+    query = '''
+        SELECT a.department, a.subdepartment, a.brand,
+               a.allocation_value AS value,
+               CASE WHEN i.invoice_value > 0 AND i.value_ron IS NOT NULL
+                   THEN a.allocation_value * i.value_ron / i.invoice_value
+                   ELSE a.allocation_value END AS value_ron,
+               CASE WHEN i.invoice_value > 0 AND i.value_eur IS NOT NULL
+                   THEN a.allocation_value * i.value_eur / i.invoice_value
+                   ELSE a.allocation_value / COALESCE(i.exchange_rate, 5.0) END AS value_eur,
+               ROUND(a.allocation_percent) AS percent,
+               a.reinvoice_to, a.reinvoice_brand, a.reinvoice_department, a.reinvoice_subdepartment,
+               i.currency
+        FROM allocations a
+        JOIN invoices i ON a.invoice_id = i.id
+        WHERE i.deleted_at IS NULL AND a.brand IS NOT DISTINCT FROM %s
+    '''
+    params = [row_brand]
+    conditions = []
 
+    if company:
+        conditions.append('a.company = %s')
+        params.append(company)
+    if start_date:
+        conditions.append('i.invoice_date >= %s')
+        params.append(start_date)
+    if end_date:
+        conditions.append('i.invoice_date <= %s')
+        params.append(end_date)
+    if department:
+        conditions.append('a.department = %s')
+        params.append(department)
+    if subdepartment:
+        conditions.append('a.subdepartment = %s')
+        params.append(subdepartment)
+
+    if conditions:
+        query += ' AND ' + ' AND '.join(conditions)
+    query += ' ORDER BY i.invoice_date, a.id'
+
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
         cursor.execute(query, params)
         results = [dict_from_row(row) for row in cursor.fetchall()]
-
-        # Cache results and enforce size limit
-        _summary_cache['brand'][cache_key] = {'data': results, 'timestamp': time.time()}
-        _enforce_summary_cache_limit('brand')
-
-        return results
     finally:
         release_db(conn)
 
+    _set_summary_cache('brand_splits', cache_key, results)
+    return results
+
 
 def get_summary_by_supplier(company: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None,
                             department: Optional[str] = None, subdepartment: Optional[str] = None,
@@ -3103,72 +3638,28 @@ def get_summary_by_supplier(company: Optional[str] = None, start_date: Optional[
 
     Uses allocation values (like other summary functions) so VAT subtraction is accounted for.
     Each invoice has exactly one supplier, so invoice_count per supplier is accurate.
+    Reads from allocation_rollups_daily (see _summary_from_rollups).
     Results are cached for 60 seconds to reduce DB load on dashboard tab switches.
     """
-    global _summary_cache
-
     # Build cache key from parameters
     cache_key = f"{company}:{start_date}:{end_date}:{department}:{subdepartment}:{brand}"
-    cache_entry = _summary_cache['supplier'].get(cache_key)
+    cached = _get_summary_cache('supplier', cache_key)
 
     # Check cache
-    if cache_entry and (time.time() - cache_entry['timestamp']) < _summary_cache['ttl']:
-        return cache_entry['data']
+    if cached is not None:
+        return cached
 
     conn = get_db()
     try:
         cursor = get_cursor(conn)
+        results = _summary_from_rollups(
+            cursor, ['supplier'],
+            company=company, start_date=start_date, end_date=end_date,
+            department=department, subdepartment=subdepartment, brand=brand
+        )
 
-        # Use allocation values (same as other summaries) so VAT subtraction is accounted for
-        # Group by supplier - each invoice has exactly one supplier
-        query = '''
-            SELECT
-                i.supplier,
-                SUM(CASE WHEN i.invoice_value > 0 AND i.value_ron IS NOT NULL
-                    THEN a.allocation_value * i.value_ron / i.invoice_value
-                    ELSE a.allocation_value END) as total_value_ron,
-                SUM(CASE WHEN i.invoice_value > 0 AND i.value_eur IS NOT NULL
-                    THEN a.allocation_value * i.value_eur / i.invoice_value
-                    ELSE a.allocation_value / COALESCE(i.exchange_rate, 5.0) END) as total_value_eur,
-                COUNT(DISTINCT a.invoice_id) as invoice_count,
-                AVG(COALESCE(i.exchange_rate, 5.0)) as avg_exchange_rate
-            FROM allocations a
-            JOIN invoices i ON a.invoice_id = i.id
-            WHERE i.deleted_at IS NULL
-        '''
-        params = []
-        conditions = []
-
-        if company:
-            conditions.append('a.company = %s')
-            params.append(company)
-        if start_date:
-            conditions.append('i.invoice_date >= %s')
-            params.append(start_date)
-        if end_date:
-            conditions.append('i.invoice_date <= %s')
-            params.append(end_date)
-        if department:
-            conditions.append('a.department = %s')
-            params.append(department)
-        if subdepartment:
-            conditions.append('a.subdepartment = %s')
-            params.append(subdepartment)
-        if brand:
-            conditions.append('a.brand = %s')
-            params.append(brand)
-
-        if conditions:
-            query += ' AND ' + ' AND '.join(conditions)
-
-        query += ' GROUP BY i.supplier ORDER BY total_value_ron DESC'
-
-        cursor.execute(query, params)
-        results = [dict_from_row(row) for row in cursor.fetchall()]
-
-        # Cache results and enforce size limit
-        _summary_cache['supplier'][cache_key] = {'data': results, 'timestamp': time.time()}
-        _enforce_summary_cache_limit('supplier')
+        # Cache results (LRU-bounded)
+        _set_summary_cache('supplier', cache_key, results)
 
         return results
     finally:
@@ -3180,10 +3671,12 @@ def delete_invoice(invoice_id: int) -> bool:
     conn = get_db()
     cursor = get_cursor(conn)
 
-    cursor.execute('UPDATE invoices SET deleted_at = CURRENT_TIMESTAMP WHERE id = %s AND deleted_at IS NULL', (invoice_id,))
-    deleted = cursor.rowcount > 0
+    cursor.execute('UPDATE invoices SET deleted_at = CURRENT_TIMESTAMP WHERE id = %s AND deleted_at IS NULL RETURNING invoice_date', (invoice_id,))
+    dates = [row['invoice_date'] for row in cursor.fetchall()]
+    deleted = len(dates) > 0
 
     conn.commit()
+    _refresh_allocation_rollups(cursor, dates)
     release_db(conn)
     if deleted:
         clear_invoices_cache()
@@ -3195,10 +3688,12 @@ def restore_invoice(invoice_id: int) -> bool:
     conn = get_db()
     cursor = get_cursor(conn)
 
-    cursor.execute('UPDATE invoices SET deleted_at = NULL WHERE id = %s AND deleted_at IS NOT NULL', (invoice_id,))
-    restored = cursor.rowcount > 0
+    cursor.execute('UPDATE invoices SET deleted_at = NULL WHERE id = %s AND deleted_at IS NOT NULL RETURNING invoice_date', (invoice_id,))
+    dates = [row['invoice_date'] for row in cursor.fetchall()]
+    restored = len(dates) > 0
 
     conn.commit()
+    _refresh_allocation_rollups(cursor, dates)
     release_db(conn)
     if restored:
         clear_invoices_cache()
@@ -3234,10 +3729,12 @@ def permanently_delete_invoice(invoice_id: int) -> bool:
     conn = get_db()
     cursor = get_cursor(conn)
 
-    cursor.execute('DELETE FROM invoices WHERE id = %s', (invoice_id,))
-    deleted = cursor.rowcount > 0
+    cursor.execute('DELETE FROM invoices WHERE id = %s RETURNING invoice_date', (invoice_id,))
+    dates = [row['invoice_date'] for row in cursor.fetchall()]
+    deleted = len(dates) > 0
 
     conn.commit()
+    _refresh_allocation_rollups(cursor, dates)
     release_db(conn)
     if deleted:
         clear_invoices_cache()
@@ -3253,10 +3750,12 @@ def bulk_soft_delete_invoices(invoice_ids: list[int]) -> int:
     cursor = get_cursor(conn)
 
     placeholders = ','.join(['%s'] * len(invoice_ids))
-    cursor.execute(f'UPDATE invoices SET deleted_at = CURRENT_TIMESTAMP WHERE id IN ({placeholders}) AND deleted_at IS NULL', invoice_ids)
-    deleted_count = cursor.rowcount
+    cursor.execute(f'UPDATE invoices SET deleted_at = CURRENT_TIMESTAMP WHERE id IN ({placeholders}) AND deleted_at IS NULL RETURNING invoice_date', invoice_ids)
+    dates = [row['invoice_date'] for row in cursor.fetchall()]
+    deleted_count = len(dates)
 
     conn.commit()
+    _refresh_allocation_rollups(cursor, dates)
     release_db(conn)
     if deleted_count > 0:
         clear_invoices_cache()
@@ -3272,10 +3771,12 @@ def bulk_restore_invoices(invoice_ids: list[int]) -> int:
     cursor = get_cursor(conn)
 
     placeholders = ','.join(['%s'] * len(invoice_ids))
-    cursor.execute(f'UPDATE invoices SET deleted_at = NULL WHERE id IN ({placeholders}) AND deleted_at IS NOT NULL', invoice_ids)
-    restored_count = cursor.rowcount
+    cursor.execute(f'UPDATE invoices SET deleted_at = NULL WHERE id IN ({placeholders}) AND deleted_at IS NOT NULL RETURNING invoice_date', invoice_ids)
+    dates = [row['invoice_date'] for row in cursor.fetchall()]
+    restored_count = len(dates)
 
     conn.commit()
+    _refresh_allocation_rollups(cursor, dates)
     release_db(conn)
     if restored_count > 0:
         clear_invoices_cache()
@@ -3291,10 +3792,12 @@ def bulk_permanently_delete_invoices(invoice_ids: list[int]) -> int:
     cursor = get_cursor(conn)
 
     placeholders = ','.join(['%s'] * len(invoice_ids))
-    cursor.execute(f'DELETE FROM invoices WHERE id IN ({placeholders})', invoice_ids)
-    deleted_count = cursor.rowcount
+    cursor.execute(f'DELETE FROM invoices WHERE id IN ({placeholders}) RETURNING invoice_date', invoice_ids)
+    dates = [row['invoice_date'] for row in cursor.fetchall()]
+    deleted_count = len(dates)
 
     conn.commit()
+    _refresh_allocation_rollups(cursor, dates)
     release_db(conn)
     if deleted_count > 0:
         clear_invoices_cache()
@@ -3396,10 +3899,14 @@ def update_invoice(
     query = f"UPDATE invoices SET {', '.join(updates)} WHERE id = %s"
 
     try:
-        cursor.execute(query, params)
-        updated = cursor.rowcount > 0
+        # Old date is needed too: moving an invoice to another day changes both days' rollups
+        old_dates = _get_invoice_dates(cursor, [invoice_id])
+        cursor.execute(query + ' RETURNING invoice_date', params)
+        new_dates = [row['invoice_date'] for row in cursor.fetchall()]
+        updated = len(new_dates) > 0
         conn.commit()
         if updated:
+            _refresh_allocation_rollups(cursor, old_dates + new_dates)
             clear_invoices_cache()
         return updated
     except Exception as e:
@@ -3446,126 +3953,153 @@ def check_invoice_number_exists(invoice_number: str, exclude_id: int = None) ->
     return {'exists': False, 'invoice': None}
 
 
-def search_invoices(query: str, filters: dict = None) -> list[dict]:
-    """Search invoices by supplier, invoice number, or value (Elasticsearch-like).
+# ============== INVOICE SEARCH ==============
+# search_invoices() filters on a lower-cased search document (trigram GIN index,
+# substring matching) and ranks with a weighted tsvector (GIN index, prefix
+# matching). Both are expression indexes created by migration 4, so the SQL
+# below must produce exactly the same expressions as the index definitions.
 
-    Splits query into words and matches ALL words against supplier OR invoice_number OR invoice_value.
-    Each word can match anywhere in the fields (partial matching).
-    Case-insensitive. Numeric values are matched against invoice_value.
+INVOICE_SEARCH_LIMIT = 50
 
-    Args:
-        query: Search text
-        filters: Optional dict with filter params (company, department, subdepartment, brand,
-                 status, payment_status, start_date, end_date)
-    """
-    conn = get_db()
-    cursor = get_cursor(conn)
-    filters = filters or {}
 
-    # Split query into words and filter empty strings
-    words = [w.strip() for w in query.split() if w.strip()]
+def _invoice_search_document(alias: str = '') -> str:
+    """Lower-cased text searched with LIKE '%word%' (trigram-indexed)."""
+    p = f'{alias}.' if alias else ''
+    return (
+        f"lower(coalesce({p}supplier, '') || ' ' || coalesce({p}invoice_number, '') || ' ' || "
+        f"coalesce({p}comment, '') || ' ' || coalesce({p}partner_search, ''))"
+    )
+
+
+def _invoice_search_vector(alias: str = '') -> str:
+    """Weighted tsvector used for ranking: number/supplier > partner > comment."""
+    p = f'{alias}.' if alias else ''
+    return (
+        f"(setweight(to_tsvector('simple', coalesce({p}invoice_number, '')), 'A') || "
+        f"setweight(to_tsvector('simple', coalesce({p}supplier, '')), 'A') || "
+        f"setweight(to_tsvector('simple', coalesce({p}partner_search, '')), 'B') || "
+        f"setweight(to_tsvector('simple', coalesce({p}comment, '')), 'C'))"
+    )
+
+
+def _parse_search_amount(word: str) -> Optional[float]:
+    """Parse a search word as an amount (handles European format: 1.234,56 or 123,45)."""
+    # Remove thousands separators and normalize decimal
+    cleaned = word.replace(' ', '').replace('.', '').replace(',', '.')
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def _escape_like(word: str) -> str:
+    return word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _build_prefix_tsquery(words: list) -> str:
+    """Build a to_tsquery() string requiring every token as a prefix: 'acme:* & 2025:*'."""
+    tokens = []
+    for word in words:
+        tokens.extend(re.findall(r'\w+', word.lower()))
+    return ' & '.join(f'{token}:*' for token in tokens)
+
 
+def _build_invoice_search_query(query: str, filters: dict = None, limit: int = INVOICE_SEARCH_LIMIT):
+    """Build the ranked invoice search SQL. Returns (sql, params) or (None, None) for an empty query."""
+    filters = filters or {}
+    words = [w.strip() for w in query.split() if w.strip()]
     if not words:
-        release_db(conn)
-        return []
+        return None, None
 
-    # Helper to parse numeric value (handles European format: 123,45 or 123.45)
-    def parse_numeric(word):
-        # Remove thousands separators and normalize decimal
-        cleaned = word.replace(' ', '').replace('.', '').replace(',', '.')
-        try:
-            return float(cleaned)
-        except ValueError:
-            return None
+    document = _invoice_search_document('i')
+    vector = _invoice_search_vector('i')
 
-    # Build search conditions: each word must match somewhere in supplier OR invoice_number OR invoice_value
-    search_conditions = []
+    # Each word must match somewhere in the search document; numeric words may
+    # instead match invoice_value within a cent (range scan on idx_invoices_invoice_value)
+    conditions = []
     params = []
     for word in words:
-        term = f'%{word}%'
-        # Check if word looks like a number (possibly with decimal)
-        numeric_val = parse_numeric(word)
-        if numeric_val is not None:
-            # Match against text fields OR exact/approximate value match
-            search_conditions.append('(i.supplier ILIKE %s OR i.invoice_number ILIKE %s OR i.comment ILIKE %s OR ABS(i.invoice_value - %s) < 0.01)')
-            params.extend([term, term, term, numeric_val])
+        term = f'%{_escape_like(word.lower())}%'
+        amount = _parse_search_amount(word)
+        if amount is not None:
+            conditions.append(f'({document} LIKE %s OR (i.invoice_value > %s AND i.invoice_value < %s))')
+            params.extend([term, amount - 0.01, amount + 0.01])
         else:
-            search_conditions.append('(i.supplier ILIKE %s OR i.invoice_number ILIKE %s OR i.comment ILIKE %s)')
-            params.extend([term, term, term])
-
-    # Build base query
-    company = filters.get('company')
-    department = filters.get('department')
-    subdepartment = filters.get('subdepartment')
-    brand = filters.get('brand')
-
-    # If any allocation filter is set, join with allocations table
-    if company or department or subdepartment or brand:
-        base_query = '''
-            SELECT DISTINCT i.*
-            FROM invoices i
-            JOIN allocations a ON a.invoice_id = i.id
-        '''
+            conditions.append(f'{document} LIKE %s')
+            params.append(term)
+
+    conditions.append('i.deleted_at IS NULL')
+
+    allocation_conditions = []
+    for column in ('company', 'department', 'subdepartment', 'brand'):
+        if filters.get(column):
+            allocation_conditions.append(f'a.{column} = %s')
+            params.append(filters[column])
+    if allocation_conditions:
+        conditions.append(f'''EXISTS (
+            SELECT 1 FROM allocations a
+            WHERE a.invoice_id = i.id AND {' AND '.join(allocation_conditions)}
+        )''')
+
+    if filters.get('start_date'):
+        conditions.append('i.invoice_date >= %s')
+        params.append(filters['start_date'])
+    if filters.get('end_date'):
+        conditions.append('i.invoice_date <= %s')
+        params.append(filters['end_date'])
+    if filters.get('status'):
+        conditions.append('i.status = %s')
+        params.append(filters['status'])
+    if filters.get('payment_status'):
+        conditions.append('i.payment_status = %s')
+        params.append(filters['payment_status'])
+
+    tsquery = _build_prefix_tsquery(words)
+    if tsquery:
+        rank = f"ts_rank({vector}, to_tsquery('simple', %s))"
+        rank_params = [tsquery]
     else:
-        base_query = '''
-            SELECT DISTINCT i.*
-            FROM invoices i
-        '''
-
-    # Build filter conditions
-    filter_conditions = ['i.deleted_at IS NULL']  # Always exclude deleted invoices
-
-    if company:
-        filter_conditions.append('a.company = %s')
-        params.append(company)
-    if department:
-        filter_conditions.append('a.department = %s')
-        params.append(department)
-    if subdepartment:
-        filter_conditions.append('a.subdepartment = %s')
-        params.append(subdepartment)
-    if brand:
-        filter_conditions.append('a.brand = %s')
-        params.append(brand)
+        rank = '0'
+        rank_params = []
 
-    # Date filters
-    start_date = filters.get('start_date')
-    end_date = filters.get('end_date')
-    if start_date:
-        filter_conditions.append('i.invoice_date >= %s')
-        params.append(start_date)
-    if end_date:
-        filter_conditions.append('i.invoice_date <= %s')
-        params.append(end_date)
+    sql = f'''
+        SELECT i.*, {rank} AS search_rank
+        FROM invoices i
+        WHERE {' AND '.join(conditions)}
+        ORDER BY search_rank DESC, i.created_at DESC, i.id DESC
+        LIMIT %s
+    '''
+    return sql, rank_params + params + [limit]
 
-    # Status filters
-    status = filters.get('status')
-    payment_status = filters.get('payment_status')
-    if status:
-        filter_conditions.append('i.status = %s')
-        params.append(status)
-    if payment_status:
-        filter_conditions.append('i.payment_status = %s')
-        params.append(payment_status)
 
-    # Combine search conditions with filter conditions
-    # Search conditions come first (they use the initial params), filter conditions come after
-    all_conditions = search_conditions + filter_conditions
+def search_invoices(query: str, filters: dict = None, limit: int = INVOICE_SEARCH_LIMIT) -> list[dict]:
+    """Search invoices by supplier, invoice number, comment, e-Factura partner or value.
 
-    # Reorder params: search params first, then filter params
-    # But we already built params in this order, so just join conditions
-    where_clause = ' AND '.join(all_conditions)
+    Splits query into words; ALL words must match (case-insensitive, anywhere in
+    the field). Numeric words also match invoice_value within 0.01. Results are
+    ranked by full-text relevance with prefix matching (exact invoice number or
+    supplier hits first), then newest first.
 
-    cursor.execute(f'''
-        {base_query}
-        WHERE {where_clause}
-        ORDER BY i.created_at DESC
-        LIMIT 50
-    ''', params)
+    Args:
+        query: Search text
+        filters: Optional dict with filter params (company, department, subdepartment, brand,
+                 status, payment_status, start_date, end_date)
+        limit: Max rows returned (default 50)
+    """
+    sql, params = _build_invoice_search_query(query, filters, limit)
+    if sql is None:
+        return []
 
-    results = [dict_from_row(row) for row in cursor.fetchall()]
-    release_db(conn)
-    return results
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute(sql, params)
+        results = []
+        for row in cursor.fetchall():
+            results.append(_invoice_from_row(row))
+        return results
+    finally:
+        release_db(conn)
 
 
 # ============== ALLOCATION FUNCTIONS ==============
@@ -3634,11 +4168,15 @@ def update_allocation(
         return False
 
     params.append(allocation_id)
-    query = f"UPDATE allocations SET {', '.join(updates)} WHERE id = %s"
+    query = f"UPDATE allocations SET {', '.join(updates)} WHERE id = %s RETURNING invoice_id"
     cursor.execute(query, params)
-    updated = cursor.rowcount > 0
+    invoice_ids = [row['invoice_id'] for row in cursor.fetchall()]
+    updated = len(invoice_ids) > 0
 
     conn.commit()
+    if updated:
+        _refresh_allocation_rollups(cursor, _get_invoice_dates(cursor, invoice_ids))
+        clear_invoices_cache()
     release_db(conn)
     return updated
 
@@ -3648,10 +4186,14 @@ def delete_allocation(allocation_id: int) -> bool:
     conn = get_db()
     cursor = get_cursor(conn)
 
-    cursor.execute('DELETE FROM allocations WHERE id = %s', (allocation_id,))
-    deleted = cursor.rowcount > 0
+    cursor.execute('DELETE FROM allocations WHERE id = %s RETURNING invoice_id', (allocation_id,))
+    invoice_ids = [row['invoice_id'] for row in cursor.fetchall()]
+    deleted = len(invoice_ids) > 0
 
     conn.commit()
+    if deleted:
+        _refresh_allocation_rollups(cursor, _get_invoice_dates(cursor, invoice_ids))
+        clear_invoices_cache()
     release_db(conn)
     return deleted
 
@@ -3706,6 +4248,8 @@ def add_allocation(
         allocation_id = cursor.fetchone()['id']
 
         conn.commit()
+        _refresh_allocation_rollups(cursor, _get_invoice_dates(cursor, [invoice_id]))
+        clear_invoices_cache()
         return allocation_id
     except Exception as e:
         conn.rollback()
@@ -3725,7 +4269,7 @@ def update_invoice_allocations(invoice_id: int, allocations: list[dict]) -> bool
 
     try:
         # Get invoice value to calculate allocation values
-        cursor.execute('SELECT invoice_value, subtract_vat, net_value FROM invoices WHERE id = %s', (invoice_id,))
+        cursor.execute('SELECT invoice_value, subtract_vat, net_value, invoice_date FROM invoices WHERE id = %s', (invoice_id,))
         result = cursor.fetchone()
         if not result:
             raise ValueError(f"Invoice {invoice_id} not found")
@@ -3799,6 +4343,7 @@ def update_invoice_allocations(invoice_id: int, allocations: list[dict]) -> bool
                 ))
 
         conn.commit()
+        _refresh_allocation_rollups(cursor, [result['invoice_date']])
         clear_invoices_cache()  # Allocations changed
         return True
     except Exception as e:
@@ -4071,11 +4616,10 @@ def delete_invoice_template(template_id: int) -> bool:
 
 def get_all_invoice_templates() -> list[dict]:
     """Get all invoice templates (with caching)."""
-    global _templates_cache
-
     # Return cached data if valid
-    if _is_cache_valid(_templates_cache):
-        return _templates_cache['data']
+    cached = _get_cache_data(_templates_cache)
+    if cached is not None:
+        return cached
 
     conn = get_db()
     cursor = get_cursor(conn)
@@ -4086,8 +4630,7 @@ def get_all_invoice_templates() -> list[dict]:
     release_db(conn)
 
     # Cache the result
-    _templates_cache['data'] = templates
-    _templates_cache['timestamp'] = time.time()
+    _set_cache_data(_templates_cache, templates)
 
     return templates
 
@@ -4700,11 +5243,10 @@ def delete_users_bulk(user_ids: list) -> int:
 
 def get_all_responsables() -> list[dict]:
     """Get all users as responsables (with caching)."""
-    global _users_cache
-
     # Return cached data if valid
-    if _is_cache_valid(_users_cache):
-        return _users_cache['data']
+    cached = _get_cache_data(_users_cache)
+    if cached is not None:
+        return cached
 
     conn = get_db()
     cursor = get_cursor(conn)
@@ -4720,8 +5262,7 @@ def get_all_responsables() -> list[dict]:
     release_db(conn)
 
     # Cache the result
-    _users_cache['data'] = results
-    _users_cache['timestamp'] = time.time()
+    _set_cache_data(_users_cache, results)
 
     return results
 
@@ -5356,6 +5897,131 @@ def update_notification_status(log_id: int, status: str, error_message: str = No
     return updated
 
 
+# ============== Notification Outbox ==============
+#
+# Notification emails are written as events to notification_outbox (in the
+# caller's transaction where possible) and sent later by the dispatcher in
+# core/services/notification_outbox.py. Rows move pending -> processing ->
+# sent / failed / skipped; a failed attempt goes back to pending with a later
+# next_attempt_at. `progress` records per-recipient notification_log ids and
+# delivery so a retry only resends what failed.
+
+def _outbox_json_default(value):
+    # Decimals stay numeric for the email templates; dates and the rest become strings
+    return float(value) if isinstance(value, Decimal) else str(value)
+
+
+def _insert_notification_outbox(cursor, event_type: str, invoice_id: Optional[int], payload: dict) -> int:
+    """Queue a notification event using the caller's cursor (same transaction)."""
+    cursor.execute('''
+        INSERT INTO notification_outbox (event_type, invoice_id, payload)
+        VALUES (%s, %s, %s)
+        RETURNING id
+    ''', (event_type, invoice_id, json.dumps(payload, default=_outbox_json_default)))
+    return cursor.fetchone()['id']
+
+
+def enqueue_notification(event_type: str, invoice_id: Optional[int], payload: dict) -> int:
+    """Queue a notification event in its own transaction. Returns the outbox id."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        outbox_id = _insert_notification_outbox(cursor, event_type, invoice_id, payload)
+        conn.commit()
+        return outbox_id
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db(conn)
+
+
+def claim_notification_outbox(limit: int = 50, stale_after_seconds: int = 600) -> list[dict]:
+    """Claim due outbox events for sending.
+
+    Rows locked by another dispatcher are skipped (SKIP LOCKED), so several
+    workers can drain the outbox at once. Events stuck in 'processing' longer
+    than stale_after_seconds (a dispatcher died mid-batch) are claimed again.
+    Claiming counts as an attempt.
+    """
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            UPDATE notification_outbox o
+            SET status = 'processing', attempts = o.attempts + 1, locked_at = CURRENT_TIMESTAMP
+            WHERE o.id IN (
+                SELECT id FROM notification_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+                   OR (status = 'processing' AND locked_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+                ORDER BY next_attempt_at, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING o.id, o.event_type, o.invoice_id, o.payload, o.progress, o.attempts
+        ''', (stale_after_seconds, limit))
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.commit()
+        return sorted(rows, key=lambda row: row['id'])
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db(conn)
+
+
+def complete_notification_outbox(outbox_id: int, status: str, progress: dict,
+                                 error: str = None, retry_in_seconds: float = None) -> bool:
+    """Record the outcome of a dispatch attempt.
+
+    status is 'sent', 'failed' or 'skipped' (final), or 'pending' with
+    retry_in_seconds to schedule another attempt.
+    """
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            UPDATE notification_outbox
+            SET status = %s,
+                progress = %s,
+                last_error = %s,
+                locked_at = NULL,
+                next_attempt_at = CASE WHEN %s IS NULL THEN next_attempt_at
+                                       ELSE CURRENT_TIMESTAMP + %s * INTERVAL '1 second' END,
+                processed_at = CASE WHEN %s = 'pending' THEN NULL ELSE CURRENT_TIMESTAMP END
+            WHERE id = %s
+        ''', (status, json.dumps(progress), error, retry_in_seconds, retry_in_seconds, status, outbox_id))
+        updated = cursor.rowcount > 0
+        conn.commit()
+        return updated
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db(conn)
+
+
+def get_notification_outbox_stats() -> dict:
+    """Outbox counts by status, plus the age of the oldest event still waiting."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            SELECT status, COUNT(*) AS count,
+                   EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - MIN(created_at)) AS oldest_seconds
+            FROM notification_outbox
+            GROUP BY status
+        ''')
+        rows = cursor.fetchall()
+    finally:
+        release_db(conn)
+
+    stats = {row['status']: row['count'] for row in rows}
+    waiting = [row['oldest_seconds'] for row in rows if row['status'] in ('pending', 'processing')]
+    stats['oldest_waiting_seconds'] = round(float(max(waiting)), 1) if waiting else 0
+    return stats
+
+
 def get_notification_logs(limit: int = 100) -> list[dict]:
     """Get recent notification logs."""
     conn = get_db()
@@ -5376,15 +6042,113 @@ def get_notification_logs(limit: int = 100) -> list[dict]:
     return results
 
 
+# ============== Bulk Processing Jobs ==============
+#
+# State of background bulk jobs (accounting/bugetare/bulk_jobs.py). The job
+# runs in one Gunicorn worker; status polls and downloads may reach any
+# worker, so status, report and Excel export are kept here. report holds the
+# pickled process_bulk_invoices() result (it contains datetimes).
+
+def save_bulk_job_status(job_id: str, user_id: Optional[int], status: dict, ttl_seconds: int) -> None:
+    """Create or update a job's progress snapshot; every save extends its expiry."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            INSERT INTO bulk_jobs (job_id, user_id, status, expires_at)
+            VALUES (%s, %s, %s, CURRENT_TIMESTAMP + %s * INTERVAL '1 second')
+            ON CONFLICT (job_id) DO UPDATE
+            SET status = EXCLUDED.status,
+                updated_at = CURRENT_TIMESTAMP,
+                expires_at = EXCLUDED.expires_at
+        ''', (job_id, user_id, json.dumps(status, default=str), ttl_seconds))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db(conn)
+
+
+def save_bulk_job_result(job_id: str, report: bytes = None, excel: bytes = None) -> bool:
+    """Store a job's serialized report and/or Excel export. Returns False if the job is gone."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('''
+            UPDATE bulk_jobs
+            SET report = COALESCE(%s, report),
+                excel = COALESCE(%s, excel)
+            WHERE job_id = %s
+        ''', (
+            psycopg2.Binary(report) if report is not None else None,
+            psycopg2.Binary(excel) if excel is not None else None,
+            job_id,
+        ))
+        updated = cursor.rowcount > 0
+        conn.commit()
+        return updated
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db(conn)
+
+
+def get_bulk_job_row(job_id: str, with_report: bool = False, with_excel: bool = False) -> Optional[dict]:
+    """Get an unexpired job: status, idle_seconds since the last save and, on request, report/excel bytes."""
+    columns = ['status', 'EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - updated_at) AS idle_seconds']
+    if with_report:
+        columns.append('report')
+    if with_excel:
+        columns.append('excel')
+
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute(f'''
+            SELECT {', '.join(columns)}
+            FROM bulk_jobs
+            WHERE job_id = %s AND expires_at > CURRENT_TIMESTAMP
+        ''', (job_id,))
+        row = cursor.fetchone()
+    finally:
+        release_db(conn)
+
+    if not row:
+        return None
+    job = dict(row)
+    job['idle_seconds'] = float(job['idle_seconds'])
+    for column in ('report', 'excel'):
+        if job.get(column) is not None:
+            job[column] = bytes(job[column])
+    return job
+
+
+def delete_expired_bulk_jobs() -> int:
+    """Delete jobs past their expiry. Returns the number removed."""
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute('DELETE FROM bulk_jobs WHERE expires_at <= CURRENT_TIMESTAMP')
+        deleted = cursor.rowcount
+        conn.commit()
+        return deleted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db(conn)
+
+
 # ============== Companies CRUD ==============
 
 def get_all_companies() -> list[dict]:
     """Get all companies (with caching)."""
-    global _companies_vat_cache
-
     # Return cached data if valid
-    if _is_cache_valid(_companies_vat_cache):
-        return _companies_vat_cache['data']
+    cached = _get_cache_data(_companies_vat_cache)
+    if cached is not None:
+        return cached
 
     conn = get_db()
     cursor = get_cursor(conn)
@@ -5398,8 +6162,7 @@ def get_all_companies() -> list[dict]:
     release_db(conn)
 
     # Cache the result
-    _companies_vat_cache['data'] = results
-    _companies_vat_cache['timestamp'] = time.time()
+    _set_cache_data(_companies_vat_cache, results)
 
     return results
 
@@ -7250,6 +8013,37 @@ def get_efactura_oauth_tokens(company_cif: str) -> Optional[dict]:
     return None
 
 
+# Arbitrary constant class key for per-CIF pg_try_advisory_lock(class, hashtext(cif))
+EFACTURA_TOKEN_REFRESH_LOCK_ID = 725_003
+
+
+@contextmanager
+def efactura_token_refresh_lock(company_cif: str):
+    """Try to take the cross-process token refresh lock for a CIF.
+
+    Yields True if this process holds the lock (held until the block exits),
+    False if another worker is refreshing the same CIF right now.
+    """
+    conn = get_db()
+    try:
+        cursor = get_cursor(conn)
+        cursor.execute(
+            'SELECT pg_try_advisory_lock(%s, hashtext(%s)) AS acquired',
+            (EFACTURA_TOKEN_REFRESH_LOCK_ID, company_cif)
+        )
+        acquired = cursor.fetchone()['acquired']
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                cursor.execute(
+                    'SELECT pg_advisory_unlock(%s, hashtext(%s))',
+                    (EFACTURA_TOKEN_REFRESH_LOCK_ID, company_cif)
+                )
+    finally:
+        release_db(conn)
+
+
 def save_efactura_oauth_tokens(company_cif: str, tokens: dict) -> bool:
     """
     Save OAuth tokens for a company's e-Factura connection.
@@ -7795,5 +8589,5 @@ def delete_user_preset(preset_id, user_id):
         release_db(conn)
 
 
-# Initialize database on import
-init_db()
+# Check schema version on import (migrations run only if the database is behind)
+ensure_schema()
@@ -0,0 +1,39 @@
+"""Gunicorn server hooks.
+
+Gunicorn loads ./gunicorn.conf.py automatically, so the Procfile and Docker
+CMD pick this up without extra flags. Command-line options still win.
+"""
+import os
+
+
+def on_starting(server):
+    """Start the shared cache server in the master before workers fork.
+
+    Only runs when CACHE_BACKEND=socket; workers connect to it through
+    core.cache.SocketCacheBackend.
+    """
+    if os.environ.get('CACHE_BACKEND', 'local').lower() != 'socket':
+        return
+    from core.cache import CacheServer, CACHE_SOCKET_PATH
+    server.cache_server = CacheServer(CACHE_SOCKET_PATH).start()
+    server.log.info(f'Shared cache server started at {CACHE_SOCKET_PATH}')
+
+
+def post_worker_init(worker):
+    """Start the notification outbox dispatcher in each worker.
+
+    Workers claim outbox events with SKIP LOCKED, so they drain it together
+    without sending an email twice. NOTIFICATION_DISPATCHER=off disables it.
+    """
+    try:
+        from core.services.notification_outbox import get_notification_dispatcher
+    except ImportError as e:
+        worker.log.warning(f'Notification dispatcher unavailable: {e}')
+        return
+    get_notification_dispatcher().start()
+
+
+def on_exit(server):
+    cache_server = getattr(server, 'cache_server', None)
+    if cache_server is not None:
+        cache_server.stop()
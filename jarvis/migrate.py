@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Apply pending database schema migrations.
+
+Run once per deploy (before starting Gunicorn) so workers only perform a
+single schema_version check at startup instead of re-running the schema
+bootstrap in every process.
+
+Usage:
+    cd jarvis && DATABASE_URL='postgresql://...' python migrate.py
+
+Options:
+    --status       Show current and target schema version, list pending migrations
+    --target N     Migrate up to version N only
+"""
+
+import os
+import sys
+import argparse
+
+# Skip the import-time schema check - this script does the migrating
+os.environ['DB_SCHEMA_CHECK'] = 'off'
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import SCHEMA_VERSION, get_schema_version, get_pending_migrations, run_migrations
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Apply pending database schema migrations')
+    parser.add_argument('--status', action='store_true', help='Show schema version and pending migrations')
+    parser.add_argument('--target', type=int, default=None, help='Migrate up to this version')
+    args = parser.parse_args(argv)
+
+    current = get_schema_version()
+    pending = get_pending_migrations()
+
+    if args.status:
+        print(f"Schema version: {current} (latest: {SCHEMA_VERSION})")
+        for version, description in pending:
+            print(f"  pending {version}: {description}")
+        if not pending:
+            print("  up to date")
+        return 0
+
+    if not pending:
+        print(f"Schema is up to date (version {current})")
+        return 0
+
+    applied = run_migrations(target=args.target)
+    for version in applied:
+        print(f"Applied migration {version}")
+    print(f"Schema version: {get_schema_version()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
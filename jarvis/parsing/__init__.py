@@ -0,0 +1,10 @@
+"""JARVIS Document Parsing.
+
+Pure parsing modules shared by the accounting apps:
+- invoices: Invoice PDF text extraction and template parsing (bulk processing)
+- statements: UniCredit bank statement parsing
+- parse_cache: Content-addressed cache of extracted text and parse results
+
+Nothing here imports Flask or the database, so process pool workers can
+import these modules without loading the web app.
+"""
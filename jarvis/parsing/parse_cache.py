@@ -0,0 +1,240 @@
+"""
+Content-Addressed Parse Cache
+
+Caches the expensive steps of invoice parsing on disk, keyed by the SHA-256 of
+the file bytes, so re-parsing the same PDF (upload, /api/parse-existing, bulk
+processing, auto-detect) skips PyPDF2 extraction, pdf2image rasterization and
+paid AI calls.
+
+Layout (one directory per file digest, shared by all processes on the host):
+
+    <PARSE_CACHE_DIR>/ab/abcdef.../text.txt          extracted PDF text
+    <PARSE_CACHE_DIR>/ab/abcdef.../images.json       [[base64, media_type], ...]
+    <PARSE_CACHE_DIR>/ab/abcdef.../result-<k>.json   parse result for key k
+
+Result keys name the parse mode, e.g. 'ai', 'bulk:v<PARSER_VERSION>' (see
+parsing.invoices) or 'template:<template_id>:<template_version>' (see
+template_cache_key), so a parser or template change never serves a result
+produced by the old code or template.
+
+Total size is bounded by PARSE_CACHE_MAX_MB; the least recently used file
+digests are evicted first. PARSE_CACHE_MAX_MB=0 disables the cache.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from datetime import datetime, date
+from typing import Any, Optional
+
+logger = logging.getLogger('jarvis.bugetare.parse_cache')
+
+PARSE_CACHE_DIR = os.environ.get('PARSE_CACHE_DIR', '/tmp/jarvis-parse-cache')
+PARSE_CACHE_MAX_MB = int(os.environ.get('PARSE_CACHE_MAX_MB', 500))
+
+# Evict down to this fraction of the limit so eviction doesn't run on every write
+EVICT_TARGET_RATIO = 0.9
+
+
+def file_digest(file_bytes: bytes) -> str:
+    """SHA-256 hex digest of file content."""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def path_digest(file_path: str) -> Optional[str]:
+    """SHA-256 hex digest of a file on disk, or None if it can't be read."""
+    try:
+        with open(file_path, 'rb') as f:
+            return file_digest(f.read())
+    except Exception:
+        return None
+
+
+def template_cache_key(mode: str, template: dict) -> str:
+    """Result key for a template-based parse: '<mode>:<template_id>:<template_version>'.
+
+    The version is a hash of the template's content, so any edit to its
+    patterns or fixed values produces a new key.
+    """
+    version = hashlib.sha256(json.dumps(template, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f"{mode}:{template.get('id')}:{version}"
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    raise TypeError(f'Cannot cache {type(value).__name__}')
+
+
+def _json_object_hook(obj):
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    if '__date__' in obj:
+        return date.fromisoformat(obj['__date__'])
+    return obj
+
+
+class ParseCache:
+    """Size-bounded on-disk cache of extracted text, page images and parse results."""
+
+    def __init__(self, directory: str = PARSE_CACHE_DIR, max_bytes: int = PARSE_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # Approximate bytes on disk, computed on first write
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _entry_dir(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _read(self, digest: Optional[str], name: str) -> Optional[bytes]:
+        if not self.enabled or not digest:
+            return None
+        path = os.path.join(self._entry_dir(digest), name)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Directory mtime is the LRU clock
+            os.utime(self._entry_dir(digest))
+        except OSError:
+            with self._lock:
+                self._stats['misses'] += 1
+            return None
+        with self._lock:
+            self._stats['hits'] += 1
+        return data
+
+    def _write(self, digest: Optional[str], name: str, data: bytes):
+        if not self.enabled or not digest:
+            return
+        entry_dir = self._entry_dir(digest)
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            tmp_path = os.path.join(entry_dir, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(entry_dir, name))
+        except OSError as e:
+            logger.warning(f'Parse cache write failed for {digest[:12]}/{name}: {e}')
+            return
+        with self._lock:
+            self._stats['writes'] += 1
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += len(data)
+            over_limit = self._size > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        """(mtime, size, path) of every digest directory."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for prefix in os.scandir(self.directory):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except OSError:
+                    continue  # Removed concurrently by another process
+        return entries
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """Remove least recently used digests until under the size target. Returns count removed."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size = total
+            self._stats['evictions'] += removed
+        if removed:
+            logger.info(f'Parse cache evicted {removed} files, {total / 1024 / 1024:.1f} MB remaining')
+        return removed
+
+    def get_text(self, digest: Optional[str]) -> Optional[str]:
+        data = self._read(digest, 'text.txt')
+        return data.decode('utf-8') if data is not None else None
+
+    def set_text(self, digest: Optional[str], text: str):
+        self._write(digest, 'text.txt', text.encode('utf-8'))
+
+    def get_images(self, digest: Optional[str]) -> Optional[list[tuple[str, str]]]:
+        data = self._read(digest, 'images.json')
+        return [tuple(image) for image in json.loads(data)] if data is not None else None
+
+    def set_images(self, digest: Optional[str], images: list[tuple[str, str]]):
+        self._write(digest, 'images.json', json.dumps(images).encode('utf-8'))
+
+    @staticmethod
+    def _result_name(key: str) -> str:
+        return f"result-{hashlib.sha256(key.encode()).hexdigest()[:16]}.json"
+
+    def get_result(self, digest: Optional[str], key: str) -> Optional[Any]:
+        data = self._read(digest, self._result_name(key))
+        return json.loads(data, object_hook=_json_object_hook) if data is not None else None
+
+    def set_result(self, digest: Optional[str], key: str, result: Any):
+        try:
+            data = json.dumps(result, default=_json_default).encode('utf-8')
+        except TypeError as e:
+            logger.warning(f'Parse result for key {key} not cacheable: {e}')
+            return
+        self._write(digest, self._result_name(key), data)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        with self._lock:
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'hit_ratio': round(self._stats['hits'] / lookups, 3) if lookups else 0.0,
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes,
+            }
+
+
+_parse_cache = None
+_parse_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> ParseCache:
+    """Get the process-wide parse cache."""
+    global _parse_cache
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            _parse_cache = ParseCache()
+        return _parse_cache
+
+
+def set_parse_cache(cache: ParseCache):
+    """Replace the process-wide parse cache (used by tests and custom setups)."""
+    global _parse_cache
+    with _parse_cache_lock:
+        _parse_cache = cache
@@ -1,6 +1,7 @@
 """Bank Statement Parser for UniCredit PDF statements.
 
-Extracts transactions from UniCredit bank statement PDFs.
+Extracts transactions from UniCredit bank statement PDFs. Runs in the
+statement parsing process pool, so it must not import Flask or the database.
 """
 import re
 import logging
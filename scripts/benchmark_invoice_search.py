@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark: invoice search latency against table size
+
+Builds a scratch schema with synthetic invoices at increasing sizes and times
+the indexed search_invoices() SQL (trigram + full-text, migration 4) against
+the previous per-word ILIKE scan. Nothing outside the scratch schema is touched
+and the schema is dropped at the end.
+
+Usage:
+    DATABASE_URL='postgresql://...' python scripts/benchmark_invoice_search.py
+
+Options:
+    --sizes 1000,10000,100000   Table sizes to benchmark
+    --runs N                    Timed runs per query (default 20)
+    --keep                      Keep the scratch schema afterwards
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+# database.py must not migrate/check the real schema when imported from here
+os.environ['DB_SCHEMA_CHECK'] = 'off'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'jarvis'))
+
+from database import _build_invoice_search_query, _invoice_search_document, _invoice_search_vector  # noqa: E402
+
+SCHEMA = 'invoice_search_bench'
+
+QUERIES = [
+    'acme',              # common supplier prefix
+    'INV-000123',        # exact invoice number
+    'servicii 2025',     # two words across fields
+    '1.234,56',          # amount
+    'RO1234',            # partner CIF fragment
+]
+
+
+def get_connection():
+    """Get database connection."""
+    db_url = os.environ.get('DATABASE_URL')
+    if not db_url:
+        print("ERROR: DATABASE_URL environment variable not set")
+        sys.exit(1)
+    conn = psycopg2.connect(db_url)
+    conn.autocommit = True
+    return conn
+
+
+def legacy_query(query):
+    """The per-word ILIKE query search_invoices() used before migration 4."""
+    conditions, params = [], []
+    for word in query.split():
+        term = f'%{word}%'
+        conditions.append('(i.supplier ILIKE %s OR i.invoice_number ILIKE %s OR i.comment ILIKE %s)')
+        params.extend([term, term, term])
+    sql = f'''
+        SELECT DISTINCT i.* FROM invoices i
+        WHERE {' AND '.join(conditions)} AND i.deleted_at IS NULL
+        ORDER BY i.created_at DESC LIMIT 50
+    '''
+    return sql, params
+
+
+def create_schema(cursor):
+    cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+    cursor.execute(f'CREATE SCHEMA {SCHEMA}')
+    cursor.execute(f'SET search_path TO {SCHEMA}, public')
+    cursor.execute('''
+        CREATE TABLE invoices (
+            id SERIAL PRIMARY KEY,
+            supplier TEXT NOT NULL,
+            invoice_number TEXT NOT NULL,
+            invoice_date DATE NOT NULL,
+            invoice_value REAL NOT NULL,
+            comment TEXT,
+            partner_search TEXT,
+            status TEXT DEFAULT 'new',
+            payment_status TEXT DEFAULT 'not_paid',
+            deleted_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute(f'CREATE INDEX ON invoices USING gin (({_invoice_search_document()}) gin_trgm_ops)')
+    cursor.execute(f'CREATE INDEX ON invoices USING gin (({_invoice_search_vector()}))')
+    cursor.execute('CREATE INDEX ON invoices(invoice_value)')
+
+
+def grow_table(cursor, size):
+    """Insert synthetic rows until the table holds `size` invoices."""
+    cursor.execute('SELECT COUNT(*) AS n FROM invoices')
+    current = cursor.fetchone()['n']
+    if size <= current:
+        return
+    cursor.execute('''
+        INSERT INTO invoices (supplier, invoice_number, invoice_date, invoice_value, comment, partner_search, created_at)
+        SELECT
+            (ARRAY['Acme', 'Dacia', 'Orange', 'Vodafone', 'Enel', 'Petrom'])[1 + g % 6] || ' SRL ' || (g % 997),
+            'INV-' || lpad(g::text, 6, '0'),
+            DATE '2025-01-01' + (g % 365),
+            round((random() * 10000)::numeric, 2),
+            CASE WHEN g % 3 = 0 THEN 'servicii luna ' || (1 + g % 12) || ' 2025' END,
+            CASE WHEN g % 2 = 0 THEN 'Partner ' || (g % 500) || ' RO' || (1000000 + g % 9000) END,
+            NOW() - (g || ' minutes')::interval
+        FROM generate_series(%s, %s) AS g
+    ''', (current + 1, size))
+    cursor.execute('ANALYZE invoices')
+
+
+def time_query(cursor, sql, params, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def uses_index(cursor, sql, params):
+    cursor.execute('EXPLAIN ' + sql, params)
+    plan = '\n'.join(row['QUERY PLAN'] for row in cursor.fetchall())
+    return 'Index' in plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark invoice search latency against table size')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated table sizes')
+    parser.add_argument('--runs', type=int, default=20, help='Timed runs per query')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch schema')
+    args = parser.parse_args()
+    sizes = sorted(int(s) for s in args.sizes.split(','))
+
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        create_schema(cursor)
+        print(f"{'rows':>8}  {'query':<14} {'indexed p50':>11} {'p95':>8} {'index':>6} {'legacy p50':>11} {'p95':>8}")
+        for size in sizes:
+            grow_table(cursor, size)
+            for query in QUERIES:
+                sql, params = _build_invoice_search_query(query)
+                p50, p95 = time_query(cursor, sql, params, args.runs)
+                indexed = uses_index(cursor, sql, params)
+                legacy_sql, legacy_params = legacy_query(query)
+                legacy_p50, legacy_p95 = time_query(cursor, legacy_sql, legacy_params, args.runs)
+                print(f"{size:>8}  {query:<14} {p50:>9.2f}ms {p95:>6.2f}ms {'yes' if indexed else 'no':>6} "
+                      f"{legacy_p50:>9.2f}ms {legacy_p95:>6.2f}ms")
+    finally:
+        if not args.keep:
+            cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Benchmark: RAG retrieval latency and recall@k
+
+Builds a scratch copy of ai_agent.rag_documents (maintained content_tsv with a
+GIN index, HNSW or IVFFlat index on embedding) filled with a synthetic,
+clustered corpus of invoice-like documents, then runs the repository's own
+search queries (build_vector_search_query / build_text_search_query /
+build_hybrid_search_query) and reports p50/p95 latency and:
+
+    recall@k  overlap of the ANN top-k with the exact (sequential scan) top-k
+    hit@k     share of queries whose source document is in the top-k
+
+Vector search is measured at several recall/latency knob values
+(hnsw.ef_search or ivfflat.probes). Text search is measured against the
+indexed column and against to_tsvector() computed per row with no index.
+Nothing outside the scratch schema is touched and the schema is
+dropped at the end.
+
+Usage:
+    DATABASE_URL='postgresql://...' python scripts/benchmark_rag_search.py
+
+Options:
+    --docs 20000                Corpus size
+    --dim 256                   Embedding dimensions (production uses 1536)
+    --queries 50                Queries per mode
+    --k 5                       Results per query
+    --index hnsw                hnsw or ivfflat
+    --knobs 10,40,100           ef_search (hnsw) or probes (ivfflat) values
+    --keep                      Keep the scratch schema afterwards
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import argparse
+import statistics
+
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+
+# database.py must not migrate/check the real schema when imported from here
+os.environ['DB_SCHEMA_CHECK'] = 'off'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'jarvis'))
+
+from ai_agent.repositories.rag_document_repository import (  # noqa: E402
+    TSVECTOR_EXPRESSION,
+    build_hybrid_search_query,
+    build_text_search_query,
+    build_vector_search_query,
+    vector_literal,
+)
+
+SCHEMA = 'rag_search_bench'
+TABLE = f'{SCHEMA}.rag_documents'
+
+SUPPLIERS = ['Acme', 'Dacia', 'Orange', 'Vodafone', 'Enel', 'Petrom', 'Digi', 'Emag', 'Dedeman', 'Lukoil']
+TOPICS = [
+    ['fuel', 'diesel', 'station', 'card'], ['internet', 'fiber', 'subscription', 'mobile'],
+    ['electricity', 'energy', 'meter', 'consumption'], ['advertising', 'campaign', 'impressions', 'clicks'],
+    ['parts', 'service', 'repair', 'workshop'], ['rent', 'office', 'lease', 'building'],
+    ['software', 'license', 'cloud', 'hosting'], ['transport', 'freight', 'delivery', 'courier'],
+]
+
+
+def get_connection():
+    """Get database connection."""
+    db_url = os.environ.get('DATABASE_URL')
+    if not db_url:
+        print("ERROR: DATABASE_URL environment variable not set")
+        sys.exit(1)
+    conn = psycopg2.connect(db_url)
+    conn.autocommit = True
+    return conn
+
+
+def normalize(vector):
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def synthetic_corpus(docs, dim, rng):
+    """Documents in topic clusters: nearby embeddings share topic words."""
+    centers = [normalize([rng.gauss(0, 1) for _ in range(dim)]) for _ in TOPICS]
+    corpus = []
+    for i in range(1, docs + 1):
+        topic = i % len(TOPICS)
+        supplier = SUPPLIERS[(i * 7) % len(SUPPLIERS)]
+        words = rng.sample(TOPICS[topic], 2)
+        content = (f"Supplier: {supplier} SRL {i % 97}\nInvoice Number: INV{i:07d}\n"
+                   f"Date: 2026-{i % 12 + 1:02d}-15\nAmount: {i * 13.7:.2f} RON\n"
+                   f"Description: {' '.join(words)}")
+        embedding = normalize([c + rng.gauss(0, 0.35) for c in centers[topic]])
+        corpus.append((i, content, embedding))
+    return corpus
+
+
+def create_schema(cursor, dim):
+    cursor.execute('CREATE EXTENSION IF NOT EXISTS vector')
+    cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+    cursor.execute(f'CREATE SCHEMA {SCHEMA}')
+    cursor.execute(f'''
+        CREATE TABLE {TABLE} (
+            id SERIAL PRIMARY KEY,
+            source_type VARCHAR(50) NOT NULL DEFAULT 'invoice',
+            source_id INTEGER,
+            source_table VARCHAR(100) DEFAULT 'invoices',
+            content TEXT NOT NULL,
+            content_hash VARCHAR(64),
+            content_tsv tsvector GENERATED ALWAYS AS ({TSVECTOR_EXPRESSION}) STORED,
+            embedding vector({dim}),
+            metadata JSONB DEFAULT '{{}}',
+            company_id INTEGER,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def load(cursor, corpus):
+    execute_values(
+        cursor,
+        f'INSERT INTO {TABLE} (source_id, content, embedding) VALUES %s',
+        [(source_id, content, vector_literal(embedding)) for source_id, content, embedding in corpus],
+        template='(%s, %s, %s::vector)',
+        page_size=1000,
+    )
+
+
+def build_indexes(cursor, index, docs):
+    start = time.perf_counter()
+    cursor.execute(f'CREATE INDEX ON {TABLE} USING gin (content_tsv)')
+    if index == 'hnsw':
+        cursor.execute(f'CREATE INDEX ON {TABLE} USING hnsw (embedding vector_cosine_ops) '
+                       f'WITH (m = 16, ef_construction = 64)')
+    else:
+        cursor.execute(f'CREATE INDEX ON {TABLE} USING ivfflat (embedding vector_cosine_ops) '
+                       f'WITH (lists = {max(10, docs // 1000)})')
+    cursor.execute(f'ANALYZE {TABLE}')
+    return time.perf_counter() - start
+
+
+def make_queries(corpus, count, rng):
+    """Perturbed corpus embeddings plus words from the same document."""
+    queries = []
+    for source_id, content, embedding in rng.sample(corpus, count):
+        lines = dict(line.split(': ', 1) for line in content.split('\n'))
+        text = f"{lines['Invoice Number']} {lines['Description'].split()[0]}"
+        vector = normalize([x + rng.gauss(0, 0.05) for x in embedding])
+        queries.append((source_id, text, vector))
+    return queries
+
+
+def run(cursor, sql, params, settings=()):
+    cursor.execute('BEGIN')
+    for name, value in settings:
+        cursor.execute('SELECT set_config(%s, %s, true)', (name, str(value)))
+    start = time.perf_counter()
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    elapsed = (time.perf_counter() - start) * 1000
+    cursor.execute('ROLLBACK')
+    return elapsed, [row['source_id'] for row in rows]
+
+
+def measure(cursor, queries, build, k, settings=(), exact=None):
+    timings, recalls, hits = [], [], 0
+    for n, (source_id, text, vector) in enumerate(queries):
+        sql, params = build(text, vector)
+        elapsed, ids = run(cursor, sql, params, settings)
+        timings.append(elapsed)
+        hits += source_id in ids[:k]
+        if exact is not None:
+            recalls.append(len(set(ids[:k]) & set(exact[n])) / max(1, len(exact[n])))
+    timings.sort()
+    p95 = timings[max(0, math.ceil(len(timings) * 0.95) - 1)]
+    recall = statistics.mean(recalls) if recalls else None
+    return statistics.median(timings), p95, recall, hits / len(queries)
+
+
+def report(label, knob, result):
+    p50, p95, recall, hit = result
+    recall_str = f'{recall:.3f}' if recall is not None else '-'
+    print(f"{label:<16} {knob:>8} {p50:>8.2f}ms {p95:>8.2f}ms {recall_str:>9} {hit:>7.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark RAG retrieval latency and recall@k')
+    parser.add_argument('--docs', type=int, default=20000, help='Corpus size')
+    parser.add_argument('--dim', type=int, default=256, help='Embedding dimensions')
+    parser.add_argument('--queries', type=int, default=50, help='Queries per mode')
+    parser.add_argument('--k', type=int, default=5, help='Results per query')
+    parser.add_argument('--index', choices=('hnsw', 'ivfflat'), default='hnsw', help='Vector index type')
+    parser.add_argument('--knobs', default='10,40,100', help='ef_search (hnsw) or probes (ivfflat) values')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch schema')
+    args = parser.parse_args()
+    knob_name = 'hnsw.ef_search' if args.index == 'hnsw' else 'ivfflat.probes'
+    knobs = [int(value) for value in args.knobs.split(',')]
+
+    rng = random.Random(42)
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        create_schema(cursor, args.dim)
+        corpus = synthetic_corpus(args.docs, args.dim, rng)
+        load(cursor, corpus)
+        print(f"{args.docs} documents, {args.dim} dims, {args.index} index built in "
+              f"{build_indexes(cursor, args.index, args.docs):.1f}s, k={args.k}\n")
+        queries = make_queries(corpus, args.queries, rng)
+
+        def vector(text, embedding):
+            return build_vector_search_query(embedding, args.k, table=TABLE)
+
+        # Exact top-k: same query with index scans disabled
+        exact_settings = [('enable_indexscan', 'off'), ('enable_bitmapscan', 'off')]
+        exact = []
+        for _, text, embedding in queries:
+            exact.append(run(cursor, *vector(text, embedding), exact_settings)[1])
+
+        print(f"{'mode':<16} {'knob':>8} {'p50':>10} {'p95':>10} {'recall@k':>9} {'hit@k':>7}")
+        report('exact (seqscan)', '-', measure(cursor, queries, vector, args.k, exact_settings, exact))
+        for knob in knobs:
+            report(f'vector {args.index}', knob, measure(cursor, queries, vector, args.k, [(knob_name, knob)], exact))
+
+        report('text indexed', '-', measure(
+            cursor, queries, lambda text, _: build_text_search_query(text, args.k, table=TABLE), args.k))
+        report('text per-row', '-', measure(
+            cursor, queries,
+            lambda text, _: build_text_search_query(text, args.k, tsvector=TSVECTOR_EXPRESSION, table=TABLE),
+            args.k))
+
+        for knob in knobs:
+            report('hybrid', knob, measure(
+                cursor, queries,
+                lambda text, embedding: build_hybrid_search_query(text, embedding, args.k, table=TABLE),
+                args.k, [(knob_name, knob)]))
+    finally:
+        if not args.keep:
+            cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bank statement ingest throughput (rows/sec)
+
+Builds a scratch schema with bank_statement_transactions and its dedup unique
+index, then ingests synthetic card-statement batches with the set-based
+save_transactions_with_dedup() path and with the previous per-row loop
+(duplicate probe + SAVEPOINT + INSERT per transaction). Each batch re-uploads
+a share of rows that already exist, so both paths exercise deduplication.
+Nothing outside the scratch schema is touched and the schema is dropped at
+the end.
+
+Usage:
+    DATABASE_URL='postgresql://...' python scripts/benchmark_statement_ingest.py
+
+Options:
+    --sizes 500,5000,20000      Batch sizes to benchmark
+    --existing 20000            Rows already in the table before each batch
+    --overlap 0.3               Share of each batch that duplicates existing rows
+    --keep                      Keep the scratch schema afterwards
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import date, timedelta
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+# database.py must not migrate/check the real schema when imported from here
+os.environ['DB_SCHEMA_CHECK'] = 'off'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'jarvis'))
+
+from accounting.statements.database import _ingest_transactions, _ingest_transactions_per_row  # noqa: E402
+
+SCHEMA = 'statement_ingest_bench'
+
+VENDORS = ['FACEBK *ADS', 'GOOGLE *ADS', 'CLAUDE.AI SUBSCRIPTION', 'DIGITALOCEAN.COM', 'SHOPIFY *APP', 'tarom.ro']
+COMPANIES = [('Autoworld SRL', '12345678'), ('Autoworld Premium SRL', '23456789'), ('Autoworld Next SRL', '34567890')]
+
+
+def get_connection():
+    """Get database connection."""
+    db_url = os.environ.get('DATABASE_URL')
+    if not db_url:
+        print("ERROR: DATABASE_URL environment variable not set")
+        sys.exit(1)
+    return psycopg2.connect(db_url)
+
+
+def create_schema(conn):
+    cursor = conn.cursor()
+    cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+    cursor.execute(f'CREATE SCHEMA {SCHEMA}')
+    cursor.execute(f'SET search_path TO {SCHEMA}, public')
+    cursor.execute('''
+        CREATE TABLE bank_statement_transactions (
+            id SERIAL PRIMARY KEY,
+            statement_id INTEGER,
+            statement_file TEXT,
+            company_name TEXT,
+            company_cui TEXT,
+            account_number TEXT,
+            transaction_date DATE,
+            value_date DATE,
+            description TEXT,
+            vendor_name TEXT,
+            matched_supplier TEXT,
+            amount REAL,
+            currency TEXT DEFAULT 'RON',
+            original_amount REAL,
+            original_currency TEXT,
+            exchange_rate REAL,
+            auth_code TEXT,
+            card_number TEXT,
+            transaction_type TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX ON bank_statement_transactions(transaction_date)')
+    cursor.execute('''
+        CREATE UNIQUE INDEX ON bank_statement_transactions
+            (company_cui, account_number, transaction_date, amount, currency, description)
+        WHERE company_cui IS NOT NULL
+          AND transaction_date IS NOT NULL
+          AND amount IS NOT NULL
+          AND description IS NOT NULL
+    ''')
+    conn.commit()
+
+
+def synthetic_transactions(count, seed):
+    """Card transactions spread over a year for several companies."""
+    rng = random.Random(seed)
+    start = date(2025, 1, 1)
+    transactions = []
+    for i in range(count):
+        company_name, company_cui = rng.choice(COMPANIES)
+        vendor = rng.choice(VENDORS)
+        transactions.append({
+            'statement_file': f'extras_{company_cui}.pdf',
+            'company_name': company_name,
+            'company_cui': company_cui,
+            'account_number': f'RO49UNCR{company_cui}',
+            'transaction_date': start + timedelta(days=rng.randint(0, 364)),
+            'description': f'{vendor} {seed}-{i}',
+            'vendor_name': vendor,
+            'amount': -round(rng.uniform(5, 5000), 2),
+            'currency': 'RON',
+            'card_number': '4****1234',
+            'transaction_type': 'card_purchase',
+        })
+    return transactions
+
+
+def reset_table(conn, existing):
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute('TRUNCATE bank_statement_transactions RESTART IDENTITY')
+    _ingest_transactions(cursor, existing)
+    cursor.execute('ANALYZE bank_statement_transactions')
+    conn.commit()
+
+
+def run(conn, ingest, batch):
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    start = time.perf_counter()
+    new_ids = ingest(cursor, batch)
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    return elapsed, len(new_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark bank statement ingest throughput')
+    parser.add_argument('--sizes', default='500,5000,20000', help='Comma-separated batch sizes')
+    parser.add_argument('--existing', type=int, default=20000, help='Rows already in the table')
+    parser.add_argument('--overlap', type=float, default=0.3, help='Share of each batch already stored')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch schema')
+    args = parser.parse_args()
+    sizes = sorted(int(s) for s in args.sizes.split(','))
+
+    conn = get_connection()
+    try:
+        create_schema(conn)
+        existing = synthetic_transactions(args.existing, seed=1)
+
+        print(f"{'batch':>7}  {'path':<9} {'seconds':>8} {'rows/sec':>10} {'new':>7} {'dupes':>7}")
+        for size in sizes:
+            duplicates = existing[:int(size * args.overlap)]
+            batch = duplicates + synthetic_transactions(size - len(duplicates), seed=size)
+            for label, ingest in (('set', _ingest_transactions), ('per-row', _ingest_transactions_per_row)):
+                reset_table(conn, existing)
+                elapsed, new_count = run(conn, ingest, batch)
+                print(f"{size:>7}  {label:<9} {elapsed:>8.2f} {size / elapsed:>10.0f} "
+                      f"{new_count:>7} {size - new_count:>7}")
+    finally:
+        if not args.keep:
+            conn.rollback()
+            conn.cursor().execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+            conn.commit()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
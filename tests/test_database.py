@@ -264,6 +264,298 @@ class TestCacheTTL:
         assert MAX_SUMMARY_CACHE_ENTRIES > 0
 
 
+# ============== KEYSET PAGINATION TESTS ==============
+
+class TestInvoiceCursor:
+    """Tests for invoice list keyset pagination cursors."""
+
+    def test_cursor_round_trip(self):
+        from database import encode_invoice_cursor, decode_invoice_cursor
+
+        token = encode_invoice_cursor({'id': 42, 'created_at': '2025-12-15T10:30:00.123456'})
+        assert decode_invoice_cursor(token) == ('2025-12-15T10:30:00.123456', 42)
+
+    def test_decode_rejects_garbage(self):
+        from database import decode_invoice_cursor
+
+        with pytest.raises(ValueError):
+            decode_invoice_cursor('not-a-cursor')
+
+    def test_next_cursor_none_on_last_page(self):
+        from database import get_next_invoice_cursor
+
+        invoices = [{'id': 1, 'created_at': '2025-12-15T10:30:00'}]
+        assert get_next_invoice_cursor(invoices, limit=10) is None
+        assert get_next_invoice_cursor([], limit=10) is None
+
+    def test_next_cursor_points_at_last_row(self):
+        from database import get_next_invoice_cursor, decode_invoice_cursor
+
+        invoices = [
+            {'id': 9, 'created_at': '2025-12-16T08:00:00'},
+            {'id': 7, 'created_at': '2025-12-15T10:30:00'},
+        ]
+        token = get_next_invoice_cursor(invoices, limit=2)
+        assert decode_invoice_cursor(token) == ('2025-12-15T10:30:00', 7)
+
+    def test_cursor_query_seeks_instead_of_offset(self):
+        import database
+        conn = MagicMock()
+        cursor = MagicMock()
+        conn.cursor.return_value = cursor
+        cursor.fetchall.return_value = []
+        token = database.encode_invoice_cursor({'id': 7, 'created_at': '2025-12-15T10:30:00'})
+
+        with patch.object(database, 'get_db', return_value=conn), \
+             patch.object(database, 'release_db'), \
+             patch.object(database, '_get_cache_data', return_value=None), \
+             patch.object(database, '_set_cache_data'):
+            database.get_invoices_with_allocations(limit=50, offset=500, company='DWA', page_cursor=token)
+
+        query, params = cursor.execute.call_args.args
+        assert '(i.created_at, i.id) < (%s::timestamp, %s)' in query
+        assert 'ORDER BY i.created_at DESC, i.id DESC' in query
+        assert params[-2:] == [50, 0]
+
+    def test_unfiltered_query_groups_by_invoice_key(self):
+        import database
+        conn = MagicMock()
+        cursor = MagicMock()
+        conn.cursor.return_value = cursor
+        cursor.fetchall.return_value = [{'id': 1, 'partner_search': 'ACME RO123', 'allocations': '[]'}]
+
+        with patch.object(database, 'get_db', return_value=conn), \
+             patch.object(database, 'release_db'), \
+             patch.object(database, '_get_cache_data', return_value=None), \
+             patch.object(database, '_set_cache_data'):
+            invoices = database.get_invoices_with_allocations(limit=50)
+
+        query = cursor.execute.call_args.args[0]
+        assert 'GROUP BY i.id\n' in query
+        assert 'pi.*' not in query
+        assert invoices == [{'id': 1, 'allocations': []}]
+
+
+# ============== ALLOCATION ROLLUP TESTS ==============
+
+class TestAllocationRollups:
+    """Tests for the allocation_rollups_daily maintenance and summary reads."""
+
+    def test_refresh_skips_when_no_dates(self):
+        from database import _refresh_allocation_rollups
+        cursor = MagicMock()
+
+        _refresh_allocation_rollups(cursor, [None])
+
+        cursor.execute.assert_not_called()
+
+    def test_refresh_recomputes_only_given_dates(self):
+        from database import _refresh_allocation_rollups
+        cursor = MagicMock()
+
+        _refresh_allocation_rollups(cursor, ['2025-12-15', date(2025, 12, 15), '2025-12-01'])
+
+        refresh_call = cursor.execute.call_args_list[1]
+        query, params = refresh_call.args
+        assert 'DELETE FROM allocation_rollups_daily' in query
+        assert 'INSERT INTO allocation_rollups_daily' in query
+        assert params == (['2025-12-01', '2025-12-15'], ['2025-12-01', '2025-12-15'])
+
+    def test_refresh_failure_is_logged_not_raised(self):
+        from database import _refresh_allocation_rollups
+        cursor = MagicMock()
+        cursor.execute.side_effect = Exception('boom')
+
+        _refresh_allocation_rollups(cursor, ['2025-12-15'])
+
+    def test_summary_reads_rollups_with_distinct_invoice_count(self):
+        from database import _summary_from_rollups
+        cursor = MagicMock()
+        cursor.fetchall.return_value = []
+
+        _summary_from_rollups(cursor, ['company'], start_date='2025-01-01', brand='BT')
+
+        query, params = cursor.execute.call_args.args
+        assert 'FROM allocation_rollups_daily' in query
+        assert 'FROM allocations' not in query
+        # Distinct count only over invoices split across rollup rows
+        assert 'SUM(invoice_count - cardinality(split_invoice_ids))' in query
+        assert 'unnest(filtered.split_invoice_ids)' in query
+        assert 'unnest(filtered.invoice_ids)' not in query
+        assert params == ['2025-01-01', 'BT']
+
+    def test_refresh_stores_invoice_count_and_split_ids(self):
+        from database import _ROLLUP_REFRESH_SQL
+
+        query = _ROLLUP_REFRESH_SQL.format(date_filter='TRUE', date_filter_i='TRUE')
+
+        assert 'COUNT(*) OVER (PARTITION BY i.id) AS invoice_rows' in query
+        assert "FILTER (WHERE invoice_rows > 1), '{}')" in query
+
+    def _run_summary(self, func, *args, **kwargs):
+        import database
+        conn = MagicMock()
+        cursor = MagicMock()
+        conn.cursor.return_value = cursor
+        cursor.fetchall.return_value = []
+
+        with patch.object(database, 'get_db', return_value=conn), \
+             patch.object(database, 'release_db'), \
+             patch.object(database, '_get_cache_data', return_value=None), \
+             patch.object(database, '_set_cache_data'):
+            getattr(database, func)(*args, **kwargs)
+        return cursor
+
+    def test_brand_summary_reads_only_rollups(self):
+        cursor = self._run_summary('get_summary_by_brand', company='DWA')
+
+        assert cursor.execute.call_count == 1
+        query, params = cursor.execute.call_args.args
+        assert 'FROM allocation_rollups_daily' in query
+        assert 'FROM allocations' not in query
+        assert 'JSON_AGG' not in query
+        assert 'JOIN invoices i ON i.id = invoice_id' in query
+        assert 'n.invoice_numbers' in query
+        assert params == ['DWA']
+
+    def test_brand_split_values_for_one_row(self):
+        cursor = self._run_summary('get_brand_split_values', None, company='DWA', start_date='2025-01-01')
+
+        query, params = cursor.execute.call_args.args
+        assert 'a.brand IS NOT DISTINCT FROM %s' in query
+        assert params == [None, 'DWA', '2025-01-01']
+
+
+# ============== INVOICE SEARCH TESTS ==============
+
+class TestInvoiceSearchQuery:
+    """Tests for the indexed search_invoices() query builder."""
+
+    def test_empty_query_returns_none(self):
+        from database import _build_invoice_search_query
+
+        assert _build_invoice_search_query('   ') == (None, None)
+
+    def test_uses_indexed_expressions(self):
+        from database import _build_invoice_search_query, _invoice_search_document, _invoice_search_vector
+
+        sql, params = _build_invoice_search_query('acme')
+
+        assert f"{_invoice_search_document('i')} LIKE %s" in sql
+        assert _invoice_search_vector('i') in sql
+        assert 'ILIKE' not in sql
+        assert params == ['acme:*', '%acme%', 50]
+
+    def test_index_expression_matches_aliased_expression(self):
+        from database import _invoice_search_document
+
+        assert _invoice_search_document('i').replace('i.', '') == _invoice_search_document()
+
+    def test_all_words_required_with_prefix_tsquery(self):
+        from database import _build_invoice_search_query
+
+        sql, params = _build_invoice_search_query('Servicii INV-2025')
+
+        assert params[0] == 'servicii:* & inv:* & 2025:*'
+        assert params[1:3] == ['%servicii%', '%inv-2025%']
+
+    def test_numeric_word_uses_value_range(self):
+        from database import _build_invoice_search_query
+
+        sql, params = _build_invoice_search_query('1.234,56')
+
+        assert 'i.invoice_value > %s AND i.invoice_value < %s' in sql
+        assert params[2] == pytest.approx(1234.55)
+        assert params[3] == pytest.approx(1234.57)
+
+    def test_like_wildcards_escaped(self):
+        from database import _build_invoice_search_query
+
+        _, params = _build_invoice_search_query('50%_off')
+
+        assert params[1] == '%50\\%\\_off%'
+
+    def test_allocation_filters_use_exists(self):
+        from database import _build_invoice_search_query
+
+        sql, params = _build_invoice_search_query('acme', {'company': 'Autoworld', 'status': 'new'}, limit=20)
+
+        assert 'DISTINCT' not in sql
+        assert 'EXISTS' in sql and 'a.company = %s' in sql
+        assert params[-3:] == ['Autoworld', 'new', 20]
+
+
+# ============== SCHEMA MIGRATION TESTS ==============
+
+class TestSchemaMigrations:
+    """Tests for the schema_version migration runner."""
+
+    def _mock_db(self, current_version):
+        conn = MagicMock()
+        cursor = MagicMock()
+        conn.cursor.return_value = cursor
+        cursor.fetchone.return_value = {'has_table': True, 'version': current_version}
+        return conn, cursor
+
+    def test_schema_version_matches_latest_migration(self):
+        from database import SCHEMA_VERSION, MIGRATIONS
+        assert SCHEMA_VERSION == max(MIGRATIONS)
+
+    def test_ensure_schema_skips_when_current(self):
+        import database
+        conn, cursor = self._mock_db(database.SCHEMA_VERSION)
+
+        with patch.object(database, 'get_db', return_value=conn), \
+             patch.object(database, 'release_db'), \
+             patch.object(database, 'run_migrations') as mock_run, \
+             patch.object(database, 'DB_SCHEMA_CHECK', 'auto'):
+            database.ensure_schema()
+
+        mock_run.assert_not_called()
+
+    def test_ensure_schema_migrates_when_behind(self):
+        import database
+        conn, cursor = self._mock_db(0)
+
+        with patch.object(database, 'get_db', return_value=conn), \
+             patch.object(database, 'release_db'), \
+             patch.object(database, 'run_migrations') as mock_run, \
+             patch.object(database, 'DB_SCHEMA_CHECK', 'auto'):
+            database.ensure_schema()
+
+        mock_run.assert_called_once()
+
+    def test_ensure_schema_warn_mode_does_not_migrate(self):
+        import database
+        conn, cursor = self._mock_db(0)
+
+        with patch.object(database, 'get_db', return_value=conn), \
+             patch.object(database, 'release_db'), \
+             patch.object(database, 'run_migrations') as mock_run, \
+             patch.object(database, 'DB_SCHEMA_CHECK', 'warn'):
+            database.ensure_schema()
+
+        mock_run.assert_not_called()
+
+    def test_run_migrations_applies_only_pending(self):
+        import database
+        conn, cursor = self._mock_db(1)
+        first, second = MagicMock(), MagicMock()
+
+        with patch.object(database, 'get_db', return_value=conn), \
+             patch.object(database, 'release_db'), \
+             patch.object(database, 'MIGRATIONS', {1: ('one', first), 2: ('two', second)}), \
+             patch.object(database, 'SCHEMA_VERSION', 2):
+            applied = database.run_migrations()
+
+        assert applied == [2]
+        first.assert_not_called()
+        second.assert_called_once()
+        sql = ' '.join(str(c.args[0]) for c in cursor.execute.call_args_list)
+        assert 'pg_advisory_lock' in sql
+        assert 'pg_advisory_unlock' in sql
+
+
 # Run with: pytest tests/test_database.py -v
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -2,8 +2,8 @@
 
 Tests for:
 - parser.py: parse_value(), parse_date(), parse_unicredit_statement()
-- vendors.py: match_vendor(), extract_vendor_name()
-- database.py: check_duplicate_transaction(), save_transactions()
+- vendors.py: VendorMatcher, match_vendor(), match_vendors(), extract_vendor_name()
+- database.py: check_duplicate_transaction(), save_transactions(), bulk_update_transaction_matches()
 """
 import sys
 import os
@@ -23,35 +23,35 @@ class TestParseValue:
     """Tests for parse_value() function - European number format parsing."""
 
     def test_simple_integer(self):
-        from accounting.statements.parser import parse_value
+        from parsing.statements import parse_value
         assert parse_value('123') == 123.0
 
     def test_european_format_with_comma(self):
-        from accounting.statements.parser import parse_value
+        from parsing.statements import parse_value
         assert parse_value('123,45') == 123.45
 
     def test_european_format_with_thousands(self):
-        from accounting.statements.parser import parse_value
+        from parsing.statements import parse_value
         assert parse_value('1.234,56') == 1234.56
 
     def test_european_format_large_number(self):
-        from accounting.statements.parser import parse_value
+        from parsing.statements import parse_value
         assert parse_value('1.234.567,89') == 1234567.89
 
     def test_with_spaces(self):
-        from accounting.statements.parser import parse_value
+        from parsing.statements import parse_value
         assert parse_value('1 234,56') == 1234.56
 
     def test_empty_string(self):
-        from accounting.statements.parser import parse_value
+        from parsing.statements import parse_value
         assert parse_value('') == 0.0
 
     def test_none(self):
-        from accounting.statements.parser import parse_value
+        from parsing.statements import parse_value
         assert parse_value(None) == 0.0
 
     def test_invalid_value(self):
-        from accounting.statements.parser import parse_value
+        from parsing.statements import parse_value
         assert parse_value('abc') == 0.0
 
 
@@ -59,31 +59,31 @@ class TestParseDate:
     """Tests for parse_date() function - DD.MM.YYYY to YYYY-MM-DD conversion."""
 
     def test_valid_date(self):
-        from accounting.statements.parser import parse_date
+        from parsing.statements import parse_date
         assert parse_date('15.11.2024') == '2024-11-15'
 
     def test_date_with_leading_zeros(self):
-        from accounting.statements.parser import parse_date
+        from parsing.statements import parse_date
         assert parse_date('01.01.2024') == '2024-01-01'
 
     def test_date_with_whitespace(self):
-        from accounting.statements.parser import parse_date
+        from parsing.statements import parse_date
         assert parse_date('  15.11.2024  ') == '2024-11-15'
 
     def test_empty_string(self):
-        from accounting.statements.parser import parse_date
+        from parsing.statements import parse_date
         assert parse_date('') is None
 
     def test_none(self):
-        from accounting.statements.parser import parse_date
+        from parsing.statements import parse_date
         assert parse_date(None) is None
 
     def test_invalid_date_format(self):
-        from accounting.statements.parser import parse_date
+        from parsing.statements import parse_date
         assert parse_date('2024-11-15') is None  # Wrong format
 
     def test_invalid_date_value(self):
-        from accounting.statements.parser import parse_date
+        from parsing.statements import parse_date
         assert parse_date('32.13.2024') is None  # Invalid day/month
 
 
@@ -91,27 +91,27 @@ class TestClassifyTransaction:
     """Tests for classify_transaction() function."""
 
     def test_pos_purchase(self):
-        from accounting.statements.parser import classify_transaction
+        from parsing.statements import classify_transaction
         assert classify_transaction('POS purchase at store') == 'card_purchase'
 
     def test_internal_transfer(self):
-        from accounting.statements.parser import classify_transaction
+        from parsing.statements import classify_transaction
         assert classify_transaction('Alim Card from account') == 'internal'
 
     def test_refund(self):
-        from accounting.statements.parser import classify_transaction
+        from parsing.statements import classify_transaction
         assert classify_transaction('Return from merchant') == 'refund'
 
     def test_fee(self):
-        from accounting.statements.parser import classify_transaction
+        from parsing.statements import classify_transaction
         assert classify_transaction('Comision administrare') == 'fee'
 
     def test_cms_transaction(self):
-        from accounting.statements.parser import classify_transaction
+        from parsing.statements import classify_transaction
         assert classify_transaction('Payment +CMS fee') == 'card_purchase'
 
     def test_other(self):
-        from accounting.statements.parser import classify_transaction
+        from parsing.statements import classify_transaction
         assert classify_transaction('Random transaction') == 'other'
 
 
@@ -119,9 +119,9 @@ class TestExtractTextFromPdf:
     """Tests for extract_text_from_pdf() function."""
 
     def test_extracts_text(self):
-        from accounting.statements.parser import extract_text_from_pdf
+        from parsing.statements import extract_text_from_pdf
         # Create a minimal PDF-like bytes (mock approach)
-        with patch('accounting.statements.parser.PyPDF2.PdfReader') as mock_reader:
+        with patch('parsing.statements.PyPDF2.PdfReader') as mock_reader:
             mock_page = MagicMock()
             mock_page.extract_text.return_value = 'Test PDF content'
             mock_reader.return_value.pages = [mock_page]
@@ -220,6 +220,100 @@ class TestMatchVendor:
         assert result['vendor_name'] is None
 
 
+class TestVendorMatcher:
+    """Tests for the combined VendorMatcher."""
+
+    @staticmethod
+    def _sequential(entries, text):
+        import re
+        for entry in entries:
+            if re.search(entry['pattern'], text, re.IGNORECASE):
+                return entry
+        return None
+
+    def test_first_pattern_wins_over_earlier_position(self):
+        from accounting.statements.vendors import VendorMatcher
+
+        matcher = VendorMatcher([{'pattern': r'ADS\d+', 'id': 1}, {'pattern': r'GOOGLE', 'id': 2}])
+
+        # GOOGLE appears first in the text, but the first pattern has priority
+        assert matcher.match('GOOGLE *ADS3555304242')['id'] == 1
+        assert matcher.match('GOOGLE CLOUD')['id'] == 2
+        assert matcher.match('FACEBK *123') is None
+
+    def test_same_result_as_sequential_search(self):
+        import random
+        from accounting.statements.vendors import VendorMatcher
+
+        entries = [
+            {'pattern': r'FACEBK\s*\*', 'id': 1},
+            {'pattern': r'^PLATA', 'id': 2},
+            {'pattern': r'(ab)\1', 'id': 3},  # Backreference runs on its own
+            {'pattern': r'GOOGLE\s*\*\s*ADS', 'id': 4},
+            {'pattern': r'(?i)shopify', 'id': 5},  # Global inline flag runs on its own
+            {'pattern': r'tarom\.ro$', 'id': 6},
+            {'pattern': r'\d{6}', 'id': 7},
+        ]
+        matcher = VendorMatcher(entries)
+        words = ['FACEBK *X', 'PLATA', 'abab', 'GOOGLE *ADS1', 'Shopify', 'tarom.ro', '123456', 'POS', 'ab',
+                 'ſhopify', 'TAROM.RO']
+        rng = random.Random(7)
+
+        for _ in range(500):
+            text = ' '.join(rng.choice(words) for _ in range(rng.randint(0, 4)))
+            assert matcher.match(text) is self._sequential(entries, text), text
+
+    def test_literal_prefix_of_another_literal(self):
+        from accounting.statements.vendors import VendorMatcher
+
+        matcher = VendorMatcher([
+            {'pattern': r'GOOGLE\s*CLOUD', 'id': 1},
+            {'pattern': r'GOOGLE', 'id': 2},
+            {'pattern': r'GOOG', 'id': 3},
+        ])
+        assert matcher.match('GOOGLE CLOUD EMEA')['id'] == 1
+        assert matcher.match('google *ads')['id'] == 2
+        assert matcher.match('GOOGPAY')['id'] == 3
+
+    def test_unicode_case_folding(self):
+        from accounting.statements.vendors import VendorMatcher
+
+        # IGNORECASE matches 'ı' to 'i' and the Kelvin sign to 'k'
+        matcher = VendorMatcher([{'pattern': r'FACEBK\s*\*', 'id': 1}, {'pattern': r'airalo', 'id': 2}])
+        assert matcher.match('FACEB\u212a *1')['id'] == 1
+        assert matcher.match('A\u0131RALO eSIM')['id'] == 2
+
+    def test_invalid_pattern_skipped(self):
+        from accounting.statements.vendors import VendorMatcher
+
+        matcher = VendorMatcher([{'pattern': r'FACEBK[', 'id': 1}, {'pattern': r'FACEBK', 'id': 2}])
+        assert len(matcher) == 1
+        assert matcher.match('FACEBK *1')['id'] == 2
+
+    def test_match_many_keeps_order(self):
+        from accounting.statements.vendors import VendorMatcher
+
+        matcher = VendorMatcher([{'pattern': r'FACEBK', 'id': 1}])
+        results = matcher.match_many(['FACEBK *1', 'Unknown', 'FACEBK *1'])
+        assert [r and r['id'] for r in results] == [1, None, 1]
+
+    @patch('accounting.statements.vendors.get_all_vendor_mappings')
+    def test_match_vendors_batch_equals_single(self, mock_get_mappings):
+        from accounting.statements.vendors import match_vendor, match_vendors, reload_patterns
+
+        mock_get_mappings.return_value = [
+            {'id': 1, 'pattern': r'FACEBK\s*\*', 'supplier_name': 'Meta', 'supplier_vat': None, 'template_id': None},
+            {'id': 2, 'pattern': r'GOOGLE', 'supplier_name': 'Google', 'supplier_vat': 'IE1', 'template_id': 3},
+        ]
+        reload_patterns()
+        descriptions = ['FACEBK *123', 'GOOGLE *ADS456', '', 'Unknown', 'FACEBK *123']
+
+        results = match_vendors(descriptions)
+
+        assert results == [match_vendor(d) for d in descriptions]
+        assert results[0] is not results[4]
+
+
 class TestMatchTransactions:
     """Tests for match_transactions() function."""
 
@@ -334,8 +428,8 @@ class TestSaveTransactions:
         mock_db.return_value = mock_conn
         mock_cur = MagicMock()
         mock_cursor.return_value = mock_cur
-        # First fetchone returns None (no duplicate), second returns the new ID
-        mock_cur.fetchone.side_effect = [None, {'id': 1}, None, {'id': 2}]
+        # Dated rows insert returns both ids, NULL-safe insert returns none
+        mock_cur.fetchall.side_effect = [[{'id': 2}, {'id': 1}], []]
 
         transactions = [
             {'statement_file': 'test.pdf', 'amount': 100, 'description': 'Test 1'},
@@ -345,9 +439,8 @@ class TestSaveTransactions:
         result = save_transactions_with_dedup(transactions)
 
         assert result['new_count'] == 2
-        assert len(result['new_ids']) == 2
-        assert 1 in result['new_ids']
-        assert 2 in result['new_ids']
+        assert result['new_ids'] == [1, 2]
+        assert result['duplicate_count'] == 0
         mock_conn.commit.assert_called_once()
 
     @patch('accounting.statements.database.release_db')
@@ -360,8 +453,8 @@ class TestSaveTransactions:
         mock_db.return_value = mock_conn
         mock_cur = MagicMock()
         mock_cursor.return_value = mock_cur
-        # First transaction: duplicate check returns existing, second: no duplicate
-        mock_cur.fetchone.side_effect = [{'id': 99}, None, {'id': 1}]
+        # Only the second transaction survives the dedup join
+        mock_cur.fetchall.side_effect = [[{'id': 1}], []]
 
         transactions = [
             {'statement_file': 'test.pdf', 'amount': 100, 'description': 'Duplicate'},
@@ -372,6 +465,238 @@ class TestSaveTransactions:
         assert result['new_count'] == 1
         assert result['duplicate_count'] == 1
 
+    @patch('accounting.statements.database.release_db')
+    @patch('accounting.statements.database.get_db')
+    @patch('accounting.statements.database.get_cursor')
+    def test_constant_round_trips(self, mock_cursor, mock_db, _mock_release):
+        from accounting.statements.database import save_transactions_with_dedup
+
+        mock_db.return_value = MagicMock()
+        mock_cur = MagicMock()
+        mock_cursor.return_value = mock_cur
+        mock_cur.fetchall.side_effect = [[{'id': i} for i in range(500)], []]
+
+        transactions = [
+            {'company_cui': '123', 'transaction_date': '2025-01-01', 'amount': i, 'description': f'T{i}'}
+            for i in range(500)
+        ]
+
+        save_transactions_with_dedup(transactions)
+
+        # Stage table + two set-based inserts; rows go through execute_values
+        assert mock_cur.execute.call_count == 3
+        insert_sql = mock_cur.execute.call_args_list[1][0][0]
+        assert 'DISTINCT ON' in insert_sql
+        assert 'ON CONFLICT DO NOTHING' in insert_sql
+
+    @patch('accounting.statements.database.get_db')
+    def test_empty_batch_skips_database(self, mock_db):
+        from accounting.statements.database import save_transactions_with_dedup
+
+        result = save_transactions_with_dedup([])
+
+        assert result == {'new_ids': [], 'new_count': 0, 'duplicate_count': 0}
+        mock_db.assert_not_called()
+
+
+class TestBulkUpdateTransactionMatches:
+    """Tests for set-based bulk_update_transaction_matches()."""
+
+    @staticmethod
+    def _returning(existing_ids):
+        """execute_values stand-in: RETURNING the staged ids that exist."""
+        return lambda cursor, sql, rows, **kwargs: [{'id': row[0]} for row in rows if row[0] in existing_ids]
+
+    @patch('accounting.statements.database.release_db')
+    @patch('accounting.statements.database.get_db')
+    @patch('accounting.statements.database.get_cursor')
+    def test_one_statement_per_outcome(self, mock_cursor, mock_db, _mock_release):
+        from accounting.statements.database import bulk_update_transaction_matches
+
+        mock_db.return_value = MagicMock()
+        mock_cur = MagicMock()
+        mock_cursor.return_value = mock_cur
+        results = [
+            {'transaction_id': i, 'invoice_id': 100 + i, 'confidence': 0.95, 'method': 'rule', 'auto_accepted': True}
+            for i in range(1, 2001)
+        ] + [
+            {'transaction_id': i, 'suggested_invoice_id': 100 + i, 'confidence': 0.6, 'method': 'heuristic'}
+            for i in range(2001, 3001)
+        ] + [{'transaction_id': 3001}, {'transaction_id': None, 'invoice_id': 1, 'auto_accepted': True}]
+
+        with patch.object(sys.modules['psycopg2.extras'], 'execute_values', side_effect=self._returning(set(range(1, 3001)))) as ev:
+            summary = bulk_update_transaction_matches(results)
+
+        assert summary == {'linked_count': 2000, 'suggested_count': 1000}
+        assert ev.call_count == 2
+        assert mock_cur.execute.call_count == 0
+        linked_sql, linked_rows = ev.call_args_list[0][0][1:3]
+        assert 'FROM (VALUES %s)' in linked_sql
+        assert "status = 'resolved'" in linked_sql
+        assert linked_rows[0] == (1, 101, 0.95, 'rule')
+        assert ev.call_args_list[0][1]['page_size'] == 2000
+
+    @patch('accounting.statements.database.release_db')
+    @patch('accounting.statements.database.get_db')
+    @patch('accounting.statements.database.get_cursor')
+    def test_counts_only_existing_rows(self, mock_cursor, mock_db, _mock_release):
+        from accounting.statements.database import bulk_update_transaction_matches
+
+        mock_db.return_value = MagicMock()
+        mock_cursor.return_value = MagicMock()
+        results = [
+            {'transaction_id': 1, 'invoice_id': 10, 'auto_accepted': True},
+            {'transaction_id': 99, 'invoice_id': 11, 'auto_accepted': True},  # Deleted meanwhile
+            {'transaction_id': 2, 'suggested_invoice_id': 12},
+        ]
+
+        with patch.object(sys.modules['psycopg2.extras'], 'execute_values', side_effect=self._returning({1, 2})) as ev:
+            summary = bulk_update_transaction_matches(results)
+
+        assert summary == {'linked_count': 1, 'suggested_count': 1}
+        assert ev.call_count == 2
+
+    @patch('accounting.statements.database.get_db')
+    def test_nothing_to_update_skips_database(self, mock_db):
+        from accounting.statements.database import bulk_update_transaction_matches
+
+        summary = bulk_update_transaction_matches([{'transaction_id': 1, 'auto_accepted': False}])
+
+        assert summary == {'linked_count': 0, 'suggested_count': 0}
+        mock_db.assert_not_called()
+
+
+class TestAcceptSuggestedMatch:
+    """Tests for accept_suggested_match()."""
+
+    @patch('accounting.statements.database.release_db')
+    @patch('accounting.statements.database.get_db')
+    @patch('accounting.statements.database.get_cursor')
+    def test_single_conditional_update(self, mock_cursor, mock_db, _mock_release):
+        from accounting.statements.database import accept_suggested_match
+
+        mock_db.return_value = MagicMock()
+        mock_cur = MagicMock()
+        mock_cursor.return_value = mock_cur
+        mock_cur.rowcount = 0
+
+        assert accept_suggested_match(5) is False
+        assert mock_cur.execute.call_count == 1
+        assert 'suggested_invoice_id IS NOT NULL' in mock_cur.execute.call_args[0][0]
+
+        mock_cur.rowcount = 1
+        assert accept_suggested_match(5) is True
+
+
+# ============== MULTI-FILE UPLOAD TESTS ==============
+
+def _fake_parse_statement(pdf_bytes, filename=None):
+    """Stand-in for parse_statement: bytes are '<delay>:<txn count>' or 'bad'."""
+    import time as _time
+    if pdf_bytes == b'bad':
+        raise ValueError('not a statement')
+    delay, count = pdf_bytes.decode().split(':')
+    _time.sleep(float(delay))
+    return {
+        'company_name': 'Autoworld SRL',
+        'company_cui': '123',
+        'period': {},
+        'transactions': [{'description': f'{filename} {i}', 'amount': -i} for i in range(int(count))],
+    }
+
+
+@pytest.fixture
+def upload_service():
+    """StatementsService with mocked repositories; parsing is faked and forked."""
+    from accounting.statements.services import statements_service as module
+
+    service = module.StatementsService()
+    service.statement_repo = MagicMock()
+    service.statement_repo.check_duplicate.return_value = None
+    service.statement_repo.create.side_effect = range(1, 100)
+    service.transaction_repo = MagicMock()
+    service.transaction_repo.save_with_dedup.side_effect = lambda txns, sid: {
+        'new_ids': [], 'new_count': len(txns), 'duplicate_count': 0
+    }
+    service.mapping_repo = MagicMock()
+    with patch.object(module, 'parse_statement', _fake_parse_statement), \
+            patch.object(module, 'match_transactions', side_effect=lambda txns: txns), \
+            patch.object(module, 'STATEMENT_START_METHOD', 'fork'):
+        yield service
+
+
+class TestProcessStatements:
+    """Tests for StatementsService.process_statements()."""
+
+    def test_inline_results_per_file(self, upload_service):
+        files = [(b'0:2', 'jan.pdf'), (b'bad', 'feb.pdf'), (b'0:3', 'mar.pdf')]
+
+        results = list(upload_service.process_statements(files, user_id=1, workers=1))
+
+        assert [(i, name) for i, name, _ in results] == [(0, 'jan.pdf'), (1, 'feb.pdf'), (2, 'mar.pdf')]
+        assert results[0][2].data['new_transactions'] == 2
+        assert results[1][2].success is False
+        assert results[1][2].error == 'not a statement'
+        assert results[2][2].data['new_transactions'] == 3
+
+    def test_skips_already_uploaded_and_repeated_files(self, upload_service):
+        upload_service.statement_repo.check_duplicate.side_effect = [
+            {'id': 7, 'uploaded_at': '2025-01-01'}, None, None
+        ]
+        files = [(b'0:1', 'old.pdf'), (b'0:2', 'new.pdf'), (b'0:2', 'copy.pdf')]
+
+        results = {name: r for _, name, r in upload_service.process_statements(files, user_id=1, workers=1)}
+
+        assert results['old.pdf'].data['existing_statement_id'] == 7
+        assert results['copy.pdf'].data['skipped'] is True
+        assert upload_service.statement_repo.create.call_count == 1
+
+    def test_parallel_results_stream_in_completion_order(self, upload_service):
+        files = [(b'0.6:1', 'slow.pdf'), (b'0:2', 'fast.pdf'), (b'bad', 'broken.pdf')]
+
+        results = list(upload_service.process_statements(files, user_id=1, workers=3))
+
+        names = [name for _, name, _ in results]
+        assert sorted(names) == ['broken.pdf', 'fast.pdf', 'slow.pdf']
+        assert names[-1] == 'slow.pdf'
+        assert {name: r.success for _, name, r in results} == {
+            'slow.pdf': True, 'fast.pdf': True, 'broken.pdf': False
+        }
+
+    def test_invoices_indexed_once_per_batch(self, upload_service):
+        upload_service.transaction_repo.save_with_dedup.side_effect = lambda txns, sid: {
+            'new_ids': [sid], 'new_count': 1, 'duplicate_count': 0
+        }
+        upload_service.transaction_repo.get_by_id.return_value = {'id': 1, 'amount': -5}
+        upload_service.transaction_repo.get_candidate_invoices.return_value = [{'id': 1, 'invoice_value': 5}]
+        files = [(b'0:1', 'a.pdf'), (b'0:1', 'b.pdf'), (b'0:1', 'c.pdf')]
+
+        list(upload_service.process_statements(files, user_id=1, workers=1))
+
+        assert upload_service.transaction_repo.get_candidate_invoices.call_count == 1
+
+
+class TestUploadStream:
+    """Tests for the NDJSON upload response."""
+
+    def test_file_lines_then_summary(self):
+        import json
+        from accounting.statements.routes import _stream_upload_results
+        from accounting.statements.services.statements_service import ServiceResult
+
+        processed = iter([
+            (1, 'b.pdf', ServiceResult(success=True, data={'filename': 'b.pdf', 'new_transactions': 4,
+                                                           'duplicate_transactions': 1})),
+            (0, 'a.pdf', ServiceResult(success=False, error='boom')),
+        ])
+
+        lines = [json.loads(line) for line in _stream_upload_results(processed, total_files=2)]
+
+        assert [line['type'] for line in lines] == ['file', 'file', 'done']
+        assert lines[0]['index'] == 1 and lines[0]['completed'] == 1
+        assert lines[1]['error'] == 'boom'
+        assert lines[2] == {'type': 'done', 'success': True, 'total_new': 4, 'total_duplicates': 1}
+
 
 # ============== RATE LIMITER TESTS ==============
 